@@ -9,13 +9,14 @@ from src.app.images.routers import image
 from src.app.media.routers import media
 from src.app.users.daos.userDAO import UserDAO
 from src.app.users.models.database import models
-from src.app.people.routers import person, household, address
+from src.app.people.routers import person, household, address, export, proximity
 from src.app.users.models.database.models import User
 from src.app.users.routers import user, login
 from src.app.users.factories.userFactory import UserFactory
 from src.app.config import settings
 from src.app.users.services.passwordUtil import PasswordUtil
 from src.app.users.services.userService import UserService
+from src.app.utils.viewCache import start_view_cache
 from src.app.worship.routers import song
 
 models.Base.metadata.create_all(engine)
@@ -29,6 +30,8 @@ app.include_router(household.router)
 app.include_router(media.router)
 app.include_router(image.router)
 app.include_router(address.router)
+app.include_router(export.router)
+app.include_router(proximity.router)
 app.include_router(church.router)
 app.include_router(song.router)
 
@@ -52,6 +55,7 @@ def get_db():
 # This sets up an initial user and is here only for now in the early stages of devs. Will move to migrations when ready.
 @app.on_event("startup")
 async def startup_event():
+    start_view_cache()
     user_DAO = UserDAO(db=next(get_db()))
     password_utils = PasswordUtil()
     user_factory = UserFactory(password_utils=password_utils)
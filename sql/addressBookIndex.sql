@@ -0,0 +1,4 @@
+-- Composite index in the order of the address book (city, suburb, street, id), used by the streamed /addresses
+-- listing and the keyset pages of /addresses/cursor.
+-- New databases get this from the model metadata, run this once against existing databases.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_addresses_city_suburb_street ON addresses (city, suburb, street, id);
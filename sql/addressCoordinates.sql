@@ -0,0 +1,3 @@
+-- Composite index for the latitude/longitude bounding box prefilter of the proximity search.
+-- New databases get this from the model metadata, run this once against existing databases.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_addresses_latitude_longitude ON addresses (latitude, longitude);
@@ -0,0 +1,7 @@
+-- Normalised fingerprints of addresses (see AddressFingerprint), so that duplicate lookups are unique index probes.
+-- New databases get these from the model metadata, run this once against existing databases and then merge the
+-- existing duplicates and fill the fingerprints with
+-- python -m src.app.people.jobs.mergeDuplicateAddresses
+-- The index allows any number of null fingerprints, so it can be created before the job has run.
+ALTER TABLE addresses ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_addresses_fingerprint ON addresses (fingerprint);
@@ -0,0 +1,5 @@
+-- Pointers to the newest profile/household image, so views resolve the image with one join.
+-- New databases get these from the model metadata, run this once against existing databases and then backfill with
+-- python -m src.app.people.jobs.backfillCurrentImages
+ALTER TABLE people ADD COLUMN IF NOT EXISTS current_profile_image_id INTEGER REFERENCES media_items (id);
+ALTER TABLE households ADD COLUMN IF NOT EXISTS current_household_image_id INTEGER REFERENCES media_items (id);
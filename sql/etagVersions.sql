@@ -0,0 +1,4 @@
+-- Row versions of the song and church views, the ETags of GET /song/{id} and GET /church are built from them.
+-- New databases get these from the model metadata, run this once against existing databases.
+ALTER TABLE songs ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE church ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
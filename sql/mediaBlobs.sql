@@ -0,0 +1,15 @@
+-- Content-addressed store of media: one blob per distinct content, media items point at theirs.
+-- New databases get these from the model metadata, run this once against existing databases and then link the
+-- existing items with python -m src.app.media.jobs.collectMediaBlobs
+CREATE TABLE IF NOT EXISTS media_blobs (
+    id SERIAL PRIMARY KEY,
+    created TIMESTAMP NOT NULL,
+    store VARCHAR NOT NULL,
+    address VARCHAR NOT NULL,
+    sha256 VARCHAR(64) NOT NULL,
+    size BIGINT NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    CONSTRAINT media_blobs_store_sha256_uc UNIQUE (store, sha256)
+);
+ALTER TABLE media_items ADD COLUMN IF NOT EXISTS blob_id INTEGER REFERENCES media_blobs (id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_media_items_blob_id ON media_items (blob_id);
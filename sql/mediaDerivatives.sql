@@ -0,0 +1,15 @@
+-- Resized copies of images (thumbnail, small, medium), shared by the media items with the same content.
+-- New databases get this from the model metadata, run this once against existing databases and then make the
+-- derivatives of the existing images with python -m src.app.media.jobs.backfillImageDerivatives
+CREATE TABLE IF NOT EXISTS media_derivatives (
+    id SERIAL PRIMARY KEY,
+    created TIMESTAMP NOT NULL,
+    source_blob_id INTEGER NOT NULL REFERENCES media_blobs (id),
+    variant VARCHAR NOT NULL,
+    blob_id INTEGER NOT NULL REFERENCES media_blobs (id),
+    content_type VARCHAR NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    CONSTRAINT media_derivatives_source_variant_uc UNIQUE (source_blob_id, variant)
+);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_media_derivatives_blob_id ON media_derivatives (blob_id);
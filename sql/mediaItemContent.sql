@@ -0,0 +1,6 @@
+-- Size, SHA-256 and sniffed content type of media items, computed while uploads are copied.
+-- New databases get these from the model metadata, run this once against existing databases. Items uploaded before
+-- keep null values.
+ALTER TABLE media_items ADD COLUMN IF NOT EXISTS size BIGINT;
+ALTER TABLE media_items ADD COLUMN IF NOT EXISTS sha256 VARCHAR(64);
+ALTER TABLE media_items ADD COLUMN IF NOT EXISTS detected_content_type VARCHAR;
@@ -0,0 +1,7 @@
+-- Month-day ordinals (month * 100 + day) used by the birthday and anniversary lookups.
+-- New databases get these from the model metadata, run this once against existing databases and then backfill with
+-- python -m src.app.people.jobs.backfillMonthDayOrdinals
+ALTER TABLE people ADD COLUMN IF NOT EXISTS birth_month_day INTEGER;
+ALTER TABLE people ADD COLUMN IF NOT EXISTS marriage_month_day INTEGER;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_people_birth_month_day ON people (birth_month_day);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_people_marriage_month_day ON people (marriage_month_day);
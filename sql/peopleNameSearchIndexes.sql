@@ -0,0 +1,4 @@
+-- Prefix indexes for the people name type-ahead (lower(name) LIKE 'x%').
+-- New databases get these from the model metadata, run this once against existing databases.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_people_lower_first_name ON people (lower(first_name) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_people_lower_last_name ON people (lower(last_name) text_pattern_ops);
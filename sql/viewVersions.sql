@@ -0,0 +1,4 @@
+-- Row versions of the people and household detail views, bumped on every write that changes the view.
+-- New databases get these from the model metadata, run this once against existing databases.
+ALTER TABLE people ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE households ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
@@ -1,7 +1,7 @@
 from fastapi import Depends
 
 from src.app.church.models.church import CreateChurch, UpdateChurch
-from src.app.database import get_db, SessionLocal
+from src.app.database import get_db, SessionLocal, UnitOfWork
 
 from src.app.church.models.database import models
 
@@ -15,7 +15,7 @@ class ChurchDAO:
             raise Exception("Church already exists")
 
         self.db.add(new_church)
-        self.db.commit()
+        UnitOfWork.commit(self.db)
         self.db.refresh(new_church)
 
         return new_church
@@ -23,13 +23,22 @@ class ChurchDAO:
     def get_church(self) -> models.Church:
         return self.db.query(models.Church).first()
 
+    def get_church_id_and_version(self):
+        return self.db.query(models.Church.id, models.Church.version).first()
+
+    def increment_version_for_address(self, address_id):
+        self.db.query(models.Church).filter(models.Church.address_id == address_id)\
+            .update({models.Church.version: models.Church.version + 1}, synchronize_session=False)
+        UnitOfWork.commit(self.db)
+
     def update_church(self, update_values):
         church_entity = self.db.query(models.Church).first()
         church_entity_to_update = self.db.query(models.Church).filter(models.Church.id == church_entity.id)
         if church_entity is None:
             raise Exception("Church does not exist")
-        church_entity_to_update.update(update_values)
-        self.db.commit()
+        update_values['version'] = models.Church.version + 1
+        church_entity_to_update.update(update_values, synchronize_session=False)
+        UnitOfWork.commit(self.db)
         return self.db.query(models.Church).first()
 
 
@@ -38,5 +47,5 @@ class ChurchDAO:
         if church_entity is None:
             raise Exception("There is no existing church configuration to delete")
         self.db.delete(church_entity)
-        self.db.commit()
+        UnitOfWork.commit(self.db)
 
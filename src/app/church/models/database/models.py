@@ -17,4 +17,6 @@ class Church(Base):
     description = Column(String)
     logo_image = relationship("MediaItem", backref="church")
     address = relationship("Address", backref="church")
+    # bumped by every write that changes the church view (including its address), used for ETags
+    version = Column(Integer, nullable=False, default=1, server_default='1')
     #add social media links as well
@@ -1,18 +1,31 @@
-from fastapi import status, Depends, HTTPException, UploadFile, APIRouter
+from typing import Union
+
+from fastapi import status, Depends, HTTPException, UploadFile, APIRouter, Header, Response
 
 from src.app.church.models.church import ViewChurch, CreateChurch, UpdateChurch
 from src.app.church.services.churchService import ChurchService, ChurchAlreadyExists, NoChurchExists, \
     LogoImageDoesNotExist, AddressDoesNotExist
 from src.app.users.models.user import User
 from src.app.users.routers.login import get_current_user
+from src.app.utils.conditionalRequest import ConditionalRequest, get_conditional_request
+from src.app.utils.etag import ETag
 
 router = APIRouter(tags=['Church'])
 
 @router.get('/church', response_model=ViewChurch)
-def get_church(church_service: ChurchService = Depends(ChurchService)):
+def get_church(response: Response, if_none_match: Union[str, None] = Header(None),
+               church_service: ChurchService = Depends(ChurchService)):
+    church_id_and_version = church_service.get_church_id_and_version()
+    if church_id_and_version is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="The church has not yet been defined")
+    etag = ETag.for_version('church', *church_id_and_version)
+    if ETag.matches(if_none_match, etag):
+        return ETag.not_modified(etag)
+
     church = church_service.get_church()
     if church is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="The church has not yet been defined")
+    ETag.tag(response, etag)
     return church
 
 @router.post('/church', status_code=status.HTTP_201_CREATED)
@@ -41,9 +54,9 @@ def delete_church(church_service: ChurchService = Depends(ChurchService), curren
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="There is not church configuration to delete")
 
 @router.get('/church/logo')
-def get_church_logo(church_service: ChurchService = Depends(ChurchService)):
-    logo_image = church_service.get_church_logo()
+def get_church_logo(request: ConditionalRequest = Depends(get_conditional_request),
+                    church_service: ChurchService = Depends(ChurchService)):
+    logo_image = church_service.get_church_logo(request)
     if logo_image is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Church logo has not been defined")
-    logo_image.headers['cache-control'] = 'max-age=20'
     return logo_image
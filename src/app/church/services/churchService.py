@@ -9,6 +9,7 @@ from src.app.church.models.church import CreateChurch, UpdateChurch, ViewChurch
 from src.app.media.daos.mediaDAO import MediaDAO
 from src.app.media.services.mediaService import MediaService
 from src.app.people.daos.addressDAO import AddressDAO
+from src.app.utils.conditionalRequest import ConditionalRequest
 
 
 class ChurchAlreadyExists(Exception):
@@ -36,6 +37,9 @@ class ChurchService:
         self.address_DAO = address_DAO
         self.media_service = media_service
 
+    def get_church_id_and_version(self):
+        return self.church_dao.get_church_id_and_version()
+
     def get_church(self) -> ViewChurch:
         return self.church_factory.create_church_from_church_entity(self.church_dao.get_church())
 
@@ -81,13 +85,15 @@ class ChurchService:
             raise NoChurchExists("There is no existing church configuration to delete")
         return self.church_dao.delete_church()
 
-    def get_church_logo(self):
+    def get_church_logo(self, request: ConditionalRequest = None):
         church_entity = self.church_dao.get_church()
         if church_entity is None:
             raise NoChurchExists("Church does not exist")
 
 
         if church_entity.logo_image is not None:
-            return self.media_service.get_media_item_by_id(church_entity.logo_image.id, as_attachment=False)
+            return self.media_service.get_media_item_by_id(church_entity.logo_image.id, as_attachment=False,
+                                                           request=request,
+                                                           cache_control=MediaService.current_item_cache_control())
 
         return None
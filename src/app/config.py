@@ -13,6 +13,27 @@ class Settings(BaseSettings):
     flocki_token_expiry_minutes: int = 20
     flocki_media_store: str = "local" # local or s3 (aws)
     flocki_media_base_path: str = "./media"
+    flocki_image_max_age_seconds: int = 20 # how long clients may reuse the current image or sheet behind a url
+    flocki_media_max_age_seconds: int = 365 * 24 * 3600 # media items never change, urls naming one are cached this long
+    flocki_media_max_upload_bytes: int = 50 * 1024 * 1024 # larger uploads are refused while they are copied
+    flocki_image_max_upload_bytes: int = 20 * 1024 * 1024
+    flocki_media_upload_chunk_bytes: int = 1024 * 1024 # uploads are copied to the store this many bytes at a time
+    flocki_image_derivatives_at_upload: bool = True # otherwise the resized images are made on their first request
+    flocki_image_derivative_quality: int = 82 # of JPEG and WebP derivatives
+
+    flocki_view_cache_backend: str = "local" # local (in-process LRU), shared or none
+    flocki_view_cache_size: int = 2000
+    flocki_view_cache_ttl_seconds: int = 3600
+    flocki_view_cache_url: str = "" # redis url for the shared backend, an in-process stand-in is used when empty
+
+    flocki_people_import_batch_size: int = 500 # people inserted per transaction by the spreadsheet import
+    flocki_export_batch_size: int = 1000 # rows fetched per round trip by the congregation export and streamed listings
+
+    flocki_proximity_cell_degrees: float = 0.05 # cell size of the in-process address grid, about 5.5km of latitude
+    flocki_proximity_index_max_age_seconds: int = 300 # the grid is rebuilt after this, picking up writes of other processes
+
+    flocki_geocode_new_addresses: bool = True # new addresses without coordinates get those of their postal code or suburb
+    flocki_geocoding_centroids_path: str = "" # csv of postal code and suburb centroids, the bundled table when empty
 
     flocki_cors_origins: Set[str] = set()
     flocki_cors_origins.add("http://localhost:3000")
@@ -22,6 +43,10 @@ class Settings(BaseSettings):
     flocki_s3_region_name = "eu-west-1"
     flocki_s3_access_key = "" 
     flocki_s3_secret_access_key = ""
+    flocki_s3_endpoint_url: str = "" # e.g. a local S3 stand-in such as minio, empty for aws
+    flocki_s3_serving_mode: str = "proxy" # proxy streams objects through the api, redirect sends a 302 to a presigned url
+    flocki_s3_presigned_url_expiry_seconds: int = 900
+    flocki_s3_presigned_url_margin_seconds: int = 60 # a presigned url is reused until this long before it expires
 
     flocki_google_client_id = "1026317288648-ig69iuhplrskjvuqtov66qu4bihlk27g.apps.googleusercontent.com"
 
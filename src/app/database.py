@@ -1,3 +1,4 @@
+from fastapi import Depends
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -15,4 +16,42 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+class UnitOfWork:
+    """
+    Makes the writes of a service call one transaction on the request session:
+
+        with self.unit_of_work:
+            ...
+
+    DAOs end their writes with UnitOfWork.commit(self.db). While a unit of work is open on the session that only
+    flushes, so later queries see the writes, and the outermost unit of work commits once at its end or rolls
+    everything back when it is left with an exception. Outside a unit of work DAOs commit as before.
+    """
+
+    def __init__(self, db: SessionLocal = Depends(get_db)):
+        self.db = db
+
+    def __enter__(self):
+        # kept on the session, so that every DAO and nested unit of work sharing it sees it
+        self.db.info['unit_of_work_depth'] = self.db.info.get('unit_of_work_depth', 0) + 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        depth = self.db.info['unit_of_work_depth'] - 1
+        self.db.info['unit_of_work_depth'] = depth
+        if depth == 0:
+            if exc_type is None:
+                self.db.commit()
+            else:
+                self.db.rollback()
+        return False
+
+    @staticmethod
+    def commit(db):
+        if db.info.get('unit_of_work_depth'):
+            db.flush()
+        else:
+            db.commit()
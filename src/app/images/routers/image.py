@@ -2,9 +2,12 @@ import logging
 import os
 import uuid
 from src.app.utils.fileUtils import FileUtils
-from fastapi import status, Depends, HTTPException, UploadFile
-from ...media.services.mediaService import MediaService, NoMediaItemException
-from ...media.models.media import ViewMediaItem
+from typing import Union
+
+from fastapi import status, Depends, HTTPException, UploadFile, Query
+from ...media.services.mediaService import MediaService, NoMediaItemException, MediaItemTooLargeException
+from ...media.models.media import ViewMediaItem, ImageSize, ImageFormat
+from ...utils.conditionalRequest import ConditionalRequest, get_conditional_request
 from fastapi import APIRouter
 from ...people.factories.peopleFactory import PeopleFactory
 from ...users.models.user import User
@@ -14,15 +17,16 @@ router = APIRouter(tags=['Images'])
 peopleFactory = PeopleFactory()
 
 @router.get('/images/{id}')
-def get_image_by_id(id: int, media_service: MediaService = Depends(MediaService)):
+def get_image_by_id(id: int, size: ImageSize = Query(ImageSize.original, description="a resized copy of the image"),
+                    format: Union[ImageFormat, None] = Query(None, description="format of the resized copy"),
+                    request: ConditionalRequest = Depends(get_conditional_request),
+                    media_service: MediaService = Depends(MediaService)):
     try:
-        image = media_service.get_media_item_by_id(id, as_attachment=False)
+        image = media_service.get_image_by_id(id, size, format, request)
 
         if image is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No image with that ID")
 
-        image.headers['cache-control'] = 'max-age=20'
-
         return image
     except NoMediaItemException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.get_message())
@@ -38,7 +42,9 @@ def upload_image(file: UploadFile, media_service: MediaService = Depends(MediaSe
         #remove file extension
         filename = os.path.splitext(file.filename)[0]
         filename = (filename.strip() + '_' + str(uuid.uuid4()) + '.' + FileUtils.get_file_extension(file)).strip()
-        return media_service.create_media_item(file, filename)
+        return media_service.create_image(file, filename)
+    except MediaItemTooLargeException as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=e.args[0])
     except:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Something went wrong")
 
@@ -1,6 +1,8 @@
+
 from fastapi import Depends
+from sqlalchemy import exc
 
-from src.app.database import SessionLocal, get_db
+from src.app.database import SessionLocal, get_db, UnitOfWork
 from src.app.media.models.database import models
 
 
@@ -13,6 +15,45 @@ class MediaDAO:
 
     def add_media_item(self, media_item):
         self.db.add(media_item)
-        self.db.commit()
+        if media_item.blob_id is not None:
+            # in the same transaction as the item, so the count never misses a committed item
+            self.db.query(models.MediaBlob).filter(models.MediaBlob.id == media_item.blob_id)\
+                .update({models.MediaBlob.ref_count: models.MediaBlob.ref_count + 1}, synchronize_session=False)
+        UnitOfWork.commit(self.db)
         self.db.refresh(media_item)
         return self.get_media_item_by_id(media_item.id)
+
+    def get_blob(self, store, sha256) -> models.MediaBlob:
+        return self.db.query(models.MediaBlob)\
+            .filter(models.MediaBlob.store == store, models.MediaBlob.sha256 == sha256).first()
+
+    def add_blob(self, blob: models.MediaBlob) -> models.MediaBlob:
+        # two uploads of the same content can race to add its blob, the loser uses the blob of the winner. The
+        # savepoint keeps the rest of an open unit of work when the insert fails
+        try:
+            with self.db.begin_nested():
+                self.db.add(blob)
+        except exc.IntegrityError:
+            return self.get_blob(blob.store, blob.sha256)
+        UnitOfWork.commit(self.db)
+        self.db.refresh(blob)
+        return blob
+
+    def get_derivative(self, source_blob_id, variant):
+        # (derivative, its blob)
+        return self.db.query(models.MediaDerivative, models.MediaBlob)\
+            .join(models.MediaBlob, models.MediaBlob.id == models.MediaDerivative.blob_id)\
+            .filter(models.MediaDerivative.source_blob_id == source_blob_id,
+                    models.MediaDerivative.variant == variant).first()
+
+    def add_derivative(self, derivative: models.MediaDerivative):
+        # the first request for a missing derivative makes it, concurrent ones use the derivative of the first
+        try:
+            with self.db.begin_nested():
+                self.db.add(derivative)
+        except exc.IntegrityError:
+            return self.get_derivative(derivative.source_blob_id, derivative.variant)
+        self.db.query(models.MediaBlob).filter(models.MediaBlob.id == derivative.blob_id)\
+            .update({models.MediaBlob.ref_count: models.MediaBlob.ref_count + 1}, synchronize_session=False)
+        UnitOfWork.commit(self.db)
+        return self.get_derivative(derivative.source_blob_id, derivative.variant)
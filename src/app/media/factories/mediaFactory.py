@@ -11,7 +11,11 @@ class MediaFactory:
                 filename=media_item.filename,
                 description=media_item.description,
                 content_type=media_item.content_type,
-                tags=media_item.tags)
+                tags=media_item.tags,
+                size=media_item.size,
+                sha256=media_item.sha256,
+                detected_content_type=media_item.detected_content_type,
+                blob_id=media_item.blob_id)
         return media_entity
 
     def create_media_item_from_media_item_entity(self, media_item_entity):
@@ -23,7 +27,11 @@ class MediaFactory:
             filename=media_item_entity.filename,
             description=media_item_entity.description,
             content_type=media_item_entity.content_type,
-            tags=media_item_entity.tags)
+            tags=media_item_entity.tags,
+            size=media_item_entity.size,
+            sha256=media_item_entity.sha256,
+            detected_content_type=media_item_entity.detected_content_type,
+            blob_id=media_item_entity.blob_id)
 
     def create_view_media_item_from_media_item_entity(self, media_item_entity):
         return ViewMediaItem(
@@ -0,0 +1,50 @@
+# Makes the thumbnail, small and medium derivatives of every image that does not have them yet, one media item per
+# content. Run once after sql/mediaDerivatives.sql and after src/app/media/jobs/collectMediaBlobs.py has linked the
+# existing items to blobs: python -m src.app.media.jobs.backfillImageDerivatives
+import logging
+
+from sqlalchemy import func
+
+from src.app.database import SessionLocal
+from src.app.media.daos.mediaDAO import MediaDAO
+from src.app.media.factories.mediaFactory import MediaFactory
+from src.app.media.models.database import models
+from src.app.media.models.media import ImageSize
+from src.app.media.services.mediaService import MediaService
+from src.app.utils.imageResizer import ImageResizer, ImageResizerException, DERIVATIVE_SIZES
+
+BATCH_SIZE = 100
+
+
+def run(db) -> int:
+    media_service = MediaService(media_DAO=MediaDAO(db), media_factory=MediaFactory())
+    sizes = [ImageSize(size) for size in DERIVATIVE_SIZES]
+    created = 0
+    last_blob_id = 0
+    while True:
+        # the first item of each content, the derivatives belong to the content
+        first_items = db.query(func.min(models.MediaItem.id))\
+            .filter(models.MediaItem.blob_id > last_blob_id)\
+            .group_by(models.MediaItem.blob_id).order_by(models.MediaItem.blob_id).limit(BATCH_SIZE).all()
+        if not first_items:
+            break
+        items = db.query(models.MediaItem).filter(models.MediaItem.id.in_([id for id, in first_items]))\
+            .order_by(models.MediaItem.blob_id).all()
+        last_blob_id = items[-1].blob_id
+        for item in items:
+            if not ImageResizer.can_resize(item.detected_content_type or item.content_type):
+                continue
+            try:
+                created += media_service.create_derivatives(item, sizes)
+            except (ImageResizerException, OSError) as e:
+                logging.error(f"No derivatives of media item {item.id}: {e}")
+        db.expunge_all()
+    return created
+
+
+if __name__ == '__main__':
+    session = SessionLocal()
+    try:
+        print(f"Made {run(session)} image derivatives")
+    finally:
+        session.close()
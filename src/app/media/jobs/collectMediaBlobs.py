@@ -0,0 +1,133 @@
+# Links the media items uploaded before sql/mediaBlobs.sql to blobs: each is hashed, the first item with a content
+# keeps its copy as the blob of that content and the copies of the others are removed. Then drops the derivatives of
+# content no item has any more, recounts the references to every blob and removes the blobs nothing points at. Run
+# once after sql/mediaBlobs.sql and sql/mediaDerivatives.sql, then from time to time:
+# python -m src.app.media.jobs.collectMediaBlobs
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from botocore.exceptions import ClientError
+from sqlalchemy import func, select, exists
+
+from src.app.database import SessionLocal
+from src.app.media.daos.mediaDAO import MediaDAO
+from src.app.media.factories.mediaFactory import MediaFactory
+from src.app.media.models.database import models
+from src.app.media.services.mediaService import MediaService
+
+BATCH_SIZE = 1000
+# an upload stores its blob before it adds the item pointing at it, younger blobs are left alone
+GRACE_PERIOD = timedelta(hours=1)
+
+
+def run(db, now: datetime = None) -> Tuple[int, int]:
+    now = now or datetime.now()
+    media_service = MediaService(media_DAO=MediaDAO(db), media_factory=MediaFactory())
+    linked = link_media_items(db, media_service, now)
+    drop_derivatives(db, now - GRACE_PERIOD)
+    count_references(db)
+    collected = collect_blobs(db, media_service, now - GRACE_PERIOD)
+    return linked, collected
+
+
+def link_media_items(db, media_service, now) -> int:
+    linked = 0
+    replaced = set()  # (store, address) of the copies the linked items no longer point at
+    last_id = 0
+    while True:
+        items = db.query(models.MediaItem)\
+            .filter(models.MediaItem.blob_id.is_(None), models.MediaItem.id > last_id)\
+            .order_by(models.MediaItem.id).limit(BATCH_SIZE).all()
+        if not items:
+            break
+        last_id = items[-1].id
+        for item in items:
+            # hashed again even when the item has a sha256, song sheets used to be overwritten under the same name
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                for chunk in media_service.read_stored(item.store, item.address):
+                    digest.update(chunk)
+                    size += len(chunk)
+            except (OSError, ClientError) as e:
+                # left unlinked, the item has nothing to serve either way
+                logging.error(f"Could not read media item {item.id}: {e}")
+                continue
+            sha256 = digest.hexdigest()
+            blob = media_service.media_DAO.get_blob(item.store, sha256)
+            if blob is None:
+                blob = models.MediaBlob(created=now, store=item.store, address=item.address, sha256=sha256, size=size)
+                db.add(blob)
+                db.flush()
+            elif blob.address != item.address:
+                replaced.add((item.store, item.address))
+            item.blob_id = blob.id
+            item.address = blob.address
+            item.size = size
+            item.sha256 = sha256
+            linked += 1
+        db.commit()
+
+    for store, address in replaced:
+        if not in_use(db, store, address):
+            media_service.delete_stored(store, address)
+    return linked
+
+
+def in_use(db, store, address) -> bool:
+    item = db.query(models.MediaItem.id)\
+        .filter(models.MediaItem.store == store, models.MediaItem.address == address).first()
+    blob = db.query(models.MediaBlob.id)\
+        .filter(models.MediaBlob.store == store, models.MediaBlob.address == address).first()
+    return item is not None or blob is not None
+
+
+def drop_derivatives(db, created_before):
+    # their blobs are collected below like any other
+    source_referenced = exists().where(models.MediaItem.blob_id == models.MediaDerivative.source_blob_id)
+    old_sources = select(models.MediaBlob.id).where(models.MediaBlob.created < created_before)
+    db.query(models.MediaDerivative)\
+        .filter(~source_referenced, models.MediaDerivative.source_blob_id.in_(old_sources))\
+        .delete(synchronize_session=False)
+    db.commit()
+
+
+def count_references(db):
+    # uploads keep the counts up to date, this repairs them after the links above and after failed requests
+    items = select(func.count(models.MediaItem.id))\
+        .where(models.MediaItem.blob_id == models.MediaBlob.id).scalar_subquery()
+    derivatives = select(func.count(models.MediaDerivative.id))\
+        .where(models.MediaDerivative.blob_id == models.MediaBlob.id).scalar_subquery()
+    db.query(models.MediaBlob).update({models.MediaBlob.ref_count: items + derivatives}, synchronize_session=False)
+    db.commit()
+
+
+def collect_blobs(db, media_service, created_before) -> int:
+    # the count can be behind an upload that committed during the recount, the items themselves are checked too
+    referenced = exists().where(models.MediaItem.blob_id == models.MediaBlob.id) | \
+        exists().where(models.MediaDerivative.blob_id == models.MediaBlob.id) | \
+        exists().where(models.MediaDerivative.source_blob_id == models.MediaBlob.id)
+    blobs = db.query(models.MediaBlob.id, models.MediaBlob.store, models.MediaBlob.address)\
+        .filter(models.MediaBlob.ref_count == 0, models.MediaBlob.created < created_before, ~referenced)\
+        .order_by(models.MediaBlob.id).all()
+    for start in range(0, len(blobs), BATCH_SIZE):
+        batch = blobs[start:start + BATCH_SIZE]
+        db.query(models.MediaBlob).filter(models.MediaBlob.id.in_([id for id, _, _ in batch]), ~referenced)\
+            .delete(synchronize_session=False)
+        db.commit()
+        # the row goes first, so that no upload finds a blob whose content is gone
+        for _, store, address in batch:
+            if not in_use(db, store, address):
+                media_service.delete_stored(store, address)
+    return len(blobs)
+
+
+if __name__ == '__main__':
+    session = SessionLocal()
+    try:
+        linked, collected = run(session)
+        print(f"Linked {linked} media items to blobs, removed {collected} unreferenced blobs")
+    finally:
+        session.close()
@@ -1,8 +1,23 @@
-from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint, ForeignKey, DECIMAL, BigInteger
 from sqlalchemy.orm import relationship
 
 from src.app.database import Base
 
+class MediaBlob(Base):
+    # the content of media items, stored once per store under its sha256. ref_count is the number of media items and
+    # derivatives pointing at it, a blob nothing points at any more is removed by
+    # src/app/media/jobs/collectMediaBlobs.py
+    __tablename__ = 'media_blobs'
+    __table_args__ = (UniqueConstraint('store', 'sha256', name='media_blobs_store_sha256_uc'),)
+    id = Column(Integer, primary_key=True, index=True)
+    created = Column(DateTime, nullable=False)
+    store = Column(String, nullable=False)
+    address = Column(String, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0, server_default='0')
+
+
 class MediaItem(Base):
     __tablename__ = 'media_items'
     id = Column(Integer, primary_key=True, index=True)
@@ -13,5 +28,25 @@ class MediaItem(Base):
     description = Column(String, nullable=True)
     content_type = Column(String, nullable=True)
     tags = Column(String, nullable=True)    # comma separated list of tags
+    # computed while the upload is copied, null for items uploaded before sql/mediaItemContent.sql
+    size = Column(BigInteger, nullable=True)
+    sha256 = Column(String(64), nullable=True)
+    detected_content_type = Column(String, nullable=True)  # sniffed from the first bytes, content_type is what the client sent
+    # null for items uploaded before sql/mediaBlobs.sql until src/app/media/jobs/collectMediaBlobs.py has linked them
+    blob_id = Column(Integer, ForeignKey('media_blobs.id'), nullable=True, index=True)
 
 
+class MediaDerivative(Base):
+    # a resized copy of the image in source_blob, so it is shared by every media item with that content. variant is
+    # the size, followed by .<format> when a format was asked for. The copy is a blob like any other, counted once per
+    # derivative pointing at it
+    __tablename__ = 'media_derivatives'
+    __table_args__ = (UniqueConstraint('source_blob_id', 'variant', name='media_derivatives_source_variant_uc'),)
+    id = Column(Integer, primary_key=True, index=True)
+    created = Column(DateTime, nullable=False)
+    source_blob_id = Column(Integer, ForeignKey('media_blobs.id'), nullable=False)
+    variant = Column(String, nullable=False)
+    blob_id = Column(Integer, ForeignKey('media_blobs.id'), nullable=False, index=True)
+    content_type = Column(String, nullable=False)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
@@ -1,6 +1,23 @@
+from enum import Enum
+
 from pydantic import HttpUrl, BaseModel
 import datetime
 
+
+class ImageSize(str, Enum):
+    # see DERIVATIVE_SIZES in src/app/utils/imageResizer.py
+    thumbnail = 'thumbnail'
+    small = 'small'
+    medium = 'medium'
+    original = 'original'
+
+
+class ImageFormat(str, Enum):
+    jpeg = 'jpeg'
+    png = 'png'
+    webp = 'webp'
+
+
 class CreateMediaItem(BaseModel):
     id: int = None
     created: datetime.datetime
@@ -10,6 +27,10 @@ class CreateMediaItem(BaseModel):
     description: str = None
     content_type: str = None
     tags: str = None
+    size: int = None
+    sha256: str = None
+    detected_content_type: str = None
+    blob_id: int = None
 
 class ViewMediaItem(BaseModel):
     id: int = None
@@ -6,8 +6,9 @@ from starlette.responses import FileResponse
 
 from src.app.utils.fileUtils import FileUtils
 from fastapi import status, Depends, HTTPException, UploadFile
-from ..services.mediaService import MediaService, NoMediaItemException
+from ..services.mediaService import MediaService, NoMediaItemException, MediaItemTooLargeException
 from ..models.media import ViewMediaItem
+from ...utils.conditionalRequest import ConditionalRequest, get_conditional_request
 from fastapi import APIRouter
 from ...users.models.user import User
 from ...users.routers.login import get_current_user
@@ -16,9 +17,10 @@ router = APIRouter(tags=['Media'])
 
 
 @router.get('/media/item/{id}')
-def get_media_item_by_id(id: int, media_service: MediaService = Depends(MediaService)):
+def get_media_item_by_id(id: int, request: ConditionalRequest = Depends(get_conditional_request),
+                         media_service: MediaService = Depends(MediaService)):
     try:
-        media_item = media_service.get_media_item_by_id(id)
+        media_item = media_service.get_media_item_by_id(id, request=request)
         if media_item is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No media_item with that ID")
         return media_item
@@ -37,6 +39,8 @@ def upload_image(file: UploadFile, media_service: MediaService = Depends(MediaSe
         filename = os.path.splitext(file.filename)[0]
         filename = (filename.strip() + '_' + str(uuid.uuid4()) + '.' + FileUtils.get_file_extension(file)).strip()
         return media_service.create_media_item(file, filename)
+    except MediaItemTooLargeException as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=e.args[0])
     except:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Something went wrong")
 
@@ -1,8 +1,13 @@
 import io
+import logging
+import tempfile
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Iterator, Optional, Tuple
 
 from fastapi import Depends
-from starlette.responses import FileResponse, StreamingResponse
+from botocore.exceptions import BotoCoreError, ClientError
+from starlette.responses import RedirectResponse, Response, StreamingResponse
 
 from src.app.config import settings
 from src.app.media.daos.mediaDAO import MediaDAO
@@ -11,14 +16,23 @@ import os.path
 
 from src.app.media.factories.mediaFactory import MediaFactory
 from src.app.media.models.database import models
-from src.app.media.models.media import CreateMediaItem
+from src.app.media.models.media import CreateMediaItem, ImageSize, ImageFormat
+from src.app.utils.conditionalRequest import ConditionalRequest, RangeNotSatisfiableException
+from src.app.utils.etag import ETag
+from src.app.utils.presignedUrlCache import presigned_url_cache
+from src.app.utils.imageResizer import ImageResizer, ImageResizerException, DERIVATIVE_SIZES
 from src.app.utils.s3Utils import S3Utils
+from src.app.utils.streamedUpload import StreamedUpload, UploadTooLargeException
 
 
 class UnsupportedMediaItemStoreException(Exception):
     pass
 
 
+class MediaItemTooLargeException(Exception):
+    pass
+
+
 class NoMediaItemException(Exception):
     def __init__(self, message):
         # Call the base class constructor with the parameters it needs
@@ -36,93 +50,338 @@ class MediaService:
         self.s3Utils = S3Utils(region = settings.flocki_s3_region_name,
                                bucket_name = settings.flocki_s3_bucket_name,
                                access_key = settings.flocki_s3_access_key,
-                               secret_access_key = settings.flocki_s3_secret_access_key)
+                               secret_access_key = settings.flocki_s3_secret_access_key,
+                               endpoint_url = settings.flocki_s3_endpoint_url)
 
-    def get_media_item_by_id(self, id, as_attachment=True) -> FileResponse:
+    def get_media_item_by_id(self, id, as_attachment=True, request: ConditionalRequest = None,
+                             cache_control: str = None) -> Response:
         media_item = self.media_DAO.get_media_item_by_id(id)
         if media_item is None:
             raise NoMediaItemException("No media item with that ID")
+        return self.create_media_item_response(media_item, as_attachment, request, cache_control=cache_control)
+
+    def get_image_by_id(self, id, size: ImageSize = None, format: ImageFormat = None,
+                        request: ConditionalRequest = None):
+        media_item = self.media_DAO.get_media_item_by_id(id)
+        if media_item is None:
+            raise NoMediaItemException("No media item with that ID")
+        return self.create_media_item_response(self.get_image_variant(media_item, size, format), as_attachment=False,
+                                               request=request)
+
+    @staticmethod
+    def is_served(media_item: models.MediaItem) -> bool:
+        # items without a store this api reads from have nothing to serve, the pointer urls answer them with a 404
+        return media_item.store in ('local', 's3')
+
+    @staticmethod
+    def current_item_cache_control() -> str:
+        # for urls that serve whichever item is current, e.g. the profile image of a person or the sheet of a song
+        return f'max-age={settings.flocki_image_max_age_seconds}'
+
+    def create_image_response(self, media_item: models.MediaItem, etag: str, request: ConditionalRequest = None,
+                              size: ImageSize = None, format: ImageFormat = None):
+        # for urls that serve whichever image is current. The etag changes with the image, so a client revalidating an
+        # unchanged image gets a 304 without the variant being looked up or the store being read. Callers add the
+        # variant_name to the etag
+        request = request or ConditionalRequest()
+        if request.is_not_modified(etag):
+            response = ETag.not_modified(etag)
+            response.headers['Cache-Control'] = self.current_item_cache_control()
+            return response
+        return self.create_media_item_response(self.get_image_variant(media_item, size, format), as_attachment=False,
+                                               request=request, etag=etag,
+                                               cache_control=self.current_item_cache_control())
+
+    def create_media_item_response(self, media_item: models.MediaItem, as_attachment=True,
+                                   request: ConditionalRequest = None, etag: str = None,
+                                   cache_control: str = None) -> Response:
+        # every media response goes through here, whatever the store: Content-Length, single byte ranges, ETag and
+        # Last-Modified with 304s. Media items are never changed once written, so by default they are cached for good
+        request = request or ConditionalRequest()
+        if media_item.store == 's3' and settings.flocki_s3_serving_mode == 'redirect':
+            response = self.create_redirect_response(media_item, as_attachment, request, etag, cache_control)
+            if response is not None:
+                return response
+        size, store_etag = self.stored_size(media_item)
+        if etag is None:
+            etag = f'"{media_item.sha256}"' if media_item.sha256 else store_etag
+        disposition = 'attachment' if as_attachment else 'inline'
+        headers = {
+            'ETag': etag,
+            'Cache-Control': cache_control or f'max-age={settings.flocki_media_max_age_seconds}, immutable',
+        }
+        if media_item.created is not None:
+            headers['Last-Modified'] = ConditionalRequest.http_date(media_item.created)
+        if request.is_not_modified(etag, media_item.created):
+            return Response(status_code=304, headers=headers)
+
+        headers['Accept-Ranges'] = 'bytes'
+        headers['Content-Disposition'] = f'{disposition}; filename="{media_item.filename}"'
+        try:
+            byte_range = request.byte_range(size, etag, media_item.created)
+        except RangeNotSatisfiableException as e:
+            return Response(status_code=416, headers={'Content-Range': e.args[0], 'Accept-Ranges': 'bytes'})
+        first, last = byte_range or (0, size - 1)
+        headers['Content-Length'] = str(last - first + 1)
+        if byte_range is not None:
+            headers['Content-Range'] = f'bytes {first}-{last}/{size}'
+        body = self.read_stored_range(media_item.store, media_item.address, first, last, byte_range is not None)
+        return StreamingResponse(body, status_code=206 if byte_range is not None else 200, headers=headers,
+                                 media_type=media_item.content_type)
+
+    def create_redirect_response(self, media_item: models.MediaItem, as_attachment, request: ConditionalRequest,
+                                 etag: str = None, cache_control: str = None) -> Optional[Response]:
+        # S3 serves the content, with ranges and validators of its own, from a presigned url. The api still answers a
+        # revalidation of its etag. None when no url can be signed, the item is then streamed through the api
+        etag = etag or (f'"{media_item.sha256}"' if media_item.sha256 else None)
+        if etag is not None and request.is_not_modified(etag):
+            response = ETag.not_modified(etag)
+            response.headers['Cache-Control'] = cache_control or \
+                f'max-age={settings.flocki_media_max_age_seconds}, immutable'
+            return response
+
+        key = self.s3_key(media_item.address)
+        disposition = f'{"attachment" if as_attachment else "inline"}; filename="{media_item.filename}"'
+        # blobs never change, objects written before them could have been overwritten
+        object_cache_control = f'max-age={settings.flocki_media_max_age_seconds}, immutable' \
+            if media_item.sha256 else None
+        expires_in = settings.flocki_s3_presigned_url_expiry_seconds
+        try:
+            url, reused_for = presigned_url_cache.get(
+                (self.s3Utils.bucket_name, key, media_item.content_type, disposition, object_cache_control),
+                lambda: self.s3Utils.presigned_url(key, expires_in, media_item.content_type, disposition,
+                                                   object_cache_control),
+                expires_in, settings.flocki_s3_presigned_url_margin_seconds)
+        except (BotoCoreError, ClientError) as e:
+            logging.error(f"No presigned url for media item {media_item.id}, it is streamed instead: {e}")
+            return None
+        # the redirect is cached no longer than the url is handed out, or than the current item of a url may be
+        max_age = reused_for if cache_control is None else min(reused_for, settings.flocki_image_max_age_seconds)
+        return RedirectResponse(url, status_code=302, headers={'Cache-Control': f'private, max-age={max_age}'})
+
+    def stored_size(self, media_item: models.MediaItem) -> Tuple[int, Optional[str]]:
+        # (size, etag of the store). Items written since sql/mediaItemContent.sql know their size and hash, older ones
+        # ask the store. Their files could have been overwritten, the etag then follows the stored file
+        id = media_item.id
         if media_item.store == 'local':
             if not os.path.isfile(media_item.address):
                 raise NoMediaItemException(f"No media item the filename stored for the provided ID: {id}")
-            file_rsp = FileResponse(media_item.address, media_type=media_item.content_type, filename=media_item.filename)
-            if as_attachment:
-                file_rsp.headers['Content-Disposition'] = f'attachment; filename="{media_item.filename}"'
-            else:
-                file_rsp.headers['Content-Disposition'] = f'inline; filename="{media_item.filename}"'
-            return file_rsp
+            if media_item.size is not None and media_item.sha256:
+                return media_item.size, None
+            stat = os.stat(media_item.address)
+            return stat.st_size, f'"{int(stat.st_mtime)}-{stat.st_size}"'
         elif media_item.store == 's3':
-            if(media_item is None):
-                raise NoMediaItemException(f"No media item with the filename stored for the provided ID: {id}")
-            #return StreamingResponse
-            obj = self.s3Utils.get_file(media_item.filename)
-            #response = FileResponse(None, filename=media_item.filename, media_type=media_item.content_type, content_disposition_type="attachment")
-            #file_obj = io.BytesIO(obj['Body'].read())
-
-            # Get the content type of the object
-            content_type = media_item.content_type
-
-            # Set the Content-Disposition header to force download with the original filename
-            if 'Key' in obj:
-                filename = obj['Key']
-            else:
-                filename = media_item.filename
-
-            headers = {
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-            streaming_rsp = StreamingResponse(obj['Body'].iter_chunks(), media_type=content_type, headers=headers)
-            return streaming_rsp
+            if media_item.size is not None and media_item.sha256:
+                return media_item.size, None
+            head = self.s3Utils.head_file(self.s3_key(media_item.address))
+            return head['ContentLength'], head['ETag']
         else:
             raise NotImplementedError("Media Item store not implemented")
 
-    def upload_media_item(self, file, filename, description=None) -> models.MediaItem:
+    def read_stored_range(self, store, address, first: int, last: int, partial: bool) -> Iterator[bytes]:
+        # S3 is asked for the range itself, and is asked before the response starts so that its errors are not lost
+        chunk_size = settings.flocki_media_upload_chunk_bytes
+        if store == 's3':
+            obj = self.s3Utils.get_file(self.s3_key(address), f'bytes={first}-{last}' if partial else None)
+            return obj['Body'].iter_chunks(chunk_size)
+        return self.read_local_range(address, first, last, chunk_size)
+
+    @staticmethod
+    def read_local_range(address, first: int, last: int, chunk_size: int) -> Iterator[bytes]:
+        with open(address, 'rb') as f:
+            f.seek(first)
+            remaining = last - first + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def upload_media_item(self, file, filename, description=None, max_bytes: int = None) -> models.MediaItem:
+        max_bytes = max_bytes or settings.flocki_media_max_upload_bytes
         file.file.seek(0)
-        if settings.flocki_media_store == 'local':
-            os.makedirs(os.path.dirname(settings.flocki_media_base_path), exist_ok=True)
-
-            if not settings.flocki_media_base_path.endswith('/'):
-                settings.flocki_media_base_path += '/'
-
-            file_path = settings.flocki_media_base_path + filename
-            with open(file_path, 'wb') as f:
-                f.write(file.file.read())
-
-            media_item = CreateMediaItem(
-                store=settings.flocki_media_store,
-                address=file_path,
-                created=datetime.now(),
-                filename=filename,
-                description=description,
-                content_type=file.content_type)
-
-        elif settings.flocki_media_store == 's3':
-            if self.s3Utils.upload_file(file.file, filename):
-                media_item = CreateMediaItem(
-                    store=settings.flocki_media_store,
-                    address="s3://"+settings.flocki_s3_bucket_name+"/"+filename,
-                    created=datetime.now(),
-                    filename=filename,
-                    description=description,
-                    content_type=file.content_type
-                )
-            else:
-                raise Exception("File upload failed")
+        try:
+            blob, upload = self.store_content(file.file, max_bytes)
+        except UploadTooLargeException as e:
+            raise MediaItemTooLargeException(e.args[0])
 
-        else:
-            raise UnsupportedMediaItemStoreException("Unsupported media item store: " + settings.flocki_media_store)
+        media_item = CreateMediaItem(
+            store=blob.store,
+            address=blob.address,
+            created=datetime.now(),
+            filename=filename,
+            description=description,
+            content_type=file.content_type,
+            size=upload.size,
+            sha256=upload.sha256,
+            detected_content_type=upload.detected_content_type,
+            blob_id=blob.id)
 
         media_item_entity = self.media_factory.create_media_item_entity_from_media_item(media_item)
         media_item_entity = self.media_DAO.add_media_item(media_item_entity)
         return media_item_entity
 
+    def store_content(self, source, max_bytes: Optional[int]) -> Tuple[models.MediaBlob, StreamedUpload]:
+        # the content is copied a chunk at a time, it is never read into memory as a whole. It is hashed while it is
+        # copied, content that is already in the store is not written again: the blob holding it is returned
+        store = settings.flocki_media_store
+        if store not in ('local', 's3'):
+            raise UnsupportedMediaItemStoreException("Unsupported media item store: " + store)
+        spool_directory = None
+        if store == 'local':
+            # next to the blobs, so that storing one is a rename
+            spool_directory = settings.flocki_media_base_path
+            os.makedirs(spool_directory, exist_ok=True)
+        with StreamedUpload.spool(source, spool_directory, max_bytes, settings.flocki_media_upload_chunk_bytes) as upload:
+            blob = self.media_DAO.get_blob(store, upload.sha256)
+            if blob is None:
+                blob = self.store_blob(store, upload)
+        return blob, upload
+
+    def store_blob(self, store, upload: StreamedUpload) -> models.MediaBlob:
+        # the blob of the same content has the same address, a concurrent upload of it writes the same bytes there
+        if store == 'local':
+            address = self.local_blob_path(upload.sha256)
+            os.makedirs(os.path.dirname(address), exist_ok=True)
+            upload.move_to(address)
+        else:
+            key = self.s3_blob_key(upload.sha256)
+            with open(upload.path, 'rb') as f:
+                if not self.s3Utils.upload_file(f, key):
+                    raise Exception("File upload failed")
+            address = "s3://" + settings.flocki_s3_bucket_name + "/" + key
+        blob = models.MediaBlob(created=datetime.now(), store=store, address=address, sha256=upload.sha256,
+                                size=upload.size)
+        return self.media_DAO.add_blob(blob)
+
+    @staticmethod
+    def local_blob_path(sha256) -> str:
+        # two levels of directories, so that none of them gets too large to list
+        return os.path.join(settings.flocki_media_base_path, 'blobs', sha256[:2], sha256[2:4], sha256)
+
+    @staticmethod
+    def s3_blob_key(sha256) -> str:
+        return f"blobs/{sha256[:2]}/{sha256}"
+
+    @staticmethod
+    def s3_key(address) -> str:
+        # addresses are s3://<bucket>/<key>
+        return address.split('/', 3)[3]
+
+    def read_stored(self, store, address) -> Iterator[bytes]:
+        chunk_size = settings.flocki_media_upload_chunk_bytes
+        if store == 'local':
+            with open(address, 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    yield chunk
+        elif store == 's3':
+            yield from self.s3Utils.get_file(self.s3_key(address))['Body'].iter_chunks(chunk_size)
+        else:
+            raise UnsupportedMediaItemStoreException("Unsupported media item store: " + store)
+
+    @contextmanager
+    def open_stored(self, store, address):
+        # a seekable file with the stored content, S3 objects are copied to a temporary file first
+        if store == 'local':
+            with open(address, 'rb') as f:
+                yield f
+        else:
+            with tempfile.SpooledTemporaryFile(max_size=settings.flocki_media_upload_chunk_bytes * 8) as f:
+                for chunk in self.read_stored(store, address):
+                    f.write(chunk)
+                f.seek(0)
+                yield f
+
+    def delete_stored(self, store, address):
+        if store == 'local':
+            if os.path.isfile(address):
+                os.remove(address)
+        elif store == 's3':
+            self.s3Utils.delete_file(self.s3_key(address))
+        else:
+            raise UnsupportedMediaItemStoreException("Unsupported media item store: " + store)
+
     # create media item is intended to be called by the media routers as it returns the media item model, not the entity. Upload
     # media item returns the entity and is to be called by another service
     def create_media_item(self, file, filename, description=None):
-        return self.media_factory.create_media_item_from_media_item_entity(self.upload_media_item(file, filename, description))
+        # any kind of media, up to the media maximum. Images declared as such are held to the image maximum
+        max_bytes = settings.flocki_image_max_upload_bytes \
+            if (file.content_type or '').lower().startswith('image/') else None
+        return self.media_factory.create_media_item_from_media_item_entity(
+            self.upload_media_item(file, filename, description, max_bytes=max_bytes))
+
+    # the same for images: they have their own maximum size and get their derivatives
+    def create_image(self, file, filename, description=None):
+        return self.media_factory.create_media_item_from_media_item_entity(self.upload_image(file, filename, description))
 
     def upload_image(self, file, filename, description):
         # TODO this is a bit of hack to make sure the extension is .jpg and not .jpeg
         if file.content_type == 'image/jpeg':
             file.content_type = 'image/jpg'
-        return self.upload_media_item(file, filename, description)
+        media_item = self.upload_media_item(file, filename, description, max_bytes=settings.flocki_image_max_upload_bytes)
+        if settings.flocki_image_derivatives_at_upload:
+            try:
+                self.create_derivatives(media_item, [ImageSize(size) for size in DERIVATIVE_SIZES])
+            except (ImageResizerException, OSError) as e:
+                # the original is stored, its derivatives are tried again on their first request
+                logging.error(f"No derivatives of media item {media_item.id}: {e}")
+        return media_item
+
+    @staticmethod
+    def is_resizable(media_item: models.MediaItem) -> bool:
+        # items uploaded before the blobs have none to hang derivatives off until collectMediaBlobs has linked them
+        return media_item.blob_id is not None and \
+            ImageResizer.can_resize(media_item.detected_content_type or media_item.content_type)
+
+    @staticmethod
+    def variant_name(size: Optional[ImageSize], format: Optional[ImageFormat] = None) -> Optional[str]:
+        # None for the original
+        if size in (None, ImageSize.original):
+            return None
+        if format is None or not ImageResizer.supports(format.value):
+            return size.value
+        return f"{size.value}.{format.value}"
+
+    def get_image_variant(self, media_item: models.MediaItem, size: ImageSize = None,
+                          format: ImageFormat = None) -> models.MediaItem:
+        # the media item to serve for size and format: the original, or a transient item for its derivative, which is
+        # made here when it is missing. Images that cannot be resized are served as they are
+        variant = self.variant_name(size, format)
+        if variant is None or not self.is_resizable(media_item):
+            return media_item
+        found = self.media_DAO.get_derivative(media_item.blob_id, variant)
+        if found is None:
+            try:
+                self.create_derivatives(media_item, [size], format)
+            except (ImageResizerException, OSError) as e:
+                logging.error(f"No {variant} derivative of media item {media_item.id}: {e}")
+                return media_item
+            found = self.media_DAO.get_derivative(media_item.blob_id, variant)
+        derivative, blob = found
+        name = os.path.splitext(media_item.filename or str(media_item.id))[0]
+        extension = derivative.content_type.split('/')[1]
+        return models.MediaItem(id=media_item.id, created=derivative.created, store=blob.store, address=blob.address,
+                                filename=f"{name}_{size.value}.{extension}", description=media_item.description,
+                                content_type=derivative.content_type, size=blob.size, sha256=blob.sha256,
+                                blob_id=blob.id)
+
+    def create_derivatives(self, media_item: models.MediaItem, sizes, format: ImageFormat = None) -> int:
+        # makes the derivatives of sizes that the content of media_item does not have yet, reading the original once
+        missing = [size for size in sizes
+                   if self.media_DAO.get_derivative(media_item.blob_id, self.variant_name(size, format)) is None]
+        if not missing or not self.is_resizable(media_item):
+            return 0
+        if format is not None and not ImageResizer.supports(format.value):
+            format = None
+        with self.open_stored(media_item.store, media_item.address) as source:
+            for size in missing:
+                source.seek(0)
+                content, content_type, width, height = ImageResizer.resize(
+                    source, DERIVATIVE_SIZES[size.value], format and format.value,
+                    settings.flocki_image_derivative_quality)
+                blob, _ = self.store_content(io.BytesIO(content), None)
+                self.media_DAO.add_derivative(models.MediaDerivative(
+                    created=datetime.now(), source_blob_id=media_item.blob_id, variant=self.variant_name(size, format),
+                    blob_id=blob.id, content_type=content_type, width=width, height=height))
+        return len(missing)
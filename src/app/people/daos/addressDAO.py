@@ -1,6 +1,19 @@
+from typing import Dict, Iterable, Iterator
+
 from fastapi import Depends
-from src.app.database import get_db, SessionLocal
+from src.app.config import settings
+from src.app.database import get_db, SessionLocal, UnitOfWork
+from src.app.people.daos.addressProximityIndex import addresses_written
 from src.app.people.models.database import models
+from src.app.utils.addressFingerprint import AddressFingerprint
+from src.app.utils.bulkLoader import BulkLoader
+from src.app.utils.centroidGeocoder import get_centroid_geocoder
+from src.app.utils.cursorPagination import CursorPagination, CursorParams, CursorPage
+
+# the order of the address book, served by ix_addresses_city_suburb_street. id makes every key unique
+ADDRESS_SORT_COLUMNS = [models.Address.city, models.Address.suburb, models.Address.street, models.Address.id]
+# the fields the centroid geocoder places an address by
+LOCATION_FIELDS = ('country', 'postal_code', 'suburb', 'city')
 
 class AddressDAO:
     def __init__(self, db: SessionLocal = Depends(get_db)):
@@ -10,22 +23,61 @@ class AddressDAO:
         return self.db.query(models.Address).filter(
             models.Address.id == address_id).first()
 
+    def get_addresses_by_ids(self, address_ids: Iterable[int]) -> Dict[int, models.Address]:
+        return BulkLoader.load_by_ids(self.db.query(models.Address), models.Address.id, address_ids)
+
     def get_existing_addresses_for_person(self, person_id):
         return self.db.query(models.PeopleAddress).filter(
             models.PeopleAddress.person_id == person_id).all()
 
+    def get_people_ids_with_address(self, address_id):
+        return {person_id for person_id, in self.db.query(models.PeopleAddress.person_id).filter(
+            models.PeopleAddress.address_id == address_id)}
+
+    def get_household_ids_with_address(self, address_id):
+        return {household_id for household_id, in self.db.query(models.Household.id).filter(
+            models.Household.address_id == address_id)}
+
     def delete_address(self, address_id):
         self.db.query(models.PeopleAddress).filter(
             models.PeopleAddress.id == address_id).delete(synchronize_session=False)
 
     def update_address(self, address_id, update_values):
-        address_entity = self.db.query(models.Address).filter(models.Address.id == address_id)
-        address_entity.update(update_values)
-        self.db.commit()
+        address_query = self.db.query(models.Address).filter(models.Address.id == address_id)
+        address = address_query.first()
+        # coordinates the caller sent are written as they are, null ones clear wrong coordinates
+        if 'latitude' not in update_values and 'longitude' not in update_values:
+            update_values = {**update_values, **self.coordinates_for_update(address, update_values)}
+        # a bulk update does not run the fingerprint or geocoding events of the model, or tell the proximity index
+        fingerprint = AddressFingerprint.of_values(self.values_after_update(address, update_values))
+        address_query.update({**update_values, 'fingerprint': fingerprint})
+        addresses_written(self.db, [address_id])
+        UnitOfWork.commit(self.db)
+
+    @staticmethod
+    def values_after_update(address, update_values) -> dict:
+        # the columns of the address as the update leaves them, with the building and complex updates do not carry
+        if address is None:
+            return update_values
+        return {**{column.key: getattr(address, column.key) for column in models.Address.__table__.columns},
+                **update_values}
+
+    @staticmethod
+    def coordinates_for_update(address, update_values):
+        # for an update without coordinates: the address keeps its own until it moves, then it is placed again. One
+        # that cannot be placed is left without coordinates, rather than at where it was
+        if address is None:
+            return {}
+        location = {field: update_values.get(field, getattr(address, field)) for field in LOCATION_FIELDS}
+        if all(location[field] == getattr(address, field) for field in LOCATION_FIELDS):
+            return {'latitude': address.latitude, 'longitude': address.longitude}
+        coordinates = get_centroid_geocoder().locate(**location) if settings.flocki_geocode_new_addresses else None
+        latitude, longitude = coordinates if coordinates is not None else (None, None)
+        return {'latitude': latitude, 'longitude': longitude}
 
     def create_address(self, new_address):
         self.db.add(new_address)
-        self.db.commit()
+        UnitOfWork.commit(self.db)
         self.db.refresh(new_address)
         return new_address
 
@@ -35,17 +87,26 @@ class AddressDAO:
             person=person
         ))
 
-    def get_all_addresses(self):
-        return self.db.query(models.Address).order_by(models.Address.city, models.Address.suburb, models.Address.street).all()
+    def stream_addresses(self, batch_size: int) -> Iterator[models.Address]:
+        # rows are fetched batch_size at a time while they are consumed, the identity map only holds them weakly
+        return iter(self.db.query(models.Address)
+                    .order_by(*[column.asc().nullslast() for column in ADDRESS_SORT_COLUMNS]).yield_per(batch_size))
+
+    def get_all_addresses_by_cursor(self, params: CursorParams = CursorParams()) -> CursorPage[models.Address]:
+        return CursorPagination.paginate(self.db.query(models.Address), ADDRESS_SORT_COLUMNS, params)
+
+    @staticmethod
+    def address_key(type, street_number, street, suburb, city, province, country, postal_code):
+        return AddressFingerprint.of(type, street_number, street, suburb, city, province, country, postal_code)
+
+    def find_addresses_by_keys(self, keys) -> dict:
+        # keys are address_key fingerprints, returns the existing address for each key that has one
+        return BulkLoader.load_by_ids(self.db.query(models.Address), models.Address.fingerprint, keys)
 
     def find_address(self, type, street_number, street, suburb, city, province, country, postal_code):
-        return self.db.query(models.Address).filter(
-            models.Address.type == type,
-            models.Address.street_number == street_number,
-            models.Address.street == street,
-            models.Address.suburb == suburb,
-            models.Address.city == city,
-            models.Address.province == province if province is not None else True,
-            models.Address.country == country if country is not None else True,
-            models.Address.postal_code == postal_code if postal_code is not None else True).first()
+        return self.find_address_by_fingerprint(
+            AddressFingerprint.of(type, street_number, street, suburb, city, province, country, postal_code))
+
+    def find_address_by_fingerprint(self, fingerprint):
+        return self.db.query(models.Address).filter(models.Address.fingerprint == fingerprint).first()
 
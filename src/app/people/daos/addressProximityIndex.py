@@ -0,0 +1,209 @@
+import heapq
+import math
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from src.app.config import settings
+from src.app.people.models.database import models
+from src.app.utils.bulkLoader import BulkLoader
+from src.app.utils.geo import GeoDistance, KM_PER_DEGREE
+
+
+class AddressProximityIndex:
+    """
+    In-process grid over the coordinates of the addresses. Cells are cell_degrees of latitude by cell_degrees of
+    longitude, a nearest-first search walks the rings of cells around the origin and only measures the addresses in
+    the cells it reaches. Addresses written by committed transactions of this process are re-read on the next search,
+    the whole grid is rebuilt once it is older than max_age_seconds, which picks up the writes of other processes.
+    """
+
+    def __init__(self, cell_degrees: float, max_age_seconds: int):
+        self.cell_degrees = cell_degrees
+        self.max_age_seconds = max_age_seconds
+        self.cells = {}  # (row, column) -> {address id: (latitude, longitude)}
+        self.address_cells = {}  # address id -> (row, column)
+        self.dirty_ids = set()
+        self.built_at = None
+        self.lock = threading.Lock()
+        # separate from lock, so that committing sessions are not held up by a rebuild
+        self.dirty_lock = threading.Lock()
+
+    def mark_stale(self):
+        self.built_at = None
+
+    def mark_dirty(self, address_ids: Iterable[int]):
+        with self.dirty_lock:
+            self.dirty_ids.update(address_ids)
+
+    def take_dirty_ids(self) -> set:
+        with self.dirty_lock:
+            address_ids, self.dirty_ids = self.dirty_ids, set()
+            return address_ids
+
+    def cell_of(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees)
+
+    def put(self, address_id: int, latitude, longitude):
+        self.remove(address_id)
+        if latitude is None or longitude is None:
+            return
+        latitude, longitude = float(latitude), float(longitude)
+        cell = self.cell_of(latitude, longitude)
+        self.cells.setdefault(cell, {})[address_id] = (latitude, longitude)
+        self.address_cells[address_id] = cell
+
+    def remove(self, address_id: int):
+        cell = self.address_cells.pop(address_id, None)
+        if cell is not None:
+            entries = self.cells[cell]
+            del entries[address_id]
+            if not entries:
+                del self.cells[cell]
+
+    def rebuild(self, db):
+        self.cells = {}
+        self.address_cells = {}
+        # the addresses marked so far are in the rows read below, later ones are refreshed by the next search
+        self.take_dirty_ids()
+        rows = db.query(models.Address.id, models.Address.latitude, models.Address.longitude)\
+            .filter(models.Address.latitude.isnot(None), models.Address.longitude.isnot(None))
+        for id, latitude, longitude in rows:
+            self.put(id, latitude, longitude)
+        self.built_at = time.monotonic()
+
+    def refresh(self, db, address_ids):
+        # deleted addresses and addresses that lost their coordinates drop out of the grid
+        address_ids = list(address_ids)
+        for address_id in address_ids:
+            self.remove(address_id)
+        coordinates = db.query(models.Address.id, models.Address.latitude, models.Address.longitude)
+        for start in range(0, len(address_ids), BulkLoader.CHUNK_SIZE):
+            for id, latitude, longitude in coordinates.filter(
+                    models.Address.id.in_(address_ids[start:start + BulkLoader.CHUNK_SIZE])):
+                self.put(id, latitude, longitude)
+
+    def ensure_current(self, db):
+        with self.lock:
+            if self.built_at is None or time.monotonic() - self.built_at > self.max_age_seconds:
+                self.rebuild(db)
+            elif self.dirty_ids:
+                self.refresh(db, self.take_dirty_ids())
+
+    @staticmethod
+    def ring_cells(row: int, column: int, ring: int):
+        # the cells at a chebyshev distance of ring from (row, column)
+        if ring == 0:
+            yield row, column
+            return
+        for c in range(column - ring, column + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, column - ring
+            yield r, column + ring
+
+    def ring_min_km(self, latitude: float, ring: int) -> float:
+        # no address in this ring or beyond is nearer than this. A ring is ring - 1 whole cells away from the cell of
+        # the origin, measured where the cells are narrowest; close enough for cells a few kilometres across
+        if ring <= 1:
+            return 0.0
+        poleward = min(90.0, abs(latitude) + (ring + 1) * self.cell_degrees)
+        return (ring - 1) * self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(poleward))
+
+    def cell_min_km(self, latitude: float, longitude: float, cell: Tuple[int, int]) -> float:
+        # the distance to the nearest corner or edge of the cell, measured along the parallel of the origin. The cell
+        # is taken on the side of the antimeridian nearest the origin
+        south, west = cell[0] * self.cell_degrees, cell[1] * self.cell_degrees
+        west += 360 * round((longitude - west - self.cell_degrees / 2) / 360)
+        return GeoDistance.haversine_km(latitude, longitude, min(max(latitude, south), south + self.cell_degrees),
+                                        min(max(longitude, west), west + self.cell_degrees))
+
+    def nearest(self, latitude: float, longitude: float, limit: int,
+                radius_km: Optional[float] = None) -> List[Tuple[float, int]]:
+        # the (distance in km, address id) of the limit addresses nearest to the origin, nearest first
+        with self.lock:
+            found = []  # heap of (-distance, address id), the farthest of the nearest so far on top
+            row, column = self.cell_of(latitude, longitude)
+            remaining = len(self.cells)
+            # once the rings have covered more cells than are occupied, the occupied cells that are left are sorted
+            # and visited nearest first instead, so that sparse areas do not walk rings of empty cells. The same
+            # happens when the rings reach the antimeridian, the columns do not wrap around to the other side of it
+            occupied = None
+            ring = 0
+            while remaining:
+                if occupied is None and ((2 * ring + 1) ** 2 > len(self.cells) or
+                                         (column - ring) * self.cell_degrees <= -180 or
+                                         (column + ring + 1) * self.cell_degrees >= 180):
+                    occupied = sorted(((self.cell_min_km(latitude, longitude, cell), cell) for cell in self.cells
+                                       if max(abs(cell[0] - row), abs(cell[1] - column)) >= ring), reverse=True)
+                if occupied is None:
+                    min_km = self.ring_min_km(latitude, ring)
+                    cells = self.ring_cells(row, column, ring)
+                    ring += 1
+                else:
+                    min_km, cell = occupied.pop()
+                    cells = [cell]
+                if radius_km is not None and min_km > radius_km:
+                    break
+                if len(found) == limit and min_km > -found[0][0]:
+                    break
+                for cell in cells:
+                    entries = self.cells.get(cell)
+                    if not entries:
+                        continue
+                    remaining -= 1
+                    for address_id, (address_latitude, address_longitude) in entries.items():
+                        distance = GeoDistance.haversine_km(latitude, longitude, address_latitude, address_longitude)
+                        if radius_km is not None and distance > radius_km:
+                            continue
+                        if len(found) < limit:
+                            heapq.heappush(found, (-distance, address_id))
+                        elif distance < -found[0][0]:
+                            heapq.heapreplace(found, (-distance, address_id))
+            return sorted((-distance, address_id) for distance, address_id in found)
+
+
+# one in-process index per engine, shared by all sessions bound to it
+_proximity_indexes = {}
+_proximity_indexes_lock = threading.Lock()
+
+
+def get_proximity_index(engine) -> AddressProximityIndex:
+    with _proximity_indexes_lock:
+        if engine not in _proximity_indexes:
+            _proximity_indexes[engine] = AddressProximityIndex(settings.flocki_proximity_cell_degrees,
+                                                               settings.flocki_proximity_index_max_age_seconds)
+        return _proximity_indexes[engine]
+
+
+def addresses_written(db, address_ids: Iterable[int]):
+    # kept on the session until its transaction ends, the indexes only re-read committed addresses.
+    # query(...).update()/delete() skip the mapper events, callers of those tell the index with this
+    db.info.setdefault('written_address_ids', set()).update(address_ids)
+
+
+@event.listens_for(models.Address, 'after_insert')
+@event.listens_for(models.Address, 'after_update')
+@event.listens_for(models.Address, 'after_delete')
+def _address_written(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        addresses_written(session, [target.id])
+
+
+@event.listens_for(Session, 'after_commit')
+def _addresses_committed(session):
+    address_ids = session.info.pop('written_address_ids', None)
+    if address_ids:
+        index = _proximity_indexes.get(session.get_bind())
+        if index is not None:
+            index.mark_dirty(address_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _addresses_rolled_back(session):
+    session.info.pop('written_address_ids', None)
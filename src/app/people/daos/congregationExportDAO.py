@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+from fastapi import Depends
+
+from src.app.database import get_db, SessionLocal
+from src.app.people.models.database import models
+
+
+class CongregationExportDAO:
+    """
+    Reads the rows of the congregation export. The queries select columns instead of entities, so nothing is kept in
+    the identity map, and fetch the rows yield_per at a time, which the postgres driver does with a server side cursor.
+    """
+
+    def __init__(self, db: SessionLocal = Depends(get_db)):
+        self.db = db
+
+    @contextmanager
+    def snapshot(self):
+        # all the queries in the block read the same snapshot of the database. The transaction is read only, it is
+        # rolled back at the end
+        self.db.rollback()
+        # sqlite only supports SERIALIZABLE, which is its default
+        isolation_level = 'SERIALIZABLE' if self.db.get_bind().dialect.name == 'sqlite' else 'REPEATABLE READ'
+        self.db.connection(execution_options={'isolation_level': isolation_level})
+        try:
+            yield
+        finally:
+            self.db.rollback()
+
+    def stream_addresses(self, batch_size: int) -> Iterator[dict]:
+        return self._stream(batch_size, models.Address.id, models.Address.type, models.Address.building,
+                            models.Address.street_number, models.Address.street, models.Address.complex,
+                            models.Address.suburb, models.Address.city, models.Address.province, models.Address.country,
+                            models.Address.postal_code, models.Address.latitude, models.Address.longitude)
+
+    def stream_people(self, batch_size: int) -> Iterator[dict]:
+        return self._stream(batch_size, models.Person.id, models.Person.first_name, models.Person.last_name,
+                            models.Person.email, models.Person.mobile_number, models.Person.date_of_birth,
+                            models.Person.gender, models.Person.marriage_date, models.Person.marital_status,
+                            models.Person.registered_date, models.Person.current_profile_image_id)
+
+    def stream_people_addresses(self, batch_size: int) -> Iterator[dict]:
+        return self._stream(batch_size, models.PeopleAddress.id, models.PeopleAddress.person_id,
+                            models.PeopleAddress.address_id)
+
+    def stream_households(self, batch_size: int) -> Iterator[dict]:
+        return self._stream(batch_size, models.Household.id, models.Household.leader_id, models.Household.address_id,
+                            models.Household.current_household_image_id)
+
+    def stream_memberships(self, batch_size: int) -> Iterator[dict]:
+        return self._stream(batch_size, models.HouseholdPerson.c.id, models.HouseholdPerson.c.household_id,
+                            models.HouseholdPerson.c.person_id)
+
+    def _stream(self, batch_size: int, id_column, *columns) -> Iterator[dict]:
+        query = self.db.query(id_column, *columns).order_by(id_column).yield_per(batch_size)
+        for row in query:
+            yield dict(row._mapping)
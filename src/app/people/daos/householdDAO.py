@@ -1,30 +1,91 @@
 from datetime import datetime
-from typing import List
+from typing import Dict, Iterable, List, Set
 
 from fastapi_pagination import Page, Params
 from fastapi_pagination.ext.sqlalchemy import paginate
 
 from fastapi import Depends
-from sqlalchemy import case, and_, or_
+from sqlalchemy import case, exists
+from sqlalchemy.orm import aliased
 
-from src.app.database import get_db, SessionLocal
+from src.app.database import get_db, SessionLocal, UnitOfWork
+from src.app.media.models.database.models import MediaItem
+from src.app.people.daos.loaderProfiles import PersonLoaderProfile, person_loader_options, household_loader_options
+from src.app.people.daos.personNameSearch import PersonNameSearch
 from src.app.people.models.database import models
 from src.app.people.models.database.models import HouseholdImage
+from src.app.people.models.household import HouseholdDepth
+from src.app.utils.bulkLoader import BulkLoader
+from src.app.utils.cursorPagination import CursorPagination, CursorParams, CursorPage
+from src.app.utils.fieldSelection import FieldSelection
 
 
 class HouseholdDAO:
     def __init__(self, db: SessionLocal = Depends(get_db)):
         self.db=db
 
-    def get_all_households(self, params: Params = Params(page=1, size=100)) -> Page[models.Household]:
-        return paginate(self.db.query(models.Household).order_by(models.Household.id), params)
-
-    def get_household_by_id(self, id):
-        return self.db.query(models.Household).filter(models.Household.id == id).first()
+    def get_all_households(self, params: Params = Params(page=1, size=100), selection: FieldSelection = None,
+                           depth: HouseholdDepth = HouseholdDepth.basic) -> Page[models.Household]:
+        return paginate(self.db.query(models.Household).options(*household_loader_options(selection, depth))
+                        .order_by(models.Household.id), params)
+
+    def get_all_households_by_cursor(self, params: CursorParams = CursorParams(),
+                                     depth: HouseholdDepth = HouseholdDepth.basic) -> CursorPage[models.Household]:
+        return CursorPagination.paginate(self.db.query(models.Household).options(*household_loader_options(None, depth)),
+                                         [models.Household.id], params)
+
+    def get_household_by_id(self, id, selection: FieldSelection = None, depth: HouseholdDepth = None):
+        # with a selection or a depth the household is loaded for that view, otherwise relationships load lazily
+        query = self.db.query(models.Household)
+        if selection is not None or depth is not None:
+            query = query.options(*household_loader_options(selection, depth or HouseholdDepth.basic))
+        return query.filter(models.Household.id == id).first()
+
+    def get_current_household_image(self, id: int):
+        # a (household id, current household image or None) row, None when there is no household with that id
+        return self.db.query(models.Household.id, MediaItem)\
+            .outerjoin(MediaItem, MediaItem.id == models.Household.current_household_image_id)\
+            .filter(models.Household.id == id).first()
+
+    def get_household_version(self, id: int):
+        return self.db.query(models.Household.version).filter(models.Household.id == id).scalar()
+
+    def increment_versions(self, household_ids):
+        if household_ids:
+            self.db.query(models.Household).filter(models.Household.id.in_(household_ids))\
+                .update({models.Household.version: models.Household.version + 1}, synchronize_session=False)
+            UnitOfWork.commit(self.db)
+
+    def get_households_by_ids(self, household_ids: Iterable[int]) -> Dict[int, models.Household]:
+        return BulkLoader.load_by_ids(self.db.query(models.Household), models.Household.id, household_ids)
+
+    def get_existing_household_ids(self, household_ids) -> Set[int]:
+        if not household_ids:
+            return set()
+        return {household_id for household_id, in self.db.query(models.Household.id)
+                .filter(models.Household.id.in_(household_ids))}
+
+    def get_household_ids_for_people(self, person_ids) -> Set[int]:
+        # households the people are a member or the leader of
+        if not person_ids:
+            return set()
+        member_of = self.db.query(models.HouseholdPerson.c.household_id)\
+            .filter(models.HouseholdPerson.c.person_id.in_(person_ids))
+        leader_of = self.db.query(models.Household.id).filter(models.Household.leader_id.in_(person_ids))
+        return {household_id for household_id, in member_of.union(leader_of)}
+
+    def get_people_ids_in_households(self, household_ids) -> Set[int]:
+        # members and leaders of the households
+        if not household_ids:
+            return set()
+        members = self.db.query(models.HouseholdPerson.c.person_id)\
+            .filter(models.HouseholdPerson.c.household_id.in_(household_ids))
+        leaders = self.db.query(models.Household.leader_id).filter(models.Household.id.in_(household_ids))
+        return {person_id for person_id, in members.union(leaders)}
 
     def add_household(self, new_household, image_entity=None):
         self.db.add(new_household)
-        self.db.commit()
+        UnitOfWork.commit(self.db)
         self.db.refresh(new_household)
         if image_entity is not None:
             self.add_household_image(new_household, image_entity)
@@ -38,27 +99,48 @@ class HouseholdDAO:
             created=datetime.now(),
         )
         self.db.add(household_image)
-        self.db.commit()
+        household_entity.current_household_image = image_entity
+        UnitOfWork.commit(self.db)
 
     def add_person_to_household(self, household_entity, person):
         household_entity.people.append(person)
-        self.db.commit()
+        UnitOfWork.commit(self.db)
 
     def remove_person_from_household(self, household_entity, person):
         household_entity.people.remove(person)
-        self.db.commit()
-
-    def update_household(self, household_entity: models.Household, update_leader_id: int, update_address_id: int, image_entity=None):
-        if image_entity is not None:
-            household_image = HouseholdImage(
-                household=household_entity,
-                image=image_entity,
-                created=datetime.now(),
-            )
-            self.db.add(household_image)
-        household_entity.leader_id = update_leader_id
-        household_entity.address_id = update_address_id
-        self.db.commit()
+        UnitOfWork.commit(self.db)
+
+    def get_member_ids(self, household_id: int) -> List[int]:
+        # read from household_people, without loading the people
+        return [person_id for person_id, in self.db.query(models.HouseholdPerson.c.person_id)
+                .filter(models.HouseholdPerson.c.household_id == household_id).order_by(models.HouseholdPerson.c.person_id)]
+
+    def update_household(self, household_entity: models.Household, update_leader_id: int, update_address_id: int, image_entity=None,
+                         people_ids_to_add=(), people_ids_to_remove=()):
+        # the household and its membership changes are written in one transaction, with one INSERT and one DELETE on
+        # household_people. household_entity.people is expired by the commit.
+        try:
+            if image_entity is not None:
+                household_image = HouseholdImage(
+                    household=household_entity,
+                    image=image_entity,
+                    created=datetime.now(),
+                )
+                self.db.add(household_image)
+                household_entity.current_household_image = image_entity
+            household_entity.leader_id = update_leader_id
+            household_entity.address_id = update_address_id
+            if people_ids_to_add:
+                self.db.execute(models.HouseholdPerson.insert(),
+                                [{'household_id': household_entity.id, 'person_id': person_id} for person_id in people_ids_to_add])
+            if people_ids_to_remove:
+                self.db.execute(models.HouseholdPerson.delete().where(
+                    models.HouseholdPerson.c.household_id == household_entity.id,
+                    models.HouseholdPerson.c.person_id.in_(people_ids_to_remove)))
+            UnitOfWork.commit(self.db)
+        except Exception:
+            self.db.rollback()
+            raise
 
     def get_people_not_in_household(self, household_id):
         return self.db.query(models.Person).filter(
@@ -70,29 +152,24 @@ class HouseholdDAO:
             .all()
 
 
-    def find_people_not_in_household_with_name_or_surname_starting_with(self, household_id, name, surname) -> List[models.Person]:
-        # Create a case statement to calculate the sorting priority.
-        surname_match = case(
-            [
-                (and_(models.Person.last_name.ilike(f"{surname}%"), models.Person.first_name.ilike(f"{name}%")),
-                 1) if name and surname else (False, 1),
-                (models.Person.last_name.ilike(f"{surname}%"), 2) if surname else (False, 2),
-            ],
-            else_=3
-        )
+    def find_people_not_in_household_with_name_or_surname_starting_with(self, household_id, name, surname,
+                                                                         params: CursorParams = CursorParams(size=20)) -> CursorPage[models.Person]:
+        is_member = exists().where(models.HouseholdPerson.c.person_id == models.Person.id,
+                                   models.HouseholdPerson.c.household_id == household_id)
+        people_query = self.db.query(models.Person).options(*person_loader_options(PersonLoaderProfile.basic))\
+            .filter(~is_member)
+
+        name_filter = PersonNameSearch(self.db).name_filter(name, surname)
+        if name_filter is not None:
+            people_query = people_query.filter(name_filter)
+
+        # people with the same last name as the household leader come first
+        leader = aliased(models.Person)
+        leader_last_name = self.db.query(leader.last_name)\
+            .join(models.Household, models.Household.leader_id == leader.id)\
+            .filter(models.Household.id == household_id)\
+            .scalar_subquery()
+        leader_last_name_priority = case([(models.Person.last_name == leader_last_name, 0)], else_=1)
 
-        # Query and order the results based on the calculated priority.
-        people_query = self.db.query(models.Person)
-
-        if name and surname:
-            people_query = people_query.filter(models.Person.first_name.ilike(f"{name}%"),
-                                               models.Person.last_name.ilike(f"{surname}%"))
-        elif name:
-            people_query = people_query.filter(or_(models.Person.first_name.ilike(f"{name}%"), models.Person.last_name.ilike(f"{name}%")))
-        elif surname:
-            people_query = people_query.filter(models.Person.last_name.ilike(f"{surname}%"))
-
-        people = people_query.order_by(surname_match, models.Person.last_name, models.Person.first_name).all()
-        # remove people that are already in the household
-        people = [person for person in people if household_id not in [household.id for household in person.households]]
-        return people
+        return CursorPagination.paginate(people_query, [leader_last_name_priority, models.Person.last_name,
+                                                        models.Person.first_name, models.Person.id], params)
@@ -0,0 +1,85 @@
+from enum import Enum
+
+from sqlalchemy.orm import selectinload, joinedload
+
+from src.app.people.models.database import models
+from src.app.people.models.household import HouseholdDepth
+from src.app.utils.fieldSelection import expands
+
+
+class PersonLoaderProfile(str, Enum):
+    basic = 'basic'
+    list = 'list'
+    detail = 'detail'
+    lookup = 'lookup'  # a FullViewPerson without households, as returned by the birthday/anniversary/email lookups
+
+
+# Each profile eagerly loads exactly the relationships that the matching PeopleFactory builder touches, so that
+# building a page of views costs a fixed number of queries (one per relationship level) instead of one per row.
+
+def profile_image_options():
+    # only the current image is needed by the views, the history is loaded by the /profile_images endpoints
+    return joinedload(models.Person.current_profile_image)
+
+
+def household_view_options():
+    # matches PeopleFactory.create_household_view: members (with avatars), leader, address and household image.
+    households = selectinload(models.Person.households)
+    return [
+        households.selectinload(models.Household.people).joinedload(models.Person.current_profile_image),
+        households.joinedload(models.Household.leader),
+        households.joinedload(models.Household.address),
+        households.joinedload(models.Household.current_household_image),
+    ]
+
+
+def person_basic_options():
+    return [profile_image_options()]
+
+
+def person_full_options(include_households=True, selection=None):
+    # relationships left out of a sparse fieldset are neither loaded nor built by the factory
+    options = []
+    if expands(selection, 'social_media_links'):
+        options.append(selectinload(models.Person.social_media_links))
+    if expands(selection, 'addresses'):
+        options.append(selectinload(models.Person.addresses).joinedload(models.PeopleAddress.address))
+    if expands(selection, 'profile_image'):
+        options.append(profile_image_options())
+    if expands(selection, 'user'):
+        options.append(joinedload(models.Person.user))
+    if include_households and expands(selection, 'households'):
+        options.extend(household_view_options())
+    return options
+
+
+def person_loader_options(profile: PersonLoaderProfile, selection=None):
+    if profile is None:
+        return []
+    if profile == PersonLoaderProfile.basic:
+        return person_basic_options()
+    if profile == PersonLoaderProfile.lookup:
+        return person_full_options(include_households=False, selection=selection)
+    # the list and the detail views both render a FullViewPerson with households.
+    return person_full_options(include_households=True, selection=selection)
+
+
+def household_loader_options(selection=None, depth: HouseholdDepth = HouseholdDepth.basic):
+    # matches HouseholdFactory.createHouseholdFromHouseholdEntity for the depth, the person trees of the members are
+    # never followed into their own households
+    options = []
+    if expands(selection, 'leader'):
+        options.append(joinedload(models.Household.leader))
+    if expands(selection, 'address'):
+        options.append(joinedload(models.Household.address))
+    if depth != HouseholdDepth.reference and expands(selection, 'household_image'):
+        options.append(joinedload(models.Household.current_household_image))
+    if expands(selection, 'people'):
+        people = selectinload(models.Household.people)
+        if depth == HouseholdDepth.reference:
+            options.append(people)
+        elif depth == HouseholdDepth.basic:
+            options.append(people.joinedload(models.Person.current_profile_image))
+        else:
+            options.append(people.options(*person_full_options(include_households=False)))
+    return options
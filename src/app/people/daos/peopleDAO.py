@@ -1,42 +1,63 @@
 from datetime import datetime, date
-from typing import List
+from typing import Dict, Iterable, List, Set
 
 from fastapi import Depends
 
 from fastapi_pagination.ext.sqlalchemy import paginate
 from fastapi_pagination import Page, Params
 
-from src.app.database import get_db, SessionLocal
+from src.app.database import get_db, SessionLocal, UnitOfWork
+from src.app.media.models.database.models import MediaItem
+from src.app.people.daos.loaderProfiles import PersonLoaderProfile, person_loader_options
+from src.app.people.daos.personNameSearch import PersonNameSearch
 from src.app.people.models.database import models
 from src.app.people.models.database.models import PersonImage
 
-from sqlalchemy import or_, and_, extract, case, select
+from sqlalchemy import or_, and_, case, func
 
 from src.app.utils.DateUtils import DateUtils
+from src.app.utils.bulkLoader import BulkLoader
+from src.app.utils.cursorPagination import CursorPagination, CursorParams, CursorPage
+from src.app.utils.fieldSelection import FieldSelection
 
 
 class PeopleDAO:
     def __init__(self, db: SessionLocal = Depends(get_db)):
         self.db = db
 
-    def get_all(self, params: Params = Params(page=1, size=100)) -> Page[models.Person]:
+    def get_all(self, params: Params = Params(page=1, size=100), selection: FieldSelection = None) -> Page[models.Person]:
         return paginate(self.db.query(models.Person)
+                        .options(*person_loader_options(PersonLoaderProfile.list, selection))
                         .order_by(models.Person.last_name.asc(), models.Person.first_name.asc(),
                                   models.Person.date_of_birth.asc(), models.Person.id.asc())
                         , params)
 
-    def get_person_by_id(self, id: int) -> models.Person:
-        return self.db.query(models.Person).filter(models.Person.id == id).first()
+    def get_all_by_cursor(self, params: CursorParams = CursorParams()) -> CursorPage[models.Person]:
+        return CursorPagination.paginate(self.db.query(models.Person)
+                                         .options(*person_loader_options(PersonLoaderProfile.list)),
+                                         [models.Person.last_name, models.Person.first_name,
+                                          models.Person.date_of_birth, models.Person.id], params)
+
+    def get_person_by_id(self, id: int, loader_profile: PersonLoaderProfile = None,
+                         selection: FieldSelection = None) -> models.Person:
+        return self.db.query(models.Person).options(*person_loader_options(loader_profile, selection))\
+            .filter(models.Person.id == id).first()
 
     def find_people_by_email_or_first_name_and_last_name(self, email: str, first_name: str, last_name: str) -> List[
         models.Person]:
-        return self.db.query(models.Person).filter(
+        return self.db.query(models.Person).options(*person_loader_options(PersonLoaderProfile.lookup)).filter(
             or_(models.Person.email == email, and_(models.Person.first_name == first_name,
                                                    models.Person.last_name == last_name))).order_by(
             models.Person.id).all()
 
     def update_person(self, person_id, update_values, image_entity=None):
         personToUpdate = self.db.query(models.Person).filter(models.Person.id == person_id)
+        # bulk updates skip the mapper events that keep the month-day ordinals in sync
+        update_values = dict(update_values)
+        if 'date_of_birth' in update_values:
+            update_values['birth_month_day'] = DateUtils.get_month_day_ordinal(update_values['date_of_birth'])
+        if 'marriage_date' in update_values:
+            update_values['marriage_month_day'] = DateUtils.get_month_day_ordinal(update_values['marriage_date'])
         if image_entity is not None:
             person_image = PersonImage(
                 person=personToUpdate.first(),
@@ -44,8 +65,24 @@ class PeopleDAO:
                 created=datetime.now(),
             )
             self.db.add(person_image)
+            update_values['current_profile_image_id'] = image_entity.id
         personToUpdate.update(update_values)
-        self.db.commit()
+        UnitOfWork.commit(self.db)
+
+    def get_current_profile_image(self, id: int):
+        # a (person id, current profile image or None) row, None when there is no person with that id
+        return self.db.query(models.Person.id, MediaItem)\
+            .outerjoin(MediaItem, MediaItem.id == models.Person.current_profile_image_id)\
+            .filter(models.Person.id == id).first()
+
+    def get_person_version(self, id: int):
+        return self.db.query(models.Person.version).filter(models.Person.id == id).scalar()
+
+    def increment_versions(self, person_ids):
+        if person_ids:
+            self.db.query(models.Person).filter(models.Person.id.in_(person_ids))\
+                .update({models.Person.version: models.Person.version + 1}, synchronize_session=False)
+            UnitOfWork.commit(self.db)
 
     def get_existing_social_media_links(self, person_id: int):
         return self.db.query(models.SocialMediaLink).filter(
@@ -63,7 +100,7 @@ class PeopleDAO:
     def create_person(self, new_person, image_entity=None):
 
         self.db.add(new_person)
-        self.db.commit()
+        UnitOfWork.commit(self.db)
         self.db.refresh(new_person)
 
         if image_entity is not None:
@@ -73,11 +110,54 @@ class PeopleDAO:
                 created=datetime.now(),
             )
             self.db.add(person_image)
-            self.db.commit()
+            new_person.current_profile_image = image_entity
+            UnitOfWork.commit(self.db)
             self.db.refresh(new_person)
 
         return new_person
 
+    def create_people(self, new_people: List[models.Person], household_ids: List[int]) -> List[int]:
+        # one transaction for the whole list, household_ids[i] is the household of new_people[i] (or None)
+        try:
+            self.db.add_all(new_people)
+            self.db.flush()
+            # read before the commit expires the entities, reading them afterwards costs a select per person
+            person_ids = [person.id for person in new_people]
+            memberships = [{'household_id': household_id, 'person_id': person_id, 'created': datetime.utcnow()}
+                           for person_id, household_id in zip(person_ids, household_ids) if household_id is not None]
+            if memberships:
+                self.db.execute(models.HouseholdPerson.insert(), memberships)
+            UnitOfWork.commit(self.db)
+        except Exception:
+            self.db.rollback()
+            raise
+        return person_ids
+
+    def get_people_by_ids(self, person_ids: Iterable[int], loader_profile: PersonLoaderProfile = None) -> Dict[int, models.Person]:
+        return BulkLoader.load_by_ids(self.db.query(models.Person).options(*person_loader_options(loader_profile)),
+                                      models.Person.id, person_ids)
+
+    def get_existing_person_ids(self, person_ids) -> Set[int]:
+        if not person_ids:
+            return set()
+        return {id for id, in self.db.query(models.Person.id).filter(models.Person.id.in_(set(person_ids)))}
+
+    def find_existing_emails(self, emails: Set[str]) -> Set[str]:
+        # emails are compared lower cased
+        if not emails:
+            return set()
+        return {email.lower() for email, in self.db.query(models.Person.email)
+                .filter(func.lower(models.Person.email).in_(emails))}
+
+    def find_existing_name_keys(self, last_names: Set[str]) -> Set[tuple]:
+        # (lower first name, lower last name, date of birth) of the people with one of the (lower cased) last names
+        if not last_names:
+            return set()
+        rows = self.db.query(models.Person.first_name, models.Person.last_name, models.Person.date_of_birth)\
+            .filter(func.lower(models.Person.last_name).in_(last_names))
+        return {((first_name or '').lower(), (last_name or '').lower(), date_of_birth)
+                for first_name, last_name, date_of_birth in rows}
+
     def add_person_image(self, personToUpdate, image_entity):
         person_image = PersonImage(
             person=personToUpdate,
@@ -85,129 +165,50 @@ class PeopleDAO:
             created=datetime.now(),
         )
         self.db.add(person_image)
-        self.db.commit()
+        personToUpdate.current_profile_image = image_entity
+        UnitOfWork.commit(self.db)
 
     def find_people_with_birthday_before_given_date(self, date: datetime.date) -> List[models.Person]:
-        current_date = DateUtils.get_current_datetime()
-        query = self.db.query(models.Person).filter(
-            and_(
-                # ensure that date entered is more than or equal to the current year
-                date.year >= current_date.year,
-                # all people with birthdays in the next year before the date entered
-                or_(
-                    and_(
-                        date.year > current_date.year,
-                        or_(
-                            extract('month', models.Person.date_of_birth) < date.month,
-                            and_(
-                                extract('month', models.Person.date_of_birth) == date.month,
-                                extract('day', models.Person.date_of_birth) <= date.day
-                            ),
-                            extract('month', models.Person.date_of_birth) > current_date.month,
-                        )
-                    ),
-                    # all people with birthdays in the current year before the date entered
-                    and_(
-                        date.year == current_date.year,
-                        or_(
-                            and_(
-                                extract('month', models.Person.date_of_birth) > current_date.month,
-                                extract('month', models.Person.date_of_birth) < date.month
-                            ),
-                            and_(
-                                extract('month', models.Person.date_of_birth) > current_date.month,
-                                extract('month', models.Person.date_of_birth) == date.month,
-                                extract('day', models.Person.date_of_birth) <= date.day
-                            ),
-                            and_(
-                                extract('month', models.Person.date_of_birth) == current_date.month,
-                                extract('day', models.Person.date_of_birth) > current_date.day,
-                                extract('day', models.Person.date_of_birth) <= date.day
-                            ),
-                            and_(
-                                extract('month', models.Person.date_of_birth) == current_date.month,
-                                extract('month', models.Person.date_of_birth) < date.month
-                            )
-                        ),
-                    )
-                )
-            )
-        ).order_by(models.Person.date_of_birth)
-
-        return query.all()
+        return self.find_people_with_upcoming_month_day_before_given_date(models.Person.birth_month_day, date)
 
     def find_people_with_anniversary_before_given_date(self, date: datetime.date) -> List[models.Person]:
-        current_date = DateUtils.get_current_datetime()
-        query = self.db.query(models.Person).filter(
-            and_(
-                # ensure that date entered is more than or equal to the current year
-                date.year >= current_date.year,
-                # all people with birthdays in the next year before the date entered
-                or_(
-                    and_(
-                        date.year > current_date.year,
-                        or_(
-                            extract('month', models.Person.marriage_date) < date.month,
-                            and_(
-                                extract('month', models.Person.marriage_date) == date.month,
-                                extract('day', models.Person.marriage_date) <= date.day
-                            ),
-                            extract('month', models.Person.marriage_date) > current_date.month,
-                        )
-                    ),
-                    # all people with birthdays in the current year before the date entered
-                    and_(
-                        date.year == current_date.year,
-                        or_(
-                            and_(
-                                extract('month', models.Person.marriage_date) > current_date.month,
-                                extract('month', models.Person.marriage_date) < date.month
-                            ),
-                            and_(
-                                extract('month', models.Person.marriage_date) > current_date.month,
-                                extract('month', models.Person.marriage_date) == date.month,
-                                extract('day', models.Person.marriage_date) <= date.day
-                            ),
-                            and_(
-                                extract('month', models.Person.marriage_date) == current_date.month,
-                                extract('day', models.Person.marriage_date) > current_date.day,
-                                extract('day', models.Person.marriage_date) <= date.day
-                            ),
-                            and_(
-                                extract('month', models.Person.marriage_date) == current_date.month,
-                                extract('month', models.Person.marriage_date) < date.month
-                            )
-                        ),
-                    )
-                )
-            )
-        ).order_by(models.Person.marriage_date)
-
-        return query.all()
-
-    def find_people_with_name_or_surname_starting_with(self, name, surname) -> List[models.Person]:
-        # Create a case statement to calculate the sorting priority.
-        surname_match = case(
-            [
-                (and_(models.Person.last_name.ilike(f"{surname}%"), models.Person.first_name.ilike(f"{name}%")),
-                 1) if name and surname else (False, 1),
-                (models.Person.last_name.ilike(f"{surname}%"), 2) if surname else (False, 2),
-            ],
-            else_=3
-        )
-
-        # Query and order the results based on the calculated priority.
-        people_query = self.db.query(models.Person)
+        return self.find_people_with_upcoming_month_day_before_given_date(models.Person.marriage_month_day, date)
 
-        if name and surname:
-            people_query = people_query.filter(models.Person.first_name.ilike(f"{name}%"),
-                                               models.Person.last_name.ilike(f"{surname}%"))
-        elif name:
-            people_query = people_query.filter(
-                or_(models.Person.first_name.ilike(f"{name}%"), models.Person.last_name.ilike(f"{name}%")))
-        elif surname:
-            people_query = people_query.filter(models.Person.last_name.ilike(f"{surname}%"))
-
-        people = people_query.order_by(surname_match, models.Person.last_name, models.Person.first_name).all()
-
-        return people
+    def find_people_with_upcoming_month_day_before_given_date(self, month_day_column, date) -> List[models.Person]:
+        current_date = DateUtils.get_current_datetime()
+        # ensure that date entered is more than or equal to the current year
+        if date.year < current_date.year:
+            return []
+
+        current_month_day = DateUtils.get_month_day_ordinal(current_date)
+        until_month_day = DateUtils.get_month_day_ordinal(date)
+
+        if date.year == current_date.year:
+            # the rest of this year up to the date entered
+            month_day_filter = and_(month_day_column > current_month_day, month_day_column <= until_month_day)
+        elif date.year == current_date.year + 1:
+            # the rest of this year and next year up to the date entered, wrapping around the end of the year
+            month_day_filter = or_(month_day_column > current_month_day, month_day_column <= until_month_day)
+        else:
+            month_day_filter = month_day_column.isnot(None)
+
+        # upcoming dates first, i.e. the rest of this year before the dates that wrap into next year
+        upcoming_order = case([(month_day_column > current_month_day, 0)], else_=1)
+
+        return self.db.query(models.Person).options(*person_loader_options(PersonLoaderProfile.lookup))\
+            .filter(month_day_filter)\
+            .order_by(upcoming_order, month_day_column, models.Person.id)\
+            .all()
+
+    def find_people_with_name_or_surname_starting_with(self, name, surname, limit: int = None) -> List[models.Person]:
+        people_query = self.db.query(models.Person).options(*person_loader_options(PersonLoaderProfile.basic))
+
+        name_filter = PersonNameSearch(self.db).name_filter(name, surname)
+        if name_filter is not None:
+            people_query = people_query.filter(name_filter)
+
+        people_query = people_query.order_by(models.Person.last_name, models.Person.first_name, models.Person.id)
+        if limit is not None:
+            people_query = people_query.limit(limit)
+
+        return people_query.all()
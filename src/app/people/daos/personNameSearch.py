@@ -0,0 +1,126 @@
+import threading
+from bisect import bisect_left
+from typing import Optional, Set
+
+from sqlalchemy import event, func, or_, and_
+from sqlalchemy.orm import Session
+
+from src.app.people.models.database import models
+
+# highest code point, used as the upper bound of a prefix range in the in-process index
+_MAX_CHAR = '\U0010ffff'
+
+
+def _like_prefix(value: str) -> str:
+    # backslash is the default LIKE escape character on postgres
+    escaped = value.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"{escaped}%"
+
+
+class PersonNamePrefixIndex:
+    """
+    In-process prefix index over lower-cased first and last names, used on SQLite where the lower(...)
+    text_pattern_ops indexes of the people table do not exist. Entries are sorted (name, id) tuples so that a prefix
+    lookup is two bisections. The index is rebuilt lazily after any write to the people table.
+    """
+
+    def __init__(self):
+        self.first_names = []
+        self.last_names = []
+        self.stale = True
+        self.lock = threading.Lock()
+
+    def mark_stale(self):
+        self.stale = True
+
+    def rebuild(self, db):
+        rows = db.query(models.Person.id, models.Person.first_name, models.Person.last_name).all()
+        self.first_names = sorted((first_name.lower(), id) for id, first_name, _ in rows if first_name)
+        self.last_names = sorted((last_name.lower(), id) for id, _, last_name in rows if last_name)
+        self.stale = False
+
+    def ensure_current(self, db):
+        if self.stale:
+            with self.lock:
+                if self.stale:
+                    self.rebuild(db)
+
+    @staticmethod
+    def ids_with_prefix(entries, prefix: str) -> Set[int]:
+        prefix = prefix.lower()
+        start = bisect_left(entries, (prefix,))
+        end = bisect_left(entries, (prefix + _MAX_CHAR,))
+        return {id for _, id in entries[start:end]}
+
+    def matching_ids(self, name: Optional[str], surname: Optional[str]) -> Set[int]:
+        if name and surname:
+            return self.ids_with_prefix(self.first_names, name) & self.ids_with_prefix(self.last_names, surname)
+        if name:
+            return self.ids_with_prefix(self.first_names, name) | self.ids_with_prefix(self.last_names, name)
+        return self.ids_with_prefix(self.last_names, surname)
+
+
+# one in-process index per engine, shared by all sessions bound to it
+_prefix_indexes = {}
+_prefix_indexes_lock = threading.Lock()
+
+
+def get_prefix_index(engine) -> PersonNamePrefixIndex:
+    with _prefix_indexes_lock:
+        if engine not in _prefix_indexes:
+            _prefix_indexes[engine] = PersonNamePrefixIndex()
+        return _prefix_indexes[engine]
+
+
+def _mark_engine_stale(engine):
+    index = _prefix_indexes.get(engine)
+    if index is not None:
+        index.mark_stale()
+
+
+@event.listens_for(models.Person, 'after_insert')
+@event.listens_for(models.Person, 'after_update')
+@event.listens_for(models.Person, 'after_delete')
+def _person_written(mapper, connection, target):
+    _mark_engine_stale(connection.engine)
+
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def _people_bulk_written(context):
+    # query(...).update()/delete() skip the mapper events; these are rare enough to just invalidate every index.
+    for index in list(_prefix_indexes.values()):
+        index.mark_stale()
+
+
+class PersonNameSearch:
+    """
+    Builds the filter for the people type-ahead. On postgres it is lower(first_name)/lower(last_name) LIKE 'x%',
+    which is served by the text_pattern_ops indexes on the people table. On SQLite it is an id IN (...) list
+    resolved from the in-process PersonNamePrefixIndex.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def uses_prefix_index(self) -> bool:
+        return self.db.get_bind().dialect.name == 'sqlite'
+
+    def name_filter(self, name: Optional[str], surname: Optional[str]):
+        if not name and not surname:
+            return None
+
+        if self.uses_prefix_index():
+            index = get_prefix_index(self.db.get_bind())
+            index.ensure_current(self.db)
+            return models.Person.id.in_(index.matching_ids(name, surname))
+
+        first_name = func.lower(models.Person.first_name)
+        last_name = func.lower(models.Person.last_name)
+        if name and surname:
+            return and_(first_name.like(_like_prefix(name)),
+                        last_name.like(_like_prefix(surname)))
+        if name:
+            return or_(first_name.like(_like_prefix(name)),
+                       last_name.like(_like_prefix(name)))
+        return last_name.like(_like_prefix(surname))
@@ -0,0 +1,53 @@
+from typing import List, Optional, Tuple
+
+from fastapi import Depends
+from sqlalchemy import and_
+
+from src.app.database import get_db, SessionLocal
+from src.app.people.daos.addressProximityIndex import get_proximity_index
+from src.app.people.models.database import models
+from src.app.utils.bulkLoader import BulkLoader
+
+
+class ProximityDAO:
+    def __init__(self, db: SessionLocal = Depends(get_db)):
+        self.db = db
+
+    def get_nearest_address_ids(self, latitude: float, longitude: float, limit: int,
+                                radius_km: Optional[float] = None) -> List[Tuple[float, int]]:
+        index = get_proximity_index(self.db.get_bind())
+        index.ensure_current(self.db)
+        return index.nearest(latitude, longitude, limit, radius_km)
+
+    @staticmethod
+    def in_box(box):
+        # box is (min latitude, max latitude, min longitude, max longitude), served by ix_addresses_latitude_longitude
+        min_latitude, max_latitude, min_longitude, max_longitude = box
+        return and_(models.Address.latitude.between(min_latitude, max_latitude),
+                    models.Address.longitude.between(min_longitude, max_longitude))
+
+    def get_households_at(self, address_ids: List[int], box):
+        # rows of the households at the addresses, with the name of the leader. Addresses that moved out of the box
+        # since the index was refreshed are left out
+        query = self.db.query(models.Household.id, models.Household.leader_id,
+                              models.Person.first_name.label('leader_first_name'),
+                              models.Person.last_name.label('leader_last_name'), models.Address)\
+            .join(models.Person, models.Household.leader_id == models.Person.id)\
+            .join(models.Address, models.Household.address_id == models.Address.id)\
+            .filter(self.in_box(box))
+        return self.rows_at(query, models.Household.address_id, address_ids)
+
+    def get_people_at(self, address_ids: List[int], box):
+        # rows of the people at the addresses, a person with more than one of the addresses has a row for each
+        query = self.db.query(models.Person.id, models.Person.first_name, models.Person.last_name, models.Address)\
+            .join(models.PeopleAddress, models.PeopleAddress.person_id == models.Person.id)\
+            .join(models.Address, models.PeopleAddress.address_id == models.Address.id)\
+            .filter(self.in_box(box))
+        return self.rows_at(query, models.PeopleAddress.address_id, address_ids)
+
+    @staticmethod
+    def rows_at(query, address_id_column, address_ids: List[int]):
+        rows = []
+        for start in range(0, len(address_ids), BulkLoader.CHUNK_SIZE):
+            rows.extend(query.filter(address_id_column.in_(address_ids[start:start + BulkLoader.CHUNK_SIZE])))
+        return rows
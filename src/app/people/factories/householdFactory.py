@@ -5,9 +5,10 @@ from fastapi import Depends
 from .peopleFactory import PeopleFactory
 from ...media.factories.mediaFactory import MediaFactory
 from ...media.models.media import ViewMediaItem
-from ...people.models.household import ViewHousehold, CreateHousehold
+from ...people.models.household import CreateHousehold, HouseholdDepth, HOUSEHOLD_VIEWS
 from ...people.models.database import models
 from ...people.models.people import ViewAddress
+from ...utils.fieldSelection import FieldSelection, expands
 
 
 class HouseholdFactory:
@@ -15,42 +16,58 @@ class HouseholdFactory:
         self.people_factory = people_factory
         self.media_factory = media_factory
 
-    def createHouseholdFromHouseholdEntity(self, household_entity: models.Household, include_household_image=False) -> ViewHousehold:
+    def createHouseholdFromHouseholdEntity(self, household_entity: models.Household, include_household_image=False,
+                                           selection: FieldSelection = None, depth: HouseholdDepth = HouseholdDepth.basic):
+        # returns the HOUSEHOLD_VIEWS model of the depth, the members are never rendered with their own households
+        household_values = {'id': household_entity.id}
 
-        leader_response = None
-        if household_entity.leader:
-            leader_response = self.people_factory.create_person_from_person_entity(household_entity.leader, include_profile_image=True)
+        # relationships left out of a sparse fieldset are not touched, so they are never lazy loaded. Below the full depth
+        # only the basic view is built for the leader and the people.
+        if expands(selection, 'leader'):
+            leader_response = None
+            if household_entity.leader:
+                if depth == HouseholdDepth.basic:
+                    leader_response = self.people_factory.create_basic_person_view_from_person_entity(household_entity.leader, include_profile_image=True)
+                else:
+                    # the leader is one of the people, so only a reference is rendered for it
+                    leader_response = self.people_factory.create_person_reference_from_person_entity(household_entity.leader)
+            household_values['leader'] = leader_response
 
-        address_response = ViewAddress(
-            id=household_entity.address.id,
-            type=household_entity.address.type,
-            street_number=household_entity.address.street_number,
-            street=household_entity.address.street,
-            suburb=household_entity.address.suburb,
-            city=household_entity.address.city,
-            province=household_entity.address.province,
-            country=household_entity.address.country,
-            postal_code=household_entity.address.postal_code,
-            latitude=household_entity.address.latitude,
-            longitude=household_entity.address.longitude)
+        if expands(selection, 'address'):
+            household_values['address'] = ViewAddress(
+                id=household_entity.address.id,
+                type=household_entity.address.type,
+                street_number=household_entity.address.street_number,
+                street=household_entity.address.street,
+                suburb=household_entity.address.suburb,
+                city=household_entity.address.city,
+                province=household_entity.address.province,
+                country=household_entity.address.country,
+                postal_code=household_entity.address.postal_code,
+                latitude=household_entity.address.latitude,
+                longitude=household_entity.address.longitude)
 
-        people = []
-        if household_entity.people:
-            for person in household_entity.people:
-                person_response = self.people_factory.create_person_from_person_entity(person, include_households=False, include_profile_image=True)
-                people.append(person_response)
+        if expands(selection, 'people'):
+            people = []
+            if household_entity.people:
+                for person in household_entity.people:
+                    if depth == HouseholdDepth.full:
+                        person_response = self.people_factory.create_person_from_person_entity(person, include_households=False, include_profile_image=True)
+                    else:
+                        person_response = self.people_factory.create_basic_person_view_from_person_entity(person, include_profile_image=depth == HouseholdDepth.basic)
+                    people.append(person_response)
+            household_values['people'] = people
 
-        household_response = ViewHousehold(
-            id=household_entity.id,
-            leader=leader_response,
-            address=address_response,
-            people = people
-        )
+        view_model = HOUSEHOLD_VIEWS[depth]
+        if selection is None:
+            household_response = view_model(**household_values)
+        else:
+            # leader and address are required on the views, but may be left out of a sparse fieldset
+            household_response = view_model.construct(**household_values)
 
-        if include_household_image and household_entity.household_images:
-            images = sorted(household_entity.household_images, key=lambda x: x.id, reverse=True)
-            if len(images) > 0 and images[0] is not None:
-                household_response.household_image = self.media_factory.create_media_item_from_media_item_entity(images[0].image)
+        if include_household_image and depth != HouseholdDepth.reference and expands(selection, 'household_image') \
+                and household_entity.current_household_image is not None:
+            household_response.household_image = self.media_factory.create_media_item_from_media_item_entity(household_entity.current_household_image)
 
         return household_response
 
@@ -5,10 +5,11 @@ from fastapi import Depends
 from ...media.models.media import ViewMediaItem
 from ...people.models.people import CreatePerson, SocialMediaLink, FullViewPerson, BasicViewPerson
 from ...people.factories.addressFactory import AddressFactory
-from ...people.models.household import ViewHousehold
+from ...people.models.household import ViewHousehold, PersonReference
 from ...people.models.database import models
 from ...media.factories.mediaFactory import MediaFactory
 from ...users.models.user import DisplayUser
+from ...utils.fieldSelection import FieldSelection, expands
 
 
 class PeopleFactory:
@@ -27,14 +28,17 @@ class PeopleFactory:
             date_of_birth=person_entity.date_of_birth,
             gender=person_entity.gender,
         )
-        if include_profile_image and person_entity.profile_images:
-            images = sorted(person_entity.profile_images, key=lambda x: x.id, reverse=True)
-            if len(images) > 0 and images[0] is not None:
-                person_response.profile_image = self.media_factory.create_view_media_item_from_media_item_entity(images[0].image)
+        if include_profile_image and person_entity.current_profile_image is not None:
+            person_response.profile_image = self.media_factory.create_view_media_item_from_media_item_entity(person_entity.current_profile_image)
 
         return person_response
 
-    def create_person_from_person_entity(self, person_entity: models.Person, include_households=True, include_profile_image=False, user: DisplayUser = None) -> FullViewPerson:
+    @staticmethod
+    def create_person_reference_from_person_entity(person_entity) -> PersonReference:
+        return PersonReference(id=person_entity.id, first_name=person_entity.first_name, last_name=person_entity.last_name)
+
+    def create_person_from_person_entity(self, person_entity: models.Person, include_households=True, include_profile_image=False, user: DisplayUser = None,
+                                         selection: FieldSelection = None) -> FullViewPerson:
         person_response = FullViewPerson(
             id=person_entity.id,
             first_name=person_entity.first_name,
@@ -47,35 +51,34 @@ class PeopleFactory:
             marital_status=person_entity.marital_status,
             registered_date=person_entity.registered_date,
         )
-        if person_entity.social_media_links:
+        # relationships left out of a sparse fieldset are not touched, so they are never lazy loaded
+        if expands(selection, 'social_media_links') and person_entity.social_media_links:
             for sml in person_entity.social_media_links:
                 sml_response = SocialMediaLink(type=sml.type, url=sml.url)
                 person_response.social_media_links.append(sml_response)
 
-        if person_entity.addresses:
+        if expands(selection, 'addresses') and person_entity.addresses:
             for people_address in person_entity.addresses:
                 address = people_address.address
                 address_response = self.address_factory.create_address_from_address_entity(address)
 
                 person_response.addresses.append(address_response)
 
-        if include_households and person_entity.households:
+        if include_households and expands(selection, 'households') and person_entity.households:
             person_response.households = []
             for household in person_entity.households:
                 household_response = self.create_household_view(household)
                 person_response.households.append(household_response)
 
 
-        if include_profile_image and person_entity.profile_images:
-            images = sorted(person_entity.profile_images, key=lambda x: x.id, reverse=True)
-            if len(images) > 0 and images[0] is not None:
-                person_response.profile_image = self.media_factory.create_view_media_item_from_media_item_entity(images[0].image)
+        if include_profile_image and expands(selection, 'profile_image') and person_entity.current_profile_image is not None:
+            person_response.profile_image = self.media_factory.create_view_media_item_from_media_item_entity(person_entity.current_profile_image)
 
 
         if user is not None:
             person_response.user = user
 
-        if person_response.user is None and person_entity.user is not None:
+        if person_response.user is None and expands(selection, 'user') and person_entity.user is not None:
             person_response.user = DisplayUser(
                 id=person_entity.user.id,
                 first_name=person_entity.user.first_name,
@@ -99,10 +102,9 @@ class PeopleFactory:
             people=people,
         )
 
-        h_images = sorted(household.household_images, key=lambda x: x.id, reverse=True)
-        if len(h_images) > 0 and h_images[0] is not None:
+        if household.current_household_image is not None:
             view_household.household_image = self.media_factory.create_view_media_item_from_media_item_entity(
-                h_images[0].image)
+                household.current_household_image)
 
         return view_household
 
@@ -0,0 +1,38 @@
+# Points people.current_profile_image_id and households.current_household_image_id at the newest image of each row
+# that does not have one yet. Run once after sql/currentImagePointers.sql:
+# python -m src.app.people.jobs.backfillCurrentImages
+from sqlalchemy import select
+
+from src.app.database import SessionLocal
+from src.app.people.models.database import models
+
+
+def run(db) -> int:
+    newest_person_image = select(models.PersonImage.image_id)\
+        .where(models.PersonImage.person_id == models.Person.id)\
+        .order_by(models.PersonImage.id.desc())\
+        .limit(1)\
+        .scalar_subquery()
+    updated = db.query(models.Person)\
+        .filter(models.Person.current_profile_image_id.is_(None), models.Person.profile_images.any())\
+        .update({models.Person.current_profile_image_id: newest_person_image}, synchronize_session=False)
+
+    newest_household_image = select(models.HouseholdImage.image_id)\
+        .where(models.HouseholdImage.household_id == models.Household.id)\
+        .order_by(models.HouseholdImage.id.desc())\
+        .limit(1)\
+        .scalar_subquery()
+    updated += db.query(models.Household)\
+        .filter(models.Household.current_household_image_id.is_(None), models.Household.household_images.any())\
+        .update({models.Household.current_household_image_id: newest_household_image}, synchronize_session=False)
+
+    db.commit()
+    return updated
+
+
+if __name__ == '__main__':
+    session = SessionLocal()
+    try:
+        print(f"Set the current image of {run(session)} people and households")
+    finally:
+        session.close()
@@ -0,0 +1,34 @@
+# Fills people.birth_month_day and people.marriage_month_day for rows created before the columns existed.
+# Run once after sql/peopleMonthDayOrdinals.sql: python -m src.app.people.jobs.backfillMonthDayOrdinals
+from sqlalchemy import extract, func
+
+from src.app.database import SessionLocal
+from src.app.people.models.database import models
+
+BATCH_SIZE = 1000
+
+
+def month_day_expression(column):
+    return extract('month', column) * 100 + extract('day', column)
+
+
+def run(db, batch_size: int = BATCH_SIZE) -> int:
+    updated = 0
+    max_id = db.query(func.max(models.Person.id)).scalar() or 0
+    # walk the table in id ranges so that each update only locks a batch of rows
+    for start_id in range(0, max_id + 1, batch_size):
+        in_batch = models.Person.id.between(start_id, start_id + batch_size - 1)
+        updated += db.query(models.Person).filter(in_batch).update({
+            models.Person.birth_month_day: month_day_expression(models.Person.date_of_birth),
+            models.Person.marriage_month_day: month_day_expression(models.Person.marriage_date),
+        }, synchronize_session=False)
+        db.commit()
+    return updated
+
+
+if __name__ == '__main__':
+    session = SessionLocal()
+    try:
+        print(f"Updated month-day ordinals of {run(session)} people")
+    finally:
+        session.close()
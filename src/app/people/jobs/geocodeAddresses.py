@@ -0,0 +1,65 @@
+# Fills the latitude and longitude of addresses that have none from the bundled postal code and suburb centroids (see
+# CentroidGeocoder), without any network calls. New addresses get theirs when they are created, run this once for the
+# existing ones and again after loading a fuller centroid table: python -m src.app.people.jobs.geocodeAddresses
+from sqlalchemy import or_
+
+from src.app.church.models.database.models import Church
+from src.app.database import SessionLocal
+from src.app.people.daos.addressProximityIndex import addresses_written
+from src.app.people.models.database import models
+from src.app.utils.centroidGeocoder import get_centroid_geocoder
+
+BATCH_SIZE = 1000
+
+
+def run(db, batch_size: int = BATCH_SIZE, geocoder=None) -> int:
+    geocoder = geocoder or get_centroid_geocoder()
+    geocoded = 0
+    last_id = 0
+    while True:
+        # keyset batches, the addresses that cannot be placed stay without coordinates and are not read again
+        rows = db.query(models.Address.id, models.Address.country, models.Address.postal_code, models.Address.suburb,
+                        models.Address.city)\
+            .filter(or_(models.Address.latitude.is_(None), models.Address.longitude.is_(None)),
+                    models.Address.id > last_id)\
+            .order_by(models.Address.id).limit(batch_size).all()
+        if not rows:
+            return geocoded
+        last_id = rows[-1].id
+        updates = []
+        for row in rows:
+            coordinates = geocoder.locate_address(row)
+            if coordinates is not None:
+                updates.append({'id': row.id, 'latitude': coordinates[0], 'longitude': coordinates[1]})
+        if updates:
+            write(db, updates)
+            geocoded += len(updates)
+        db.commit()
+
+
+def write(db, updates):
+    # updates are {'id', 'latitude', 'longitude'} mappings, written with one executemany
+    db.bulk_update_mappings(models.Address, updates)
+    address_ids = [update['id'] for update in updates]
+    # the views of the people, households and churches embed the address, their versions move on. The members of a
+    # household see its address through the household
+    residents = db.query(models.PeopleAddress.person_id).filter(models.PeopleAddress.address_id.in_(address_ids))
+    members = db.query(models.HouseholdPerson.c.person_id)\
+        .join(models.Household, models.Household.id == models.HouseholdPerson.c.household_id)\
+        .filter(models.Household.address_id.in_(address_ids))
+    db.query(models.Person).filter(or_(models.Person.id.in_(residents.scalar_subquery()),
+                                       models.Person.id.in_(members.scalar_subquery())))\
+        .update({models.Person.version: models.Person.version + 1}, synchronize_session=False)
+    db.query(models.Household).filter(models.Household.address_id.in_(address_ids))\
+        .update({models.Household.version: models.Household.version + 1}, synchronize_session=False)
+    db.query(Church).filter(Church.address_id.in_(address_ids))\
+        .update({Church.version: Church.version + 1}, synchronize_session=False)
+    addresses_written(db, address_ids)
+
+
+if __name__ == '__main__':
+    session = SessionLocal()
+    try:
+        print(f"Geocoded {run(session)} addresses")
+    finally:
+        session.close()
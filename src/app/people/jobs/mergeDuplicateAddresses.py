@@ -0,0 +1,105 @@
+# Merges addresses with the same fingerprint (see AddressFingerprint) into the one with the lowest id: the people,
+# households and churches of the duplicates are pointed at it and the duplicates deleted. Fills the fingerprint of
+# every address that does not have one, or has one from an earlier AddressFingerprint. Run once after
+# sql/addressFingerprints.sql, and again when AddressFingerprint changes:
+# python -m src.app.people.jobs.mergeDuplicateAddresses
+from sqlalchemy import case
+
+from src.app.church.models.database.models import Church
+from src.app.database import SessionLocal
+from src.app.people.daos.addressProximityIndex import addresses_written
+from src.app.people.models.database import models
+from src.app.utils.addressFingerprint import AddressFingerprint
+
+BATCH_SIZE = 1000
+
+
+def run(db) -> int:
+    survivors = {}  # fingerprint -> (id, latitude, longitude) of the address that is kept
+    groups = {}  # survivor id -> ids of its duplicates
+    fingerprint_updates = []
+    coordinate_updates = {}
+    rows = db.query(models.Address.id, models.Address.type, models.Address.building, models.Address.street_number,
+                    models.Address.street, models.Address.complex, models.Address.suburb, models.Address.city,
+                    models.Address.province, models.Address.country, models.Address.postal_code,
+                    models.Address.latitude, models.Address.longitude, models.Address.fingerprint).order_by(models.Address.id).yield_per(BATCH_SIZE)
+    for row in rows:
+        fingerprint = AddressFingerprint.of_address(row)
+        survivor = survivors.get(fingerprint)
+        if survivor is None:
+            survivors[fingerprint] = (row.id, row.latitude, row.longitude)
+            if row.fingerprint != fingerprint:
+                fingerprint_updates.append({'id': row.id, 'fingerprint': fingerprint})
+            continue
+        survivor_id, latitude, longitude = survivor
+        groups.setdefault(survivor_id, []).append(row.id)
+        # the kept address takes the coordinates of a duplicate when it has none
+        if latitude is None and row.latitude is not None and survivor_id not in coordinate_updates:
+            coordinate_updates[survivor_id] = {'id': survivor_id, 'latitude': row.latitude, 'longitude': row.longitude}
+
+    merged = 0
+    batch = []
+    for survivor_id, duplicate_ids in groups.items():
+        batch.append((survivor_id, duplicate_ids))
+        if sum(len(duplicate_ids) + 1 for _, duplicate_ids in batch) >= BATCH_SIZE:
+            merged += merge(db, batch)
+            batch = []
+    if batch:
+        merged += merge(db, batch)
+
+    # the duplicates are gone, so the fingerprints of the kept addresses are unique now
+    db.bulk_update_mappings(models.Address, fingerprint_updates)
+    db.bulk_update_mappings(models.Address, list(coordinate_updates.values()))
+    addresses_written(db, coordinate_updates)
+    db.commit()
+    return merged
+
+
+def merge(db, groups) -> int:
+    # groups are (survivor id, duplicate ids) tuples
+    merged_into = {duplicate_id: survivor_id for survivor_id, duplicate_ids in groups for duplicate_id in duplicate_ids}
+    address_ids = set(merged_into) | {survivor_id for survivor_id, _ in groups}
+
+    # a person linked to more than one address of a group keeps one link
+    links = db.query(models.PeopleAddress.id, models.PeopleAddress.person_id, models.PeopleAddress.address_id)\
+        .filter(models.PeopleAddress.address_id.in_(address_ids)).order_by(models.PeopleAddress.id).all()
+    kept_links = set()
+    duplicate_link_ids = []
+    person_ids = set()
+    for link_id, person_id, address_id in links:
+        key = (person_id, merged_into.get(address_id, address_id))
+        if key in kept_links:
+            duplicate_link_ids.append(link_id)
+        else:
+            kept_links.add(key)
+        if address_id in merged_into:
+            person_ids.add(person_id)
+    if duplicate_link_ids:
+        db.query(models.PeopleAddress).filter(models.PeopleAddress.id.in_(duplicate_link_ids))\
+            .delete(synchronize_session=False)
+
+    survivor_of = case(merged_into, value=models.PeopleAddress.address_id)
+    db.query(models.PeopleAddress).filter(models.PeopleAddress.address_id.in_(merged_into))\
+        .update({models.PeopleAddress.address_id: survivor_of}, synchronize_session=False)
+    # the views of the people, households and churches embed the address, their versions move on
+    if person_ids:
+        db.query(models.Person).filter(models.Person.id.in_(person_ids))\
+            .update({models.Person.version: models.Person.version + 1}, synchronize_session=False)
+    db.query(models.Household).filter(models.Household.address_id.in_(merged_into))\
+        .update({models.Household.address_id: case(merged_into, value=models.Household.address_id),
+                 models.Household.version: models.Household.version + 1}, synchronize_session=False)
+    db.query(Church).filter(Church.address_id.in_(merged_into))\
+        .update({Church.address_id: case(merged_into, value=Church.address_id), Church.version: Church.version + 1},
+                synchronize_session=False)
+
+    db.query(models.Address).filter(models.Address.id.in_(merged_into)).delete(synchronize_session=False)
+    addresses_written(db, merged_into)
+    return len(merged_into)
+
+
+if __name__ == '__main__':
+    session = SessionLocal()
+    try:
+        print(f"Merged {run(session)} duplicate addresses")
+    finally:
+        session.close()
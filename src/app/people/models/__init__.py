@@ -0,0 +1,3 @@
+# household.py resolves FullViewPerson.households once ViewHousehold is defined. It is imported with the package, so
+# that FullViewPerson is usable whichever of the models is imported first
+from src.app.people.models import household  # noqa: F401
@@ -1,9 +1,15 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Date, UniqueConstraint, ForeignKey, DECIMAL, DateTime, Table, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Date, UniqueConstraint, ForeignKey, DECIMAL, DateTime, Table, TIMESTAMP, \
+    Index, func, event
 from src.app.database import Base
 from sqlalchemy.orm import relationship
 
+from src.app.utils.DateUtils import DateUtils
+from src.app.config import settings
+from src.app.utils.addressFingerprint import AddressFingerprint
+from src.app.utils.centroidGeocoder import get_centroid_geocoder
+
 HouseholdPerson = Table('household_people', Base.metadata,
                         Column('id', Integer, primary_key=True),
                         Column('created', TIMESTAMP, default=datetime.utcnow, nullable=False),
@@ -21,6 +27,12 @@ class Person(Base):
     date_of_birth = Column(Date)
     gender = Column(String)
     marriage_date = Column(Date)
+    # month-day ordinals (see DateUtils.get_month_day_ordinal) of date_of_birth and marriage_date
+    birth_month_day = Column(Integer, index=True)
+    marriage_month_day = Column(Integer, index=True)
+    # the newest of profile_images, kept up to date by PeopleDAO so that views don't need the image history
+    current_profile_image_id = Column(Integer, ForeignKey('media_items.id'), nullable=True)
+    current_profile_image = relationship("MediaItem", foreign_keys=[current_profile_image_id])
     marital_status = Column(String)
     registered_date = Column(Date)
     social_media_links = relationship("SocialMediaLink", cascade="all, delete-orphan")
@@ -29,6 +41,23 @@ class Person(Base):
     profile_images = relationship("PersonImage", back_populates="person", cascade="all, delete-orphan")
     #as list false
     user = relationship("User", backref="person", uselist=False)
+    # bumped by every write that changes the detail view of the person, the cached view is keyed on it
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+
+    # the name type-ahead filters on lower(name) LIKE 'x%', text_pattern_ops lets postgres use these for prefix matches
+    __table_args__ = (
+        Index('ix_people_lower_first_name', func.lower(first_name).label('lower_first_name'),
+              postgresql_ops={'lower_first_name': 'text_pattern_ops'}),
+        Index('ix_people_lower_last_name', func.lower(last_name).label('lower_last_name'),
+              postgresql_ops={'lower_last_name': 'text_pattern_ops'}),
+    )
+
+
+@event.listens_for(Person, 'before_insert')
+@event.listens_for(Person, 'before_update')
+def sync_month_day_ordinals(mapper, connection, person):
+    person.birth_month_day = DateUtils.get_month_day_ordinal(person.date_of_birth)
+    person.marriage_month_day = DateUtils.get_month_day_ordinal(person.marriage_date)
 
 class SocialMediaLink(Base):
     __tablename__ = 'social_media_links'
@@ -64,19 +93,47 @@ class Address(Base):
     postal_code = Column(String)
     latitude = Column(DECIMAL(10, 8))
     longitude = Column(DECIMAL(11, 8))
+    # see AddressFingerprint, null until sql/addressFingerprints.sql and the merge job have run on existing rows
+    fingerprint = Column(String(64), unique=True, index=True)
     _table_args__ = (UniqueConstraint('person_id', 'type', name='addresses_person_type_uc'),
                      UniqueConstraint('household_id', name='addresses_household_uc'))
 
+    # the bounding box prefilter of the proximity search, and the order of the address book listing
+    __table_args__ = (
+        Index('ix_addresses_latitude_longitude', latitude, longitude),
+        Index('ix_addresses_city_suburb_street', city, suburb, street, id),
+    )
+
+
+@event.listens_for(Address, 'before_insert')
+@event.listens_for(Address, 'before_update')
+def sync_fingerprint(mapper, connection, address):
+    address.fingerprint = AddressFingerprint.of_address(address)
+
+
+@event.listens_for(Address, 'before_insert')
+def geocode_new_address(mapper, connection, address):
+    # addresses created before this, or without a known postal code or suburb, are left to jobs/geocodeAddresses.py
+    if settings.flocki_geocode_new_addresses and (address.latitude is None or address.longitude is None):
+        coordinates = get_centroid_geocoder().locate_address(address)
+        if coordinates is not None:
+            address.latitude, address.longitude = coordinates
+
 
 class Household(Base):
     __tablename__ = 'households'
     id = Column(Integer, primary_key=True, index=True)
     leader_id = Column(Integer, ForeignKey('people.id'), nullable=False)
     address_id = Column(Integer, ForeignKey('addresses.id'), nullable=False)
+    # the newest of household_images, kept up to date by HouseholdDAO so that views don't need the image history
+    current_household_image_id = Column(Integer, ForeignKey('media_items.id'), nullable=True)
     address = relationship("Address", cascade=None)
     household_images = relationship("HouseholdImage", back_populates="household", cascade="all, delete-orphan")
+    current_household_image = relationship("MediaItem", foreign_keys=[current_household_image_id])
     leader = relationship("Person", cascade=None, foreign_keys=[leader_id])
     people = relationship(Person, secondary=HouseholdPerson)  # , primaryjoin="Household.id == HouseholdPerson.household_id")
+    # bumped by every write that changes the detail view of the household, the cached view is keyed on it
+    version = Column(Integer, nullable=False, default=1, server_default='1')
 
 
 class PersonImage(Base):
@@ -1,7 +1,9 @@
-from pydantic import BaseModel, Field, root_validator
-from .people import ViewAddress, BasicViewPerson
+from enum import Enum
 
-from typing import List
+from pydantic import BaseModel, Extra, Field, root_validator
+from .people import ViewAddress, BasicViewPerson, FullViewPerson
+
+from typing import List, Union
 
 from ...media.models.media import CreateMediaItem, ViewMediaItem
 
@@ -72,3 +74,55 @@ class ViewHousehold(BaseModel):
     people: List[BasicViewPerson] = Field([], title="A list of people belonging to the household")
 
 
+FullViewPerson.update_forward_refs(ViewHousehold=ViewHousehold)
+
+
+class HouseholdDepth(int, Enum):
+    # how much of the people in a household is rendered, the leader is always a member as well
+    reference = 0  # ViewHouseholdSummary: the leader as a reference, the members as basic views without their images
+    basic = 1  # ViewHousehold
+    full = 2  # ViewHouseholdWithMembers: the leader as a reference, the members as full views without their households
+
+
+class PersonReference(BaseModel):
+    id: int = Field(None)
+    first_name: str = Field(None)
+    last_name: str = Field(None)
+
+    class Config:
+        # a person view is not a reference, see HouseholdView
+        extra = Extra.forbid
+
+
+class ViewHouseholdSummary(BaseModel):
+    id: int = Field(None)
+    leader: PersonReference = Field(title="The designated leader of the household, see people for the details")
+    address: ViewAddress = Field(title="An addresses")
+    people: List[BasicViewPerson] = Field([], title="A list of people belonging to the household")
+
+    class Config:
+        # the other views have a household_image, see HouseholdView
+        extra = Extra.forbid
+
+
+class ViewHouseholdWithMembers(BaseModel):
+    id: int = Field(None)
+    leader: PersonReference = Field(title="The designated leader of the household, see people for the details")
+    address: ViewAddress = Field(title="An addresses")
+    household_image: ViewMediaItem = Field(None, title="The image of this household")
+    people: List[FullViewPerson] = Field([], title="A list of people belonging to the household")
+
+
+HOUSEHOLD_VIEWS = {
+    HouseholdDepth.reference: ViewHouseholdSummary,
+    HouseholdDepth.basic: ViewHousehold,
+    HouseholdDepth.full: ViewHouseholdWithMembers,
+}
+
+# the response model of the household endpoints. A response is validated as the first view it fits: the summary does
+# not fit the others, whose household_image it forbids, and the view with members does not fit the basic view, whose
+# leader is a person and not a reference
+HouseholdView = Union[ViewHouseholdSummary, ViewHouseholdWithMembers, ViewHousehold]
+
+# the ViewHousehold attributes that are built from relationships, and can be left out with expand=
+HOUSEHOLD_RELATIONSHIPS = {'leader', 'address', 'household_image', 'people'}
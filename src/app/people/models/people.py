@@ -223,5 +223,5 @@ class FullViewPerson(BasicViewPerson):
         orm_mode = True
 
 
-from src.app.people.models.household import ViewHousehold
-FullViewPerson.update_forward_refs(household=ViewHousehold)
+# the FullViewPerson attributes that are built from relationships, and can be left out with expand=
+PERSON_RELATIONSHIPS = {'social_media_links', 'addresses', 'households', 'profile_image', 'user'}
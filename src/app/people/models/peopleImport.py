@@ -0,0 +1,33 @@
+from enum import Enum
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class ImportRowStatus(str, Enum):
+    created = "created"
+    duplicate = "duplicate"
+    invalid = "invalid"
+
+
+class ImportRowResult(BaseModel):
+    row: int = Field(title="The spreadsheet row number, the header is row 1")
+    status: ImportRowStatus
+    person_id: int = Field(None, title="The id of the created person")
+    message: str = Field(None, title="Why the row was not imported")
+
+
+class PeopleImportReport(BaseModel):
+    created: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    rows: List[ImportRowResult] = Field([], title="The outcome of every imported row, in spreadsheet order")
+
+    def add(self, row: int, status: ImportRowStatus, person_id: int = None, message: str = None):
+        if status == ImportRowStatus.created:
+            self.created += 1
+        elif status == ImportRowStatus.duplicate:
+            self.duplicates += 1
+        else:
+            self.invalid += 1
+        self.rows.append(ImportRowResult(row=row, status=status, person_id=person_id, message=message))
@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+
+from .household import PersonReference
+from .people import ViewAddress
+
+
+class NearbyHousehold(BaseModel):
+    id: int
+    leader: PersonReference = Field(title="The designated leader of the household")
+    address: ViewAddress = Field(title="The address of the household")
+    distance_km: float = Field(title="The great-circle distance between the address and the origin")
+
+
+class NearbyPerson(BaseModel):
+    id: int
+    first_name: str = Field(None)
+    last_name: str = Field(None)
+    address: ViewAddress = Field(title="The address of the person nearest to the origin")
+    distance_km: float = Field(title="The great-circle distance between the address and the origin")
@@ -1,18 +1,30 @@
-from fastapi import status, Depends, HTTPException, Response
+from fastapi import status, Depends, HTTPException, Response, Query
 from ..services.addressService import AddressService, NoAddressException, AddressAlreadyExists
 from ...people.models.people import ViewAddress, UpdateAddress, CreateAddress
 from fastapi import APIRouter
-from typing import List
+from typing import List, Union
 from ...users.models.user import User
 from ...users.routers.login import get_current_user
+from ...utils.cursorPagination import CursorPage, CursorParams, InvalidCursorException
 
 router = APIRouter(tags=['Address'])
 
 
+# streamed while the addresses are read, so the whole address book is never held in memory
 @router.get('/addresses', response_model=List[ViewAddress])
 def get_addresses(address_service: AddressService = Depends(AddressService), current_user: User = Depends(get_current_user)):
-    addresses_response = address_service.get_all_addresses()
-    return addresses_response
+    return address_service.stream_all_addresses()
+
+
+# keyset pagination: pass the next_cursor/prev_cursor of the previous response as cursor, no total is calculated
+@router.get('/addresses/cursor', response_model=CursorPage[ViewAddress])
+def get_addresses_by_cursor(cursor: Union[str, None] = None, page_size: int = Query(10, ge=1, le=1000),
+                            address_service: AddressService = Depends(AddressService),
+                            current_user: User = Depends(get_current_user)):
+    try:
+        return address_service.get_all_addresses_by_cursor(CursorParams(cursor=cursor, size=page_size))
+    except InvalidCursorException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
 
 
 @router.get('/addresses/{id}', response_model=ViewAddress)
@@ -28,7 +40,7 @@ def get_address(id: int, address_service: AddressService = Depends(AddressServic
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Address with that id does not exist")
 
 @router.put('/addresses/', response_model=ViewAddress)
-def update_address(id: int, update_address: UpdateAddress, address_service: AddressService = Depends(AddressService),
+def update_address(id: int, update_address: UpdateAddress, response: Response, address_service: AddressService = Depends(AddressService),
                   current_user: User = Depends(get_current_user)):
     try:
         address_response = address_service.update_address(id, update_address)
@@ -38,6 +50,9 @@ def update_address(id: int, update_address: UpdateAddress, address_service: Addr
         return address_response
     except NoAddressException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Address with that id does not exist")
+    except AddressAlreadyExists as e:
+        response.status_code = status.HTTP_409_CONFLICT
+        return e.existing_address
 
 @router.post('/addresses', status_code=status.HTTP_201_CREATED, response_model=ViewAddress)
 def add_address(address: CreateAddress, response: Response, address_service: AddressService = Depends(AddressService),
@@ -0,0 +1,21 @@
+from typing import Union
+
+from fastapi import APIRouter, Depends, Header
+from starlette.responses import StreamingResponse
+
+from ..services.congregationExportService import CongregationExportService
+from ...users.models.user import User
+from ...users.routers.login import get_current_user
+from ...utils.ndjson import NDJSON
+
+router = APIRouter(tags=['Export'])
+
+
+# the whole congregation as NDJSON, one row per line, read from one consistent snapshot. Compressed with gzip when the
+# client accepts it
+@router.get('/export/congregation', response_class=StreamingResponse,
+            responses={200: {'content': {NDJSON.MEDIA_TYPE: {}}}})
+def export_congregation(accept_encoding: Union[str, None] = Header(None),
+                        export_service: CongregationExportService = Depends(CongregationExportService),
+                        current_user: User = Depends(get_current_user)):
+    return export_service.export_congregation(gzip=NDJSON.accepts_gzip(accept_encoding))
@@ -1,24 +1,64 @@
-from fastapi import status, Depends, HTTPException, UploadFile, Query
+from fastapi import status, Depends, HTTPException, UploadFile, Query, Response, Header
 from fastapi_pagination import Page, Params
 
-from ..models.household import CreateHousehold, ViewHousehold, UpdateHousehold
+from ..models.household import CreateHousehold, ViewHousehold, UpdateHousehold, HOUSEHOLD_RELATIONSHIPS, HouseholdDepth, \
+    HouseholdView
 from fastapi import APIRouter
 from typing import List, Union
 
 from ..models.people import BasicViewPerson
 from ..services.householdService import HouseholdService, NoHouseholdException
 from ..services.peopleService import NoPersonException
-from ...media.models.media import ViewMediaItem
-from ...media.services.mediaService import NoMediaItemException
+from ...media.models.media import ViewMediaItem, ImageSize, ImageFormat
+from ...utils.conditionalRequest import ConditionalRequest, get_conditional_request
+from ...media.services.mediaService import NoMediaItemException, MediaItemTooLargeException
 from ...users.models.user import User
 from ...users.routers.login import get_current_user
+from ...utils.cursorPagination import CursorPage, CursorParams, InvalidCursorException
+from ...utils.etag import ETag
+from ...utils.fieldSelection import FieldSelection, InvalidFieldSelectionException
 
 router = APIRouter(tags=['Household'])
 
-@router.get('/households', response_model=Page[ViewHousehold])
-def get_households(page: int = 1, page_size:int = 10, household_service: HouseholdService = Depends(HouseholdService), current_user: User = Depends(get_current_user)):
+def get_household_field_selection(fields: Union[str, None] = Query(None, description="comma separated attributes to return"),
+                                  expand: Union[str, None] = Query(None, description="comma separated relationships to include: " + ", ".join(sorted(HOUSEHOLD_RELATIONSHIPS)))):
+    try:
+        return FieldSelection.parse(fields, expand, set(ViewHousehold.__fields__), HOUSEHOLD_RELATIONSHIPS)
+    except InvalidFieldSelectionException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+
+def get_household_depth(depth: int = Query(HouseholdDepth.basic.value, ge=HouseholdDepth.reference.value, le=HouseholdDepth.full.value,
+                                           description="0: the leader as a reference and the people without images, 1: the people as basic views, 2: the people as full views without their households")):
+    return HouseholdDepth(depth)
+
+def household_response(result, selection: Union[FieldSelection, None]):
+    # a sparse fieldset is not any of the views, every depth is validated against the view of its own
+    if selection is not None:
+        return selection.response(result)
+    return result
+
+def household_variant(selection: Union[FieldSelection, None], depth: HouseholdDepth):
+    variant = selection.variant() if selection is not None else ''
+    if depth != HouseholdDepth.basic:
+        variant += f";depth={depth.value}"
+    return variant
+
+@router.get('/households', response_model=Page[HouseholdView])
+def get_households(page: int = 1, page_size:int = 10, selection: FieldSelection = Depends(get_household_field_selection), depth: HouseholdDepth = Depends(get_household_depth), household_service: HouseholdService = Depends(HouseholdService), current_user: User = Depends(get_current_user)):
     params: Params = Params(page=page, size=page_size)
-    return household_service.get_all_households(params=params)
+    households_response = household_service.get_all_households(params=params, selection=selection, depth=depth)
+    return household_response(households_response, selection)
+
+# keyset pagination: pass the next_cursor/prev_cursor of the previous response as cursor, no total is calculated
+@router.get('/households/cursor', response_model=CursorPage[HouseholdView])
+def get_households_by_cursor(cursor: Union[str, None] = None, page_size: int = Query(10, ge=1, le=1000),
+                             depth: HouseholdDepth = Depends(get_household_depth),
+                             household_service: HouseholdService = Depends(HouseholdService),
+                             current_user: User = Depends(get_current_user)):
+    try:
+        return household_service.get_all_households_by_cursor(CursorParams(cursor=cursor, size=page_size), depth)
+    except InvalidCursorException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
 
 # get list of people that can be added to this household (excludes list of people already in the household,
 # and sorts the list by last name, but prioritizes people with the same last name of the existing household
@@ -26,19 +66,57 @@ def get_households(page: int = 1, page_size:int = 10, household_service: Househo
 @router.get('/households/people', response_model=List[BasicViewPerson])
 def get_people_not_in_household(household_id: int = Query(None, description="id of the household"),
                                 name: Union[str, None] = None, surname: Union[str, None] = None,
+                                limit: int = Query(20, ge=1, le=100, description="maximum number of people returned"),
                                 household_service: HouseholdService = Depends(HouseholdService),
                                 current_user: User = Depends(get_current_user)):
     try:
-        people_response = household_service.get_people_not_in_household(household_id, name, surname)
-        return people_response
+        people_page = household_service.get_people_not_in_household(household_id, name, surname,
+                                                                     CursorParams(size=limit))
+        return people_page.items
+    except NoHouseholdException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Household with that id does not exist")
+
+# same as /households/people, but pages through the candidates with next_cursor/prev_cursor
+@router.get('/households/people/cursor', response_model=CursorPage[BasicViewPerson])
+def get_people_not_in_household_by_cursor(household_id: int = Query(None, description="id of the household"),
+                                          name: Union[str, None] = None, surname: Union[str, None] = None,
+                                          cursor: Union[str, None] = None,
+                                          page_size: int = Query(20, ge=1, le=100),
+                                          household_service: HouseholdService = Depends(HouseholdService),
+                                          current_user: User = Depends(get_current_user)):
+    try:
+        return household_service.get_people_not_in_household(household_id, name, surname,
+                                                              CursorParams(cursor=cursor, size=page_size))
     except NoHouseholdException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Household with that id does not exist")
+    except InvalidCursorException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
 
 
-@router.get('/households/{id}', response_model=ViewHousehold)
-def get_household(id: int, household_service: HouseholdService = Depends(HouseholdService), current_user: User = Depends(get_current_user)):
+@router.get('/households/{id}', response_model=HouseholdView)
+def get_household(id: int, response: Response, selection: FieldSelection = Depends(get_household_field_selection),
+                  depth: HouseholdDepth = Depends(get_household_depth),
+                  if_none_match: Union[str, None] = Header(None),
+                  household_service: HouseholdService = Depends(HouseholdService), current_user: User = Depends(get_current_user)):
     try:
-        return household_service.get_household_by_id(id)
+        version = household_service.get_version(id)
+        if version is None:
+            raise NoHouseholdException(f"Household does not exist with the following ID: {id}")
+        etag = ETag.for_version('household', id, version, household_variant(selection, depth))
+        if ETag.matches(if_none_match, etag):
+            return ETag.not_modified(etag)
+
+        if selection is None and depth == HouseholdDepth.basic:
+            household_json = household_service.get_json_by_id(id, version)
+            if household_json is None:
+                raise NoHouseholdException(f"Household does not exist with the following ID: {id}")
+            return ETag.tag(Response(content=household_json, media_type="application/json"), etag)
+        household = household_service.get_household_by_id(id, selection, depth)
+        if selection is not None:
+            return ETag.tag(selection.response(household), etag)
+        # the header is added to the response built from the view
+        ETag.tag(response, etag)
+        return household
     except NoHouseholdException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Household with that id does not exist")
 
@@ -63,15 +141,21 @@ def update_household(id: int, household: UpdateHousehold, household_service: Hou
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person with that id does not exist")
 
 @router.get('/households/{id}/household_image')
-def get_household_image(id: int, household_service: HouseholdService = Depends(HouseholdService)):
+def get_household_image(id: int, request: ConditionalRequest = Depends(get_conditional_request),
+                        size: ImageSize = Query(ImageSize.original, description="a resized copy of the image"),
+                        format: Union[ImageFormat, None] = Query(None, description="format of the resized copy"),
+                        household_service: HouseholdService = Depends(HouseholdService)):
     try:
-        household_image_response = household_service.get_household_image_by_household_id(id)
+        household_image_response = household_service.get_household_image_by_household_id(id, request, size,
+                                                                                          format)
         if household_image_response is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No profile image")
 
         return household_image_response
     except NoHouseholdException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Household with that id does not exist")
+    except NoMediaItemException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.get_message())
 
 @router.get('/households/{id}/profile_images', response_model=List[ViewMediaItem])
 def get_household_images(id: int, household_service: HouseholdService = Depends(HouseholdService),
@@ -96,3 +180,5 @@ def update_household_with_image(id: int, file: UploadFile, household_service: Ho
         return household_response
     except NoHouseholdException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Household with that id does not exist")
+    except MediaItemTooLargeException as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=e.args[0])
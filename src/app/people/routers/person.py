@@ -1,37 +1,69 @@
 import datetime
+import logging
+from zipfile import BadZipFile
 
-from fastapi import status, Depends, HTTPException, UploadFile
+from fastapi import status, Depends, HTTPException, UploadFile, Query, Response, Header
 
 from fastapi_pagination import Params, Page
+from openpyxl.utils.exceptions import InvalidFileException
 
 from ..services.addressService import NoAddressException
 from ..services.peopleService import PeopleService, NoPersonException, NoHouseholdExceptionForPersonCreation, \
-    UnableToRemoveLeaderFromHouseholdException
-from ...media.models.media import ViewMediaItem
-from ...media.services.mediaService import NoMediaItemException
-from ...people.models.people import CreatePerson, FullViewPerson, UpdatePerson, BasicViewPerson
+    UnableToRemoveLeaderFromHouseholdException, InvalidPeopleSpreadsheetException
+from ...media.models.media import ViewMediaItem, ImageSize, ImageFormat
+from ...utils.conditionalRequest import ConditionalRequest, get_conditional_request
+from ...media.services.mediaService import NoMediaItemException, MediaItemTooLargeException
+from ...people.models.people import CreatePerson, FullViewPerson, UpdatePerson, BasicViewPerson, PERSON_RELATIONSHIPS
+from ...people.models.peopleImport import PeopleImportReport
 from fastapi import APIRouter
 from typing import List, Union
 from ...users.models.user import User
 from ...users.routers.login import get_current_user
+from ...utils.cursorPagination import CursorPage, CursorParams, InvalidCursorException
+from ...utils.etag import ETag
+from ...utils.fieldSelection import FieldSelection, InvalidFieldSelectionException
 
 router = APIRouter(tags=['People'])
 
 
+def get_person_field_selection(fields: Union[str, None] = Query(None, description="comma separated attributes to return"),
+                               expand: Union[str, None] = Query(None, description="comma separated relationships to include: " + ", ".join(sorted(PERSON_RELATIONSHIPS)))):
+    try:
+        return FieldSelection.parse(fields, expand, set(FullViewPerson.__fields__), PERSON_RELATIONSHIPS)
+    except InvalidFieldSelectionException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+
+
 @router.get('/people', response_model=Page[FullViewPerson])
-def get_people(page: int = 1, page_size: int = 10, people_service: PeopleService = Depends(PeopleService),
+def get_people(page: int = 1, page_size: int = 10, selection: FieldSelection = Depends(get_person_field_selection),
+               people_service: PeopleService = Depends(PeopleService),
                current_user: User = Depends(get_current_user)):
     params: Params = Params(page=page, size=page_size)
-    people_response = people_service.get_all(params)
+    people_response = people_service.get_all(params, selection)
+    if selection is not None:
+        return selection.response(people_response)
     return people_response
 
 
+# keyset pagination: pass the next_cursor/prev_cursor of the previous response as cursor, no total is calculated
+@router.get('/people/cursor', response_model=CursorPage[FullViewPerson])
+def get_people_by_cursor(cursor: Union[str, None] = None, page_size: int = Query(10, ge=1, le=1000),
+                         people_service: PeopleService = Depends(PeopleService),
+                         current_user: User = Depends(get_current_user)):
+    try:
+        return people_service.get_all_by_cursor(CursorParams(cursor=cursor, size=page_size))
+    except InvalidCursorException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+
+
 @router.get('/people/with_name_or_surname', name="Find People By Name or Surname Starting With",
             response_model=List[BasicViewPerson])
 def find_people_with_name_or_surname_starting_with(name: Union[str, None] = None, surname: Union[str, None] = None,
+                                                   limit: int = Query(20, ge=1, le=100,
+                                                                      description="maximum number of people returned"),
                                                    people_service: PeopleService = Depends(PeopleService),
                                                    current_user: User = Depends(get_current_user)):
-    return people_service.find_people_with_name_or_surname_starting_with(name, surname)
+    return people_service.find_people_with_name_or_surname_starting_with(name, surname, limit)
 
 
 # find people by email or first name and last name
@@ -44,13 +76,27 @@ def find_by_email_or_names(email: Union[str, None] = None, first_name: Union[str
 
 
 @router.get('/people/{id}', response_model=FullViewPerson)
-def get_person(id: int, people_service: PeopleService = Depends(PeopleService),
+def get_person(id: int, selection: FieldSelection = Depends(get_person_field_selection),
+               if_none_match: Union[str, None] = Header(None),
+               people_service: PeopleService = Depends(PeopleService),
                current_user: User = Depends(get_current_user)):
-    person_response = people_service.get_by_id(id)
-    if person_response is None:
+    version = people_service.get_version(id)
+    if version is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person with that id does not exist")
+    etag = ETag.for_version('person', id, version, selection.variant() if selection is not None else None)
+    if ETag.matches(if_none_match, etag):
+        return ETag.not_modified(etag)
+
+    if selection is None:
+        person_json = people_service.get_json_by_id(id, version)
+        if person_json is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person with that id does not exist")
+        return ETag.tag(Response(content=person_json, media_type="application/json"), etag)
 
-    return person_response
+    person_response = people_service.get_by_id(id, selection)
+    if person_response is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person with that id does not exist")
+    return ETag.tag(selection.response(person_response), etag)
 
 
 @router.put('/people/', response_model=FullViewPerson)
@@ -69,16 +115,20 @@ def update_person(id: int, person: UpdatePerson, people_service: PeopleService =
 
 
 @router.get('/people/{id}/profile_image')
-def get_person_profile_image(id: int, people_service: PeopleService = Depends(PeopleService)):
+def get_person_profile_image(id: int, request: ConditionalRequest = Depends(get_conditional_request),
+                             size: ImageSize = Query(ImageSize.original, description="a resized copy of the image"),
+                             format: Union[ImageFormat, None] = Query(None, description="format of the resized copy"),
+                             people_service: PeopleService = Depends(PeopleService)):
     try:
-        profile_image_response = people_service.get_profile_image_by_person_id(id)
+        profile_image_response = people_service.get_profile_image_by_person_id(id, request, size, format)
         if profile_image_response is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No profile image")
 
-        profile_image_response.headers['cache-control'] = 'max-age=20'
         return profile_image_response
     except NoPersonException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person with that id does not exist")
+    except NoMediaItemException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.get_message())
 
 
 @router.get('/people/{id}/profile_images', response_model=List[ViewMediaItem])
@@ -106,16 +156,25 @@ def update_person_with_profile_image(id: int, file: UploadFile, people_service:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person with that id does not exist")
     except NoHouseholdExceptionForPersonCreation as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.args[0])
+    except MediaItemTooLargeException as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=e.args[0])
 
 
-@router.post('/people/add_people_from_spreadsheet', response_model=List[ViewMediaItem])
+@router.post('/people/add_people_from_spreadsheet', response_model=PeopleImportReport)
 def add_people_from_spreadsheet(file: UploadFile, people_service: PeopleService = Depends(PeopleService),
                                 current_user: User = Depends(get_current_user)):
     try:
         people_response = people_service.add_people_from_spreadsheet(file)
         return people_response
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Error uploading spreadsheet")
+    except InvalidPeopleSpreadsheetException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+    except (InvalidFileException, BadZipFile) as e:
+        # not an xlsx workbook
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Error uploading spreadsheet")
+    except Exception:
+        # anything else is not the fault of the spreadsheet
+        logging.exception("Error importing people from a spreadsheet")
+        raise
 
 
 @router.post('/people', status_code=status.HTTP_201_CREATED, response_model=FullViewPerson)
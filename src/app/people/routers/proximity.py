@@ -0,0 +1,43 @@
+from typing import List, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from ..models.proximity import NearbyHousehold, NearbyPerson
+from ..services.addressService import NoAddressException
+from ..services.proximityService import ProximityService, NoCoordinatesException
+from ...users.models.user import User
+from ...users.routers.login import get_current_user
+
+router = APIRouter(tags=['Proximity'])
+
+
+class Origin:
+    # the point the distances are measured from: the coordinates of an address, or a latitude and longitude. The caller
+    # is authenticated first, so that the 404 of an address id says nothing to anyone else
+    def __init__(self, current_user: User = Depends(get_current_user),
+                 address_id: Union[int, None] = Query(None, description="measure from the coordinates of this address"),
+                 latitude: Union[float, None] = Query(None, ge=-90, le=90),
+                 longitude: Union[float, None] = Query(None, ge=-180, le=180),
+                 radius_km: Union[float, None] = Query(None, gt=0, description="only return results within this distance"),
+                 limit: int = Query(10, ge=1, le=100, description="the number of results, nearest first"),
+                 proximity_service: ProximityService = Depends(ProximityService)):
+        try:
+            self.latitude, self.longitude = proximity_service.get_origin(address_id, latitude, longitude)
+        except NoAddressException:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Address with that id does not exist")
+        except NoCoordinatesException as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+        self.radius_km = radius_km
+        self.limit = limit
+
+
+@router.get('/nearby/households', response_model=List[NearbyHousehold])
+def get_nearby_households(origin: Origin = Depends(Origin), proximity_service: ProximityService = Depends(ProximityService),
+                          current_user: User = Depends(get_current_user)):
+    return proximity_service.get_nearby_households(origin.latitude, origin.longitude, origin.limit, origin.radius_km)
+
+
+@router.get('/nearby/people', response_model=List[NearbyPerson])
+def get_nearby_people(origin: Origin = Depends(Origin), proximity_service: ProximityService = Depends(ProximityService),
+                      current_user: User = Depends(get_current_user)):
+    return proximity_service.get_nearby_people(origin.latitude, origin.longitude, origin.limit, origin.radius_km)
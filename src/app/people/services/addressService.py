@@ -1,8 +1,18 @@
+from typing import Iterator
+
 from fastapi import Depends
+from starlette.responses import StreamingResponse
+
+from src.app.church.daos.churchDAO import ChurchDAO
+from src.app.config import settings
 
 from src.app.people.daos.addressDAO import AddressDAO
 from src.app.people.factories.addressFactory import AddressFactory
 from src.app.people.models.people import UpdateAddress, CreateAddress, ViewAddress
+from src.app.people.services.viewCacheService import ViewCacheService
+from src.app.utils.addressFingerprint import AddressFingerprint
+from src.app.utils.cursorPagination import CursorParams, CursorPage
+from src.app.utils.jsonArray import JSONArray
 
 
 class NoAddressException(Exception):
@@ -13,15 +23,29 @@ class AddressAlreadyExists(Exception):
         self.existing_address = existing_address
 
 class AddressService:
-    def __init__(self, addressDAO: AddressDAO = Depends(AddressDAO), addressFactory: AddressFactory = Depends(AddressFactory)):
+    def __init__(self, addressDAO: AddressDAO = Depends(AddressDAO), addressFactory: AddressFactory = Depends(AddressFactory),
+                 view_cache_service: ViewCacheService = Depends(ViewCacheService), church_DAO: ChurchDAO = Depends(ChurchDAO)):
         self.addressDAO = addressDAO
         self.addressFactory = addressFactory
+        self.view_cache_service = view_cache_service
+        self.church_DAO = church_DAO
 
-    def get_all_addresses(self):
-        addresses = self.addressDAO.get_all_addresses()
-        for address in addresses:
+    def get_all_addresses(self, batch_size: int = None) -> Iterator[ViewAddress]:
+        for address in self.addressDAO.stream_addresses(batch_size or settings.flocki_export_batch_size):
             yield self.addressFactory.create_address_from_address_entity(address)
 
+    def stream_all_addresses(self) -> StreamingResponse:
+        # the rows are read while the response is sent, the body is the same as for a List[ViewAddress] response_model
+        return StreamingResponse(JSONArray.chunks(address.json().encode('utf-8') for address in self.get_all_addresses()),
+                                 media_type=JSONArray.MEDIA_TYPE)
+
+    def get_all_addresses_by_cursor(self, params: CursorParams = CursorParams()) -> CursorPage[ViewAddress]:
+        addresses_page = self.addressDAO.get_all_addresses_by_cursor(params)
+        return CursorPage.create(items=[self.addressFactory.create_address_from_address_entity(address)
+                                        for address in addresses_page.items],
+                                 params=params, next_cursor=addresses_page.next_cursor,
+                                 prev_cursor=addresses_page.prev_cursor)
+
     def get_by_id(self, id):
         address_entity = self.addressDAO.get_address_by_id(id)
         if address_entity is None:
@@ -42,9 +66,17 @@ class AddressService:
         # For update requests the model is not expected to come in with an ID since it is passed in the URL.
         address.id = address_entity.id
 
-        update_values = address.dict()
+        # only what the client sent, the coordinates it leaves out are kept or placed again by the DAO
+        update_values = address.dict(exclude_unset=True)
+        # the fingerprint is unique, an update cannot turn the address into a copy of another one
+        existing_address = self.addressDAO.find_address_by_fingerprint(
+            AddressFingerprint.of_values(AddressDAO.values_after_update(address_entity, update_values)))
+        if existing_address is not None and existing_address.id != address.id:
+            raise AddressAlreadyExists(self.addressFactory.create_address_from_address_entity(existing_address))
 
         self.addressDAO.update_address(address.id, update_values)
+        self.view_cache_service.invalidate_address(address.id)
+        self.church_DAO.increment_version_for_address(address.id)
         return self.addressFactory.create_address_from_address_entity(self.addressDAO.get_address_by_id(id))
 
     def create_address(self, address: CreateAddress):
@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Iterator
+
+from fastapi import Depends
+from starlette.responses import StreamingResponse
+
+from src.app.config import settings
+from src.app.people.daos.congregationExportDAO import CongregationExportDAO
+from src.app.utils.ndjson import NDJSON
+
+
+class CongregationExportService:
+    """
+    Exports the people, households, their memberships and addresses as NDJSON. Every line is one row with a "record"
+    attribute naming its kind. Addresses come first and people before the households and links that refer to them,
+    so the graph can be rebuilt in one pass.
+    """
+
+    def __init__(self, export_DAO: CongregationExportDAO = Depends(CongregationExportDAO)):
+        self.export_DAO = export_DAO
+
+    def get_records(self, batch_size: int = None) -> Iterator[dict]:
+        batch_size = batch_size or settings.flocki_export_batch_size
+        streams = [('address', self.export_DAO.stream_addresses),
+                   ('person', self.export_DAO.stream_people),
+                   ('person_address', self.export_DAO.stream_people_addresses),
+                   ('household', self.export_DAO.stream_households),
+                   ('membership', self.export_DAO.stream_memberships)]
+        # runs while the response is sent, the snapshot ends when the last row has been read or the client went away
+        with self.export_DAO.snapshot():
+            for record, stream in streams:
+                for row in stream(batch_size):
+                    yield {'record': record, **row}
+
+    def export_congregation(self, gzip: bool = False) -> StreamingResponse:
+        body = NDJSON.chunks(self.get_records())
+        headers = {'Content-Disposition': f'attachment; filename=congregation-{datetime.now().strftime("%Y%m%d-%H%M%S")}.ndjson',
+                   'Vary': 'Accept-Encoding'}
+        if gzip:
+            body = NDJSON.gzip(body)
+            headers['Content-Encoding'] = 'gzip'
+        return StreamingResponse(body, media_type=NDJSON.MEDIA_TYPE, headers=headers)
@@ -4,10 +4,12 @@ from fastapi import Depends, UploadFile
 
 from fastapi_pagination import Page, Params
 
-from starlette.responses import FileResponse
+from starlette.responses import Response
 
 from src.app.media.daos.mediaDAO import MediaDAO
 from src.app.media.factories.mediaFactory import MediaFactory
+from src.app.media.models.media import ImageSize, ImageFormat
+from src.app.utils.conditionalRequest import ConditionalRequest
 from src.app.media.services.mediaService import MediaService, NoMediaItemException
 from src.app.people.daos.addressDAO import AddressDAO
 from src.app.people.daos.peopleDAO import PeopleDAO
@@ -15,11 +17,17 @@ from src.app.people.daos.householdDAO import HouseholdDAO
 
 from src.app.people.factories.householdFactory import HouseholdFactory
 from src.app.people.factories.peopleFactory import PeopleFactory
-from src.app.people.models.household import CreateHousehold, UpdateHousehold, ViewHousehold
+from src.app.people.models.household import CreateHousehold, UpdateHousehold, ViewHousehold, HouseholdDepth
+from src.app.people.models.people import BasicViewPerson
 from src.app.people.services.addressService import NoAddressException
 from src.app.people.services.householdUtils import HouseholdUtils
 from src.app.people.services.peopleService import NoPersonException
+from src.app.people.services.viewCacheService import ViewCacheService
 
+from src.app.utils.bulkLoader import BulkLoader
+from src.app.utils.cursorPagination import CursorParams, CursorPage
+from src.app.utils.etag import ETag
+from src.app.utils.fieldSelection import FieldSelection
 from src.app.utils.fileUtils import FileUtils
 class NoHouseholdException(Exception):
     pass
@@ -34,7 +42,8 @@ class HouseholdService:
                  peopleDAO: PeopleDAO = Depends(PeopleDAO), people_factory: PeopleFactory = Depends(PeopleFactory),
                  media_service: MediaService = Depends(MediaService), media_DAO: MediaDAO = Depends(MediaDAO),
                  media_factory: MediaFactory = Depends(MediaFactory), address_DAO: AddressDAO = Depends(AddressDAO),
-                 household_utils: HouseholdUtils = Depends(HouseholdUtils)):
+                 household_utils: HouseholdUtils = Depends(HouseholdUtils),
+                 view_cache_service: ViewCacheService = Depends(ViewCacheService)):
         self.people_DAO = peopleDAO
         self.people_factory = people_factory
         self.household_factory = household_factory
@@ -44,42 +53,53 @@ class HouseholdService:
         self.media_factory = media_factory
         self.address_DAO = address_DAO
         self.household_utils = household_utils
+        self.view_cache_service = view_cache_service
 
-    def get_all_households(self, params: Params = Params(page=1, size=100)) -> Page[ViewHousehold]:
+    def get_all_households(self, params: Params = Params(page=1, size=100), selection: FieldSelection = None,
+                           depth: HouseholdDepth = HouseholdDepth.basic) -> Page[ViewHousehold]:
         households_response = []
-        households_page = self.household_DAO.get_all_households(params=params)
+        households_page = self.household_DAO.get_all_households(params=params, selection=selection, depth=depth)
         if households_page:
             for household in households_page.items:
-                households_response.append(self.household_factory.createHouseholdFromHouseholdEntity(household_entity=household,  include_household_image=True))
+                households_response.append(self.household_factory.createHouseholdFromHouseholdEntity(household_entity=household,  include_household_image=True, selection=selection, depth=depth))
 
             return Page.create(items=households_response, params=params, total=households_page.total)
 
         return []
 
 
-    def get_household_by_id(self, id: int):
-        household_entity = self.household_DAO.get_household_by_id(id)
+    def get_all_households_by_cursor(self, params: CursorParams = CursorParams(),
+                                     depth: HouseholdDepth = HouseholdDepth.basic) -> CursorPage[ViewHousehold]:
+        households_page = self.household_DAO.get_all_households_by_cursor(params, depth=depth)
+        households_response = [
+            self.household_factory.createHouseholdFromHouseholdEntity(household_entity=household,
+                                                                      include_household_image=True, depth=depth)
+            for household in households_page.items]
+
+        return CursorPage.create(items=households_response, params=params, next_cursor=households_page.next_cursor,
+                                 prev_cursor=households_page.prev_cursor)
+
+    def get_household_by_id(self, id: int, selection: FieldSelection = None, depth: HouseholdDepth = HouseholdDepth.basic):
+        household_entity = self.household_DAO.get_household_by_id(id, selection, depth)
         if household_entity is None:
             raise NoHouseholdException(f"Household does not exist with the following ID: {id}")
-        return self.household_factory.createHouseholdFromHouseholdEntity(household_entity, include_household_image=True)
+        return self.household_factory.createHouseholdFromHouseholdEntity(household_entity, include_household_image=True, selection=selection, depth=depth)
 
+    def get_version(self, id: int):
+        return self.household_DAO.get_household_version(id)
 
-    def add_household(self, household: CreateHousehold):
+    def get_json_by_id(self, id: int, version: int = None):
+        # the full view serialized to JSON, served from the view cache while the household is unchanged
+        return self.view_cache_service.get_household_json(id, lambda: self.get_household_by_id(id), version)
 
-        people_entities = []
-        invalid_people_ids = []
-        for person_id in household.people_ids:
-            person_entity = self.people_DAO.get_person_by_id(person_id)
-            if not person_entity:
-                invalid_people_ids.append(person_id)
-            people_entities.append(person_entity)
+    def add_household(self, household: CreateHousehold):
 
-        if invalid_people_ids is not None and len(invalid_people_ids) > 0:
+        # the leader id is required to be in the list of people ids, so it is validated with them
+        people = self.people_DAO.get_people_by_ids(household.people_ids)
+        invalid_people_ids = BulkLoader.missing_ids(household.people_ids, people)
+        if invalid_people_ids:
             raise NoPersonException(f"No people with the following IDs: {invalid_people_ids}")
-
-        leader_entity = self.people_DAO.get_person_by_id(household.leader_id)
-        # leader entity can never be None because leader id is required to be in the list of people ids, and so would have
-        # failed validation in the previous check above.
+        people_entities = [people[person_id] for person_id in household.people_ids]
 
         image_entity = None
         if household.household_image_id is not None:
@@ -88,7 +108,9 @@ class HouseholdService:
                 raise NoMediaItemException(f"No image with the following ID: {household.household_image_id}")
 
         new_household = self.household_factory.createHouseholdEntityFromHousehold(household, people_entities)
-        return self.household_factory.createHouseholdFromHouseholdEntity(self.household_DAO.add_household(new_household, image_entity), True)
+        created_household = self.household_DAO.add_household(new_household, image_entity)
+        self.view_cache_service.invalidate_households([created_household.id])
+        return self.household_factory.createHouseholdFromHouseholdEntity(created_household, True)
 
     def get_household_images_by_household_id(self, id):
         household_entity = self.household_DAO.get_household_by_id(id)
@@ -110,23 +132,22 @@ class HouseholdService:
             description = f"Profile image for household with ID: {household_entity.id}"
             image_entity = self.media_service.upload_image(file, filename, description)
             self.household_DAO.add_household_image(household_entity, image_entity)
+            self.view_cache_service.invalidate_households([household_entity.id])
             return self.media_factory.create_media_item_from_media_item_entity(image_entity)
 
-    def get_household_image_by_household_id(self, id) -> FileResponse:
-        household_entity = self.household_DAO.get_household_by_id(id)
-        if household_entity is None:
-            raise NoHouseholdException(
-                f"No household with the following ID: {id}")  # HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person with that id does not exist")
-        household_with_image = self.household_factory.createHouseholdFromHouseholdEntity(household_entity, True)
-        if household_with_image is None:
-            return None
-        elif household_with_image.household_image is None:
+    def get_household_image_by_household_id(self, id, request: ConditionalRequest = None, size: ImageSize = None,
+                                            format: ImageFormat = None) -> Response:
+        # the household and its current image are read with one query, the image is served by the media layer
+        household_image = self.household_DAO.get_current_household_image(id)
+        if household_image is None:
+            raise NoHouseholdException(f"No household with the following ID: {id}")
+        _, image_entity = household_image
+        if image_entity is None or not self.media_service.is_served(image_entity):
             return None
-        elif household_with_image.household_image.store is not None and household_with_image.household_image.store == 'local':
-            return FileResponse(household_with_image.household_image.address)
-        elif household_with_image.household_image.store is not None and household_with_image.household_image.store == 's3':
-            return self.media_service.get_media_item_by_id(household_with_image.household_image.id)
-        return
+        variant = self.media_service.variant_name(size, format)
+        return self.media_service.create_image_response(image_entity,
+                                                        ETag.for_version('household-image', id, image_entity.id, variant),
+                                                        request, size, format)
 
     def update_household(self, id, household: UpdateHousehold):
         household_entity = self.household_DAO.get_household_by_id(id)
@@ -138,16 +159,11 @@ class HouseholdService:
         if address_entity is None:
             raise NoAddressException(f"No address with the following ID: {household.address_id}")
 
-        update_values = household.dict()
-        update_people_ids = update_values.pop('people_ids', household.dict())
-        people_entities = []
+        update_people_ids = household.people_ids
+        existing_person_ids = self.people_DAO.get_existing_person_ids(update_people_ids)
         for person_id in update_people_ids:
-            person_entity = self.people_DAO.get_person_by_id(person_id)
-            if not person_entity:
+            if person_id not in existing_person_ids:
                 raise NoPersonException(f"No person with the following ID: {person_id}")
-            people_entities.append(person_entity)
-
-        leader_entity = self.people_DAO.get_person_by_id(household.leader_id)
 
         image_entity = None
         if household.household_image_id is not None:
@@ -155,36 +171,28 @@ class HouseholdService:
             if not image_entity:
                 raise NoMediaItemException(f"No image with the following ID: {household.household_image_id}")
 
-        self.household_DAO.update_household(household_entity, household.leader_id, household.address_id, image_entity)
-
-        existing_people_ids = self.household_utils.get_existing_people_ids(household_entity)
+        previous_leader_id = household_entity.leader_id
+        existing_people_ids = self.household_DAO.get_member_ids(id)
         people_ids_to_add = self.household_utils.get_people_ids_to_add(existing_people_ids, update_people_ids)
         people_ids_to_remove = self.household_utils.get_people_ids_to_remove(existing_people_ids, update_people_ids)
+        self.household_DAO.update_household(household_entity, household.leader_id, household.address_id, image_entity,
+                                            people_ids_to_add, people_ids_to_remove)
 
-        if people_ids_to_add is not None and len(people_ids_to_add) > 0:
-            for person_id in people_ids_to_add:
-                self.household_DAO.add_person_to_household(household_entity, self.people_DAO.get_person_by_id(person_id))
-
-        if people_ids_to_remove is not None and len(people_ids_to_remove) > 0:
-            for person_id in people_ids_to_remove:
-                self.household_DAO.remove_person_from_household(household_entity, self.people_DAO.get_person_by_id(person_id))
-
+        self.view_cache_service.invalidate_households([household_entity.id], existing_people_ids + [previous_leader_id])
         return self.get_household_by_id(id)
 
-    def get_people_not_in_household(self, household_id, name=None, surname=None):
+    def get_people_not_in_household(self, household_id, name=None, surname=None,
+                                    params: CursorParams = CursorParams(size=20)) -> CursorPage[BasicViewPerson]:
         household_entity = self.household_DAO.get_household_by_id(household_id)
         if household_entity is None:
             raise NoHouseholdException(f"No household with the following ID: {household_id}")
 
-        people_entities = self.household_DAO.find_people_not_in_household_with_name_or_surname_starting_with(household_id, name, surname)
-
-        # Check if household_entity.leader and x.last_name are valid attributes
-        leader_last_name = getattr(household_entity.leader, 'last_name', None)
-
-        #sort people entities by last name but prioritize people with the same last name as the household
-        people_entities = sorted(people_entities, key=lambda x: (x.last_name != leader_last_name, x.last_name))
+        # already sorted by last name with people sharing the leader's last name first
+        people_page = self.household_DAO.find_people_not_in_household_with_name_or_surname_starting_with(
+            household_id, name, surname, params)
         people_response = []
-        for person_entity in people_entities:
+        for person_entity in people_page.items:
             people_response.append(self.people_factory.create_basic_person_view_from_person_entity(person_entity, include_profile_image=True))
 
-        return people_response
+        return CursorPage.create(items=people_response, params=params, next_cursor=people_page.next_cursor,
+                                 prev_cursor=people_page.prev_cursor)
@@ -2,19 +2,34 @@ import datetime
 from typing import Union, List
 
 from fastapi import Depends, UploadFile
-from fastapi.responses import FileResponse
 
 from fastapi_pagination import Page, Params
+from openpyxl import load_workbook
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+
+from src.app.config import settings
+from src.app.database import UnitOfWork
 
 from src.app.media.daos.mediaDAO import MediaDAO
 from src.app.media.factories.mediaFactory import MediaFactory
+from src.app.media.models.media import ImageSize, ImageFormat
+from src.app.utils.conditionalRequest import ConditionalRequest
 from src.app.media.services.mediaService import MediaService, NoMediaItemException
 from src.app.people.daos.addressDAO import AddressDAO
+from src.app.people.daos.loaderProfiles import PersonLoaderProfile
 from src.app.people.daos.peopleDAO import PeopleDAO
+from src.app.people.factories.addressFactory import AddressFactory
 from src.app.people.factories.peopleFactory import PeopleFactory
-from src.app.people.models.people import CreatePerson, UpdatePerson, BasicViewPerson
+from src.app.people.models.people import CreatePerson, UpdatePerson, BasicViewPerson, FullViewPerson, CreateAddress, \
+    AddressType
+from src.app.people.models.peopleImport import PeopleImportReport, ImportRowStatus
 from src.app.users.models.user import DisplayUser
-from src.app.users.services.userService import UserService
+from src.app.users.services.userService import UserService, ExistingUserExistsException
+from src.app.utils.bulkLoader import BulkLoader
+from src.app.utils.cursorPagination import CursorParams, CursorPage
+from src.app.utils.etag import ETag
+from src.app.utils.fieldSelection import FieldSelection
 from src.app.utils.fileUtils import FileUtils
 
 import uuid
@@ -22,6 +37,7 @@ import uuid
 from src.app.people.daos.householdDAO import HouseholdDAO
 from src.app.people.services.addressService import NoAddressException
 from src.app.people.services.householdUtils import HouseholdUtils
+from src.app.people.services.viewCacheService import ViewCacheService
 from src.app.utils.DateUtils import DateUtils
 
 
@@ -37,6 +53,17 @@ class UnableToRemoveLeaderFromHouseholdException(Exception):
     pass
 
 
+class InvalidPeopleSpreadsheetException(Exception):
+    pass
+
+
+# spreadsheet columns (header names, case-insensitive, spaces or underscores) of the people import
+PERSON_IMPORT_COLUMNS = ['FIRST_NAME', 'LAST_NAME', 'EMAIL', 'MOBILE_NUMBER', 'DATE_OF_BIRTH', 'GENDER', 'MARRIAGE_DATE',
+                         'MARITAL_STATUS', 'REGISTERED_DATE']
+ADDRESS_IMPORT_COLUMNS = ['STREET_NUMBER', 'STREET', 'SUBURB', 'CITY', 'PROVINCE', 'COUNTRY', 'POSTAL_CODE']
+REQUIRED_IMPORT_COLUMNS = ['FIRST_NAME', 'LAST_NAME']
+
+
 class PeopleService:
     def __init__(self, peopleDAO: PeopleDAO = Depends(PeopleDAO), addressDAO: AddressDAO = Depends(AddressDAO),
                  media_DAO: MediaDAO = Depends(MediaDAO),
@@ -45,7 +72,10 @@ class PeopleService:
                  media_factory: MediaFactory = Depends(MediaFactory),
                  household_DAO: HouseholdDAO = Depends(HouseholdDAO),
                  household_utils: HouseholdUtils = Depends(HouseholdUtils),
-                 user_service: UserService = Depends(UserService)):
+                 user_service: UserService = Depends(UserService),
+                 view_cache_service: ViewCacheService = Depends(ViewCacheService),
+                 address_factory: AddressFactory = Depends(AddressFactory),
+                 unit_of_work: UnitOfWork = Depends(UnitOfWork)):
         self.peopleDAO = peopleDAO
         self.peopleFactory = people_factory
         self.addressDAO = addressDAO
@@ -55,47 +85,58 @@ class PeopleService:
         self.household_DAO = household_DAO
         self.household_utils = household_utils
         self.user_service = user_service
+        self.view_cache_service = view_cache_service
+        self.address_factory = address_factory
+        self.unit_of_work = unit_of_work
 
-    def get_all(self, params: Params = Params(page=1, size=100)):
+    def get_all(self, params: Params = Params(page=1, size=100), selection: FieldSelection = None):
         people_response = []
-        people_page = self.peopleDAO.get_all(params)
+        people_page = self.peopleDAO.get_all(params, selection)
 
         for person in people_page.items:
             people_response.append(
                 self.peopleFactory.create_person_from_person_entity(person_entity=person, include_profile_image=True,
-                                                                    include_households=True))
+                                                                    include_households=True, selection=selection))
 
         return Page.create(items=people_response, params=params, total=people_page.total)
 
-    def get_by_id(self, id):
-        person_entity = self.peopleDAO.get_person_by_id(id)
-        if person_entity is None:
-            return None
-        return self.peopleFactory.create_person_from_person_entity(person_entity, include_households=True,
-                                                                   include_profile_image=True)
+    def get_all_by_cursor(self, params: CursorParams = CursorParams()) -> CursorPage[FullViewPerson]:
+        people_page = self.peopleDAO.get_all_by_cursor(params)
+        people_response = [
+            self.peopleFactory.create_person_from_person_entity(person_entity=person, include_profile_image=True,
+                                                                include_households=True)
+            for person in people_page.items]
 
-    # TODO refactor this code a bit so that the local vs s3 logic can be centralized
-    def get_profile_image_by_person_id(self, id):
-        person_entity = self.peopleDAO.get_person_by_id(id)
+        return CursorPage.create(items=people_response, params=params, next_cursor=people_page.next_cursor,
+                                 prev_cursor=people_page.prev_cursor)
+
+    def get_by_id(self, id, selection: FieldSelection = None):
+        person_entity = self.peopleDAO.get_person_by_id(id, loader_profile=PersonLoaderProfile.detail,
+                                                        selection=selection)
         if person_entity is None:
-            raise NoPersonException("No person with that Id")
-        person_with_profile_image = self.peopleFactory.create_person_from_person_entity(person_entity, False, True)
-        if person_with_profile_image is None:
             return None
-        else:
-            if person_with_profile_image.profile_image is None:
-                return None
+        return self.peopleFactory.create_person_from_person_entity(person_entity, include_households=True,
+                                                                   include_profile_image=True, selection=selection)
 
-            full_profile_image_info = self.media_DAO.get_media_item_by_id(person_with_profile_image.profile_image.id)
+    def get_version(self, id):
+        return self.peopleDAO.get_person_version(id)
 
-            if full_profile_image_info is None:
-                return None
-            elif full_profile_image_info.store is not None and full_profile_image_info.store == 'local':
-                return FileResponse(full_profile_image_info.address)
-            elif full_profile_image_info.store is not None and full_profile_image_info.store == 's3':
-                return self.media_service.get_media_item_by_id(full_profile_image_info.id)
+    def get_json_by_id(self, id, version: int = None):
+        # the full view serialized to JSON, served from the view cache while the person is unchanged
+        return self.view_cache_service.get_person_json(id, lambda: self.get_by_id(id), version)
 
+    def get_profile_image_by_person_id(self, id, request: ConditionalRequest = None, size: ImageSize = None,
+                                       format: ImageFormat = None):
+        # the person and their current image are read with one query, the image is served by the media layer
+        person_image = self.peopleDAO.get_current_profile_image(id)
+        if person_image is None:
+            raise NoPersonException("No person with that Id")
+        _, image_entity = person_image
+        if image_entity is None or not self.media_service.is_served(image_entity):
             return None
+        variant = self.media_service.variant_name(size, format)
+        return self.media_service.create_image_response(
+            image_entity, ETag.for_version('person-image', id, image_entity.id, variant), request, size, format)
 
     # TODO fis this code for new address int array on person
     def update_person(self, id: int, person: UpdatePerson):
@@ -109,102 +150,104 @@ class PeopleService:
 
         # validate that households are correct.
         household_ids = update_values.pop('household_ids', person.dict())
-        self.validate_households(household_ids)
+        households = self.validate_households(household_ids)
         # validate potential removal of persons
         self.validate_household_remove_person(household_ids, person_entity)
         # validate address ids
-        self.validate_addresses(person.addresses)
+        address_entities = self.validate_addresses(person.addresses)
         # validate image id
-        self.validate_image_id(person.profile_image_id)
-
-        # start updating record
-        smls = update_values.pop('social_media_links', person.dict())
-        if smls is not None:
-            existing_social_media_links = self.peopleDAO.get_existing_social_media_links(person.id)
-            if existing_social_media_links:
-                for existing_sml in existing_social_media_links:
-                    self.peopleDAO.delete_social_media_link(existing_sml.id)
-
-            for sml in smls:
-                self.peopleDAO.create_social_media_link(person.id, sml['type'], sml['url'])
-
-        addresses = update_values.pop('addresses', person.dict())
-        if addresses is not None:
-            existing_people_addresses = self.addressDAO.get_existing_addresses_for_person(person.id)
-            if existing_people_addresses is not None:
-                for existing_people_address in existing_people_addresses:
-                    self.addressDAO.delete_address(existing_people_address.id)
-
-            # TODO consider querying DB if an address already exists with the given values. otherwise you will end up with
-            # multiple rows in the DB for the same address
-            for address_id in addresses:
-                address = self.addressDAO.get_address_by_id(address_id)
-                self.addressDAO.create_address_linked_to_person(address, person_entity)
-
-        image_entity = None
-        profile_image_id = update_values.pop('profile_image_id', person.dict())
-        if profile_image_id is not None:
-            image_entity = self.media_DAO.get_media_item_by_id(profile_image_id)
-
-        self.peopleDAO.update_person(person_entity.id, update_values, image_entity)
-        if household_ids is not None:
-            self.update_households_for_person(household_ids, person_entity)
-
-        return self.peopleFactory.create_person_from_person_entity(self.peopleDAO.get_person_by_id(id),
-                                                                   include_households=True, include_profile_image=True)
+        image_entity = self.validate_image_id(person.profile_image_id)
+
+        # start updating record, in one transaction. The view is built after the commit has expired the stale
+        # relationships of person_entity
+        with self.unit_of_work:
+            smls = update_values.pop('social_media_links', person.dict())
+            if smls is not None:
+                existing_social_media_links = self.peopleDAO.get_existing_social_media_links(person.id)
+                if existing_social_media_links:
+                    for existing_sml in existing_social_media_links:
+                        self.peopleDAO.delete_social_media_link(existing_sml.id)
+
+                for sml in smls:
+                    self.peopleDAO.create_social_media_link(person.id, sml['type'], sml['url'])
+
+            addresses = update_values.pop('addresses', person.dict())
+            if addresses is not None:
+                existing_people_addresses = self.addressDAO.get_existing_addresses_for_person(person.id)
+                if existing_people_addresses is not None:
+                    for existing_people_address in existing_people_addresses:
+                        self.addressDAO.delete_address(existing_people_address.id)
+
+                # TODO consider querying DB if an address already exists with the given values. otherwise you will end up with
+                # multiple rows in the DB for the same address
+                for address_id in addresses:
+                    self.addressDAO.create_address_linked_to_person(address_entities[address_id], person_entity)
+
+            update_values.pop('profile_image_id', person.dict())
+
+            previous_household_ids = [household.id for household in person_entity.households]
+            self.peopleDAO.update_person(person_entity.id, update_values, image_entity)
+            if household_ids is not None:
+                self.update_households_for_person(household_ids, person_entity, households)
+            self.view_cache_service.invalidate_people([person_entity.id], previous_household_ids)
+
+        return self.peopleFactory.create_person_from_person_entity(
+            self.peopleDAO.get_person_by_id(id, loader_profile=PersonLoaderProfile.detail),
+            include_households=True, include_profile_image=True)
 
     def validate_image_id(self, profile_image_id):
+        # returns the image so that it does not have to be loaded again
         if profile_image_id is not None:
             image_entity = self.media_DAO.get_media_item_by_id(profile_image_id)
             if image_entity is None:
                 raise NoMediaItemException(f"Image with id: {profile_image_id} does not exist")
+            return image_entity
+        return None
 
     def validate_addresses(self, addresses):
-        for address_id in addresses:
-            address = self.addressDAO.get_address_by_id(address_id)
-            if address is None:
-                raise NoAddressException(f"Address with id: {address_id} does not exist")
-
-    def update_households_for_person(self, new_household_ids, personToUpdate):
+        # returns the addresses by id, loaded with one query
+        address_entities = self.addressDAO.get_addresses_by_ids(addresses)
+        missing_ids = BulkLoader.missing_ids(addresses, address_entities)
+        if missing_ids:
+            raise NoAddressException(f"Address with id: {missing_ids[0]} does not exist")
+        return address_entities
+
+    def update_households_for_person(self, new_household_ids, personToUpdate, households=None):
+        # households maps household ids to entities, e.g. as returned by validate_households
         existing_household_ids = self.household_utils.get_existing_household_ids(personToUpdate)
         household_ids_to_add = self.household_utils.get_household_ids_to_add(existing_household_ids, new_household_ids)
         household_ids_to_remove = self.household_utils.get_household_ids_to_remove(existing_household_ids,
                                                                                    new_household_ids)
 
-        if household_ids_to_add:
-            for household_id in household_ids_to_add:
-                self.household_DAO.add_person_to_household(self.household_DAO.get_household_by_id(household_id),
-                                                           personToUpdate)
-        if household_ids_to_remove:
-            for household_id in household_ids_to_remove:
-                self.household_DAO.remove_person_from_household(self.household_DAO.get_household_by_id(household_id),
-                                                                personToUpdate)
+        households = self.load_households(list(household_ids_to_add) + list(household_ids_to_remove), households)
+        for household_id in household_ids_to_add:
+            self.household_DAO.add_person_to_household(households.get(household_id), personToUpdate)
+        for household_id in household_ids_to_remove:
+            self.household_DAO.remove_person_from_household(households.get(household_id), personToUpdate)
 
     def create_person(self, person: CreatePerson, create_login: Union[bool, None] = False):
-        self.validate_households(person.household_ids)
+        households = self.validate_households(person.household_ids)
         # validate address ids
-        self.validate_addresses(person.addresses)
+        addresses = self.validate_addresses(person.addresses)
         # validate image id
-        self.validate_image_id(person.profile_image_id)
-
-        image_entity = None
-        if person.profile_image_id is not None:
-            image_entity = self.media_DAO.get_media_item_by_id(person.profile_image_id)
-        address_entities = []
-        for address_id in person.addresses:
-            address_entities.append(self.addressDAO.get_address_by_id(address_id))
+        image_entity = self.validate_image_id(person.profile_image_id)
+
+        address_entities = [addresses[address_id] for address_id in person.addresses]
         new_person = self.peopleFactory.create_person_entity_from_create_person(person, address_entities)
 
         if new_person.registered_date is None:
             new_person.registered_date = DateUtils.get_current_datetime()
 
-        created_person = self.peopleDAO.create_person(new_person, image_entity)
-        if person.household_ids is not None:
-            self.add_person_to_households(created_person, person.household_ids)
-
         created_user: DisplayUser = None
-        if create_login is not None and create_login is True:
-            created_user = self.create_login_for_person(created_person)
+        # the person, their households and their login are committed together
+        with self.unit_of_work:
+            created_person = self.peopleDAO.create_person(new_person, image_entity)
+            if person.household_ids is not None:
+                self.add_person_to_households(created_person, person.household_ids, households)
+                self.view_cache_service.invalidate_people([created_person.id])
+
+            if create_login is not None and create_login is True:
+                created_user = self.create_login_for_person(created_person)
 
         return self.peopleFactory.create_person_from_person_entity(self.peopleDAO.get_person_by_id(created_person.id),
                                                                    include_households=True, include_profile_image=True,
@@ -214,19 +257,21 @@ class PeopleService:
         existing_household_ids = self.household_utils.get_existing_household_ids(personToUpdate)
         household_ids_to_remove = self.household_utils.get_household_ids_to_remove(existing_household_ids,
                                                                                    new_household_ids)
-        for (household_id) in household_ids_to_remove:
-            household_entity = self.household_DAO.get_household_by_id(household_id)
-            if household_entity.leader.id == personToUpdate.id:
+        # loaded with one query, and compared by leader_id so that no leader is loaded
+        for household_entity in self.household_DAO.get_households_by_ids(household_ids_to_remove).values():
+            if household_entity.leader_id == personToUpdate.id:
                 raise UnableToRemoveLeaderFromHouseholdException(
                     f"You cannot remove a leader [id='{personToUpdate.id}'] from a household [id='{household_entity.id}']. You must first assign a new leader to the household.")
 
     def validate_households(self, household_ids):
-        if household_ids is not None:
-            for household_id in household_ids:
-                household_entity = self.household_DAO.get_household_by_id(household_id)
-                if household_entity is None:
-                    # TODO if this happens at this stage the person would have already have been created.
-                    raise NoHouseholdExceptionForPersonCreation(f"No household with that Id: {household_id}")
+        # returns the households by id, loaded with one query
+        if household_ids is None:
+            return {}
+        households = self.household_DAO.get_households_by_ids(household_ids)
+        missing_ids = BulkLoader.missing_ids(household_ids, households)
+        if missing_ids:
+            raise NoHouseholdExceptionForPersonCreation(f"No household with that Id: {missing_ids[0]}")
+        return households
 
     def upload_profile_image(self, id, file: UploadFile):
         personToUpdate = self.peopleDAO.get_person_by_id(id)
@@ -240,6 +285,7 @@ class PeopleService:
             description = f"Profile image for user: {personToUpdate.first_name}  {personToUpdate.last_name}  with ID: {personToUpdate.id}"
             image_entity = self.media_service.upload_image(file, filename, description)
             self.peopleDAO.add_person_image(personToUpdate, image_entity)
+            self.view_cache_service.invalidate_people([personToUpdate.id])
             return self.media_factory.create_media_item_from_media_item_entity(image_entity)
 
     def get_profile_images_by_person_id(self, id):
@@ -250,17 +296,25 @@ class PeopleService:
 
     # I would have prefered adding this method to the household service, and make each service only dependent on it's own DAO,
     # but I couldn't get it to work due to circular dependencies.
-    def add_person_to_households(self, person, household_entity_ids):
+    def add_person_to_households(self, person, household_entity_ids, households=None):
         # household_entity_ids should have been validated by now.
+        households = self.load_households(household_entity_ids, households)
         for household_id in household_entity_ids:
-            household_entity = self.household_DAO.get_household_by_id(household_id)
-            self.household_DAO.add_person_to_household(household_entity, person)
+            self.household_DAO.add_person_to_household(households.get(household_id), person)
 
-    def remove_person_from_households(self, person, household_entity_ids):
+    def remove_person_from_households(self, person, household_entity_ids, households=None):
         # household_entity_ids should have been validated by now.
+        households = self.load_households(household_entity_ids, households)
         for household_id in household_entity_ids:
-            household_entity = self.household_DAO.get_household_by_id(household_id)
-            self.household_DAO.remove_person_from_household(household_entity, person)
+            self.household_DAO.remove_person_from_household(households.get(household_id), person)
+
+    def load_households(self, household_ids, households=None):
+        # the given households by id, with the ones that are not in it yet loaded in one query
+        households = dict(households or {})
+        missing_ids = BulkLoader.missing_ids(household_ids, households)
+        if missing_ids:
+            households.update(self.household_DAO.get_households_by_ids(missing_ids))
+        return households
 
     def find_people_by_email_or_first_and_last_name(self, email, first_name, last_name):
         email = email if email is not None else ''
@@ -278,10 +332,12 @@ class PeopleService:
 
     def create_login_for_person(self, created_person) -> DisplayUser:
         try:
-            return self.user_service.create_user_from_person(created_person)
-        except:
+            # in a savepoint, a login that cannot be inserted leaves the rest of the unit of work to commit
+            with self.unit_of_work.db.begin_nested():
+                return self.user_service.create_user_from_person(created_person)
+        except (ExistingUserExistsException, IntegrityError):
             # TODO log warning and somehow include warning to the frontend.
-            return None;
+            return None
 
     def find_people_with_birthday_before_given_date(self, date: datetime.date):
         people = self.peopleDAO.find_people_with_birthday_before_given_date(date)
@@ -303,8 +359,8 @@ class PeopleService:
 
         return people_list_response
 
-    def find_people_with_name_or_surname_starting_with(self, name, surname) -> List[BasicViewPerson]:
-        people = self.peopleDAO.find_people_with_name_or_surname_starting_with(name, surname)
+    def find_people_with_name_or_surname_starting_with(self, name, surname, limit: int = 20) -> List[BasicViewPerson]:
+        people = self.peopleDAO.find_people_with_name_or_surname_starting_with(name, surname, limit)
         people_list_response = []
         for person in people:
             person_response = self.peopleFactory.create_basic_person_view_from_person_entity(person,
@@ -312,3 +368,145 @@ class PeopleService:
             people_list_response.append(person_response)
 
         return people_list_response
+
+    def add_people_from_spreadsheet(self, file: UploadFile, batch_size: int = None) -> PeopleImportReport:
+        # The first row holds the column names, see PERSON_IMPORT_COLUMNS, ADDRESS_IMPORT_COLUMNS, ADDRESS_TYPE and
+        # HOUSEHOLD_ID. Rows are streamed from the workbook and imported in batches, a batch is one transaction.
+        # Existing people (same email, or same names and date of birth) and repeated rows are reported as duplicates.
+        batch_size = batch_size or settings.flocki_people_import_batch_size
+        report = PeopleImportReport()
+        seen_keys = set()
+        workbook = load_workbook(file.file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            column_indexes = self.get_import_column_indexes(next(rows, None))
+            batch = []
+            for row_number, row in enumerate(rows, start=2):
+                if all(value is None or str(value).strip() == '' for value in row):
+                    continue
+                batch.append((row_number, row))
+                if len(batch) >= batch_size:
+                    self.import_people_batch(batch, column_indexes, report, seen_keys)
+                    batch = []
+            if batch:
+                self.import_people_batch(batch, column_indexes, report, seen_keys)
+        finally:
+            workbook.close()
+        report.rows.sort(key=lambda result: result.row)
+        return report
+
+    @staticmethod
+    def get_import_column_indexes(header):
+        if header is None:
+            raise InvalidPeopleSpreadsheetException("The spreadsheet is empty")
+        column_indexes = {}
+        for i, value in enumerate(header):
+            if value is not None:
+                column_indexes[str(value).strip().upper().replace(' ', '_')] = i
+        for required_column in REQUIRED_IMPORT_COLUMNS:
+            if required_column not in column_indexes:
+                raise InvalidPeopleSpreadsheetException(f"Column {required_column} is required")
+        return column_indexes
+
+    @staticmethod
+    def get_import_value(row, column_indexes, column):
+        index = column_indexes.get(column)
+        if index is None or index >= len(row):
+            return None
+        value = row[index]
+        if isinstance(value, str):
+            value = value.strip()
+            return value if value != '' else None
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, float) and value.is_integer():
+            # numbers such as mobile numbers and postal codes are often stored as numeric cells
+            return str(int(value))
+        if isinstance(value, int):
+            return str(value)
+        return value
+
+    def parse_import_row(self, row, column_indexes):
+        values = {column.lower(): self.get_import_value(row, column_indexes, column) for column in PERSON_IMPORT_COLUMNS}
+        person = CreatePerson(**{name: value for name, value in values.items() if value is not None})
+
+        address = None
+        address_values = {column.lower(): self.get_import_value(row, column_indexes, column)
+                          for column in ADDRESS_IMPORT_COLUMNS}
+        if any(value is not None for value in address_values.values()):
+            address_type = self.get_import_value(row, column_indexes, 'ADDRESS_TYPE') or AddressType.home.value
+            address = CreateAddress(type=str(address_type).lower(), **address_values)
+
+        household_id = self.get_import_value(row, column_indexes, 'HOUSEHOLD_ID')
+        if household_id is not None:
+            try:
+                household_id = int(household_id)
+            except ValueError:
+                raise ValueError(f"Household id '{household_id}' is not a number")
+        return person, address, household_id
+
+    @staticmethod
+    def get_import_address_key(address: CreateAddress):
+        return AddressDAO.address_key(address.type.value, address.street_number, address.street, address.suburb,
+                                      address.city, address.province, address.country, address.postal_code)
+
+    def import_people_batch(self, batch, column_indexes, report: PeopleImportReport, seen_keys: set):
+        parsed_rows = []
+        for row_number, row in batch:
+            try:
+                parsed_rows.append((row_number,) + self.parse_import_row(row, column_indexes))
+            except (ValidationError, ValueError) as e:
+                report.add(row_number, ImportRowStatus.invalid, message=str(e).replace('\n', ' '))
+
+        # one lookup per kind for the whole batch
+        existing_emails = self.peopleDAO.find_existing_emails(
+            {person.email.lower() for _, person, _, _ in parsed_rows if person.email})
+        existing_name_keys = self.peopleDAO.find_existing_name_keys(
+            {person.last_name.lower() for _, person, _, _ in parsed_rows})
+        existing_household_ids = self.household_DAO.get_existing_household_ids(
+            {household_id for _, _, _, household_id in parsed_rows if household_id is not None})
+        addresses = self.addressDAO.find_addresses_by_keys(
+            {self.get_import_address_key(address) for _, _, address, _ in parsed_rows if address is not None})
+
+        new_rows = []
+        batch_keys = set()
+        for row_number, person, address, household_id in parsed_rows:
+            email_key = ('email', person.email.lower()) if person.email else None
+            name_key = (person.first_name.lower(), person.last_name.lower(), person.date_of_birth)
+            if (email_key is not None and email_key[1] in existing_emails) or name_key in existing_name_keys \
+                    or any(key in seen_keys or key in batch_keys for key in [email_key, name_key] if key is not None):
+                report.add(row_number, ImportRowStatus.duplicate, message="Person already exists")
+                continue
+            if household_id is not None and household_id not in existing_household_ids:
+                report.add(row_number, ImportRowStatus.invalid, message=f"No household with that Id: {household_id}")
+                continue
+
+            address_entities = None
+            if address is not None:
+                address_key = self.get_import_address_key(address)
+                if address_key not in addresses:
+                    # shared by the following rows with the same address
+                    addresses[address_key] = self.address_factory.create_address_entity_from_address(address)
+                address_entities = [addresses[address_key]]
+
+            person_entity = self.peopleFactory.create_person_entity_from_create_person(person, address_entities)
+            if person_entity.registered_date is None:
+                person_entity.registered_date = DateUtils.get_current_datetime()
+            batch_keys.update(key for key in [email_key, name_key] if key is not None)
+            new_rows.append((row_number, person_entity, household_id))
+
+        if not new_rows:
+            return
+        try:
+            person_ids = self.peopleDAO.create_people([person_entity for _, person_entity, _ in new_rows],
+                                                      [household_id for _, _, household_id in new_rows])
+        except SQLAlchemyError as e:
+            for row_number, _, _ in new_rows:
+                report.add(row_number, ImportRowStatus.invalid, message=f"The batch could not be saved: {e.__class__.__name__}")
+            return
+
+        seen_keys.update(batch_keys)
+        for (row_number, _, _), person_id in zip(new_rows, person_ids):
+            report.add(row_number, ImportRowStatus.created, person_id=person_id)
+        self.view_cache_service.invalidate_households(
+            {household_id for _, _, household_id in new_rows if household_id is not None})
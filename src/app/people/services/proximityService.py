@@ -0,0 +1,81 @@
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import Depends
+
+from src.app.people.daos.addressDAO import AddressDAO
+from src.app.people.daos.proximityDAO import ProximityDAO
+from src.app.people.factories.addressFactory import AddressFactory
+from src.app.people.models.household import PersonReference
+from src.app.people.models.proximity import NearbyHousehold, NearbyPerson
+from src.app.people.services.addressService import NoAddressException
+from src.app.utils.geo import GeoDistance
+
+# the box of the SQL prefilter is this much larger than the farthest address, so that rounding cannot drop it
+BOX_MARGIN_KM = 0.001
+
+
+class NoCoordinatesException(Exception):
+    pass
+
+
+class ProximityService:
+    def __init__(self, proximity_DAO: ProximityDAO = Depends(ProximityDAO), address_DAO: AddressDAO = Depends(AddressDAO),
+                 address_factory: AddressFactory = Depends(AddressFactory)):
+        self.proximity_DAO = proximity_DAO
+        self.address_DAO = address_DAO
+        self.address_factory = address_factory
+
+    def get_origin(self, address_id: Optional[int], latitude: Optional[float],
+                   longitude: Optional[float]) -> Tuple[float, float]:
+        if address_id is not None:
+            address_entity = self.address_DAO.get_address_by_id(address_id)
+            if address_entity is None:
+                raise NoAddressException("No address with that Id")
+            if address_entity.latitude is None or address_entity.longitude is None:
+                raise NoCoordinatesException("The address has no latitude and longitude")
+            return float(address_entity.latitude), float(address_entity.longitude)
+        if latitude is None or longitude is None:
+            raise NoCoordinatesException("Either an address_id or a latitude and longitude are required")
+        return latitude, longitude
+
+    def get_nearby_households(self, latitude: float, longitude: float, limit: int,
+                              radius_km: Optional[float] = None) -> List[NearbyHousehold]:
+        nearest = self.find_nearest(latitude, longitude, limit, radius_km, self.proximity_DAO.get_households_at)
+        return [NearbyHousehold(id=row.id,
+                                leader=PersonReference(id=row.leader_id, first_name=row.leader_first_name,
+                                                       last_name=row.leader_last_name),
+                                address=self.address_factory.create_address_from_address_entity(row.Address),
+                                distance_km=distance)
+                for distance, row in nearest]
+
+    def get_nearby_people(self, latitude: float, longitude: float, limit: int,
+                          radius_km: Optional[float] = None) -> List[NearbyPerson]:
+        nearest = self.find_nearest(latitude, longitude, limit, radius_km, self.proximity_DAO.get_people_at)
+        return [NearbyPerson(id=row.id, first_name=row.first_name, last_name=row.last_name,
+                             address=self.address_factory.create_address_from_address_entity(row.Address),
+                             distance_km=distance)
+                for distance, row in nearest]
+
+    def find_nearest(self, latitude: float, longitude: float, limit: int, radius_km: Optional[float],
+                     rows_at: Callable) -> list:
+        # (distance, row) of the limit nearest rows, nearest first. rows_at loads the rows at a list of addresses;
+        # addresses without any are skipped by asking the index for more of them until there are enough rows
+        address_limit = limit
+        while True:
+            addresses = self.proximity_DAO.get_nearest_address_ids(latitude, longitude, address_limit, radius_km)
+            if not addresses:
+                return []
+            box = GeoDistance.bounding_box(latitude, longitude, addresses[-1][0] + BOX_MARGIN_KM)
+            nearest = {}
+            for row in rows_at([address_id for _, address_id in addresses], box):
+                # measured again from the stored coordinates, the index may not have seen the latest write yet
+                distance = GeoDistance.haversine_km(latitude, longitude, float(row.Address.latitude),
+                                                    float(row.Address.longitude))
+                if radius_km is not None and distance > radius_km:
+                    continue
+                if row.id not in nearest or distance < nearest[row.id][0]:
+                    nearest[row.id] = (distance, row)
+            # every row nearer than the farthest of these addresses has been seen
+            if len(nearest) >= limit or len(addresses) < address_limit:
+                return sorted(nearest.values(), key=lambda item: (item[0], item[1].id))[:limit]
+            address_limit *= 4
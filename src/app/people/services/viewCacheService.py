@@ -0,0 +1,85 @@
+import json
+from typing import Callable, Iterable, Optional
+
+from fastapi import Depends
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from src.app.people.daos.addressDAO import AddressDAO
+from src.app.people.daos.householdDAO import HouseholdDAO
+from src.app.people.daos.peopleDAO import PeopleDAO
+from src.app.utils.viewCache import ViewCache, get_view_cache, PERSON, HOUSEHOLD
+
+
+class ViewCacheService:
+    """
+    Serves the FullViewPerson and ViewHousehold detail views from the view cache and invalidates them on writes.
+
+    A person view embeds the person's households, which embed the basic view of every member. A household view embeds
+    the basic view of its leader and members. So a change to a person affects the person, their households and the
+    other members of those households, and a change to a household affects the household and its members.
+    Invalidating bumps the row versions of every affected entry and evicts it.
+    """
+
+    def __init__(self, peopleDAO: PeopleDAO = Depends(PeopleDAO), household_DAO: HouseholdDAO = Depends(HouseholdDAO),
+                 address_DAO: AddressDAO = Depends(AddressDAO), cache: ViewCache = Depends(get_view_cache)):
+        self.people_DAO = peopleDAO
+        self.household_DAO = household_DAO
+        self.address_DAO = address_DAO
+        self.cache = cache
+
+    @staticmethod
+    def serialize(view: BaseModel) -> bytes:
+        # same encoding as the JSONResponse fastapi builds for a response_model
+        return json.dumps(jsonable_encoder(view), ensure_ascii=False, allow_nan=False, indent=None,
+                          separators=(",", ":")).encode("utf-8")
+
+    def get_person_json(self, id: int, build_view: Callable[[], Optional[BaseModel]],
+                        version: int = None) -> Optional[bytes]:
+        if version is None:
+            version = self.people_DAO.get_person_version(id)
+        return self._get_json(PERSON, id, version, build_view)
+
+    def get_household_json(self, id: int, build_view: Callable[[], Optional[BaseModel]],
+                           version: int = None) -> Optional[bytes]:
+        if version is None:
+            version = self.household_DAO.get_household_version(id)
+        return self._get_json(HOUSEHOLD, id, version, build_view)
+
+    def _get_json(self, kind: str, id: int, version: Optional[int], build_view) -> Optional[bytes]:
+        if version is None:
+            return None
+        body = self.cache.get(kind, id, version)
+        if body is None:
+            view = build_view()
+            if view is None:
+                return None
+            body = self.serialize(view)
+            # stored under the version read before building, a concurrent write makes this entry unreachable
+            self.cache.put(kind, id, version, body)
+        return body
+
+    def invalidate_people(self, person_ids: Iterable[int], household_ids: Iterable[int] = ()):
+        # household_ids are households the people belonged to before the write
+        household_ids = set(household_ids) | self.household_DAO.get_household_ids_for_people(set(person_ids))
+        self._invalidate(set(person_ids), household_ids)
+
+    def invalidate_households(self, household_ids: Iterable[int], person_ids: Iterable[int] = ()):
+        # person_ids are members the households had before the write
+        self._invalidate(set(person_ids), set(household_ids))
+
+    def invalidate_person_details(self, person_ids: Iterable[int]):
+        # for changes that only show in the detail view of the people themselves, e.g. their user
+        self._invalidate(set(person_ids), set())
+
+    def invalidate_address(self, address_id: int):
+        # only detail views embed addresses, the basic person view does not
+        self._invalidate(self.address_DAO.get_people_ids_with_address(address_id),
+                         self.address_DAO.get_household_ids_with_address(address_id))
+
+    def _invalidate(self, person_ids: set, household_ids: set):
+        person_ids = person_ids | self.household_DAO.get_people_ids_in_households(household_ids)
+        self.people_DAO.increment_versions(person_ids)
+        self.household_DAO.increment_versions(household_ids)
+        self.cache.evict(PERSON, person_ids)
+        self.cache.evict(HOUSEHOLD, household_ids)
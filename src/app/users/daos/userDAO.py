@@ -3,8 +3,9 @@ from fastapi import Depends
 from fastapi_pagination import Page, Params
 from fastapi_pagination.ext.sqlalchemy import paginate
 
-from src.app.database import SessionLocal, get_db
+from src.app.database import SessionLocal, get_db, UnitOfWork
 from src.app.users.models.database import models
+from src.app.utils.cursorPagination import CursorPagination, CursorParams, CursorPage
 from sqlalchemy import func
 
 class UserDAO:
@@ -14,12 +15,15 @@ class UserDAO:
     def get_all_users(self, params: Params = Params(page=1, size=100)) -> Page[models.User]:
         return paginate(self.db.query(models.User), params)
 
+    def get_all_users_by_cursor(self, params: CursorParams = CursorParams()) -> CursorPage[models.User]:
+        return CursorPagination.paginate(self.db.query(models.User), [models.User.id], params)
+
     def get_user_by_id(self, id) -> models.User:
         return self.db.query(models.User).filter(models.User.id == id).first()
 
     def create_user(self, new_user):
         self.db.add(new_user)
-        self.db.commit()
+        UnitOfWork.commit(self.db)
         self.db.refresh(new_user)
         return self.get_user_by_id(new_user.id)
 
@@ -29,7 +33,7 @@ class UserDAO:
 
         userToUpdate = self.db.query(models.User).filter(models.User.id == user_id)
         userToUpdate.update(update_values)
-        self.db.commit()
+        UnitOfWork.commit(self.db)
 
     def get_user_by_name(self, username):
         return self.db.query(models.User).filter(func.lower(models.User.email) == func.lower(username)).first()
@@ -37,6 +41,6 @@ class UserDAO:
     def update_user_person(self, id, person_id):
         userToUpdate = self.db.query(models.User).filter(models.User.id == id)
         userToUpdate.update({'person_id': person_id})
-        self.db.commit()
+        UnitOfWork.commit(self.db)
 
 
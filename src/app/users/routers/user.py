@@ -1,4 +1,4 @@
-from fastapi import status, Depends, HTTPException
+from fastapi import status, Depends, HTTPException, Query
 
 from fastapi_pagination import Page, Params
 
@@ -6,6 +6,7 @@ from .login import get_current_user
 from ..services.userService import UserService, NoUserException, ExistingUserExistsException, \
     AlreadyExistPersonAssociatedWithUser
 from ...users.models.user import User, DisplayUser
+from ...utils.cursorPagination import CursorPage, CursorParams, InvalidCursorException
 from fastapi import APIRouter
 from typing import List
 
@@ -15,6 +16,14 @@ router = APIRouter(tags=['Users'])
 def get_users(page: int = 1, page_size: int = 100, user_service: UserService = Depends(UserService), current_user: User = Depends(get_current_user)):
     return user_service.get_all_users(Params(page=page, size=page_size))
 
+# keyset pagination: pass the next_cursor/prev_cursor of the previous response as cursor, no total is calculated
+@router.get('/users/cursor', response_model=CursorPage[DisplayUser])
+def get_users_by_cursor(cursor: str = None, page_size: int = Query(100, ge=1, le=1000), user_service: UserService = Depends(UserService), current_user: User = Depends(get_current_user)):
+    try:
+        return user_service.get_all_users_by_cursor(CursorParams(cursor=cursor, size=page_size))
+    except InvalidCursorException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+
 @router.get('/users/{id}', response_model=User)
 def get_user(id: int, user_service: UserService = Depends(UserService), current_user: User = Depends(get_current_user)):
     try:
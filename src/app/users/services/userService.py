@@ -4,10 +4,12 @@ from fastapi_pagination import Page, Params
 
 from src.app.people.daos.peopleDAO import PeopleDAO
 from src.app.people.models.database.models import Person
+from src.app.people.services.viewCacheService import ViewCacheService
 from src.app.users.daos.userDAO import UserDAO
 from src.app.users.factories.userFactory import UserFactory
 from src.app.users.models.user import User, DisplayUser
 from src.app.users.services.passwordUtil import PasswordUtil
+from src.app.utils.cursorPagination import CursorParams, CursorPage
 
 
 class NoUserException(Exception):
@@ -25,11 +27,12 @@ class AlreadyExistPersonAssociatedWithUser(Exception):
 
 class UserService:
     def __init__(self, user_factory: UserFactory = Depends(UserFactory), user_DAO: UserDAO = Depends(UserDAO), password_utils: PasswordUtil = Depends(PasswordUtil),
-                 peopleDAO: PeopleDAO = Depends(PeopleDAO)):
+                 peopleDAO: PeopleDAO = Depends(PeopleDAO), view_cache_service: ViewCacheService = Depends(ViewCacheService)):
         self.user_factory = user_factory
         self.user_DAO = user_DAO
         self.password_utils = password_utils
         self.peopleDAO = peopleDAO
+        self.view_cache_service = view_cache_service
 
     def get_all_users(self, params: Params = Params(page=1, size=100)) -> Page[User]:
         user_entities = []
@@ -42,6 +45,12 @@ class UserService:
         else:
             return []
 
+    def get_all_users_by_cursor(self, params: CursorParams = CursorParams()) -> CursorPage[User]:
+        user_entities_page = self.user_DAO.get_all_users_by_cursor(params)
+        users = [self.user_factory.create_user_from_user_entity(user_entity) for user_entity in user_entities_page.items]
+        return CursorPage.create(items=users, params=params, next_cursor=user_entities_page.next_cursor,
+                                 prev_cursor=user_entities_page.prev_cursor)
+
     def get_user_by_id(self, id) -> User:
         user_entity = self.user_DAO.get_user_by_id(id)
         if user_entity is None:
@@ -80,7 +89,11 @@ class UserService:
         if 'password' in update_values:
             update_values['password'] = self.password_utils.hash_pwd(update_values['password'])
 
+        previous_person_id = userToUpdate.person_id
         self.user_DAO.update_user(user_id, update_values)
+        # the user is part of the detail view of the linked people
+        self.view_cache_service.invalidate_person_details(
+            {person_id for person_id in [previous_person_id, update_values.get('person_id')] if person_id is not None})
         return self.get_user_by_id(user_id)
 
     def update_user_person(self, id, person_id):
@@ -95,5 +108,8 @@ class UserService:
         if person.user is not None:
             raise AlreadyExistPersonAssociatedWithUser("Person already has a user associated with it")
 
+        previous_person_id = userToUpdate.person_id
         self.user_DAO.update_user_person(id, person_id)
+        self.view_cache_service.invalidate_person_details(
+            {linked_person_id for linked_person_id in [previous_person_id, person_id] if linked_person_id is not None})
         return self.user_factory.create_user_from_user_entity(self.get_user_by_id(id))
\ No newline at end of file
@@ -7,3 +7,10 @@ class DateUtils:
     def get_current_datetime():
         return datetime.now()
 
+    # month * 100 + day, e.g. 1115 for the 15th of November. Ordering these matches calendar order within a year,
+    # which lets birthdays and anniversaries be found with a range scan instead of extracting month and day per row.
+    @staticmethod
+    def get_month_day_ordinal(value):
+        if value is None:
+            return None
+        return value.month * 100 + value.day
@@ -0,0 +1,98 @@
+import hashlib
+import re
+from enum import Enum
+
+# street types, folded in the last word of the street only: "12 Main Rd." and "12 main road" are the same address,
+# while "St James Road" keeps its saint
+STREET_TYPES = {
+    'st': 'street', 'str': 'street',
+    'rd': 'road',
+    'ave': 'avenue', 'av': 'avenue',
+    'dr': 'drive', 'drv': 'drive',
+    'ln': 'lane',
+    'cres': 'crescent', 'cr': 'crescent',
+    'blvd': 'boulevard',
+    'ct': 'court', 'crt': 'court',
+    'pl': 'place',
+    'cl': 'close',
+    'sq': 'square',
+    'hwy': 'highway',
+    'tce': 'terrace', 'ter': 'terrace',
+    'ext': 'extension',
+}
+
+# folded when they end a street of more than one word, "Main Rd N" is "Main Road North"
+COMPASS_POINTS = {'n': 'north', 's': 'south', 'e': 'east', 'w': 'west'}
+
+# folded in the province and the country
+REGIONS = {
+    'wc': 'western cape', 'ec': 'eastern cape', 'nc': 'northern cape', 'gp': 'gauteng', 'kzn': 'kwazulu natal',
+    'fs': 'free state', 'nw': 'north west', 'lp': 'limpopo', 'mp': 'mpumalanga',
+    'za': 'south africa', 'rsa': 'south africa',
+}
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+class AddressFingerprint:
+    """
+    Addresses are the same when their type, building, street number, street, complex, suburb, city, province, country
+    and postal code are the same after normalising: case, punctuation and whitespace are ignored, and street types,
+    provinces and countries are folded (see STREET_TYPES, COMPASS_POINTS and REGIONS). The fingerprint is the sha256
+    of the normalised values and is stored in the uniquely indexed addresses.fingerprint column, so a duplicate lookup
+    is an index probe.
+    """
+
+    @staticmethod
+    def words(value) -> list:
+        if value is None:
+            return []
+        if isinstance(value, Enum):
+            value = value.value
+        return _NON_WORD.sub(' ', str(value).lower().replace('_', ' ')).split()
+
+    @staticmethod
+    def normalise(value) -> str:
+        return ' '.join(AddressFingerprint.words(value))
+
+    @staticmethod
+    def normalise_region(value) -> str:
+        return ' '.join(REGIONS.get(word, word) for word in AddressFingerprint.words(value))
+
+    @staticmethod
+    def normalise_street(value) -> str:
+        words = AddressFingerprint.words(value)
+        street_type = len(words) - 1
+        if len(words) > 1 and words[-1] in COMPASS_POINTS:
+            words[-1] = COMPASS_POINTS[words[-1]]
+            street_type -= 1
+        if street_type >= 0:
+            words[street_type] = STREET_TYPES.get(words[street_type], words[street_type])
+        return ' '.join(words)
+
+    @staticmethod
+    def of(type, street_number, street, suburb, city, province, country, postal_code, building=None,
+           complex=None) -> str:
+        normalised = '|'.join([AddressFingerprint.normalise(type), AddressFingerprint.normalise(street_number),
+                               AddressFingerprint.normalise_street(street), AddressFingerprint.normalise(suburb),
+                               AddressFingerprint.normalise(city), AddressFingerprint.normalise_region(province),
+                               AddressFingerprint.normalise_region(country), AddressFingerprint.normalise(postal_code)])
+        building, complex = AddressFingerprint.normalise(building), AddressFingerprint.normalise(complex)
+        if building or complex:
+            # only added when there is one, the fingerprints of the other addresses stay what they were
+            normalised += '|' + building + '|' + complex
+        return hashlib.sha256(normalised.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def of_address(address) -> str:
+        # address is an Address entity or anything with the same attributes
+        return AddressFingerprint.of(address.type, address.street_number, address.street, address.suburb, address.city,
+                                     address.province, address.country, address.postal_code,
+                                     getattr(address, 'building', None), getattr(address, 'complex', None))
+
+    @staticmethod
+    def of_values(values: dict) -> str:
+        return AddressFingerprint.of(values.get('type'), values.get('street_number'), values.get('street'),
+                                     values.get('suburb'), values.get('city'), values.get('province'),
+                                     values.get('country'), values.get('postal_code'), values.get('building'),
+                                     values.get('complex'))
@@ -0,0 +1,27 @@
+from typing import Dict, Iterable, List
+
+
+class BulkLoader:
+    """
+    Loads the rows for a list of ids with one IN query, so that services can validate the ids and use the rows without
+    a query per id.
+    """
+
+    # keeps a single IN list well below the bind parameter limits of the databases
+    CHUNK_SIZE = 1000
+
+    @staticmethod
+    def load_by_ids(query, id_column, ids: Iterable) -> Dict:
+        # query selects the entities (with any loader options), the result maps the id_column value to the entity.
+        # id_column can be any unique column, e.g. a natural key
+        ids = list({id for id in ids if id is not None})
+        entities = {}
+        for start in range(0, len(ids), BulkLoader.CHUNK_SIZE):
+            for entity in query.filter(id_column.in_(ids[start:start + BulkLoader.CHUNK_SIZE])):
+                entities[getattr(entity, id_column.key)] = entity
+        return entities
+
+    @staticmethod
+    def missing_ids(ids: Iterable, entities: Dict) -> List:
+        # the ids without a row, in the order they were asked for and without repeats
+        return [id for id in dict.fromkeys(ids) if id not in entities]
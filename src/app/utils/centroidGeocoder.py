@@ -0,0 +1,76 @@
+import csv
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from src.app.config import settings
+from src.app.utils.addressFingerprint import AddressFingerprint
+
+# the table that ships with the app, flocki_geocoding_centroids_path replaces it with a fuller one of the same columns
+BUNDLED_CENTROIDS_PATH = os.path.join(os.path.dirname(__file__), '..', 'people', 'data', 'postalCodeCentroids.csv')
+
+
+class CentroidGeocoder:
+    """
+    Resolves the coordinates of an address offline from a table of postal code and suburb centroids (columns country,
+    postal_code, suburb, city, latitude and longitude). The postal code is tried first, then the suburb in its city,
+    then the suburb on its own when only one city of the country has a suburb of that name. Names are compared after
+    the AddressFingerprint normalisation, so "RSA" and "South Africa" are the same country. Rows with the same key
+    (a postal code shared by several suburbs) are averaged.
+    """
+
+    def __init__(self, rows):
+        sums = {}
+        for row in rows:
+            country = AddressFingerprint.normalise_region(row['country'])
+            postal_code = AddressFingerprint.normalise(row.get('postal_code'))
+            suburb = AddressFingerprint.normalise(row.get('suburb'))
+            city = AddressFingerprint.normalise(row.get('city'))
+            point = (float(row['latitude']), float(row['longitude']))
+            keys = []
+            if postal_code:
+                keys.append(('postal_code', country, postal_code))
+            if suburb:
+                keys.append(('suburb', country, suburb, city))
+                keys.append(('suburb_only', country, suburb))
+            for key in keys:
+                latitude_sum, longitude_sum, count, cities = sums.get(key, (0.0, 0.0, 0, set()))
+                sums[key] = (latitude_sum + point[0], longitude_sum + point[1], count + 1, cities | {city})
+        self.centroids: Dict[tuple, Tuple[float, float]] = {
+            key: (latitude_sum / count, longitude_sum / count)
+            for key, (latitude_sum, longitude_sum, count, cities) in sums.items()
+            # a suburb name used in more than one city cannot be placed without the city
+            if key[0] != 'suburb_only' or len(cities) == 1}
+
+    @staticmethod
+    def load(path: str) -> 'CentroidGeocoder':
+        with open(path, newline='', encoding='utf-8') as file:
+            return CentroidGeocoder(csv.DictReader(file))
+
+    def locate(self, country, postal_code, suburb, city) -> Optional[Tuple[float, float]]:
+        country = AddressFingerprint.normalise_region(country)
+        postal_code = AddressFingerprint.normalise(postal_code)
+        suburb = AddressFingerprint.normalise(suburb)
+        if postal_code and ('postal_code', country, postal_code) in self.centroids:
+            return self.centroids[('postal_code', country, postal_code)]
+        if suburb:
+            return self.centroids.get(('suburb', country, suburb, AddressFingerprint.normalise(city))) or \
+                self.centroids.get(('suburb_only', country, suburb))
+        return None
+
+    def locate_address(self, address) -> Optional[Tuple[float, float]]:
+        # address is an Address entity or anything with the same attributes
+        return self.locate(address.country, address.postal_code, address.suburb, address.city)
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_centroid_geocoder() -> CentroidGeocoder:
+    # loaded on first use and kept for the life of the process
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            _geocoder = CentroidGeocoder.load(settings.flocki_geocoding_centroids_path or BUNDLED_CENTROIDS_PATH)
+        return _geocoder
@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Tuple, Union
+
+from fastapi import Header
+
+from src.app.utils.etag import ETag
+
+
+class RangeNotSatisfiableException(Exception):
+    pass
+
+
+class ConditionalRequest:
+    """
+    The headers that make a GET of media conditional or partial. If-None-Match takes precedence over
+    If-Modified-Since, and a Range is only honoured while If-Range still matches the representation. Only single byte
+    ranges are served, a request for several ranges gets the whole content, which RFC 9110 allows.
+    """
+
+    def __init__(self, range: str = None, if_range: str = None, if_none_match: str = None,
+                 if_modified_since: str = None):
+        self.range = range
+        self.if_range = if_range
+        self.if_none_match = if_none_match
+        self.if_modified_since = if_modified_since
+
+    @staticmethod
+    def http_date(value: datetime) -> str:
+        # naive datetimes are local time, as written by datetime.now()
+        return value.astimezone(timezone.utc).strftime('%a, %d %b %Y %H:%M:%S GMT')
+
+    @staticmethod
+    def parse_http_date(value: str) -> Optional[datetime]:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+    def is_not_modified(self, etag: str, last_modified: Optional[datetime] = None) -> bool:
+        if self.if_none_match:
+            return ETag.matches(self.if_none_match, etag)
+        if self.if_modified_since and last_modified is not None:
+            since = self.parse_http_date(self.if_modified_since)
+            # http dates have whole seconds
+            return since is not None and last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+        return False
+
+    def byte_range(self, size: int, etag: str, last_modified: Optional[datetime] = None) -> Optional[Tuple[int, int]]:
+        # the (first, last) byte positions to serve, None for the whole content
+        if not self.range or not self.range.startswith('bytes=') or ',' in self.range:
+            return None
+        if self.if_range and not self.if_range_matches(etag, last_modified):
+            return None
+        first, separator, last = self.range[len('bytes='):].strip().partition('-')
+        if separator != '-' or not (first or last) or not (first or '0').isdigit() or not (last or '0').isdigit():
+            # not a byte range, ignored
+            return None
+        if not first:
+            # the last bytes of the content
+            if int(last) == 0 or size == 0:
+                raise RangeNotSatisfiableException(f"bytes */{size}")
+            return max(0, size - int(last)), size - 1
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+        if first >= size:
+            raise RangeNotSatisfiableException(f"bytes */{size}")
+        if first > last:
+            return None
+        return first, last
+
+    def if_range_matches(self, etag: str, last_modified: Optional[datetime]) -> bool:
+        # If-Range uses the strong comparison
+        if self.if_range.startswith('"'):
+            return self.if_range == etag
+        since = self.parse_http_date(self.if_range)
+        return since is not None and last_modified is not None and \
+            last_modified.astimezone(timezone.utc).replace(microsecond=0) == since
+
+
+def get_conditional_request(range: Union[str, None] = Header(None), if_range: Union[str, None] = Header(None),
+                            if_none_match: Union[str, None] = Header(None),
+                            if_modified_since: Union[str, None] = Header(None)) -> ConditionalRequest:
+    return ConditionalRequest(range, if_range, if_none_match, if_modified_since)
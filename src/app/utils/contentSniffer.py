@@ -0,0 +1,46 @@
+from typing import Optional
+
+# (offset, magic bytes, content type), checked in order
+_SIGNATURES = [
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (0, b'%PDF-', 'application/pdf'),
+    (0, b'II*\x00', 'image/tiff'),
+    (0, b'MM\x00*', 'image/tiff'),
+    (0, b'ID3', 'audio/mpeg'),
+    (0, b'OggS', 'audio/ogg'),
+    (0, b'fLaC', 'audio/flac'),
+    (0, b'PK\x03\x04', 'application/zip'),
+]
+
+# brands of the ISO base media file format (the "ftyp" box at offset 4)
+_FTYP_BRANDS = {
+    b'heic': 'image/heic', b'heix': 'image/heic', b'mif1': 'image/heif', b'msf1': 'image/heif',
+    b'avif': 'image/avif', b'isom': 'video/mp4', b'iso2': 'video/mp4', b'mp41': 'video/mp4', b'mp42': 'video/mp4',
+    b'M4A ': 'audio/mp4', b'qt  ': 'video/quicktime',
+}
+
+
+class ContentSniffer:
+    """
+    Detects the type of a file from its first bytes, so that what is stored does not only rest on the Content-Type
+    the client sent.
+    """
+
+    # the number of leading bytes sniff needs
+    HEADER_SIZE = 16
+
+    @staticmethod
+    def sniff(header: bytes) -> Optional[str]:
+        for offset, magic, content_type in _SIGNATURES:
+            if header[offset:offset + len(magic)] == magic:
+                return content_type
+        if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+            return 'image/webp'
+        if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+            return 'audio/wav'
+        if header[4:8] == b'ftyp':
+            return _FTYP_BRANDS.get(header[8:12])
+        return None
@@ -0,0 +1,153 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import Generic, List, Optional, Sequence, TypeVar
+
+from pydantic import BaseModel, Field, conint
+from pydantic.generics import GenericModel
+from sqlalchemy import and_, or_
+
+T = TypeVar("T")
+
+NEXT = 'next'
+PREV = 'prev'
+
+
+class InvalidCursorException(Exception):
+    pass
+
+
+class CursorParams(BaseModel):
+    cursor: str = Field(None, title="An opaque cursor returned as next_cursor or prev_cursor by a previous page")
+    size: conint(ge=1, le=1000) = Field(10, title="The maximum number of items in the page")
+
+
+class CursorPage(GenericModel, Generic[T]):
+    # Keyset pages never compute a total, so fetching page N costs the same as fetching the first page.
+    items: List[T]
+    size: int
+    next_cursor: Optional[str] = Field(None, title="Pass as cursor to fetch the following page")
+    prev_cursor: Optional[str] = Field(None, title="Pass as cursor to fetch the preceding page")
+
+    class Config:
+        # the DAOs return pages of database entities
+        arbitrary_types_allowed = True
+
+    @classmethod
+    def create(cls, items: Sequence[T], params: CursorParams, next_cursor: str = None, prev_cursor: str = None):
+        return cls(items=items, size=params.size, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
+class CursorPagination:
+    """
+    Keyset pagination over a fixed list of ascending sort columns, with NULLs sorted last (the Postgres default for
+    ascending order). The last column must be unique (normally the primary key) so that every row has a distinct key.
+    Sort columns may be any SQL expression (e.g. a case() priority); they are selected alongside the entity so the
+    cursor can be built from the last row of the page.
+    """
+
+    @staticmethod
+    def encode_cursor(values, direction) -> str:
+        payload = [CursorPagination._to_json_value(value) for value in values]
+        raw = json.dumps({'k': payload, 'd': direction}, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str, sort_columns):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            decoded = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            values = decoded['k']
+            direction = decoded['d']
+        except (ValueError, KeyError, TypeError, binascii.Error):
+            raise InvalidCursorException("Invalid cursor")
+
+        if direction not in (NEXT, PREV) or not isinstance(values, list) or len(values) != len(sort_columns):
+            raise InvalidCursorException("Invalid cursor")
+
+        try:
+            return [CursorPagination._from_json_value(value, column) for value, column in zip(values, sort_columns)], direction
+        except (ValueError, TypeError):
+            raise InvalidCursorException("Invalid cursor")
+
+    @staticmethod
+    def paginate(query, sort_columns, params: CursorParams) -> CursorPage:
+        direction = NEXT
+        if params.cursor:
+            values, direction = CursorPagination.decode_cursor(params.cursor, sort_columns)
+            if direction == NEXT:
+                query = query.filter(CursorPagination._after(sort_columns, values))
+            else:
+                query = query.filter(CursorPagination._before(sort_columns, values))
+
+        if direction == NEXT:
+            query = query.order_by(*[column.asc().nullslast() for column in sort_columns])
+        else:
+            query = query.order_by(*[column.desc().nullsfirst() for column in sort_columns])
+
+        query = query.add_columns(*[column.label(f"cursor_key_{i}") for i, column in enumerate(sort_columns)])
+
+        # fetch one extra row to find out whether there is another page in this direction, instead of counting.
+        rows = query.limit(params.size + 1).all()
+        has_more = len(rows) > params.size
+        rows = rows[:params.size]
+        if direction == PREV:
+            rows.reverse()
+
+        next_cursor = None
+        prev_cursor = None
+        if rows:
+            first_key = list(rows[0][1:])
+            last_key = list(rows[-1][1:])
+            if direction == NEXT:
+                if has_more:
+                    next_cursor = CursorPagination.encode_cursor(last_key, NEXT)
+                if params.cursor:
+                    prev_cursor = CursorPagination.encode_cursor(first_key, PREV)
+            else:
+                next_cursor = CursorPagination.encode_cursor(last_key, NEXT)
+                if has_more:
+                    prev_cursor = CursorPagination.encode_cursor(first_key, PREV)
+
+        return CursorPage.create(items=[row[0] for row in rows], params=params, next_cursor=next_cursor,
+                                 prev_cursor=prev_cursor)
+
+    @staticmethod
+    def _after(sort_columns, values):
+        clauses = []
+        for i, (column, value) in enumerate(zip(sort_columns, values)):
+            # with NULLs last nothing sorts after a NULL, so a NULL value only contributes through the equality prefix.
+            if value is not None:
+                greater = or_(column > value, column.is_(None))
+                clauses.append(and_(*CursorPagination._equal_prefix(sort_columns[:i], values[:i]), greater))
+        return or_(*clauses)
+
+    @staticmethod
+    def _before(sort_columns, values):
+        clauses = []
+        for i, (column, value) in enumerate(zip(sort_columns, values)):
+            smaller = column.isnot(None) if value is None else column < value
+            clauses.append(and_(*CursorPagination._equal_prefix(sort_columns[:i], values[:i]), smaller))
+        return or_(*clauses)
+
+    @staticmethod
+    def _equal_prefix(columns, values):
+        return [column.is_(None) if value is None else column == value for column, value in zip(columns, values)]
+
+    @staticmethod
+    def _to_json_value(value):
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def _from_json_value(value, column):
+        if value is None:
+            return None
+        python_type = column.type.python_type
+        if python_type is datetime.datetime:
+            return datetime.datetime.fromisoformat(value)
+        if python_type is datetime.date:
+            return datetime.date.fromisoformat(value)
+        return python_type(value)
@@ -0,0 +1,38 @@
+import hashlib
+from typing import Optional
+
+from starlette.responses import Response
+
+
+class ETag:
+    """
+    Strong entity tags built from the version of the row a representation is rendered from, so that a conditional GET
+    can be answered with a version lookup instead of building the view.
+    """
+
+    @staticmethod
+    def for_version(kind: str, id, version: int, variant: Optional[str] = None) -> str:
+        # variant tells different representations of the same row version apart (e.g. a sparse fieldset)
+        tag = f"{kind}-{id}-{version}"
+        if variant:
+            tag += '-' + hashlib.sha1(variant.encode()).hexdigest()[:12]
+        return f'"{tag}"'
+
+    @staticmethod
+    def matches(if_none_match: Optional[str], etag: str) -> bool:
+        # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+        return any((candidate[2:] if candidate.startswith('W/') else candidate) == etag for candidate in candidates)
+
+    @staticmethod
+    def not_modified(etag: str) -> Response:
+        return Response(status_code=304, headers={'ETag': etag})
+
+    @staticmethod
+    def tag(response: Response, etag: str) -> Response:
+        response.headers['ETag'] = etag
+        return response
@@ -0,0 +1,72 @@
+from typing import Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+
+class InvalidFieldSelectionException(Exception):
+    pass
+
+
+class FieldSelection:
+    """
+    A sparse fieldset parsed from the fields= and expand= query parameters (comma separated names).
+    fields limits the top level attributes of a view, expand limits which relationships are loaded and built.
+    A relationship is only included when it is allowed by both.
+    """
+
+    def __init__(self, relationships: Set[str], fields: Optional[Set[str]] = None, expand: Optional[Set[str]] = None):
+        self.relationships = relationships
+        self.fields = fields
+        self.expand = expand
+
+    @staticmethod
+    def parse(fields: Optional[str], expand: Optional[str], all_fields: Set[str], relationships: Set[str]):
+        # no selection means the full view, as before sparse fieldsets existed
+        if not fields and not expand:
+            return None
+
+        field_set = FieldSelection._split(fields)
+        expand_set = FieldSelection._split(expand)
+        if field_set is not None and not field_set <= all_fields:
+            raise InvalidFieldSelectionException(f"Unknown fields: {', '.join(sorted(field_set - all_fields))}")
+        if expand_set is not None and not expand_set <= relationships:
+            raise InvalidFieldSelectionException(
+                f"Unknown relationships to expand: {', '.join(sorted(expand_set - relationships))}")
+        return FieldSelection(relationships, field_set, expand_set)
+
+    @staticmethod
+    def _split(value: Optional[str]):
+        if not value:
+            return None
+        return {name.strip() for name in value.split(',') if name.strip()}
+
+    def includes(self, name: str) -> bool:
+        if self.fields is not None and name not in self.fields:
+            return False
+        if name in self.relationships and self.expand is not None and name not in self.expand:
+            return False
+        return True
+
+    def variant(self) -> str:
+        # identifies the representation this selection produces, e.g. for entity tags
+        return f"fields={','.join(sorted(self.fields or []))};expand={','.join(sorted(self.expand or []))}" \
+            if self.fields is not None or self.expand is not None else ''
+
+    def project(self, view: BaseModel) -> dict:
+        excluded = {name for name in view.__fields__ if not self.includes(name)}
+        return view.dict(exclude=excluded)
+
+    def response(self, result) -> JSONResponse:
+        # result is a single view or a page of views
+        if isinstance(result, BaseModel) and isinstance(getattr(result, 'items', None), list):
+            content = result.dict(exclude={'items'})
+            content['items'] = [self.project(item) for item in result.items]
+        else:
+            content = self.project(result)
+        return JSONResponse(content=jsonable_encoder(content))
+
+
+def expands(selection: Optional[FieldSelection], relationship: str) -> bool:
+    return selection is None or selection.includes(relationship)
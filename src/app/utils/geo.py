@@ -0,0 +1,36 @@
+import math
+from typing import Tuple
+
+# mean radius of the earth
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+class GeoDistance:
+    """
+    Great-circle distances between latitude/longitude pairs in degrees, and the latitude/longitude box around a point
+    that holds everything within a distance of it, for prefiltering on the coordinate columns.
+    """
+
+    @staticmethod
+    def haversine_km(latitude1: float, longitude1: float, latitude2: float, longitude2: float) -> float:
+        latitude1, longitude1, latitude2, longitude2 = map(math.radians, (latitude1, longitude1, latitude2, longitude2))
+        a = math.sin((latitude2 - latitude1) / 2) ** 2 + \
+            math.cos(latitude1) * math.cos(latitude2) * math.sin((longitude2 - longitude1) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+    @staticmethod
+    def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+        # (min latitude, max latitude, min longitude, max longitude)
+        angle = radius_km / EARTH_RADIUS_KM
+        min_latitude = latitude - math.degrees(angle)
+        max_latitude = latitude + math.degrees(angle)
+        if min_latitude <= -90 or max_latitude >= 90 or angle >= math.pi / 2:
+            # the circle reaches over a pole, every longitude is in it
+            return max(min_latitude, -90.0), min(max_latitude, 90.0), -180.0, 180.0
+        # the widest longitude of the circle, which is reached a little poleward of the centre
+        delta_longitude = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+        if longitude - delta_longitude < -180 or longitude + delta_longitude > 180:
+            # the circle crosses the antimeridian, the longitudes on its other side wrap around to the far end
+            return min_latitude, max_latitude, -180.0, 180.0
+        return min_latitude, max_latitude, longitude - delta_longitude, longitude + delta_longitude
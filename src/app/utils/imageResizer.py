@@ -0,0 +1,58 @@
+import io
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+# the longest edge in pixels of each derivative. Thumbnails are twice the 48px avatars, for high density screens
+DERIVATIVE_SIZES = {'thumbnail': 96, 'small': 320, 'medium': 1024}
+
+# the formats Pillow decodes that uploads come in, checked before anything is read
+RESIZABLE_CONTENT_TYPES = {'image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp', 'image/bmp', 'image/tiff'}
+
+_CONTENT_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp'}
+
+
+class ImageResizerException(Exception):
+    pass
+
+
+class ImageResizer:
+    """
+    Scales images down to fit a square of max_edge pixels, keeping their aspect ratio and never scaling up. The EXIF
+    orientation of phone photos is applied, and the derivative carries no metadata. Without a format, images with
+    transparency become PNG and everything else JPEG.
+    """
+
+    @staticmethod
+    def can_resize(content_type: Optional[str]) -> bool:
+        return content_type is not None and content_type.lower() in RESIZABLE_CONTENT_TYPES
+
+    @staticmethod
+    def supports(format: str) -> bool:
+        # webp needs Pillow built with libwebp
+        return format.upper() != 'WEBP' or features.check('webp')
+
+    @staticmethod
+    def resize(source, max_edge: int, format: Optional[str] = None, quality: int = 82) -> Tuple[bytes, str, int, int]:
+        # (content, content type, width, height). source is a path or a seekable binary file
+        try:
+            image = Image.open(source)
+            # JPEG decodes straight to a fraction of its size, a phone photo is not decoded in full for a thumbnail
+            image.draft('RGB', (max_edge, max_edge))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+            raise ImageResizerException(f"The image could not be resized: {e}")
+
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+        format = (format or ('PNG' if has_alpha else 'JPEG')).upper()
+        if format == 'JPEG':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        content = io.BytesIO()
+        if format == 'PNG':
+            image.save(content, format, optimize=True)
+        else:
+            image.save(content, format, quality=quality)
+        return content.getvalue(), _CONTENT_TYPES[format], image.width, image.height
@@ -0,0 +1,31 @@
+from typing import Iterable, Iterator
+
+from src.app.utils.ndjson import NDJSON
+
+
+class JSONArray:
+    """
+    A JSON array that is sent while it is built, so that a listing never has to be held in memory as a whole. The
+    body is the same as that of a list response_model.
+    """
+
+    MEDIA_TYPE = 'application/json'
+
+    @staticmethod
+    def chunks(values: Iterable[bytes], chunk_size: int = None) -> Iterator[bytes]:
+        # values are encoded JSON values, sent in chunks of about chunk_size bytes
+        chunk_size = chunk_size or NDJSON.CHUNK_SIZE
+        parts = [b'[']
+        size = 1
+        separator = b''
+        for value in values:
+            parts.append(separator)
+            parts.append(value)
+            separator = b','
+            size += len(value) + 1
+            if size >= chunk_size:
+                yield b''.join(parts)
+                parts = []
+                size = 0
+        parts.append(b']')
+        yield b''.join(parts)
@@ -0,0 +1,76 @@
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, Optional
+
+
+class NDJSON:
+    """
+    Newline delimited JSON (one JSON object per line) for streamed responses.
+    """
+
+    MEDIA_TYPE = 'application/x-ndjson'
+    # lines are sent in chunks of about this many bytes
+    CHUNK_SIZE = 64 * 1024
+
+    @staticmethod
+    def encode_value(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return float(value)
+        raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+    @staticmethod
+    def dumps(record: dict) -> bytes:
+        return json.dumps(record, default=NDJSON.encode_value, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b'\n'
+
+    @staticmethod
+    def chunks(records: Iterable[dict], chunk_size: int = None) -> Iterator[bytes]:
+        chunk_size = chunk_size or NDJSON.CHUNK_SIZE
+        lines = []
+        size = 0
+        for record in records:
+            line = NDJSON.dumps(record)
+            lines.append(line)
+            size += len(line)
+            if size >= chunk_size:
+                yield b''.join(lines)
+                lines = []
+                size = 0
+        if lines:
+            yield b''.join(lines)
+
+    @staticmethod
+    def gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+        # compresses the stream as it is sent, only the compressor state is kept in memory
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    @staticmethod
+    def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+        if not accept_encoding:
+            return False
+        qualities = {}
+        for coding in accept_encoding.split(','):
+            name, _, parameters = coding.strip().partition(';')
+            qualities.setdefault(name.strip().lower(), NDJSON.quality(parameters))
+        # * only stands for the codings that are not listed, an explicit gzip entry takes precedence
+        return qualities.get('gzip', qualities.get('*', 0)) > 0
+
+    @staticmethod
+    def quality(parameters: str) -> float:
+        # the q= weight of an Accept-Encoding entry, 1 when it has none or an invalid one
+        for parameter in parameters.split(';'):
+            key, _, value = parameter.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    return float(value)
+                except ValueError:
+                    return 1
+        return 1
@@ -0,0 +1,38 @@
+import threading
+import time
+from typing import Callable, Hashable, Tuple
+
+from cachetools import LRUCache
+
+MAX_ENTRIES = 10000
+
+
+class PresignedUrlCache:
+    """
+    Presigned urls by what they were signed for, reused until margin_seconds before they expire. Signing is local, but
+    handing out the same url for a while lets clients and proxies cache the content behind it.
+    """
+
+    def __init__(self, max_entries: int):
+        self.entries = LRUCache(maxsize=max_entries)  # key -> (url, time until which it is handed out)
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable, sign: Callable[[], str], expires_in: int, margin_seconds: int) -> Tuple[str, int]:
+        # (url, seconds it is still handed out for). sign makes a url that expires in expires_in seconds
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None or entry[1] <= now:
+            # signed outside the lock, two requests racing for the same url both get a valid one
+            entry = (sign(), now + max(expires_in - margin_seconds, 0))
+            with self.lock:
+                self.entries[key] = entry
+        url, reuse_until = entry
+        return url, int(reuse_until - now)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+presigned_url_cache = PresignedUrlCache(MAX_ENTRIES)
@@ -7,9 +7,10 @@ from starlette.responses import FileResponse
 
 
 class S3Utils:
-    def __init__(self, bucket_name, region=None, access_key=None, secret_access_key=None):
+    def __init__(self, bucket_name, region=None, access_key=None, secret_access_key=None, endpoint_url=None):
         self.bucket_name = bucket_name
-        self.s3 = boto3.resource('s3', aws_access_key_id=access_key, aws_secret_access_key=secret_access_key, region_name=region)
+        self.s3 = boto3.resource('s3', aws_access_key_id=access_key, aws_secret_access_key=secret_access_key, region_name=region,
+                                 endpoint_url=endpoint_url or None)
 
 
     def upload_file(self, file, object_name=None):
@@ -23,15 +24,38 @@ class S3Utils:
             return False
         return True
 
-    def get_file(self, object_name):
+    def get_file(self, object_name, byte_range=None):
+        # byte_range is a Range header value, e.g. bytes=0-1023, the object then has the ContentRange of the part
         try:
-            obj = self.s3.Object(self.bucket_name, key=object_name).get()
+            if byte_range:
+                obj = self.s3.Object(self.bucket_name, key=object_name).get(Range=byte_range)
+            else:
+                obj = self.s3.Object(self.bucket_name, key=object_name).get()
             #convert obj to StreamingResponse
             return obj
         except Exception as e:
             logging.error(e)
             raise e
 
+    def head_file(self, object_name):
+        try:
+            return self.s3.meta.client.head_object(Bucket=self.bucket_name, Key=object_name)
+        except Exception as e:
+            logging.error(e)
+            raise e
+
+    def presigned_url(self, object_name, expires_in, content_type=None, content_disposition=None, cache_control=None):
+        # a GET url that needs no credentials until it expires. The headers S3 answers it with can be overridden, the
+        # keys of blobs say nothing about their content
+        params = {'Bucket': self.bucket_name, 'Key': object_name}
+        if content_type:
+            params['ResponseContentType'] = content_type
+        if content_disposition:
+            params['ResponseContentDisposition'] = content_disposition
+        if cache_control:
+            params['ResponseCacheControl'] = cache_control
+        return self.s3.meta.client.generate_presigned_url('get_object', Params=params, ExpiresIn=expires_in)
+
     def delete_file(self, object_name):
         try:
             response = self.s3.Object(self.bucket_name, object_name).delete()
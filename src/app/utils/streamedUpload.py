@@ -0,0 +1,68 @@
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+from src.app.utils.contentSniffer import ContentSniffer
+
+
+class UploadTooLargeException(Exception):
+    pass
+
+
+class StreamedUpload:
+    """
+    An upload copied into a temporary file chunk_size bytes at a time. Its size, SHA-256 and sniffed content type are
+    computed in the same pass, and the copy stops as soon as it goes over max_bytes. Used as a context manager the
+    temporary file is removed unless it was moved into place with move_to.
+    """
+
+    def __init__(self, path: str, size: int, sha256: str, detected_content_type: Optional[str]):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.detected_content_type = detected_content_type
+
+    @staticmethod
+    def spool(source, directory: Optional[str], max_bytes: Optional[int], chunk_size: int) -> 'StreamedUpload':
+        # directory should be on the filesystem of the final path, so that move_to is a rename
+        descriptor, path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.part')
+        digest = hashlib.sha256()
+        size = 0
+        header = b''
+        try:
+            with os.fdopen(descriptor, 'wb') as target:
+                while True:
+                    chunk = source.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise UploadTooLargeException(f"The file is larger than the maximum of {max_bytes} bytes")
+                    if len(header) < ContentSniffer.HEADER_SIZE:
+                        header += chunk[:ContentSniffer.HEADER_SIZE - len(header)]
+                    digest.update(chunk)
+                    target.write(chunk)
+                target.flush()
+                os.fsync(target.fileno())
+        except BaseException:
+            os.remove(path)
+            raise
+        return StreamedUpload(path, size, digest.hexdigest(), ContentSniffer.sniff(header))
+
+    def move_to(self, path: str):
+        # atomic, readers see either no file or the complete one
+        os.replace(self.path, path)
+        self.path = None
+
+    def discard(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.discard()
+        return False
@@ -0,0 +1,148 @@
+import threading
+import time
+from typing import Iterable, Optional
+
+from cachetools import LRUCache
+
+from src.app.config import settings
+
+PERSON = 'person'
+HOUSEHOLD = 'household'
+
+
+class LRUViewCacheBackend:
+    """
+    In-process backend, entries are only visible to the worker that stored them.
+    """
+
+    def __init__(self, max_entries: int):
+        self.entries = LRUCache(maxsize=max_entries)
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            return self.entries.get(key)
+
+    def set(self, key: str, value: bytes):
+        with self.lock:
+            self.entries[key] = value
+
+    def delete(self, *keys: str):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+
+class LocalSharedStore:
+    """
+    Stand-in for a shared key value store (redis) with the subset of its client API used by SharedViewCacheBackend.
+    Used for development and tests when flocki_view_cache_url is not set.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            return value
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ex if ex else None)
+
+    def delete(self, *keys: str):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+class SharedViewCacheBackend:
+    """
+    Backend on a store shared by all workers. The client needs redis style get(key), set(key, value, ex=seconds) and
+    delete(*keys).
+    """
+
+    def __init__(self, client, ttl_seconds: int, prefix: str = 'flocki:view:'):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes):
+        self.client.set(self.prefix + key, value, ex=self.ttl_seconds)
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+
+class ViewCache:
+    """
+    Serialized (JSON bytes) detail views keyed by entity kind and id. Every entry is stored with the version of the row
+    it was built from and is only returned for that version, so a row whose version moved on is never served stale,
+    even by a worker that missed the eviction.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    @staticmethod
+    def key(kind: str, id: int) -> str:
+        return f"{kind}:{id}"
+
+    def get(self, kind: str, id: int, version: int) -> Optional[bytes]:
+        if self.backend is None:
+            return None
+        entry = self.backend.get(self.key(kind, id))
+        if entry is None:
+            return None
+        entry_version, _, body = entry.partition(b'\n')
+        if entry_version != str(version).encode():
+            return None
+        return body
+
+    def put(self, kind: str, id: int, version: int, body: bytes):
+        if self.backend is not None:
+            self.backend.set(self.key(kind, id), str(version).encode() + b'\n' + body)
+
+    def evict(self, kind: str, ids: Iterable[int]):
+        if self.backend is not None:
+            self.backend.delete(*[self.key(kind, id) for id in ids])
+
+
+def create_view_cache_backend():
+    if settings.flocki_view_cache_backend == 'local':
+        return LRUViewCacheBackend(settings.flocki_view_cache_size)
+    if settings.flocki_view_cache_backend == 'shared':
+        if settings.flocki_view_cache_url:
+            # only needed when a shared store is configured
+            import redis
+            client = redis.Redis.from_url(settings.flocki_view_cache_url)
+            # the client connects lazily, a store that cannot be reached would otherwise only show in requests
+            client.ping()
+        else:
+            client = LocalSharedStore()
+        return SharedViewCacheBackend(client, settings.flocki_view_cache_ttl_seconds)
+    return None
+
+
+# one cache per process, shared by all requests. It caches nothing until start_view_cache has built its backend
+view_cache = ViewCache()
+
+
+def start_view_cache():
+    # called when the app starts, so that a bad store url or a missing redis package stops it from starting
+    view_cache.backend = create_view_cache_backend()
+
+
+def get_view_cache() -> ViewCache:
+    return view_cache
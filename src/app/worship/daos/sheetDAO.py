@@ -2,7 +2,7 @@ from typing import List
 
 from fastapi import Depends
 
-from src.app.database import SessionLocal, get_db
+from src.app.database import SessionLocal, get_db, UnitOfWork
 from src.app.worship.models.database import models
 from sqlalchemy import func, exc
 
@@ -17,10 +17,16 @@ class SheetDAO:
     def get_sheet_by_id(self, id) -> models.Sheet:
         return self.db.query(models.Sheet).filter(models.Sheet.id == id).first()
 
+    def increment_song_version(self, song_id):
+        # sheets are part of the song view
+        self.db.query(models.Song).filter(models.Song.id == song_id)\
+            .update({models.Song.version: models.Song.version + 1}, synchronize_session=False)
+
     def create_sheet(self, sheet: models.Sheet):
         try:
             self.db.add(sheet)
-            self.db.commit()
+            self.increment_song_version(sheet.song_id)
+            UnitOfWork.commit(self.db)
         except exc.IntegrityError:
             self.db.rollback()
             raise ValueError("Sheet with that type and key already exists")
@@ -32,6 +38,7 @@ class SheetDAO:
             models.Sheet.song_id == song_id, models.Sheet.type == type, models.Sheet.sheet_key == sheet_key).first()
 
     def update_sheet(self, sheet_entity):
-        self.db.commit()
+        self.increment_song_version(sheet_entity.song_id)
+        UnitOfWork.commit(self.db)
         self.db.refresh(sheet_entity)
         return sheet_entity
@@ -1,13 +1,15 @@
-from typing import List
+from typing import Dict, Iterable, List
 
 from fastapi import Depends
 
 from fastapi_pagination import Page, Params
 from fastapi_pagination.ext.sqlalchemy import paginate
 
-from src.app.database import SessionLocal, get_db
+from src.app.database import SessionLocal, get_db, UnitOfWork
+from src.app.utils.bulkLoader import BulkLoader
+from src.app.utils.cursorPagination import CursorPagination, CursorParams, CursorPage
 from src.app.worship.models.database import models
-from sqlalchemy import func, exc
+from sqlalchemy import func, exc, select
 
 
 class SongDAO:
@@ -18,18 +20,24 @@ class SongDAO:
         #order by code
         return paginate(self.db.query(models.Song).order_by(models.Song.code), params)
 
+    def get_all_songs_by_cursor(self, params: CursorParams = CursorParams()) -> CursorPage[models.Song]:
+        return CursorPagination.paginate(self.db.query(models.Song), [models.Song.code, models.Song.id], params)
+
     def get_all_songs_without_pagination(self) -> List[models.Song]:
         return self.db.query(models.Song).order_by(models.Song.code)
 
     def get_song_by_id(self, id) -> models.Song:
         return self.db.query(models.Song).filter(models.Song.id == id).first()
 
+    def get_song_version(self, id):
+        return self.db.query(models.Song.version).filter(models.Song.id == id).scalar()
+
     def create_song(self, song: models.Song):
         if not song.code:
             song.code = self.get_next_code(song)
         try:
             self.db.add(song)
-            self.db.commit()
+            UnitOfWork.commit(self.db)
         except exc.IntegrityError:
             self.db.rollback()
             raise ValueError("Song with that code already exists")
@@ -49,7 +57,7 @@ class SongDAO:
     def create_sheet(self, sheet: models.Sheet):
         try:
             self.db.add(sheet)
-            self.db.commit()
+            UnitOfWork.commit(self.db)
         except exc.IntegrityError:
             self.db.rollback()
             raise ValueError("Sheet with that type and key already exists")
@@ -62,15 +70,16 @@ class SongDAO:
     def update_song(self, song_entity, update_values):
         if 'id' in update_values:
             del update_values['id']
+        update_values['version'] = models.Song.version + 1
         entity_to_update = self.db.query(models.Song).filter(models.Song.id == song_entity.id)
-        entity_to_update.update(update_values)
-        self.db.commit()
+        entity_to_update.update(update_values, synchronize_session=False)
+        UnitOfWork.commit(self.db)
         return self.get_song_by_id(song_entity.id)
 
     def create_author(self, author_entity):
         try:
             self.db.add(author_entity)
-            self.db.commit()
+            UnitOfWork.commit(self.db)
         except exc.IntegrityError:
             self.db.rollback()
             raise ValueError("Author with that name already exists")
@@ -82,7 +91,11 @@ class SongDAO:
             del update_values['id']
         entity_to_update = self.db.query(models.Author).filter(models.Author.id == author_entity.id)
         entity_to_update.update(update_values)
-        self.db.commit()
+        # the author name is part of the view of each of their songs
+        author_song_ids = select(models.AuthorSong.song_id).where(models.AuthorSong.author_id == author_entity.id)
+        self.db.query(models.Song).filter(models.Song.id.in_(author_song_ids))\
+            .update({models.Song.version: models.Song.version + 1}, synchronize_session=False)
+        UnitOfWork.commit(self.db)
         return self.get_author_by_id(author_entity.id)
 
     def get_all_authors(self):
@@ -91,8 +104,8 @@ class SongDAO:
     def get_author_by_id(self, id):
         return self.db.query(models.Author).filter(models.Author.id == id).first()
 
-    def get_authors_by_ids(self, author_ids):
-        return self.db.query(models.Author).filter(models.Author.id.in_(author_ids)).all()
+    def get_authors_by_ids(self, author_ids: Iterable[int]) -> Dict[int, models.Author]:
+        return BulkLoader.load_by_ids(self.db.query(models.Author), models.Author.id, author_ids)
 
     def get_existing_authors_for_song(self, song_id):
         return self.db.query(models.AuthorSong).filter(models.AuthorSong.song_id == song_id).all()
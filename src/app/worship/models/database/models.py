@@ -16,6 +16,8 @@ class Song(Base):
     video_link = Column(String)
     sheets = relationship("Sheet", backref="song")
     authors = relationship("AuthorSong", back_populates="song", cascade="all, delete-orphan")
+    # bumped by every write that changes the song view (including its sheets and author names), used for ETags
+    version = Column(Integer, nullable=False, default=1, server_default='1')
 
     # unique key code
     __table_args__ = (UniqueConstraint('code', name='songs_code_uc'),)
@@ -1,9 +1,10 @@
-from typing import List
+from typing import List, Union
 
-from fastapi import status, Depends, HTTPException, UploadFile, APIRouter
+from fastapi import status, Depends, HTTPException, UploadFile, APIRouter, Header, Response, Query
 from fastapi_pagination import Params, Page
 
 from src.app.media.models.media import ViewMediaItem
+from src.app.media.services.mediaService import MediaItemTooLargeException
 from src.app.worship.models.songs import ViewSong, CreateAuthor, ViewAuthor, CreateSong
 
 from src.app.worship.services.songService import SongService, NoSongException, SongWithThatCodeExists, \
@@ -11,15 +12,27 @@ from src.app.worship.services.songService import SongService, NoSongException, S
 from src.app.worship.services.sheetService import SheetService, NoSongException as NSException, NoSheetException
 from src.app.users.models.user import User
 from src.app.users.routers.login import get_current_user
+from src.app.utils.cursorPagination import CursorPage, CursorParams, InvalidCursorException
+from src.app.utils.conditionalRequest import ConditionalRequest, get_conditional_request
+from src.app.utils.etag import ETag
 
 router = APIRouter(tags=['Songs'])
 
 @router.get('/song/{id}', response_model=ViewSong)
-def get_song(id: int, song_service: SongService = Depends(SongService)):
+def get_song(id: int, response: Response, if_none_match: Union[str, None] = Header(None),
+             song_service: SongService = Depends(SongService)):
     try:
+        version = song_service.get_song_version(id)
+        if version is None:
+            raise NoSongException("Song with that id does not exist")
+        etag = ETag.for_version('song', id, version)
+        if ETag.matches(if_none_match, etag):
+            return ETag.not_modified(etag)
+
         song = song_service.get_song_by_id(id)
         if song is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="The song does not exist")
+        ETag.tag(response, etag)
         return song
     except NoSongException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Song with that id does not exist")
@@ -28,6 +41,14 @@ def get_song(id: int, song_service: SongService = Depends(SongService)):
 def get_songs(page: int = 1, page_size:int = 10, song_service : SongService = Depends(SongService)):
     return song_service.get_all_songs()
 
+# keyset pagination: pass the next_cursor/prev_cursor of the previous response as cursor, no total is calculated
+@router.get('/songs/cursor', response_model=CursorPage[ViewSong])
+def get_songs_by_cursor(cursor: str = None, page_size: int = Query(10, ge=1, le=1000), song_service: SongService = Depends(SongService)):
+    try:
+        return song_service.get_all_songs_by_cursor(CursorParams(cursor=cursor, size=page_size))
+    except InvalidCursorException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+
 @router.post('/song', response_model=ViewSong)
 def create_song(song: CreateSong, song_service: SongService = Depends(SongService)):
     try:
@@ -58,6 +79,8 @@ def upload_song_sheet(song_id: int, type: str, sheet_key: str,  file: UploadFile
         return song_sheet_response;
     except NSException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Song with that id does not exist")
+    except MediaItemTooLargeException as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=e.args[0])
 
 @router.put('/song_sheet', response_model=ViewSong)
 def update_song_sheet(song_id: int, type: str, sheet_key: str,  file: UploadFile, sheet_service : SheetService = Depends(SheetService),
@@ -69,12 +92,16 @@ def update_song_sheet(song_id: int, type: str, sheet_key: str,  file: UploadFile
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Song with that id does not exist")
     except NoSheetException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sheet with that song id does not exist. Post to create a new one")
+    except MediaItemTooLargeException as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=e.args[0])
 
 #endpoint to get a sheet by song id, for a given type and given song key unless key not provided use song_key of song
 @router.get('/song_sheet/{song_id}/{type}/{sheet_key}')
-def get_song_sheet(song_id: int, type: str, sheet_key: str = None, sheet_service : SheetService = Depends(SheetService)):
+def get_song_sheet(song_id: int, type: str, sheet_key: str = None,
+                   request: ConditionalRequest = Depends(get_conditional_request),
+                   sheet_service : SheetService = Depends(SheetService)):
     try:
-        sheet = sheet_service.get_song_sheet(song_id, type, sheet_key)
+        sheet = sheet_service.get_song_sheet(song_id, type, sheet_key, request)
         if sheet is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="The sheet does not exist")
         return sheet
@@ -83,9 +110,10 @@ def get_song_sheet(song_id: int, type: str, sheet_key: str = None, sheet_service
 
 #endpoint to get a sheet by song id, for a given type and given song key unless key not provided use song_key of song
 @router.get('/song_sheet/{song_id}/{type}')
-def get_song_sheet(song_id: int, type: str, sheet_service : SheetService = Depends(SheetService)):
+def get_song_sheet(song_id: int, type: str, request: ConditionalRequest = Depends(get_conditional_request),
+                   sheet_service : SheetService = Depends(SheetService)):
     try:
-        sheet = sheet_service.get_song_sheet(song_id, type, None)
+        sheet = sheet_service.get_song_sheet(song_id, type, None, request)
         if sheet is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="The sheet does not exist")
         return sheet
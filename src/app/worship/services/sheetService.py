@@ -5,6 +5,7 @@ from starlette.responses import FileResponse
 
 from src.app.media.factories.mediaFactory import MediaFactory
 from src.app.media.services.mediaService import MediaService
+from src.app.utils.conditionalRequest import ConditionalRequest
 from src.app.worship.daos.songDAO import SongDAO
 from src.app.worship.daos.sheetDAO import SheetDAO
 from src.app.worship.factories.songFactory import SongFactory
@@ -49,7 +50,7 @@ class SheetService:
         song_entity = self.song_DAO.get_song_by_id(song_id)
         return self.song_factory.create_song_from_song_entity(song_entity)
 
-    def get_song_sheet(self, song_id, type, sheet_key):
+    def get_song_sheet(self, song_id, type, sheet_key, request: ConditionalRequest = None):
         song_entity = self.song_DAO.get_song_by_id(song_id)
         if song_entity is None:
             raise NoSongException("Song with that id does not exist")
@@ -61,7 +62,9 @@ class SheetService:
         if sheet_entity is None:
             raise NoSongException("Sheet with that id does not exist")
 
-        return self.media_service.get_media_item_by_id(sheet_entity.media_item_id, as_attachment=False)
+        # an update points the sheet at a new media item, so the url is revalidated
+        return self.media_service.get_media_item_by_id(sheet_entity.media_item_id, as_attachment=False, request=request,
+                                                       cache_control=MediaService.current_item_cache_control())
 
     def get_sheet_types(self):
         return [type.value for type in SheetType]
@@ -11,6 +11,8 @@ from openpyxl.styles import Font, PatternFill
 from openpyxl.workbook import Workbook
 from starlette.responses import StreamingResponse
 
+from src.app.utils.bulkLoader import BulkLoader
+from src.app.utils.cursorPagination import CursorParams, CursorPage
 from src.app.worship.daos.songDAO import SongDAO
 from src.app.worship.models.database.models import Song
 from src.app.worship.factories.songFactory import SongFactory
@@ -49,6 +51,15 @@ class SongService:
         else:
             return []
 
+    def get_all_songs_by_cursor(self, params: CursorParams = CursorParams()) -> CursorPage[ViewSong]:
+        song_entities_page = self.song_DAO.get_all_songs_by_cursor(params)
+        songs = [self.song_factory.create_song_from_song_entity(song_entity) for song_entity in song_entities_page.items]
+        return CursorPage.create(items=songs, params=params, next_cursor=song_entities_page.next_cursor,
+                                 prev_cursor=song_entities_page.prev_cursor)
+
+    def get_song_version(self, id):
+        return self.song_DAO.get_song_version(id)
+
     def get_song_by_id(self, id) -> ViewSong:
         song_entity = self.song_DAO.get_song_by_id(id)
         if song_entity is None:
@@ -59,18 +70,20 @@ class SongService:
         #check if song with that code exists and if so raise error
         if self.song_DAO.get_song_by_code(song.code):
             raise SongWithThatCodeExists("Song with that code already exists")
-        valid_authors = []
-        if song.author_ids:
-            for author_id in song.author_ids:
-                author = self.song_DAO.get_author_by_id(author_id)
-                if author:
-                    valid_authors.append(author)
-                else:
-                    raise NoAuthorException("Author with that id does not exist")
+        valid_authors = self.get_valid_authors(song.author_ids)
         song_entity = self.song_factory.create_song_entity_from_song(song, valid_authors)
         song_entity = self.song_DAO.create_song(song_entity)
         return self.song_factory.create_song_from_song_entity(song_entity)
 
+    def get_valid_authors(self, author_ids):
+        # the authors in the order of author_ids, loaded with one query
+        if not author_ids:
+            return []
+        authors = self.song_DAO.get_authors_by_ids(author_ids)
+        if BulkLoader.missing_ids(author_ids, authors):
+            raise NoAuthorException("Author with that id does not exist")
+        return [authors[author_id] for author_id in author_ids]
+
     def create_author(self, author: CreateAuthor) -> ViewAuthor:
         author_entity = self.song_factory.create_author_entity_from_author(author)
         author_entity = self.song_DAO.create_author(author_entity)
@@ -105,14 +118,7 @@ class SongService:
 
         authors_ids = update_values.pop('author_ids', song.dict())
         #validate author_ids
-        valid_authors = []
-        if authors_ids:
-            for author_id in authors_ids:
-                author = self.song_DAO.get_author_by_id(author_id)
-                if author:
-                    valid_authors.append(author)
-                else:
-                    raise NoAuthorException("Author with that id does not exist")
+        valid_authors = self.get_valid_authors(authors_ids)
 
         if authors_ids:
             existing_author_songs = self.song_DAO.get_existing_authors_for_song(song_entity.id)
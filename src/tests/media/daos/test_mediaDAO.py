@@ -0,0 +1,157 @@
+import hashlib
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import UploadFile
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.app.config import settings
+from src.app.database import Base
+from src.app.media.daos.mediaDAO import MediaDAO
+from src.app.media.factories.mediaFactory import MediaFactory
+from src.app.media.jobs import collectMediaBlobs, backfillImageDerivatives
+from src.app.media.models.database import models
+from src.app.media.models.media import ImageSize, ImageFormat
+from src.app.media.services.mediaService import MediaService
+from src.app.people.models.database import models as people_models
+from src.app.users.models.database import models as user_models
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_db.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+PDF = b'%PDF-1.4\n' + b'hymn ' * 50
+
+
+@pytest.fixture()
+def test_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'flocki_media_store', 'local')
+    monkeypatch.setattr(settings, 'flocki_media_base_path', str(tmp_path))
+    Base.metadata.create_all(bind=engine)
+    db.expunge_all()
+    yield tmp_path
+    try:
+        Base.metadata.drop_all(bind=engine)
+    except Exception as e:
+        print("teardown of DB failed")
+        print(e)
+
+
+db = TestingSessionLocal()
+media_service = MediaService(media_DAO=MediaDAO(db), media_factory=MediaFactory())
+
+
+def upload_file(content: bytes, content_type: str = 'application/pdf') -> UploadFile:
+    return UploadFile(filename='sheet.pdf', file=io.BytesIO(content), content_type=content_type)
+
+
+def jpeg(width, height) -> bytes:
+    content = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 120, 40)).save(content, 'JPEG')
+    return content.getvalue()
+
+
+def stored_files(directory):
+    return sorted(os.path.relpath(os.path.join(root, name), directory)
+                  for root, _, names in os.walk(directory) for name in names)
+
+
+def test_identical_uploads_are_stored_once(test_db):
+    first = media_service.upload_media_item(upload_file(PDF), 'A1_chords_C.pdf')
+    second = media_service.upload_media_item(upload_file(PDF), 'A1_chords_D.pdf')
+    other = media_service.upload_media_item(upload_file(PDF + b'amen'), 'A2_chords_C.pdf')
+
+    assert first.id != second.id
+    assert first.blob_id == second.blob_id != other.blob_id
+    assert first.address == second.address
+    assert [first.filename, second.filename] == ['A1_chords_C.pdf', 'A1_chords_D.pdf']
+    blob = db.query(models.MediaBlob).filter(models.MediaBlob.id == first.blob_id).one()
+    assert blob.ref_count == 2
+    assert blob.sha256 == hashlib.sha256(PDF).hexdigest()
+    assert len(stored_files(test_db)) == 2
+
+
+def test_collect_media_blobs_links_and_removes_copies(test_db):
+    # two items uploaded before the blobs, with the same content under different names
+    for filename in ['A1_chords_C.pdf', 'A1_lyrics_C.pdf']:
+        with open(os.path.join(str(test_db), filename), 'wb') as f:
+            f.write(PDF)
+        db.add(models.MediaItem(created=datetime.now(), store='local', filename=filename,
+                                address=os.path.join(str(test_db), filename)))
+    db.commit()
+    uploaded = media_service.upload_media_item(upload_file(PDF + b'amen'), 'A2_chords_C.pdf')
+    # a blob whose upload failed before its item was added
+    db.add(models.MediaBlob(created=datetime.now() - timedelta(days=1), store='local', sha256='0' * 64, size=0,
+                            address=os.path.join(str(test_db), 'orphan')))
+    db.commit()
+    open(os.path.join(str(test_db), 'orphan'), 'wb').close()
+
+    linked, collected = collectMediaBlobs.run(db)
+
+    assert (linked, collected) == (2, 1)
+    items = db.query(models.MediaItem).order_by(models.MediaItem.id).all()
+    assert items[0].blob_id == items[1].blob_id
+    assert items[0].address == items[1].address == os.path.join(str(test_db), 'A1_chords_C.pdf')
+    assert items[1].sha256 == hashlib.sha256(PDF).hexdigest()
+    counts = dict(db.query(models.MediaBlob.id, models.MediaBlob.ref_count))
+    assert counts == {items[0].blob_id: 2, uploaded.blob_id: 1}
+    assert stored_files(test_db) == sorted(['A1_chords_C.pdf', os.path.relpath(uploaded.address, str(test_db))])
+
+
+def test_image_derivatives_are_made_at_upload(test_db):
+    image = media_service.upload_image(upload_file(jpeg(1600, 1200), 'image/jpeg'), 'photo.jpg', 'A photo')
+
+    derivatives = {derivative.variant: derivative for derivative in db.query(models.MediaDerivative)}
+    assert set(derivatives) == {'thumbnail', 'small', 'medium'}
+    assert (derivatives['thumbnail'].width, derivatives['thumbnail'].height) == (96, 72)
+    assert (derivatives['medium'].width, derivatives['medium'].height) == (1024, 768)
+    assert all(derivative.source_blob_id == image.blob_id for derivative in derivatives.values())
+
+    thumbnail = media_service.get_image_variant(image, ImageSize.thumbnail)
+    assert thumbnail.content_type == 'image/jpeg'
+    assert thumbnail.filename == 'photo_thumbnail.jpeg'
+    with Image.open(thumbnail.address) as stored:
+        assert stored.size == (96, 72)
+    assert media_service.get_image_variant(image, ImageSize.original) is image
+
+    # the same photo again shares the derivatives of the first
+    media_service.upload_image(upload_file(jpeg(1600, 1200), 'image/jpeg'), 'photo_again.jpg', 'A photo')
+    assert db.query(models.MediaDerivative).count() == 3
+
+
+def test_image_derivatives_are_made_on_first_request(test_db, monkeypatch):
+    monkeypatch.setattr(settings, 'flocki_image_derivatives_at_upload', False)
+    image = media_service.upload_image(upload_file(jpeg(150, 300), 'image/jpeg'), 'photo.jpg', 'A photo')
+    assert db.query(models.MediaDerivative).count() == 0
+
+    small = media_service.get_image_variant(image, ImageSize.small, ImageFormat.webp)
+
+    assert small.content_type == 'image/webp'
+    with Image.open(small.address) as stored:
+        # never scaled up
+        assert stored.size == (150, 300)
+    assert [derivative.variant for derivative in db.query(models.MediaDerivative)] == ['small.webp']
+    assert media_service.get_image_variant(image, ImageSize.small, ImageFormat.webp).address == small.address
+    assert db.query(models.MediaBlob).filter(models.MediaBlob.id == small.blob_id).one().ref_count == 1
+
+    # not an image, served as it is
+    sheet = media_service.upload_media_item(upload_file(PDF), 'A1_chords_C.pdf')
+    assert media_service.get_image_variant(sheet, ImageSize.thumbnail) is sheet
+
+
+def test_backfill_image_derivatives(test_db, monkeypatch):
+    monkeypatch.setattr(settings, 'flocki_image_derivatives_at_upload', False)
+    media_service.upload_image(upload_file(jpeg(800, 600), 'image/jpeg'), 'photo.jpg', 'A photo')
+    media_service.upload_image(upload_file(jpeg(800, 600), 'image/jpeg'), 'photo_again.jpg', 'A photo')
+    media_service.upload_media_item(upload_file(PDF), 'A1_chords_C.pdf')
+
+    assert backfillImageDerivatives.run(db) == 3
+    assert backfillImageDerivatives.run(db) == 0
+    assert sorted(derivative.variant for derivative in db.query(models.MediaDerivative)) == \
+        ['medium', 'small', 'thumbnail']
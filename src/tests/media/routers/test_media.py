@@ -0,0 +1,62 @@
+import io
+import os
+from unittest import mock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.app.config import settings
+from src.app.images.routers import image
+from src.app.media.daos.mediaDAO import MediaDAO
+from src.app.media.routers import media
+from src.app.users.routers.login import get_current_user
+
+app = FastAPI()
+app.include_router(media.router)
+app.include_router(image.router)
+app.dependency_overrides[get_current_user] = lambda: None
+app.dependency_overrides[MediaDAO] = lambda: MediaDAO(db=None)
+client = TestClient(app)
+
+
+@pytest.fixture()
+def local_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'flocki_media_store', 'local')
+    monkeypatch.setattr(settings, 'flocki_media_base_path', str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.parametrize('url', ['/image', '/media/item'])
+@mock.patch.object(MediaDAO, 'add_media_item')
+@mock.patch.object(MediaDAO, 'get_blob')
+def test_upload_image_larger_than_the_image_maximum(mock_get_blob, mock_add_media_item, url, local_store):
+    content = b'\xff\xd8\xff' + b'\x00' * (settings.flocki_image_max_upload_bytes - 2)
+
+    response = client.post(url, files={'file': ('photo.jpg', io.BytesIO(content), 'image/jpeg')})
+
+    # below the maximum of other media, but over the one of images
+    assert len(content) < settings.flocki_media_max_upload_bytes
+    assert response.status_code == 413
+    assert mock_get_blob.call_count == 0
+    assert mock_add_media_item.call_count == 0
+
+
+@mock.patch.object(MediaDAO, 'add_media_item')
+@mock.patch.object(MediaDAO, 'add_blob')
+@mock.patch.object(MediaDAO, 'get_blob')
+def test_upload_media_item_larger_than_the_image_maximum(mock_get_blob, mock_add_blob, mock_add_media_item,
+                                                         local_store):
+    # other media go up to the media maximum
+    content = b'%PDF-1.4\n' + b'\x00' * (30 * 1024 * 1024)
+    mock_get_blob.return_value = None
+    mock_add_blob.side_effect = lambda blob: blob
+    mock_add_media_item.side_effect = lambda media_item: media_item
+
+    response = client.post('/media/item', files={'file': ('minutes.pdf', io.BytesIO(content), 'application/pdf')})
+
+    assert response.status_code == 200
+    media_item = mock_add_media_item.call_args[0][0]
+    assert media_item.content_type == 'application/pdf'
+    assert media_item.size == len(content)
+    assert os.path.getsize(media_item.address) == len(content)
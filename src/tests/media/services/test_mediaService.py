@@ -0,0 +1,295 @@
+import asyncio
+import datetime
+import hashlib
+import io
+import os
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import boto3
+import pytest
+import requests
+from botocore.exceptions import NoCredentialsError
+from fastapi import UploadFile
+from moto import mock_s3
+
+from src.app.config import settings
+from src.app.media.daos.mediaDAO import MediaDAO
+from src.app.media.factories.mediaFactory import MediaFactory
+from src.app.media.models.database import models
+from src.app.media.services.mediaService import MediaService, MediaItemTooLargeException
+from src.app.utils.conditionalRequest import ConditionalRequest
+from src.app.utils.presignedUrlCache import presigned_url_cache
+from src.app.utils.s3Utils import S3Utils
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 100
+
+
+@pytest.fixture()
+def local_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'flocki_media_store', 'local')
+    monkeypatch.setattr(settings, 'flocki_media_base_path', str(tmp_path))
+    monkeypatch.setattr(settings, 'flocki_media_upload_chunk_bytes', 16)
+    return tmp_path
+
+
+def upload_file(content: bytes, content_type: str = 'image/png') -> UploadFile:
+    file = UploadFile(filename='photo.png', file=io.BytesIO(content), content_type=content_type)
+    # a read of everything at once would show up as a read without a size
+    file.file.read = mock.Mock(wraps=file.file.read)
+    return file
+
+
+@mock.patch.object(MediaDAO, 'add_blob')
+@mock.patch.object(MediaDAO, 'get_blob')
+@mock.patch.object(MediaDAO, 'add_media_item')
+def test_upload_media_item_is_copied_in_chunks(mock_add_media_item, mock_get_blob, mock_add_blob, local_store):
+    mock_add_media_item.side_effect = lambda media_item: media_item
+    mock_get_blob.return_value = None
+    mock_add_blob.side_effect = lambda blob: blob
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+    file = upload_file(PNG, content_type='application/octet-stream')
+
+    media_item = media_service.upload_media_item(file, 'photo_1.png', 'A photo')
+
+    sha256 = hashlib.sha256(PNG).hexdigest()
+    assert media_item.address == os.path.join(str(local_store), 'blobs', sha256[:2], sha256[2:4], sha256)
+    assert media_item.filename == 'photo_1.png'
+    with open(media_item.address, 'rb') as f:
+        assert f.read() == PNG
+    assert media_item.size == len(PNG)
+    assert media_item.sha256 == sha256
+    assert media_item.content_type == 'application/octet-stream'
+    assert media_item.detected_content_type == 'image/png'
+    assert all(call.args == (16,) for call in file.file.read.call_args_list)
+    # the temporary file was renamed into place
+    assert os.listdir(local_store) == ['blobs']
+    assert mock_add_blob.call_args.args[0].address == media_item.address
+
+
+@mock.patch.object(MediaDAO, 'get_blob')
+@mock.patch.object(MediaDAO, 'add_media_item')
+def test_upload_media_item_larger_than_the_maximum(mock_add_media_item, mock_get_blob, local_store, monkeypatch):
+    monkeypatch.setattr(settings, 'flocki_media_max_upload_bytes', 64)
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+    file = upload_file(PNG)
+
+    with pytest.raises(MediaItemTooLargeException):
+        media_service.upload_media_item(file, 'photo_1.png')
+
+    # the copy stopped at the chunk that went over the maximum, and nothing is left behind
+    assert file.file.read.call_count == 5
+    assert os.listdir(local_store) == []
+    assert mock_get_blob.call_count == 0
+    assert mock_add_media_item.call_count == 0
+
+
+@mock.patch.object(MediaDAO, 'add_media_item')
+def test_upload_image_has_its_own_maximum(mock_add_media_item, local_store, monkeypatch):
+    monkeypatch.setattr(settings, 'flocki_image_max_upload_bytes', 64)
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+
+    with pytest.raises(MediaItemTooLargeException):
+        media_service.upload_image(upload_file(PNG), 'photo_1.png', 'A photo')
+
+
+@mock.patch.object(MediaDAO, 'add_blob')
+@mock.patch.object(MediaDAO, 'get_blob')
+@mock.patch.object(MediaDAO, 'add_media_item')
+def test_upload_media_item_already_in_the_store(mock_add_media_item, mock_get_blob, mock_add_blob, local_store):
+    mock_add_media_item.side_effect = lambda media_item: media_item
+    mock_get_blob.return_value = models.MediaBlob(id=7, store='local', address='/media/blobs/existing')
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+
+    media_item = media_service.upload_media_item(upload_file(PNG), 'photo_2.png', 'The same photo')
+
+    # only the item is written, it points at the blob that is already stored
+    mock_get_blob.assert_called_once_with('local', hashlib.sha256(PNG).hexdigest())
+    assert mock_add_blob.call_count == 0
+    assert media_item.blob_id == 7
+    assert media_item.address == '/media/blobs/existing'
+    assert media_item.filename == 'photo_2.png'
+    assert os.listdir(local_store) == []
+
+
+def read_body(response):
+    async def read():
+        return b''.join([chunk async for chunk in response.body_iterator])
+
+    return asyncio.run(read())
+
+
+def stored_item(local_store, content: bytes, store='local', sha256=True) -> models.MediaItem:
+    path = os.path.join(str(local_store), 'photo.png')
+    with open(path, 'wb') as f:
+        f.write(content)
+    return models.MediaItem(id=1, created=datetime.datetime(2024, 3, 1, 12, 30, tzinfo=datetime.timezone.utc),
+                            store=store, address=path if store == 'local' else 's3://bucket/blobs/ab/abc',
+                            filename='photo.png', content_type='image/png', size=len(content),
+                            sha256=hashlib.sha256(content).hexdigest() if sha256 else None)
+
+
+def test_media_item_response(local_store):
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+    media_item = stored_item(local_store, PNG)
+
+    response = media_service.create_media_item_response(media_item)
+
+    assert response.status_code == 200
+    assert read_body(response) == PNG
+    assert response.headers['content-length'] == str(len(PNG))
+    assert response.headers['accept-ranges'] == 'bytes'
+    assert response.headers['etag'] == f'"{media_item.sha256}"'
+    assert response.headers['last-modified'] == 'Fri, 01 Mar 2024 12:30:00 GMT'
+    assert response.headers['cache-control'] == f'max-age={settings.flocki_media_max_age_seconds}, immutable'
+    assert response.headers['content-disposition'] == 'attachment; filename="photo.png"'
+
+
+def test_media_item_response_not_modified(local_store):
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+    media_item = stored_item(local_store, PNG)
+    etag = f'"{media_item.sha256}"'
+
+    assert media_service.create_media_item_response(
+        media_item, request=ConditionalRequest(if_none_match=etag)).status_code == 304
+    assert media_service.create_media_item_response(
+        media_item, request=ConditionalRequest(if_modified_since='Fri, 01 Mar 2024 12:30:00 GMT')).status_code == 304
+    assert media_service.create_media_item_response(
+        media_item, request=ConditionalRequest(if_modified_since='Fri, 01 Mar 2024 12:29:59 GMT')).status_code == 200
+    # If-None-Match decides when both are sent
+    assert media_service.create_media_item_response(
+        media_item, request=ConditionalRequest(if_none_match='"other"',
+                                               if_modified_since='Fri, 01 Mar 2024 12:30:00 GMT')).status_code == 200
+
+
+@pytest.mark.parametrize('range, content_range, first, last', [
+    ('bytes=0-9', 'bytes 0-9/108', 0, 9),
+    ('bytes=100-', 'bytes 100-107/108', 100, 107),
+    ('bytes=-8', 'bytes 100-107/108', 100, 107),
+    ('bytes=100-5000', 'bytes 100-107/108', 100, 107),
+])
+def test_media_item_response_range(local_store, range, content_range, first, last):
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+    media_item = stored_item(local_store, PNG)
+
+    response = media_service.create_media_item_response(media_item, request=ConditionalRequest(range=range))
+
+    assert response.status_code == 206
+    assert response.headers['content-range'] == content_range
+    assert response.headers['content-length'] == str(last - first + 1)
+    assert read_body(response) == PNG[first:last + 1]
+
+
+def test_media_item_response_range_not_served(local_store):
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+    media_item = stored_item(local_store, PNG)
+
+    response = media_service.create_media_item_response(media_item, request=ConditionalRequest(range='bytes=108-'))
+    assert response.status_code == 416
+    assert response.headers['content-range'] == 'bytes */108'
+    # a range of a representation the client no longer has, or of several parts, gets the whole content
+    for request in [ConditionalRequest(range='bytes=0-9', if_range='"other"'),
+                    ConditionalRequest(range='bytes=0-9,20-29')]:
+        response = media_service.create_media_item_response(media_item, request=request)
+        assert response.status_code == 200
+        assert read_body(response) == PNG
+
+
+@mock.patch.object(S3Utils, 'head_file')
+@mock.patch.object(S3Utils, 'get_file')
+def test_media_item_response_s3_range(mock_get_file, mock_head_file, local_store):
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+    mock_get_file.return_value = {'Body': mock.Mock(iter_chunks=mock.Mock(return_value=iter([PNG[10:20]])))}
+    media_item = stored_item(local_store, PNG, store='s3')
+
+    response = media_service.create_media_item_response(media_item, request=ConditionalRequest(range='bytes=10-19'))
+
+    # S3 is asked for the range, the size is known from the item
+    mock_get_file.assert_called_once_with('blobs/ab/abc', 'bytes=10-19')
+    assert mock_head_file.call_count == 0
+    assert response.status_code == 206
+    assert response.headers['content-range'] == 'bytes 10-19/108'
+    assert read_body(response) == PNG[10:20]
+
+    # an item from before the sizes were kept asks S3 for its size and etag
+    mock_head_file.return_value = {'ContentLength': len(PNG), 'ETag': '"s3-etag"'}
+    mock_get_file.return_value = {'Body': mock.Mock(iter_chunks=mock.Mock(return_value=iter([PNG])))}
+    response = media_service.create_media_item_response(stored_item(local_store, PNG, store='s3', sha256=False))
+    assert response.headers['etag'] == '"s3-etag"'
+    assert response.headers['content-length'] == str(len(PNG))
+
+
+@pytest.fixture()
+def s3_store(monkeypatch):
+    # moto stands in for S3, including the presigned urls
+    with mock_s3():
+        boto3.resource('s3', region_name='eu-west-1').create_bucket(
+            Bucket='flocki-test-media', CreateBucketConfiguration={'LocationConstraint': 'eu-west-1'})
+        monkeypatch.setattr(settings, 'flocki_media_store', 's3')
+        monkeypatch.setattr(settings, 'flocki_s3_bucket_name', 'flocki-test-media')
+        monkeypatch.setattr(settings, 'flocki_s3_region_name', 'eu-west-1')
+        monkeypatch.setattr(settings, 'flocki_s3_serving_mode', 'redirect')
+        presigned_url_cache.clear()
+        yield
+
+
+@mock.patch.object(MediaDAO, 'add_blob')
+@mock.patch.object(MediaDAO, 'get_blob')
+@mock.patch.object(MediaDAO, 'add_media_item')
+def s3_media_item(mock_add_media_item, mock_get_blob, mock_add_blob) -> models.MediaItem:
+    mock_add_media_item.side_effect = lambda media_item: media_item
+    mock_get_blob.return_value = None
+    mock_add_blob.side_effect = lambda blob: blob
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+    return media_service.upload_media_item(upload_file(PNG), 'photo_1.png', 'A photo')
+
+
+def test_s3_media_item_redirect(s3_store):
+    media_item = s3_media_item()
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+
+    with mock.patch.object(S3Utils, 'presigned_url', wraps=media_service.s3Utils.presigned_url) as mock_presigned_url:
+        response = media_service.create_media_item_response(media_item, as_attachment=False)
+        again = media_service.create_media_item_response(media_item, as_attachment=False)
+
+    assert response.status_code == 302
+    url = response.headers['location']
+    assert f'/blobs/{media_item.sha256[:2]}/{media_item.sha256}' in url
+    # the signature is reused, and the redirect is cached no longer than that
+    assert again.headers['location'] == url
+    assert mock_presigned_url.call_count == 1
+    max_age = settings.flocki_s3_presigned_url_expiry_seconds - settings.flocki_s3_presigned_url_margin_seconds
+    assert response.headers['cache-control'] in (f'private, max-age={max_age}', f'private, max-age={max_age - 1}')
+    assert requests.get(url).content == PNG
+    # S3 answers with the headers of the item, not of the blob
+    query = parse_qs(urlparse(url).query)
+    assert query['response-content-type'] == ['image/png']
+    assert query['response-content-disposition'] == ['inline; filename="photo_1.png"']
+
+    # a revalidation is answered by the api
+    response = media_service.create_media_item_response(
+        media_item, request=ConditionalRequest(if_none_match=f'"{media_item.sha256}"'))
+    assert response.status_code == 304
+
+
+def test_s3_media_item_proxy(s3_store, monkeypatch):
+    monkeypatch.setattr(settings, 'flocki_s3_serving_mode', 'proxy')
+    media_item = s3_media_item()
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+
+    response = media_service.create_media_item_response(media_item, request=ConditionalRequest(range='bytes=8-15'))
+
+    assert response.status_code == 206
+    assert read_body(response) == PNG[8:16]
+
+
+@mock.patch.object(S3Utils, 'presigned_url')
+def test_s3_media_item_streamed_without_presigned_url(mock_presigned_url, s3_store):
+    mock_presigned_url.side_effect = NoCredentialsError()
+    media_item = s3_media_item()
+    media_service = MediaService(media_DAO=MediaDAO(), media_factory=MediaFactory())
+
+    response = media_service.create_media_item_response(media_item)
+
+    assert response.status_code == 200
+    assert read_body(response) == PNG
@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.app.database import Base
+from src.app.media.models.database import models as media_models
+from src.app.people.daos.congregationExportDAO import CongregationExportDAO
+from src.app.people.models.database import models
+from src.app.users.models.database import models as user_models
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_db.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture()
+def test_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    try:
+        Base.metadata.drop_all(bind=engine)
+    except Exception as e:
+        print("teardown of DB failed")
+        print(e)
+
+
+db = TestingSessionLocal()
+export_DAO = CongregationExportDAO(db)
+
+
+def test_stream_congregation_rows(test_db):
+    address = models.Address(type="home", street="Main Road", city="Cape Town")
+    people = [models.Person(first_name=f"Person {i}", last_name="Export") for i in range(5)]
+    for person in people:
+        person.addresses.append(models.PeopleAddress(address=address))
+    db.add(address)
+    db.add_all(people)
+    db.flush()
+    db.add(models.Household(leader_id=people[0].id, address=address, people=people[:3]))
+    db.commit()
+    loaded_entities = len(db.identity_map)
+
+    with export_DAO.snapshot():
+        # batches smaller than the number of rows
+        addresses = list(export_DAO.stream_addresses(2))
+        exported_people = list(export_DAO.stream_people(2))
+        people_addresses = list(export_DAO.stream_people_addresses(2))
+        households = list(export_DAO.stream_households(2))
+        memberships = list(export_DAO.stream_memberships(2))
+
+    assert addresses[0]['street'] == "Main Road"
+    assert [person['first_name'] for person in exported_people] == [f"Person {i}" for i in range(5)]
+    assert {(link['person_id'], link['address_id']) for link in people_addresses} == {(person.id, address.id) for person in people}
+    assert households == [{'id': households[0]['id'], 'leader_id': people[0].id, 'address_id': address.id,
+                           'current_household_image_id': None}]
+    assert [membership['person_id'] for membership in memberships] == [person.id for person in people[:3]]
+    # the rows are plain values, no entities are loaded
+    assert len(db.identity_map) == loaded_entities
@@ -3,14 +3,21 @@ from datetime import datetime
 import pytest
 
 from src.app.database import get_db, SessionLocal, Base
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from src.app.media.models.database import models as media_models
 
 from src.app.people.models.database import models
 # test_database.py
 from src.app.people.daos.householdDAO import HouseholdDAO
+from src.app.media.factories.mediaFactory import MediaFactory
+from src.app.people.factories.addressFactory import AddressFactory
+from src.app.people.factories.householdFactory import HouseholdFactory
+from src.app.people.factories.peopleFactory import PeopleFactory
+from src.app.people.models.household import HouseholdDepth, ViewHouseholdSummary, ViewHousehold, ViewHouseholdWithMembers
 from src.app.people.models.database.models import HouseholdImage
+from src.app.utils.bulkLoader import BulkLoader
+from src.app.utils.cursorPagination import CursorParams
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test_db.db"
 engine = create_engine(
@@ -89,11 +96,49 @@ def test_get_household_by_id_one_household(test_db):
     assert household.address_id == 1
 
 
+def test_get_current_household_image(test_db):
+    image = media_models.MediaItem(address="1.jpg", store="local", created=datetime.now())
+    household_with_image = models.Household(leader_id=1, address_id=1, current_household_image=image)
+    household_without_image = models.Household(leader_id=1, address_id=1)
+    db.add_all([household_with_image, household_without_image])
+    db.commit()
+
+    household_id, current_image = householdDAO.get_current_household_image(household_with_image.id)
+    assert household_id == household_with_image.id
+    assert current_image.id == image.id
+    assert tuple(householdDAO.get_current_household_image(household_without_image.id)) == (household_without_image.id, None)
+    assert householdDAO.get_current_household_image(99) is None
+
+
 def test_get_household_by_id_no_household(test_db):
     household = householdDAO.get_household_by_id(99)
     assert household is None
 
 
+def test_get_households_by_ids(test_db, monkeypatch):
+    households = [models.Household(leader_id=1, address_id=1) for _ in range(3)]
+    db.add_all(households)
+    db.commit()
+    ids = [household.id for household in households]
+    # a small chunk size so that the ids are split over more than one IN list
+    monkeypatch.setattr(BulkLoader, 'CHUNK_SIZE', 2)
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        households_by_id = householdDAO.get_households_by_ids(ids + [99, ids[0], None])
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    assert set(households_by_id) == set(ids)
+    assert all(households_by_id[id].id == id for id in ids)
+    assert len(statements) == 2
+    assert BulkLoader.missing_ids(ids + [99, 98, 99], households_by_id) == [99, 98]
+
+
 def test_add_household(test_db):
     household = models.Household(
         leader_id=1,
@@ -135,6 +180,7 @@ def test_add_household_image(test_db):
     assert len(household_queried.household_images) == 1
     assert household_queried.household_images[0].image.address == "test"
     assert household_queried.household_images[0].image.description == "test"
+    assert household_queried.current_household_image.address == "test"
 
 
 def test_add_person_to_household(test_db):
@@ -231,6 +277,7 @@ def test_update_household(test_db):
     assert household_queried.household_images is not None
     assert len(household_queried.household_images) == 2
     assert household_queried.household_images[1].image.address == "new_test"
+    assert household_queried.current_household_image.address == "new_test"
 
 
 def test_get_people_not_in_household(test_db):
@@ -280,3 +327,173 @@ def test_get_people_not_in_household(test_db):
     assert people[1].last_name == "b_last_name"
     assert people[2].first_name == "test"
     assert people[2].last_name == "c_last_name"
+
+
+def test_find_people_not_in_household_excludes_members_and_prioritises_leader_last_name(test_db):
+    leader = models.Person(first_name="Leader", last_name="Smith")
+    member = models.Person(first_name="Member", last_name="Smith")
+    candidates = [
+        models.Person(first_name="Anna", last_name="Adams"),
+        models.Person(first_name="Zed", last_name="Smith"),
+        models.Person(first_name="Bob", last_name="Brown"),
+        models.Person(first_name="Amy", last_name="Smith"),
+    ]
+    db.add_all([leader, member] + candidates)
+    db.commit()
+    household = models.Household(leader_id=leader.id, address_id=1)
+    db.add(household)
+    db.commit()
+    household.people.append(leader)
+    household.people.append(member)
+    db.commit()
+
+    first_page = householdDAO.find_people_not_in_household_with_name_or_surname_starting_with(
+        household.id, None, None, CursorParams(size=3))
+    second_page = householdDAO.find_people_not_in_household_with_name_or_surname_starting_with(
+        household.id, None, None, CursorParams(cursor=first_page.next_cursor, size=3))
+
+    assert [person.first_name for person in first_page.items] == ["Amy", "Zed", "Anna"]
+    assert [person.first_name for person in second_page.items] == ["Bob"]
+    assert second_page.next_cursor is None
+
+
+def test_find_people_not_in_household_with_name(test_db):
+    household = models.Household(leader_id=1, address_id=1)
+    db.add(household)
+    db.add_all([models.Person(first_name="Anna", last_name="Adams"), models.Person(first_name="Bob", last_name="Brown")])
+    db.commit()
+
+    people_page = householdDAO.find_people_not_in_household_with_name_or_surname_starting_with(household.id, "an", None)
+
+    assert [person.first_name for person in people_page.items] == ["Anna"]
+
+
+def test_view_dependencies_of_people_and_households(test_db):
+    leader = models.Person(first_name="Leader", last_name="Smith")
+    member = models.Person(first_name="Member", last_name="Smith")
+    other = models.Person(first_name="Other", last_name="Jones")
+    db.add_all([leader, member, other])
+    db.commit()
+    household = models.Household(leader_id=leader.id, address_id=1)
+    other_household = models.Household(leader_id=other.id, address_id=1)
+    db.add_all([household, other_household])
+    db.commit()
+    household.people.append(member)
+    db.commit()
+
+    # the leader is not a member here, but still depends on the household
+    assert householdDAO.get_household_ids_for_people({leader.id}) == {household.id}
+    assert householdDAO.get_household_ids_for_people({member.id, other.id}) == {household.id, other_household.id}
+    assert householdDAO.get_people_ids_in_households({household.id}) == {leader.id, member.id}
+    assert householdDAO.get_household_ids_for_people(set()) == set()
+
+
+def test_increment_versions(test_db):
+    household = models.Household(leader_id=1, address_id=1)
+    other_household = models.Household(leader_id=1, address_id=1)
+    db.add_all([household, other_household])
+    db.commit()
+
+    householdDAO.increment_versions({household.id})
+
+    assert householdDAO.get_household_version(household.id) == 2
+    assert householdDAO.get_household_version(other_household.id) == 1
+    assert householdDAO.get_household_version(99) is None
+
+
+def test_household_views_by_depth_load_a_fixed_number_of_statements(test_db):
+    household_factory = HouseholdFactory(people_factory=PeopleFactory(address_factory=AddressFactory(), media_factory=MediaFactory()),
+                                         media_factory=MediaFactory())
+    for i in range(3):
+        address = models.Address(type="home", street=f"Street {i}")
+        people = []
+        for j in range(3):
+            person = models.Person(first_name=f"Person {i}{j}", last_name="Depth",
+                                   current_profile_image=media_models.MediaItem(address=f"{i}{j}.jpg", store="local", created=datetime.now()))
+            person.social_media_links.append(models.SocialMediaLink(type="facebook", url=f"https://www.facebook.com/{i}{j}"))
+            person.addresses.append(models.PeopleAddress(address=address))
+            people.append(person)
+        db.add_all(people)
+        db.flush()
+        db.add(models.Household(leader_id=people[0].id, address=address, people=people))
+    db.commit()
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def build_page(depth):
+        db.expunge_all()
+        statements.clear()
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            return [household_factory.createHouseholdFromHouseholdEntity(household, include_household_image=True, depth=depth)
+                    for household in householdDAO.get_all_households(depth=depth).items]
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    households = build_page(HouseholdDepth.reference)
+    # count, households with their leaders and addresses, people
+    assert len(statements) == 3
+    assert isinstance(households[0], ViewHouseholdSummary)
+    assert households[0].leader.first_name == "Person 00"
+    assert households[0].people[0].profile_image is None
+
+    households = build_page(HouseholdDepth.basic)
+    assert len(statements) == 3
+    assert isinstance(households[0], ViewHousehold)
+    assert households[0].people[0].profile_image is not None
+
+    households = build_page(HouseholdDepth.full)
+    # and the social media links and addresses of the people, but never their households
+    assert len(statements) == 5
+    assert isinstance(households[0], ViewHouseholdWithMembers)
+    assert households[0].people[0].social_media_links[0].url == "https://www.facebook.com/00"
+    assert households[0].people[0].households is None
+
+
+def test_update_household_with_membership_changes(test_db):
+    address = models.Address(type="home", street="Street")
+    people = [models.Person(first_name=f"Person {i}") for i in range(4)]
+    db.add_all(people + [address])
+    db.flush()
+    household = models.Household(leader_id=people[0].id, address=address, people=people[:3])
+    db.add(household)
+    db.commit()
+    assert householdDAO.get_member_ids(household.id) == [people[0].id, people[1].id, people[2].id]
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        householdDAO.update_household(household, people[2].id, household.address_id, None,
+                                      [people[3].id], [people[0].id, people[1].id])
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    # the household, one insert and one delete
+    assert len([statement for statement in statements if 'household_people' in statement]) == 2
+    assert householdDAO.get_member_ids(household.id) == [people[2].id, people[3].id]
+    assert household.leader_id == people[2].id
+    assert [person.id for person in household.people] == [people[2].id, people[3].id]
+
+
+def test_update_household_rolls_back_membership_changes(test_db):
+    address = models.Address(type="home", street="Street")
+    people = [models.Person(first_name=f"Person {i}") for i in range(2)]
+    db.add_all(people + [address])
+    db.flush()
+    household = models.Household(leader_id=people[0].id, address=address, people=people[:1])
+    db.add(household)
+    db.commit()
+
+    with pytest.raises(Exception):
+        # address_id is not nullable
+        householdDAO.update_household(household, people[1].id, None, None, [people[1].id], [people[0].id])
+
+    assert householdDAO.get_member_ids(household.id) == [people[0].id]
+    assert household.leader_id == people[0].id
@@ -4,16 +4,27 @@ from unittest import mock
 # from main import app
 import pytest
 from fastapi_pagination import Params
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
-from src.app.database import Base
+from src.app.database import Base, UnitOfWork
+from src.app.media.factories.mediaFactory import MediaFactory
 from src.app.media.models.database import models as media_models
+from src.app.people.daos.loaderProfiles import PersonLoaderProfile
 from src.app.people.daos.peopleDAO import PeopleDAO
+from src.app.people.factories.addressFactory import AddressFactory
+from src.app.people.factories.peopleFactory import PeopleFactory
+from src.app.people.jobs import backfillMonthDayOrdinals, backfillCurrentImages, mergeDuplicateAddresses, geocodeAddresses
+from src.app.church.models.database.models import Church
+from src.app.people.daos.addressDAO import AddressDAO
 # test_database.py
 from src.app.people.models.database import models
 from src.app.people.models.database.models import Person, SocialMediaLink
+from src.app.people.models.people import FullViewPerson, PERSON_RELATIONSHIPS
 from src.app.utils.DateUtils import DateUtils
+from src.app.utils.addressFingerprint import AddressFingerprint
+from src.app.utils.cursorPagination import CursorParams, InvalidCursorException
+from src.app.utils.fieldSelection import FieldSelection
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test_db.db"
 engine = create_engine(
@@ -144,6 +155,68 @@ def test_get_all_pagination_ordered_by_id(test_db):
     assert people[0].date_of_birth == new_person_2.date_of_birth
 
 
+def test_get_all_by_cursor_walks_forward_and_back_in_sort_order(test_db):
+    # includes NULL last names and birth dates, which sort last like in the offset mode on postgres
+    people = [
+        models.Person(first_name="A", last_name="B", date_of_birth=datetime(1984, 1, 1)),
+        models.Person(first_name="A", last_name="A", date_of_birth=datetime(1984, 1, 1)),
+        models.Person(first_name="A", last_name="A", date_of_birth=datetime(1960, 1, 1)),
+        models.Person(first_name="A", last_name="A"),
+        models.Person(first_name="B", last_name="A", date_of_birth=datetime(1970, 1, 1)),
+        models.Person(first_name="C"),
+        models.Person(first_name="A"),
+    ]
+    for person in people:
+        db.add(person)
+    db.commit()
+    expected_ids = [people[i].id for i in [2, 1, 3, 4, 0, 6, 5]]
+
+    seen_ids = []
+    page = peopleDAO.get_all_by_cursor(CursorParams(size=2))
+    assert page.prev_cursor is None
+    pages = [page]
+    while True:
+        seen_ids.extend(person.id for person in page.items)
+        if page.next_cursor is None:
+            break
+        page = peopleDAO.get_all_by_cursor(CursorParams(cursor=page.next_cursor, size=2))
+        pages.append(page)
+
+    assert seen_ids == expected_ids
+    assert len(pages) == 4
+
+    previous_page = peopleDAO.get_all_by_cursor(CursorParams(cursor=pages[-1].prev_cursor, size=2))
+    assert [person.id for person in previous_page.items] == [person.id for person in pages[-2].items]
+    first_page = peopleDAO.get_all_by_cursor(CursorParams(cursor=pages[1].prev_cursor, size=2))
+    assert [person.id for person in first_page.items] == expected_ids[:2]
+    assert first_page.prev_cursor is None
+
+
+def test_get_all_by_cursor_does_not_count(test_db):
+    for i in range(3):
+        db.add(models.Person(first_name=f"Person {i}", last_name="A"))
+    db.commit()
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        page = peopleDAO.get_all_by_cursor(CursorParams(size=2))
+        peopleDAO.get_all_by_cursor(CursorParams(cursor=page.next_cursor, size=2))
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    assert not [statement for statement in statements if "count(" in statement.lower()]
+
+
+def test_get_all_by_cursor_invalid_cursor(test_db):
+    with pytest.raises(InvalidCursorException):
+        peopleDAO.get_all_by_cursor(CursorParams(cursor="not a cursor", size=2))
+
+
 def test_get_all_none(test_db):
     new_person_1 = models.Person(
         first_name="Test Name"
@@ -161,6 +234,81 @@ def test_get_all_none(test_db):
     assert people[1].first_name == new_person_2.first_name
 
 
+def create_person_graph(first_name, household):
+    image = media_models.MediaItem(address=first_name + ".jpg", store="local", created=datetime.now())
+    person = models.Person(first_name=first_name, last_name="Graph")
+    person.social_media_links.append(models.SocialMediaLink(type="facebook", url="https://www.facebook.com/" + first_name.replace(" ", "")))
+    person.addresses.append(models.PeopleAddress(address=models.Address(type="home", street=first_name + " street")))
+    person.profile_images.append(models.PersonImage(image=image, created=datetime.now()))
+    person.current_profile_image = image
+    db.add(person)
+    household.people.append(person)
+    return person
+
+
+def count_statements(fn):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return len(statements)
+
+
+def test_get_all_statement_count_does_not_grow_with_page_size(test_db):
+    leader = models.Person(first_name="Leader", last_name="Graph")
+    household_address = models.Address(type="home", street="Household street")
+    db.add(leader)
+    db.add(household_address)
+    db.commit()
+    household = models.Household(leader_id=leader.id, address=household_address)
+    household_image = media_models.MediaItem(address="household.jpg", store="local", created=datetime.now())
+    household.household_images.append(models.HouseholdImage(image=household_image, created=datetime.now()))
+    household.current_household_image = household_image
+    db.add(household)
+    for i in range(8):
+        create_person_graph(f"Person {i}", household)
+    db.commit()
+
+    people_factory = PeopleFactory(address_factory=AddressFactory(), media_factory=MediaFactory())
+
+    def build_page(size):
+        db.expunge_all()
+        for person in peopleDAO.get_all(Params(page=1, size=size)).items:
+            people_factory.create_person_from_person_entity(person, include_households=True, include_profile_image=True)
+
+    small_page_statements = count_statements(lambda: build_page(2))
+    large_page_statements = count_statements(lambda: build_page(9))
+
+    assert small_page_statements == large_page_statements
+
+
+def test_get_person_by_id_detail_profile_statement_count(test_db):
+    household_address = models.Address(type="home", street="Household street")
+    db.add(household_address)
+    household = models.Household(leader_id=1, address=household_address)
+    db.add(household)
+    people = [create_person_graph(f"Person {i}", household) for i in range(5)]
+    db.commit()
+    person_id = people[0].id
+
+    people_factory = PeopleFactory(address_factory=AddressFactory(), media_factory=MediaFactory())
+
+    def build_detail():
+        db.expunge_all()
+        person = peopleDAO.get_person_by_id(person_id, loader_profile=PersonLoaderProfile.detail)
+        people_factory.create_person_from_person_entity(person, include_households=True, include_profile_image=True)
+
+    # person (+user), social links, addresses, profile images, households, household members, their images,
+    # household leader/address and household images: the count is fixed regardless of the household size.
+    assert count_statements(build_detail) <= 10
+
+
 def test_get_person_by_id_person_found(test_db):
     # test get_person_by_id
     new_person_1 = models.Person(
@@ -174,6 +322,20 @@ def test_get_person_by_id_person_found(test_db):
     assert person.first_name == new_person_1.first_name
 
 
+def test_get_current_profile_image(test_db):
+    image = media_models.MediaItem(address="1.jpg", store="local", created=datetime.now())
+    person_with_image = models.Person(first_name="With Image", current_profile_image=image)
+    person_without_image = models.Person(first_name="Without Image")
+    db.add_all([person_with_image, person_without_image])
+    db.commit()
+
+    person_id, current_image = peopleDAO.get_current_profile_image(person_with_image.id)
+    assert person_id == person_with_image.id
+    assert current_image.id == image.id
+    assert tuple(peopleDAO.get_current_profile_image(person_without_image.id)) == (person_without_image.id, None)
+    assert peopleDAO.get_current_profile_image(-1) is None
+
+
 def test_get_person_by_id_person_not_found(test_db):
     # test get_person_by_id
     new_person_1 = models.Person(
@@ -281,6 +443,7 @@ def test_update_person_including_image(test_db):
     assert updated_person.registered_date == datetime(2022, 1, 1, 0, 0).date()
     assert updated_person.date_of_birth == datetime(1984, 1, 1, 0, 0).date()
     assert updated_person.profile_images[0].id == image_entity.id
+    assert updated_person.current_profile_image_id == image_entity.id
 
 
 def test_get_existing_social_media_links(test_db):
@@ -422,6 +585,7 @@ def test_person_create_with_image(test_db):
     assert created_person.marital_status == "single"
     assert created_person.profile_images[0] is not None
     assert created_person.profile_images[0].image.address == "test_image.jpg"
+    assert created_person.current_profile_image.address == "test_image.jpg"
 
 
 def test_add_person_image(test_db):
@@ -445,6 +609,7 @@ def test_add_person_image(test_db):
     person = db.query(models.Person).filter(models.Person.id == new_person_1.id).first()
     assert person.profile_images[0] is not None
     assert person.profile_images[0].image.address == "test_image.jpg"
+    assert person.current_profile_image_id == new_image_entity.id
 
 
 def test_find_people_by_email_or_first_name_and_last_name_match_email(test_db):
@@ -882,3 +1047,427 @@ def test_find_all_people_with_anniversary_before_date_in_the_following_year(mock
     assert len(people) == 2
     assert people[0].id == new_person_nov_15.id
     assert people[1].id == new_person_jan_23.id
+
+
+def test_find_people_with_name_or_surname_starting_with_name(test_db):
+    smith = models.Person(first_name="John", last_name="Smith")
+    johnson = models.Person(first_name="Anna", last_name="Johnson")
+    other = models.Person(first_name="Peter", last_name="Parker")
+    db.add_all([smith, johnson, other])
+    db.commit()
+
+    people = peopleDAO.find_people_with_name_or_surname_starting_with("jo", None)
+
+    assert [person.id for person in people] == [johnson.id, smith.id]
+
+
+def test_find_people_with_name_or_surname_starting_with_name_and_surname(test_db):
+    smith = models.Person(first_name="John", last_name="Smith")
+    jones = models.Person(first_name="John", last_name="Jones")
+    db.add_all([smith, jones])
+    db.commit()
+
+    people = peopleDAO.find_people_with_name_or_surname_starting_with("JOHN", "sm")
+
+    assert [person.id for person in people] == [smith.id]
+
+
+def test_find_people_with_name_or_surname_starting_with_limit_and_wildcards(test_db):
+    for i in range(5):
+        db.add(models.Person(first_name=f"Person {i}", last_name="Smith"))
+    db.add(models.Person(first_name="Percent", last_name="100%"))
+    db.commit()
+
+    assert len(peopleDAO.find_people_with_name_or_surname_starting_with(None, "smith", limit=3)) == 3
+    assert peopleDAO.find_people_with_name_or_surname_starting_with(None, "%") == []
+    assert len(peopleDAO.find_people_with_name_or_surname_starting_with(None, "100%")) == 1
+
+
+def test_find_people_with_name_or_surname_starting_with_sees_renames(test_db):
+    person = models.Person(first_name="John", last_name="Smith")
+    db.add(person)
+    db.commit()
+    assert len(peopleDAO.find_people_with_name_or_surname_starting_with(None, "smi")) == 1
+
+    peopleDAO.update_person(person.id, {'last_name': 'Jones'})
+
+    assert peopleDAO.find_people_with_name_or_surname_starting_with(None, "smi") == []
+    assert len(peopleDAO.find_people_with_name_or_surname_starting_with(None, "jon")) == 1
+
+
+def test_month_day_ordinals_kept_in_sync_on_create_and_update(test_db):
+    person = peopleDAO.create_person(models.Person(first_name="A", date_of_birth=datetime(1960, 11, 15)))
+    assert person.birth_month_day == 1115
+    assert person.marriage_month_day is None
+
+    peopleDAO.update_person(person.id, {'date_of_birth': datetime(1960, 2, 29).date(),
+                                        'marriage_date': datetime(1985, 3, 1).date()})
+    db.refresh(person)
+    assert person.birth_month_day == 229
+    assert person.marriage_month_day == 301
+
+
+@mock.patch.object(DateUtils, 'get_current_datetime')
+def test_find_people_with_birthday_ordered_by_upcoming_date(mock_get_current_datetime, test_db):
+    mock_get_current_datetime.return_value = datetime(2023, 11, 15, 0, 0, 0)
+
+    today = models.Person(first_name="Today", date_of_birth=datetime(1990, 11, 15))
+    jan_1 = models.Person(first_name="Jan", date_of_birth=datetime(2001, 1, 1))
+    dec_31 = models.Person(first_name="Dec", date_of_birth=datetime(1950, 12, 31))
+    nov_16 = models.Person(first_name="Nov", date_of_birth=datetime(1970, 11, 16))
+    after_window = models.Person(first_name="Feb", date_of_birth=datetime(1970, 2, 2))
+    db.add_all([today, jan_1, dec_31, nov_16, after_window])
+    db.commit()
+
+    people = peopleDAO.find_people_with_birthday_before_given_date(datetime(2024, 2, 1, 0, 0, 0))
+
+    assert [person.id for person in people] == [nov_16.id, dec_31.id, jan_1.id]
+
+
+def test_backfill_month_day_ordinals(test_db):
+    db.add(models.Person(first_name="A", date_of_birth=datetime(1960, 11, 15), marriage_date=datetime(1980, 1, 2)))
+    db.add(models.Person(first_name="B"))
+    db.commit()
+    # simulate rows that existed before the columns were added
+    db.query(models.Person).update({'birth_month_day': None, 'marriage_month_day': None})
+    db.commit()
+
+    assert backfillMonthDayOrdinals.run(db, batch_size=1) == 2
+
+    people = db.query(models.Person).order_by(models.Person.id).all()
+    assert [(person.birth_month_day, person.marriage_month_day) for person in people] == [(1115, 102), (None, None)]
+
+
+def test_backfill_current_images(test_db):
+    old_image = media_models.MediaItem(address="old.jpg", store="local", created=datetime.now())
+    new_image = media_models.MediaItem(address="new.jpg", store="local", created=datetime.now())
+    person = models.Person(first_name="A")
+    person.profile_images.append(models.PersonImage(image=old_image, created=datetime.now()))
+    person.profile_images.append(models.PersonImage(image=new_image, created=datetime.now()))
+    without_images = models.Person(first_name="B")
+    household_address = models.Address(type="home")
+    db.add_all([person, without_images, household_address])
+    db.commit()
+    household = models.Household(leader_id=person.id, address=household_address)
+    household.household_images.append(models.HouseholdImage(image=old_image, created=datetime.now()))
+    db.add(household)
+    db.commit()
+
+    assert backfillCurrentImages.run(db) == 2
+
+    db.expire_all()
+    assert person.current_profile_image_id == new_image.id
+    assert without_images.current_profile_image_id is None
+    assert household.current_household_image_id == old_image.id
+
+
+def test_get_all_with_sparse_fieldset_skips_unselected_relationships(test_db):
+    household_address = models.Address(type="home", street="Household street")
+    db.add(household_address)
+    household = models.Household(leader_id=1, address=household_address)
+    db.add(household)
+    for i in range(3):
+        create_person_graph(f"Person {i}", household)
+    db.commit()
+
+    people_factory = PeopleFactory(address_factory=AddressFactory(), media_factory=MediaFactory())
+
+    def build_page(selection):
+        db.expunge_all()
+        for person in peopleDAO.get_all(Params(page=1, size=10), selection).items:
+            people_factory.create_person_from_person_entity(person, include_households=True,
+                                                            include_profile_image=True, selection=selection)
+
+    selection = FieldSelection.parse("id,first_name,last_name,profile_image", None, set(FullViewPerson.__fields__),
+                                     PERSON_RELATIONSHIPS)
+    # count, people joined to their current image, and nothing else
+    assert count_statements(lambda: build_page(selection)) == 2
+    assert count_statements(lambda: build_page(None)) > 2
+
+
+def test_person_version_increments(test_db):
+    person = models.Person(first_name="John", last_name="Smith")
+    other_person = models.Person(first_name="Jane", last_name="Smith")
+    db.add_all([person, other_person])
+    db.commit()
+
+    assert peopleDAO.get_person_version(person.id) == 1
+    peopleDAO.increment_versions({person.id})
+    peopleDAO.increment_versions(set())
+
+    assert peopleDAO.get_person_version(person.id) == 2
+    assert peopleDAO.get_person_version(other_person.id) == 1
+    assert peopleDAO.get_person_version(99) is None
+
+
+def test_create_people(test_db):
+    household_address = models.Address(type="home", street="Household street")
+    db.add(household_address)
+    household = models.Household(leader_id=1, address=household_address)
+    existing_person = models.Person(first_name="John", last_name="Smith", email="John@Test.com",
+                                    date_of_birth=datetime(1980, 1, 1).date())
+    db.add_all([household, existing_person])
+    db.commit()
+
+    new_people = [models.Person(first_name="Jane", last_name="Smith"), models.Person(first_name="Mary", last_name="Jones")]
+    person_ids = peopleDAO.create_people(new_people, [household.id, None])
+
+    assert len(person_ids) == 2
+    assert [person.first_name for person in household.people] == ["Jane"]
+    assert household.people[0].id == person_ids[0]
+    assert peopleDAO.find_existing_emails({"john@test.com", "jane@test.com"}) == {"john@test.com"}
+    assert peopleDAO.find_existing_name_keys({"smith"}) == {("john", "smith", datetime(1980, 1, 1).date()),
+                                                            ("jane", "smith", None)}
+
+
+def test_person_writes_in_a_unit_of_work_commit_once(test_db):
+    household_address = models.Address(type="home", street="Household street")
+    db.add(household_address)
+    db.commit()
+    household = models.Household(leader_id=1, address_id=household_address.id)
+    db.add(household)
+    db.commit()
+    commits = []
+
+    def after_commit(session):
+        commits.append(session)
+
+    event.listen(db, "after_commit", after_commit)
+    try:
+        with UnitOfWork(db):
+            person = peopleDAO.create_person(models.Person(first_name="John", last_name="Smith"))
+            # flushed, so it can be linked and queried before the commit
+            assert person.id is not None
+            household.people.append(person)
+            UnitOfWork.commit(db)
+            assert commits == []
+    finally:
+        event.remove(db, "after_commit", after_commit)
+    assert len(commits) == 1
+    assert [member.first_name for member in household.people] == ["John"]
+
+
+def test_person_writes_in_a_unit_of_work_roll_back_together(test_db):
+    with pytest.raises(ValueError):
+        with UnitOfWork(db):
+            peopleDAO.create_person(models.Person(first_name="John", last_name="Smith"))
+            raise ValueError("failed half way")
+
+    assert db.query(models.Person).count() == 0
+    # the session is usable again and DAOs commit on their own outside a unit of work
+    peopleDAO.create_person(models.Person(first_name="Jane", last_name="Smith"))
+    db.rollback()
+    assert db.query(models.Person).count() == 1
+
+
+def test_address_fingerprint_is_maintained_and_used_for_lookups(test_db):
+    address_DAO = AddressDAO(db)
+    address = address_DAO.create_address(models.Address(type="home", street_number="12", street="Main Road", suburb="Rondebosch",
+                                                         city="Cape Town", province="Western Cape", country="South Africa"))
+    assert address.fingerprint is not None
+
+    # case, punctuation, whitespace and abbreviations are folded
+    found = address_DAO.find_address("home", "12", " main  rd.", "RONDEBOSCH", "cape town", "WC", "ZA", None)
+    assert found.id == address.id
+    assert address_DAO.find_address("business", "12", "Main Road", "Rondebosch", "Cape Town", "Western Cape",
+                                    "South Africa", None) is None
+
+    address_DAO.update_address(address.id, {'type': "home", 'street_number': "14", 'street': "Main Road", 'suburb': "Rondebosch",
+                                            'city': "Cape Town", 'province': "Western Cape", 'country': "South Africa",
+                                            'postal_code': None})
+    assert address_DAO.find_address("home", "14", "Main Rd", "Rondebosch", "Cape Town", "WC", "South Africa", None).id == address.id
+    assert address_DAO.find_address("home", "12", "Main Road", "Rondebosch", "Cape Town", "WC", "South Africa", None) is None
+
+
+def test_address_fingerprint_only_folds_street_types_in_the_street():
+    def fingerprint(street_number="12", street="Main Road", suburb="Rondebosch", postal_code="7700"):
+        return AddressFingerprint.of("home", street_number, street, suburb, "Cape Town", "WC", "ZA", postal_code)
+
+    assert fingerprint(street="main rd n") == fingerprint(street="Main Road North")
+    assert fingerprint(street="St James Road") != fingerprint(street="Street James Road")
+    assert fingerprint(street_number="12 N") != fingerprint(street_number="12 North")
+    assert fingerprint(suburb="Rondebosch E") != fingerprint(suburb="Rondebosch East")
+    assert fingerprint(postal_code="S 7700") != fingerprint(postal_code="South 7700")
+
+
+def test_units_in_different_buildings_are_different_addresses(test_db):
+    # rows from before the fingerprint column, two flats in the same street
+    db.execute(models.Address.__table__.insert(), [
+        {'id': id, 'type': "home", 'building': building, 'complex': complex, 'street_number': "12",
+         'street': "Main Road", 'city': "Cape Town"}
+        for id, building, complex in [(1, "Block A", "Sunset Gardens"), (2, "Block B", "Sunset Gardens"),
+                                      (3, "block a", "Sunset  Gardens")]])
+    db.commit()
+
+    assert mergeDuplicateAddresses.run(db) == 1
+
+    db.expire_all()
+    assert [address.id for address in db.query(models.Address).order_by(models.Address.id)] == [1, 2]
+    assert len({address.fingerprint for address in db.query(models.Address)}) == 2
+    # an update that does not carry the building keeps it in the fingerprint
+    address_DAO = AddressDAO(db)
+    address_DAO.update_address(2, {'type': "home", 'street_number': "12", 'street': "Main Rd", 'suburb': None,
+                                   'city': "Cape Town", 'province': None, 'country': None, 'postal_code': None,
+                                   'latitude': None, 'longitude': None})
+    db.expire_all()
+    assert address_DAO.get_address_by_id(2).fingerprint != address_DAO.get_address_by_id(1).fingerprint
+    assert address_DAO.find_address("home", "12", "Main Road", None, "Cape Town", None, None, None) is None
+
+
+def test_merge_duplicate_addresses(test_db):
+    # addresses from before the fingerprint column, inserted without the model so that no fingerprint is set
+    rows = [(1, "12", "Main Road", "Cape Town", None), (2, "12", "main rd", "CAPE TOWN", -33.9), (3, "12", "Main Rd.", "Cape Town", None),
+            (4, "7", "Long Street", "Cape Town", None)]
+    db.execute(models.Address.__table__.insert(), [
+        {'id': id, 'type': "home", 'street_number': street_number, 'street': street, 'city': city, 'latitude': latitude}
+        for id, street_number, street, city, latitude in rows])
+    kept, duplicate, other_duplicate, other = 1, 2, 3, 4
+
+    person = models.Person(first_name="John", last_name="Smith")
+    # linked to two copies of the same address
+    person.addresses = [models.PeopleAddress(address_id=kept), models.PeopleAddress(address_id=duplicate)]
+    other_person = models.Person(first_name="Jane", last_name="Smith")
+    other_person.addresses = [models.PeopleAddress(address_id=other_duplicate)]
+    db.add_all([person, other_person])
+    db.flush()
+    household = models.Household(leader_id=person.id, address_id=other_duplicate)
+    church = Church(name="Church", created=datetime.now(), address_id=duplicate)
+    db.add_all([household, church])
+    db.commit()
+
+    assert mergeDuplicateAddresses.run(db) == 2
+
+    db.expire_all()
+    assert [address.id for address in db.query(models.Address).order_by(models.Address.id)] == [kept, other]
+    assert db.query(models.Address).filter(models.Address.fingerprint.is_(None)).count() == 0
+    # the kept address takes the coordinates of a duplicate
+    assert float(db.query(models.Address).get(kept).latitude) == -33.9
+    assert [link.address_id for link in person.addresses] == [kept]
+    assert [link.address_id for link in other_person.addresses] == [kept]
+    assert household.address_id == kept
+    assert household.version == 2
+    assert church.address_id == kept
+    assert church.version == 2
+    assert person.version == 2
+    # running it again changes nothing
+    assert mergeDuplicateAddresses.run(db) == 0
+
+
+def test_new_addresses_are_geocoded_from_the_centroid_table(test_db):
+    by_postal_code = models.Address(type="home", street_number="1", street="Main Road", suburb="Anywhere",
+                                    city="Cape Town", country="RSA", postal_code="7700")
+    by_suburb = models.Address(type="home", street_number="2", street="Main Road", suburb="SANDTON",
+                               city="Johannesburg", country="South Africa")
+    given = models.Address(type="home", street_number="3", street="Main Road", suburb="Rondebosch",
+                           city="Cape Town", country="South Africa", postal_code="7700", latitude=-1, longitude=1)
+    unknown = models.Address(type="home", street_number="4", street="Main Road", suburb="Nowhere", city="Nowhere",
+                             country="South Africa", postal_code="0000")
+    db.add_all([by_postal_code, by_suburb, given, unknown])
+    db.commit()
+
+    # the two Rondebosch and Newlands rows of 7700 are averaged
+    assert float(by_postal_code.latitude) == pytest.approx(-33.9695)
+    assert float(by_postal_code.longitude) == pytest.approx(18.4645)
+    assert (float(by_suburb.latitude), float(by_suburb.longitude)) == pytest.approx((-26.1076, 28.0567))
+    assert (float(given.latitude), float(given.longitude)) == (-1, 1)
+    assert unknown.latitude is None
+
+
+def test_addresses_are_geocoded_again_when_they_move(test_db):
+    address_DAO = AddressDAO(db)
+    address = address_DAO.create_address(models.Address(type="home", street_number="1", street="Main Road",
+                                                         suburb="Rondebosch", city="Cape Town",
+                                                         country="South Africa", postal_code="7700"))
+    values = {'type': "home", 'street_number': "1", 'street': "Main Road", 'suburb': "Rondebosch",
+              'city': "Cape Town", 'province': None, 'country': "South Africa", 'postal_code': "7700"}
+
+    # an update that does not move the address keeps its coordinates
+    address_DAO.update_address(address.id, {**values, 'street_number': "2"})
+    db.expire_all()
+    assert float(address_DAO.get_address_by_id(address.id).latitude) == pytest.approx(-33.9695)
+
+    # a new postal code places it again, and the proximity index is told
+    with mock.patch('src.app.people.daos.addressDAO.addresses_written') as addresses_written:
+        address_DAO.update_address(address.id, {**values, 'postal_code': "7708"})
+    addresses_written.assert_called_once_with(db, [address.id])
+    db.expire_all()
+    moved = address_DAO.get_address_by_id(address.id)
+    assert (float(moved.latitude), float(moved.longitude)) == pytest.approx((-33.98, 18.465))
+
+    # coordinates sent with the update are kept
+    address_DAO.update_address(address.id, {**values, 'postal_code': "7700", 'latitude': -1, 'longitude': 1})
+    db.expire_all()
+    assert (float(moved.latitude), float(moved.longitude)) == (-1, 1)
+
+    # one that cannot be placed any more loses the coordinates of where it was
+    address_DAO.update_address(address.id, {**values, 'suburb': "Nowhere", 'city': "Nowhere", 'postal_code': "0000"})
+    db.expire_all()
+    assert moved.latitude is None and moved.longitude is None
+
+    # coordinates sent as null are cleared, even when the address could be placed
+    address_DAO.update_address(address.id, {**values, 'latitude': -1, 'longitude': 1})
+    address_DAO.update_address(address.id, {'latitude': None, 'longitude': None})
+    db.expire_all()
+    assert moved.latitude is None and moved.longitude is None
+    assert moved.postal_code == "7700"
+
+
+def test_geocode_addresses(test_db):
+    # addresses from before geocoding, inserted without the model so that they have no coordinates
+    db.execute(models.Address.__table__.insert(), [
+        {'id': id, 'type': "home", 'street_number': "1", 'street': "Main Road", 'suburb': suburb, 'city': city,
+         'country': "South Africa", 'postal_code': postal_code}
+        for id, suburb, city, postal_code in [(1, "Claremont", "Cape Town", "7708"), (2, "Nowhere", "Nowhere", None),
+                                              (3, "Hatfield", "Pretoria", None)]])
+    person = models.Person(first_name="John", last_name="Smith")
+    person.addresses = [models.PeopleAddress(address_id=1)]
+    member = models.Person(first_name="Jane", last_name="Smith")
+    db.add_all([person, member])
+    db.flush()
+    household = models.Household(leader_id=member.id, address_id=3, people=[member])
+    church = Church(name="Church", created=datetime.now(), address_id=1)
+    db.add_all([household, church])
+    db.commit()
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    try:
+        assert geocodeAddresses.run(db, batch_size=2) == 2
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_statement)
+    # one bulk update of the addresses per batch
+    assert len([statement for statement in statements if statement.startswith('UPDATE addresses')]) == 2
+    db.expire_all()
+    assert (float(db.query(models.Address).get(1).latitude), float(db.query(models.Address).get(1).longitude)) \
+           == pytest.approx((-33.98, 18.465))
+    assert db.query(models.Address).get(2).latitude is None
+    assert float(db.query(models.Address).get(3).latitude) == pytest.approx(-25.75)
+    assert (person.version, member.version, household.version, church.version) == (2, 2, 2, 2)
+    # running it again only reads the address that cannot be placed
+    assert geocodeAddresses.run(db) == 0
+
+
+def test_addresses_are_streamed_and_paged_in_address_book_order(test_db):
+    rows = [("Cape Town", "Rondebosch", "Main Road"), ("Cape Town", "Claremont", "Main Road"),
+            ("Cape Town", "Claremont", "Main Road"), ("Cape Town", "Claremont", "Argyle Street"),
+            ("Johannesburg", "Sandton", "Rivonia Road"), (None, None, "Nowhere Street")]
+    db.add_all([models.Address(type="home", street_number=str(number), street=street, suburb=suburb, city=city)
+                for number, (city, suburb, street) in enumerate(rows)])
+    db.commit()
+    address_DAO = AddressDAO(db)
+
+    expected = [3, 1, 2, 0, 4, 5]
+    assert [int(address.street_number) for address in address_DAO.stream_addresses(batch_size=2)] == expected
+
+    page = address_DAO.get_all_addresses_by_cursor(CursorParams(size=4))
+    assert [int(address.street_number) for address in page.items] == expected[:4]
+    assert page.prev_cursor is None
+    page = address_DAO.get_all_addresses_by_cursor(CursorParams(cursor=page.next_cursor, size=4))
+    assert [int(address.street_number) for address in page.items] == expected[4:]
+    assert page.next_cursor is None
+    page = address_DAO.get_all_addresses_by_cursor(CursorParams(cursor=page.prev_cursor, size=4))
+    assert [int(address.street_number) for address in page.items] == expected[:4]
@@ -0,0 +1,168 @@
+import math
+import random
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.app.database import Base
+from src.app.media.models.database import models as media_models
+from src.app.people.daos.addressDAO import AddressDAO
+from src.app.people.daos.addressProximityIndex import AddressProximityIndex, get_proximity_index
+from src.app.people.daos.proximityDAO import ProximityDAO
+from src.app.people.factories.addressFactory import AddressFactory
+from src.app.people.models.database import models
+from src.app.people.services.proximityService import ProximityService
+from src.app.users.models.database import models as user_models
+from src.app.utils.geo import GeoDistance
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_db.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture()
+def test_db():
+    Base.metadata.create_all(bind=engine)
+    # the tables are recreated for every test, without the writes the index would hear about
+    get_proximity_index(engine).mark_stale()
+    db.expunge_all()
+    yield
+    try:
+        Base.metadata.drop_all(bind=engine)
+    except Exception as e:
+        print("teardown of DB failed")
+        print(e)
+
+
+db = TestingSessionLocal()
+proximity_service = ProximityService(proximity_DAO=ProximityDAO(db), address_DAO=AddressDAO(db),
+                                     address_factory=AddressFactory())
+
+
+def add_address(street, latitude, longitude):
+    address = models.Address(type='home', street_number='1', street=street, suburb='Rondebosch',
+                             city='Cape Town', province='Western Cape', country='South Africa', postal_code='7700',
+                             latitude=latitude, longitude=longitude)
+    db.add(address)
+    return address
+
+
+def add_household(leader_name, address):
+    leader = models.Person(first_name=leader_name, last_name='Host', mobile_number='0820000000')
+    db.add(leader)
+    db.flush()
+    db.add(models.PeopleAddress(person_id=leader.id, address_id=address.id))
+    household = models.Household(leader_id=leader.id, address_id=address.id)
+    db.add(household)
+    return household
+
+
+def test_nearest_matches_a_full_scan():
+    index = AddressProximityIndex(cell_degrees=0.05, max_age_seconds=300)
+    generator = random.Random(18)
+    points = {id: (-33.9 + generator.uniform(-0.5, 0.5), 18.5 + generator.uniform(-0.5, 0.5)) for id in range(2000)}
+    for id, (latitude, longitude) in points.items():
+        index.put(id, latitude, longitude)
+
+    for latitude, longitude, radius_km in [(-33.9, 18.5, None), (-33.4, 18.0, 7.5), (-35.0, 20.0, None)]:
+        expected = sorted((GeoDistance.haversine_km(latitude, longitude, *point), id) for id, point in points.items()
+                          if radius_km is None or GeoDistance.haversine_km(latitude, longitude, *point) <= radius_km)
+        assert index.nearest(latitude, longitude, 25, radius_km) == pytest.approx(expected[:25])
+
+
+def test_nearest_reaches_across_the_antimeridian():
+    index = AddressProximityIndex(cell_degrees=0.05, max_age_seconds=300)
+    generator = random.Random(180)
+    points = {id: (-17.0 + generator.uniform(-0.5, 0.5), generator.choice([-180.0, 179.5]) + generator.uniform(0, 0.5))
+              for id in range(2000)}
+    for id, (latitude, longitude) in points.items():
+        index.put(id, latitude, longitude)
+
+    for latitude, longitude, radius_km in [(-17.0, 179.99, None), (-17.0, -179.99, 5.0), (-16.7, 179.7, None)]:
+        expected = sorted((GeoDistance.haversine_km(latitude, longitude, *point), id) for id, point in points.items()
+                          if radius_km is None or GeoDistance.haversine_km(latitude, longitude, *point) <= radius_km)
+        assert index.nearest(latitude, longitude, 25, radius_km) == pytest.approx(expected[:25])
+
+
+def test_bounding_box_across_the_antimeridian_holds_every_longitude():
+    assert GeoDistance.bounding_box(-17.0, 179.99, 10)[2:] == (-180.0, 180.0)
+    assert GeoDistance.bounding_box(-17.0, -179.99, 10)[2:] == (-180.0, 180.0)
+
+
+def test_bounding_box_holds_the_circle():
+    min_latitude, max_latitude, min_longitude, max_longitude = GeoDistance.bounding_box(-33.9, 18.5, 10)
+    for bearing in range(0, 360, 5):
+        # walk 10km from the centre at this bearing
+        angle, theta = 10 / 6371.0088, math.radians(bearing)
+        latitude1, longitude1 = math.radians(-33.9), math.radians(18.5)
+        latitude2 = math.asin(math.sin(latitude1) * math.cos(angle) + math.cos(latitude1) * math.sin(angle) * math.cos(theta))
+        longitude2 = longitude1 + math.atan2(math.sin(theta) * math.sin(angle) * math.cos(latitude1),
+                                             math.cos(angle) - math.sin(latitude1) * math.sin(latitude2))
+        assert min_latitude - 1e-9 <= math.degrees(latitude2) <= max_latitude + 1e-9
+        assert min_longitude - 1e-9 <= math.degrees(longitude2) <= max_longitude + 1e-9
+
+
+def test_nearby_households_are_ranked_by_distance(test_db):
+    near = add_address('Near Road', -33.9600, 18.4700)
+    far = add_address('Far Road', -34.1000, 18.8000)
+    nearest = add_address('Nearest Road', -33.9590, 18.4690)
+    empty = add_address('Empty Road', -33.9595, 18.4695)
+    add_address('Unknown Road', None, None)
+    db.flush()
+    add_household('Far', far)
+    add_household('Near', near)
+    add_household('Nearest', nearest)
+    db.commit()
+
+    households = proximity_service.get_nearby_households(-33.9590, 18.4690, 2)
+    assert [household.leader.first_name for household in households] == ['Nearest', 'Near']
+    assert households[0].distance_km == pytest.approx(0)
+    assert households[1].address.street == 'Near Road'
+
+    households = proximity_service.get_nearby_households(-33.9590, 18.4690, 10, radius_km=5)
+    assert [household.leader.first_name for household in households] == ['Nearest', 'Near']
+
+    people = proximity_service.get_nearby_people(-34.1, 18.8, 1)
+    assert [(person.first_name, person.address.street) for person in people] == [('Far', 'Far Road')]
+    assert empty.id not in {household.address.id for household in households}
+
+
+def test_nearby_households_across_the_antimeridian(test_db):
+    west = add_address('West Road', -17.0, -179.995)
+    east = add_address('East Road', -17.0, 179.9)
+    db.flush()
+    add_household('East', east)
+    add_household('West', west)
+    db.commit()
+
+    households = proximity_service.get_nearby_households(-17.0, 179.995, 2)
+    assert [household.leader.first_name for household in households] == ['West', 'East']
+    assert households[0].distance_km == pytest.approx(1.06, abs=0.01)
+
+
+def test_index_follows_committed_address_writes(test_db):
+    address = add_address('Moving Road', -33.9, 18.4)
+    db.flush()
+    add_household('Mover', address)
+    db.commit()
+    assert [household.leader.first_name for household in proximity_service.get_nearby_households(-33.9, 18.4, 1, 1)] \
+           == ['Mover']
+
+    # a bulk update through the DAO, the mapper events do not see it
+    AddressDAO(db).update_address(address.id, {'type': 'home', 'street_number': '1', 'street': 'Moving Road',
+                                               'suburb': 'Rondebosch', 'city': 'Cape Town', 'province': 'Western Cape',
+                                               'country': 'South Africa', 'postal_code': '7700',
+                                               'latitude': -26.2, 'longitude': 28.0})
+    index = get_proximity_index(engine)
+    assert address.id in index.dirty_ids
+    assert proximity_service.get_nearby_households(-33.9, 18.4, 1, 1) == []
+    assert index.address_cells[address.id] == index.cell_of(-26.2, 28.0)
+
+    # a rolled back write is not re-read
+    moved = add_address('Rolled Back Road', -33.9, 18.4)
+    db.flush()
+    db.rollback()
+    assert moved.id not in index.dirty_ids
@@ -8,8 +8,9 @@ from src.app.people.factories.peopleFactory import PeopleFactory
 from src.app.people.models.database import models
 from src.app.people.models.household import ViewHousehold
 from src.app.people.models.people import SocialMediaLink, BasicViewPerson, ViewAddress, CreatePerson, Gender, \
-    MaritalStatus
+    MaritalStatus, FullViewPerson, PERSON_RELATIONSHIPS
 from src.app.media.models.database import models as media_models
+from src.app.utils.fieldSelection import FieldSelection
 
 
 people_factory = PeopleFactory()
@@ -136,6 +137,7 @@ def test_create_person_from_person_entity_with_image(mock_create_view_media_item
     person_image_entity_1 = models.PersonImage(id=1, person_id=person_entity.id, image=image_entity_1)
     person_image_entity_2 = models.PersonImage(id=2, person_id=person_entity.id, image=image_entity_2)
     person_entity.profile_images = [person_image_entity_1, person_image_entity_2]
+    person_entity.current_profile_image = image_entity_2
 
     full_person_view = pfactory.create_person_from_person_entity(person_entity, include_households=False,
                                                                  include_profile_image=True)
@@ -330,3 +332,27 @@ def test_create_person_entity_from_create_person_with_addresses():
     assert address_entity_1.id in [address.address.id for address in person_entity.addresses]
     assert address_entity_2.id in [address.address.id for address in person_entity.addresses]
 
+
+
+
+def test_create_person_from_person_entity_with_sparse_fieldset():
+    selection = FieldSelection.parse("id,first_name,addresses", None, set(FullViewPerson.__fields__),
+                                     PERSON_RELATIONSHIPS)
+    pfactory = PeopleFactory(address_factory=AddressFactory(), media_factory=MediaFactory())
+    person_entity = models.Person(id=1, first_name="Test Name")
+    person_entity.social_media_links = [models.SocialMediaLink(type="facebook", url="https://www.facebook.com/test")]
+    person_entity.addresses = [models.PeopleAddress(address=models.Address(id=1, type="home"))]
+    person_entity.households = [models.Household(id=1)]
+    person_entity.current_profile_image = media_models.MediaItem(id=1, created=datetime(2020, 1, 1), store="local",
+                                                                 address="test_image.jpg")
+
+    person_view = pfactory.create_person_from_person_entity(person_entity, include_households=True,
+                                                            include_profile_image=True, selection=selection)
+
+    # relationships outside of the selection are not built (and so never lazy loaded)
+    assert person_view.social_media_links == []
+    assert person_view.households is None
+    assert person_view.profile_image is None
+    assert len(person_view.addresses) == 1
+    assert selection.project(person_view) == {'id': 1, 'first_name': "Test Name",
+                                              'addresses': [person_view.addresses[0].dict()]}
@@ -1,7 +1,9 @@
 import pytest
 
-from src.app.people.models.household import CreateHousehold, UpdateHousehold
-from pydantic import ValidationError
+from src.app.people.models.household import CreateHousehold, UpdateHousehold, HouseholdView, ViewHousehold, \
+    ViewHouseholdSummary, ViewHouseholdWithMembers, PersonReference
+from src.app.people.models.people import BasicViewPerson, FullViewPerson, ViewAddress
+from pydantic import ValidationError, parse_obj_as
 
 def test_create_household_model():
     household = CreateHousehold(
@@ -66,4 +68,20 @@ def test_update_household_model_with_no_leader_id():
             people_ids=[1, 2, 3],
             household_image_id=1)
 
-    assert e is not None
\ No newline at end of file
+    assert e is not None
+
+def test_household_views_are_validated_as_their_own_view():
+    # responses are validated from the dict of the view, which has to fit its own view before the others
+    address = ViewAddress(id=1, city="Cape Town")
+    views = [
+        ViewHouseholdSummary(id=1, leader=PersonReference(id=1, first_name="John"), address=address,
+                             people=[BasicViewPerson(id=1, first_name="John")]),
+        ViewHouseholdWithMembers(id=1, leader=PersonReference(id=1, first_name="John"), address=address,
+                                 people=[FullViewPerson(id=1, first_name="John", households=None)]),
+        ViewHousehold(id=1, leader=BasicViewPerson(id=1, first_name="John"), address=address,
+                      people=[BasicViewPerson(id=1, first_name="John")]),
+    ]
+    for view in views:
+        validated = parse_obj_as(HouseholdView, view.dict())
+        assert type(validated) is type(view)
+        assert validated.dict() == view.dict()
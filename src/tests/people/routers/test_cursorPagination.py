@@ -0,0 +1,27 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.app.people.routers import person, household, address
+from src.app.users.routers import user
+from src.app.users.routers.login import get_current_user
+from src.app.worship.routers import song
+
+app = FastAPI()
+app.include_router(person.router)
+app.include_router(household.router)
+app.include_router(user.router)
+app.include_router(song.router)
+app.include_router(address.router)
+app.dependency_overrides[get_current_user] = lambda: None
+client = TestClient(app)
+
+
+@pytest.mark.parametrize('page_size', [0, 1001])
+@pytest.mark.parametrize('url', ['/people/cursor', '/households/cursor', '/users/cursor', '/songs/cursor',
+                                 '/addresses/cursor'])
+def test_cursor_page_size_out_of_range(url, page_size):
+    response = client.get(url, params={'page_size': page_size})
+
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'] == ['query', 'page_size']
@@ -0,0 +1,51 @@
+import io
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+
+from src.app.people.routers import person
+from src.app.people.services.peopleService import PeopleService
+from src.app.users.routers.login import get_current_user
+
+app = FastAPI()
+app.include_router(person.router)
+app.dependency_overrides[get_current_user] = lambda: None
+app.dependency_overrides[PeopleService] = lambda: PeopleService()
+client = TestClient(app, raise_server_exceptions=False)
+
+
+def upload_spreadsheet(content: bytes):
+    return client.post('/people/add_people_from_spreadsheet',
+                       files={'file': ('people.xlsx', io.BytesIO(content), 'application/octet-stream')})
+
+
+def test_add_people_from_spreadsheet_not_a_workbook():
+    response = upload_spreadsheet(b'first_name,last_name')
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == "Error uploading spreadsheet"
+
+
+def test_add_people_from_spreadsheet_invalid_spreadsheet():
+    workbook = Workbook()
+    workbook.active.append(['FIRST_NAME'])
+    content = io.BytesIO()
+    workbook.save(content)
+
+    response = upload_spreadsheet(content.getvalue())
+
+    assert response.status_code == 400
+    assert response.json()['detail'].startswith("Column ")
+
+
+@mock.patch.object(PeopleService, 'add_people_from_spreadsheet')
+def test_add_people_from_spreadsheet_server_error(mock_add_people_from_spreadsheet):
+    mock_add_people_from_spreadsheet.side_effect = RuntimeError("database is gone")
+
+    with mock.patch.object(person.logging, 'exception') as mock_log_exception:
+        response = upload_spreadsheet(b'')
+
+    assert response.status_code == 500
+    mock_log_exception.assert_called_once()
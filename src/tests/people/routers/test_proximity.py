@@ -0,0 +1,21 @@
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.app.people.routers import proximity
+from src.app.people.services.proximityService import ProximityService
+
+app = FastAPI()
+app.include_router(proximity.router)
+app.dependency_overrides[ProximityService] = lambda: ProximityService()
+client = TestClient(app)
+
+
+@mock.patch.object(ProximityService, 'get_origin')
+def test_nearby_is_authenticated_before_the_address_is_looked_up(mock_get_origin):
+    for url in ['/nearby/households?address_id=1', '/nearby/people?address_id=1']:
+        response = client.get(url)
+
+        assert response.status_code == 401
+    assert mock_get_origin.call_count == 0
@@ -0,0 +1,45 @@
+import asyncio
+import json
+from unittest import mock
+
+from src.app.people.daos.addressDAO import AddressDAO
+from src.app.people.factories.addressFactory import AddressFactory
+from src.app.people.models.database import models
+from src.app.people.services.addressService import AddressService
+from src.app.utils.ndjson import NDJSON
+
+
+def read_body(response):
+    async def read():
+        return b''.join([chunk async for chunk in response.body_iterator])
+
+    return asyncio.run(read())
+
+
+@mock.patch.object(AddressDAO, 'stream_addresses')
+def test_stream_all_addresses(mock_stream_addresses, monkeypatch):
+    monkeypatch.setattr(NDJSON, 'CHUNK_SIZE', 100)
+    mock_stream_addresses.return_value = iter([
+        models.Address(id=id, type="home", street_number=str(id), street="Main Road", suburb="Rondebosch",
+                       city="Cape Town", province="Western Cape", country="South Africa", postal_code="7700",
+                       latitude=-33.96, longitude=18.47) for id in range(1, 6)])
+    address_service = AddressService(addressDAO=AddressDAO(), addressFactory=AddressFactory())
+
+    response = address_service.stream_all_addresses()
+    # nothing is read before the response is sent
+    assert mock_stream_addresses.call_count == 0
+    addresses = json.loads(read_body(response))
+
+    assert response.media_type == 'application/json'
+    assert [address['id'] for address in addresses] == [1, 2, 3, 4, 5]
+    assert addresses[0] == {'id': 1, 'type': 'home', 'street_number': '1', 'street': 'Main Road',
+                            'suburb': 'Rondebosch', 'city': 'Cape Town', 'province': 'Western Cape',
+                            'country': 'South Africa', 'postal_code': '7700', 'latitude': -33.96, 'longitude': 18.47}
+
+
+@mock.patch.object(AddressDAO, 'stream_addresses')
+def test_stream_all_addresses_none(mock_stream_addresses):
+    mock_stream_addresses.return_value = iter([])
+    address_service = AddressService(addressDAO=AddressDAO(), addressFactory=AddressFactory())
+
+    assert json.loads(read_body(address_service.stream_all_addresses())) == []
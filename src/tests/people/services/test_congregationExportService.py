@@ -0,0 +1,90 @@
+import asyncio
+import datetime
+import gzip
+import json
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest import mock
+
+from src.app.people.daos.congregationExportDAO import CongregationExportDAO
+from src.app.people.services.congregationExportService import CongregationExportService
+from src.app.utils.ndjson import NDJSON
+
+
+def read_body(response):
+    async def read():
+        return b''.join([chunk async for chunk in response.body_iterator])
+
+    return asyncio.run(read())
+
+
+def create_export_service(events):
+    export_DAO = CongregationExportDAO(db=mock.MagicMock())
+
+    @contextmanager
+    def snapshot():
+        events.append('begin')
+        yield
+        events.append('end')
+
+    def stream(name, rows):
+        def rows_in_snapshot(batch_size):
+            assert 'begin' in events and 'end' not in events
+            events.append(name)
+            return iter(rows)
+        return rows_in_snapshot
+
+    export_DAO.snapshot = snapshot
+    export_DAO.stream_addresses = stream('addresses', [{'id': 1, 'type': 'home', 'latitude': Decimal('-33.9')}])
+    export_DAO.stream_people = stream('people', [{'id': 1, 'first_name': 'John', 'date_of_birth': datetime.date(1980, 1, 1)}])
+    export_DAO.stream_people_addresses = stream('people_addresses', [{'id': 1, 'person_id': 1, 'address_id': 1}])
+    export_DAO.stream_households = stream('households', [{'id': 1, 'leader_id': 1, 'address_id': 1}])
+    export_DAO.stream_memberships = stream('memberships', [{'id': 1, 'household_id': 1, 'person_id': 1}])
+    return CongregationExportService(export_DAO=export_DAO)
+
+
+def test_get_records_reads_every_kind_in_one_snapshot():
+    events = []
+    export_service = create_export_service(events)
+
+    records = list(export_service.get_records(batch_size=10))
+
+    assert [record['record'] for record in records] == ['address', 'person', 'person_address', 'household', 'membership']
+    assert records[0] == {'record': 'address', 'id': 1, 'type': 'home', 'latitude': Decimal('-33.9')}
+    # rows are read lazily, the snapshot ends with the last one
+    assert events == ['begin', 'addresses', 'people', 'people_addresses', 'households', 'memberships', 'end']
+
+
+def test_export_congregation():
+    export_service = create_export_service([])
+
+    response = export_service.export_congregation()
+
+    assert response.media_type == NDJSON.MEDIA_TYPE
+    assert 'content-encoding' not in response.headers
+    lines = read_body(response).decode().splitlines()
+    assert len(lines) == 5
+    assert json.loads(lines[0]) == {'record': 'address', 'id': 1, 'type': 'home', 'latitude': -33.9}
+    assert json.loads(lines[1]) == {'record': 'person', 'id': 1, 'first_name': 'John', 'date_of_birth': '1980-01-01'}
+
+
+def test_export_congregation_gzip():
+    response = create_export_service([]).export_congregation(gzip=True)
+
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['vary'] == 'Accept-Encoding'
+    lines = gzip.decompress(read_body(response)).decode().splitlines()
+    assert [json.loads(line)['record'] for line in lines] == ['address', 'person', 'person_address', 'household', 'membership']
+
+
+def test_accepts_gzip():
+    assert NDJSON.accepts_gzip('gzip, deflate, br')
+    assert NDJSON.accepts_gzip('*')
+    assert not NDJSON.accepts_gzip('gzip;q=0')
+    assert not NDJSON.accepts_gzip('gzip; q=0.000, deflate')
+    # an explicit gzip entry takes precedence over *, whichever comes first
+    assert NDJSON.accepts_gzip('*;q=0, gzip')
+    assert not NDJSON.accepts_gzip('gzip;q=0, *')
+    assert not NDJSON.accepts_gzip('*;q=0, deflate')
+    assert not NDJSON.accepts_gzip('identity')
+    assert not NDJSON.accepts_gzip(None)
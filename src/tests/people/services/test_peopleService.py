@@ -1,20 +1,25 @@
+import asyncio
 import datetime
+import io
 
 import pytest
+from openpyxl import Workbook
 from fastapi import UploadFile
 from fastapi.responses import FileResponse
 
 from fastapi_pagination import Page, Params
 
 from unittest import mock
-from unittest.mock import call
+from unittest.mock import call, ANY
 
+from src.app.database import UnitOfWork
 from src.app.media.daos.mediaDAO import MediaDAO
 from src.app.media.factories.mediaFactory import MediaFactory
 from src.app.media.models.media import ViewMediaItem
 from src.app.media.models.database import models as media_models
 from src.app.media.services.mediaService import NoMediaItemException, MediaService
 from src.app.people.daos.addressDAO import AddressDAO
+from src.app.people.factories.addressFactory import AddressFactory
 from src.app.people.daos.peopleDAO import PeopleDAO
 from src.app.people.factories.peopleFactory import PeopleFactory
 from src.app.people.models.household import ViewHousehold
@@ -22,12 +27,24 @@ from src.app.people.models.people import FullViewPerson, UpdatePerson, SocialMed
     MaritalStatus, ViewAddress, BasicViewPerson
 from src.app.people.services.addressService import NoAddressException
 from src.app.people.services.householdUtils import HouseholdUtils
+from src.app.people.services.viewCacheService import ViewCacheService
+from src.app.people.models.peopleImport import ImportRowStatus
 from src.app.people.services.peopleService import PeopleService, NoPersonException, \
-    NoHouseholdExceptionForPersonCreation, UnableToRemoveLeaderFromHouseholdException
+    NoHouseholdExceptionForPersonCreation, UnableToRemoveLeaderFromHouseholdException, \
+    InvalidPeopleSpreadsheetException
 from src.app.people.models.database import models
 from pytest_unordered import unordered
 from src.app.people.daos.householdDAO import HouseholdDAO
 from src.app.utils.DateUtils import DateUtils
+from src.app.users.services.userService import ExistingUserExistsException
+from src.app.utils.conditionalRequest import ConditionalRequest
+
+
+def read_body(response):
+    async def read():
+        return b''.join([chunk async for chunk in response.body_iterator])
+
+    return asyncio.run(read())
 
 
 @mock.patch.object(PeopleFactory, 'create_person_from_person_entity')
@@ -46,7 +63,7 @@ def test_get_all(mock_get_all, mock_create_person_from_person_entity):
     full_view_person_2 = FullViewPerson(id=2, first_name='Jane')
     full_view_person_3 = FullViewPerson(id=3, first_name='Jimmy')
 
-    def side_effect(person_entity: models.Person, include_profile_image=True, include_households=True) -> FullViewPerson:
+    def side_effect(person_entity: models.Person, include_profile_image=True, include_households=True, selection=None) -> FullViewPerson:
         if person_entity.id == 1:
             return full_view_person_1
         elif person_entity.id == 2:
@@ -59,9 +76,9 @@ def test_get_all(mock_get_all, mock_create_person_from_person_entity):
     people_page = people_service.get_all()
     people = people_page.items
     # for some reason the order of parameters matters, and is reversed to what is actually passed in, in the code.
-    calls = [call(include_households=True, include_profile_image=True, person_entity=person_1),
-             call(include_households=True, include_profile_image=True, person_entity=person_2),
-             call(include_households=True, include_profile_image=True, person_entity=person_3)]
+    calls = [call(include_households=True, include_profile_image=True, person_entity=person_1, selection=None),
+             call(include_households=True, include_profile_image=True, person_entity=person_2, selection=None),
+             call(include_households=True, include_profile_image=True, person_entity=person_3, selection=None)]
     mock_create_person_from_person_entity.assert_has_calls(calls, any_order=True)
                                                                 #call(person_2, include_profile_image=True, include_households=True),
                                                                 #call(person_3, include_profile_image=True, include_households=True)])
@@ -86,90 +103,79 @@ def test_get_by_id(mock_get_person_by_id, mock_create_person_from_person_entity)
     assert person.first_name == "John"
 
 
-@mock.patch.object(MediaDAO, 'get_media_item_by_id')
-@mock.patch.object(PeopleFactory, 'create_person_from_person_entity')
-@mock.patch.object(PeopleDAO, 'get_person_by_id')
-def test_get_profile_image_by_person_id_store_local(mock_get_person_by_id, mock_create_person_from_person_entity, mock_get_media_item_by_id):
-    peopleDAO = PeopleDAO()
-    peopleFactory = PeopleFactory()
-    mediaDAO = MediaDAO()
-    people_service = PeopleService(peopleDAO=peopleDAO, people_factory=peopleFactory, media_DAO=mediaDAO)
-    person_1 = models.Person(id=1, first_name="John")
+@mock.patch.object(PeopleDAO, 'get_current_profile_image')
+def test_get_profile_image_by_person_id_store_local(mock_get_current_profile_image, tmp_path):
+    people_service = PeopleService(peopleDAO=PeopleDAO(), media_service=MediaService())
+    image_path = tmp_path / "image.jpg"
+    image_path.write_bytes(b"jpg")
+    mock_get_current_profile_image.return_value = (1, media_models.MediaItem(id=3, store="local", address=str(image_path),
+                                                                             filename="image.jpg", content_type="image/jpg"))
 
-    mock_get_person_by_id.return_value = [person_1]
-    view_image = ViewMediaItem(id=1)
-    mock_create_person_from_person_entity.return_value = FullViewPerson(id=1, first_name='John', profile_image=view_image)
-    mock_get_media_item_by_id.return_value = media_models.MediaItem(id=1, store="local", address="path/to/image.jpg")
-    fileResponse: FileResponse = people_service.get_profile_image_by_person_id(1)
+    response = people_service.get_profile_image_by_person_id(1)
 
-    assert fileResponse.path == "path/to/image.jpg"
+    assert read_body(response) == b"jpg"
+    assert response.headers['content-length'] == '3'
+    assert response.headers['content-disposition'] == 'inline; filename="image.jpg"'
+    assert response.headers['etag'] == '"person-image-1-3"'
+    assert response.headers['cache-control'] == 'max-age=20'
+    mock_get_current_profile_image.assert_called_once_with(1)
 
 
-@mock.patch.object(MediaDAO, 'get_media_item_by_id')
-@mock.patch.object(PeopleFactory, 'create_person_from_person_entity')
-@mock.patch.object(PeopleDAO, 'get_person_by_id')
-def test_get_profile_image_by_person_id_store_none(mock_get_person_by_id, mock_create_person_from_person_entity, mock_get_media_item_by_id):
-    peopleDAO = PeopleDAO()
-    peopleFactory = PeopleFactory()
-    mediaDAO = MediaDAO()
-    people_service = PeopleService(peopleDAO=peopleDAO, people_factory=peopleFactory, media_DAO=mediaDAO)
-    person_1 = models.Person(id=1, first_name="John")
+@mock.patch.object(MediaService, 'create_media_item_response')
+@mock.patch.object(PeopleDAO, 'get_current_profile_image')
+def test_get_profile_image_by_person_id_not_modified(mock_get_current_profile_image, mock_create_media_item_response):
+    people_service = PeopleService(peopleDAO=PeopleDAO(), media_service=MediaService())
+    mock_get_current_profile_image.return_value = (1, media_models.MediaItem(id=3, store="s3", address="s3://bucket/image.jpg"))
 
-    mock_get_person_by_id.return_value = [person_1]
-    view_image = ViewMediaItem(id=1)
-    mock_create_person_from_person_entity.return_value = FullViewPerson(id=1, first_name='John', profile_image=view_image)
-    mock_get_media_item_by_id.return_value = media_models.MediaItem(id=1, store=None, address="path/to/image.jpg")
-    fileResponse: FileResponse = people_service.get_profile_image_by_person_id(1)
+    response = people_service.get_profile_image_by_person_id(1, ConditionalRequest(if_none_match='"person-image-1-3"'))
 
-    assert fileResponse == None
+    # the image did not change, so it is not read from the store
+    assert response.status_code == 304
+    assert response.headers['etag'] == '"person-image-1-3"'
+    mock_create_media_item_response.assert_not_called()
 
-@mock.patch.object(MediaDAO, 'get_media_item_by_id')
-@mock.patch.object(PeopleFactory, 'create_person_from_person_entity')
-@mock.patch.object(PeopleDAO, 'get_person_by_id')
-def test_get_profile_image_by_person_id_store_none(mock_get_person_by_id, mock_create_person_from_person_entity, mock_get_media_item_by_id):
-    peopleDAO = PeopleDAO()
-    peopleFactory = PeopleFactory()
-    mediaDAO = MediaDAO()
-    people_service = PeopleService(peopleDAO=peopleDAO, people_factory=peopleFactory, media_DAO=mediaDAO)
-    person_1 = models.Person(id=1, first_name="John")
 
-    mock_get_person_by_id.return_value = [person_1]
-    view_image = ViewMediaItem(id=1)
-    mock_create_person_from_person_entity.return_value = FullViewPerson(id=1, first_name='John', profile_image=view_image)
-    mock_get_media_item_by_id.return_value = media_models.MediaItem(id=1, store="s3", address="path/to/image.jpg")
-    with pytest.raises(NotImplementedError) as e:
-        people_service.get_profile_image_by_person_id(1)
+@mock.patch.object(MediaService, 'create_media_item_response')
+@mock.patch.object(PeopleDAO, 'get_current_profile_image')
+def test_get_profile_image_by_person_id_store_s3(mock_get_current_profile_image, mock_create_media_item_response):
+    people_service = PeopleService(peopleDAO=PeopleDAO(), media_service=MediaService())
+    image = media_models.MediaItem(id=3, store="s3", address="s3://bucket/image.jpg")
+    mock_get_current_profile_image.return_value = (1, image)
+    mock_create_media_item_response.return_value = FileResponse("image.jpg")
 
-    assert e is not None
+    # an etag of a previous image
+    response = people_service.get_profile_image_by_person_id(1, ConditionalRequest(if_none_match='"person-image-1-2"'))
 
-@mock.patch.object(MediaDAO, 'get_media_item_by_id')
-@mock.patch.object(PeopleFactory, 'create_person_from_person_entity')
-@mock.patch.object(PeopleDAO, 'get_person_by_id')
-def test_get_profile_image_by_person_id_person_none(mock_get_person_by_id, mock_create_person_from_person_entity, mock_get_media_item_by_id):
-    peopleDAO = PeopleDAO()
-    peopleFactory = PeopleFactory()
-    mediaDAO = MediaDAO()
-    people_service = PeopleService(peopleDAO=peopleDAO, people_factory=peopleFactory, media_DAO=mediaDAO)
+    mock_create_media_item_response.assert_called_once_with(image, as_attachment=False, request=ANY,
+                                                            etag='"person-image-1-3"', cache_control='max-age=20')
 
-    mock_get_person_by_id.return_value = None
+
+@mock.patch.object(PeopleDAO, 'get_current_profile_image')
+def test_get_profile_image_by_person_id_store_none(mock_get_current_profile_image):
+    people_service = PeopleService(peopleDAO=PeopleDAO(), media_service=MediaService())
+    mock_get_current_profile_image.return_value = (1, media_models.MediaItem(id=3, store=None, address="path/to/image.jpg"))
+
+    response = people_service.get_profile_image_by_person_id(1)
+
+    assert response == None
+
+
+@mock.patch.object(PeopleDAO, 'get_current_profile_image')
+def test_get_profile_image_by_person_id_person_none(mock_get_current_profile_image):
+    people_service = PeopleService(peopleDAO=PeopleDAO())
+    mock_get_current_profile_image.return_value = None
 
     with pytest.raises(NoPersonException) as e:
         people_service.get_profile_image_by_person_id(1)
 
     assert e is not None
 
-@mock.patch.object(MediaDAO, 'get_media_item_by_id')
-@mock.patch.object(PeopleFactory, 'create_person_from_person_entity')
-@mock.patch.object(PeopleDAO, 'get_person_by_id')
-def test_get_profile_image_by_person_id_store_none(mock_get_person_by_id, mock_create_person_from_person_entity, mock_get_media_item_by_id):
-    peopleDAO = PeopleDAO()
-    peopleFactory = PeopleFactory()
-    mediaDAO = MediaDAO()
-    people_service = PeopleService(peopleDAO=peopleDAO, people_factory=peopleFactory, media_DAO=mediaDAO)
-    person_1 = models.Person(id=1, first_name="John")
 
-    mock_get_person_by_id.return_value = [person_1]
-    mock_create_person_from_person_entity.return_value = None
+@mock.patch.object(PeopleDAO, 'get_current_profile_image')
+def test_get_profile_image_by_person_id_no_image(mock_get_current_profile_image):
+    people_service = PeopleService(peopleDAO=PeopleDAO())
+    mock_get_current_profile_image.return_value = (1, None)
+
     response = people_service.get_profile_image_by_person_id(1)
 
     assert response == None
@@ -190,42 +196,41 @@ def test_validate_image_id_invalid(mock_get_media_item_by_id):
 def test_validate_image_id_valid(mock_get_media_item_by_id):
     mediaDAO = MediaDAO()
     people_service = PeopleService( media_DAO=mediaDAO)
-    mock_get_media_item_by_id.return_value = media_models.MediaItem(id=1, store="local", address="path/to/image.jpg")
-
-    people_service.validate_image_id(1)
+    image_entity = media_models.MediaItem(id=1, store="local", address="path/to/image.jpg")
+    mock_get_media_item_by_id.return_value = image_entity
 
-    # no exception has been raised. test passes
+    assert people_service.validate_image_id(1) is image_entity
 
-@mock.patch.object(AddressDAO, 'get_address_by_id')
-def test_validate_addresses_invalid(mock_get_address_by_id):
+@mock.patch.object(AddressDAO, 'get_addresses_by_ids')
+def test_validate_addresses_invalid(mock_get_addresses_by_ids):
     addressDAO = AddressDAO()
     people_service = PeopleService(addressDAO=addressDAO)
-    mock_get_address_by_id.return_value = None
+    mock_get_addresses_by_ids.return_value = {1: models.Address(id=1)}
     with pytest.raises(NoAddressException) as e:
-        people_service.validate_addresses([1])
+        people_service.validate_addresses([1, 2, 3])
 
-    assert e is not None
+    # the first missing id is reported
+    assert str(e.value) == "Address with id: 2 does not exist"
+    mock_get_addresses_by_ids.assert_called_once_with([1, 2, 3])
 
 
-@mock.patch.object(AddressDAO, 'get_address_by_id')
-def test_validate_addresses_valid(mock_get_address_by_id):
+@mock.patch.object(AddressDAO, 'get_addresses_by_ids')
+def test_validate_addresses_valid(mock_get_addresses_by_ids):
     addressDAO = AddressDAO()
     people_service = PeopleService(addressDAO=addressDAO)
-    mock_get_address_by_id.return_value = models.Address(id=1)
-
-    people_service.validate_addresses([1])
+    address = models.Address(id=1)
+    mock_get_addresses_by_ids.return_value = {1: address}
 
-    # no exception has been raised. test passes
+    assert people_service.validate_addresses([1]) == {1: address}
 
 #TODO the update person test can be expanded to test a lot more of its paths. But for now, this will do.
 
+@mock.patch.object(ViewCacheService, 'invalidate_people')
 @mock.patch.object(PeopleFactory, 'create_person_from_person_entity')
 @mock.patch('src.app.people.services.peopleService.PeopleService.update_households_for_person')
 @mock.patch.object(PeopleDAO, 'update_person')
-@mock.patch.object(MediaDAO, 'get_media_item_by_id')
 @mock.patch.object(AddressDAO, 'delete_address')
 @mock.patch.object(AddressDAO, 'create_address_linked_to_person')
-@mock.patch.object(AddressDAO, 'get_address_by_id')
 @mock.patch.object(AddressDAO, 'get_existing_addresses_for_person')
 @mock.patch.object(PeopleDAO, 'create_social_media_link')
 @mock.patch.object(PeopleDAO, 'delete_social_media_link')
@@ -237,14 +242,16 @@ def test_validate_addresses_valid(mock_get_address_by_id):
 @mock.patch.object(PeopleDAO, 'get_person_by_id')
 def test_update_person(mock_get_person_by_id, mock_validate_households, mock_validate_household_remove_person, mock_validate_addresses,
                        mock_validate_image_id, mock_get_existing_social_media_links, mock_delete_social_media_link, mock_create_social_media_link,
-                       mock_get_existing_addresses_for_person, mock_get_address_by_id, mock_create_address_linked_to_person,
-                       mock_delete_address, mock_get_media_item_by_id, mock_update_person, mock_update_households_for_person,
-                       mock_create_person_from_person_entity):
+                       mock_get_existing_addresses_for_person, mock_create_address_linked_to_person,
+                       mock_delete_address, mock_update_person, mock_update_households_for_person,
+                       mock_create_person_from_person_entity, mock_invalidate_people):
     peopleDAO = PeopleDAO()
     peopleFactory = PeopleFactory()
     addressDAO = AddressDAO()
     mediaDAO = MediaDAO()
-    people_service = PeopleService(peopleDAO=peopleDAO, people_factory=peopleFactory, addressDAO=addressDAO, media_DAO=mediaDAO)
+    db = mock.MagicMock(info={})
+    people_service = PeopleService(peopleDAO=peopleDAO, people_factory=peopleFactory, addressDAO=addressDAO, media_DAO=mediaDAO,
+                                   view_cache_service=ViewCacheService(), unit_of_work=UnitOfWork(db))
     existing_person = models.Person(id=1, first_name="John")
     existing_person.social_media_links = [models.SocialMediaLink(id=1, person_id=1, type="facebook", url="facebook.com/john")]
     existing_person.households = [models.Household(id=1, leader_id=5), models.Household(id=2, leader_id=5)]
@@ -275,14 +282,16 @@ def test_update_person(mock_get_person_by_id, mock_validate_households, mock_val
     updated_household_ids = [3,4]
     update_person.household_ids = updated_household_ids
 
+    image_entity = media_models.MediaItem(id=1, store="local", address="path/to/image.jpg")
+    households = {3: models.Household(id=3, leader_id=5), 4: models.Household(id=4, leader_id=5)}
     mock_get_person_by_id.return_value = existing_person
-    mock_validate_households.return_value = None
+    # the validations return the entities they loaded, these are used for the update
+    mock_validate_households.return_value = households
     mock_validate_household_remove_person.return_value = None
-    mock_validate_addresses.return_value = None
-    mock_validate_image_id.return_value = None
+    mock_validate_addresses.return_value = {3: new_address}
+    mock_validate_image_id.return_value = image_entity
 
     mock_get_existing_social_media_links.return_value = existing_person.social_media_links
-    mock_get_address_by_id.return_value = new_address
     mock_create_address_linked_to_person.return_value = None
 
     mock_delete_social_media_link.return_value = None
@@ -290,14 +299,15 @@ def test_update_person(mock_get_person_by_id, mock_validate_households, mock_val
     mock_get_existing_addresses_for_person.return_value = existing_person.addresses
     mock_delete_address.return_value = None
     mock_create_address_linked_to_person.return_value = None
-    image_entity = media_models.MediaItem(id=1, store="local", address="path/to/image.jpg")
-    mock_get_media_item_by_id.return_value = image_entity
     mock_update_person.return_value = None
     mock_update_households_for_person.return_value = None
     mock_create_person_from_person_entity.return_value = FullViewPerson(id=1, first_name="John", last_name="Smith")
 
     people_service.update_person(update_person.id, update_person)
 
+    # the households the person was in before the update are evicted as well
+    mock_invalidate_people.assert_called_once_with([1], [1, 2])
+
     mock_validate_households.assert_called_with(updated_household_ids)
     mock_validate_household_remove_person.assert_called_with(updated_household_ids, existing_person)
     mock_validate_addresses.assert_called_with(update_person.addresses)
@@ -313,8 +323,11 @@ def test_update_person(mock_get_person_by_id, mock_validate_households, mock_val
     update_values.pop('profile_image_id')
 
     mock_update_person.assert_called_with(1, update_values, image_entity)
-    mock_update_households_for_person.assert_has_calls([call(updated_household_ids, existing_person)])
+    mock_update_households_for_person.assert_has_calls([call(updated_household_ids, existing_person, households)])
     mock_create_person_from_person_entity.call_count == 1
+    # all the writes are committed once
+    db.commit.assert_called_once()
+    db.rollback.assert_not_called()
 
 
 @mock.patch.object(PeopleDAO, 'get_person_by_id')
@@ -411,23 +424,23 @@ def test_validate_image_id(mock_get_media_item_by_id):
         people_service.validate_image_id(1)
 
 
-@mock.patch.object(AddressDAO, 'get_address_by_id')
-def test_validate_addresses(mock_get_address_by_id):
+@mock.patch.object(AddressDAO, 'get_addresses_by_ids')
+def test_validate_addresses(mock_get_addresses_by_ids):
     addressDAO = AddressDAO()
     people_service = PeopleService(addressDAO=addressDAO)
-    mock_get_address_by_id.return_value = None
+    mock_get_addresses_by_ids.return_value = {}
     with pytest.raises(NoAddressException):
         people_service.validate_addresses([1])
 
 
-@mock.patch.object(HouseholdDAO, 'get_household_by_id')
+@mock.patch.object(HouseholdDAO, 'get_households_by_ids')
 @mock.patch.object(HouseholdDAO, 'remove_person_from_household')
 @mock.patch.object(HouseholdDAO, 'add_person_to_household')
 @mock.patch.object(HouseholdUtils, 'get_household_ids_to_remove')
 @mock.patch.object(HouseholdUtils, 'get_household_ids_to_add')
 @mock.patch.object(HouseholdUtils, 'get_existing_household_ids')
 def test_update_households_for_persons(mock_get_existing_household_ids, mock_get_household_ids_to_add, mock_get_household_ids_to_remove,
-                                       mock_add_person_to_household, mock_remove_person_from_household, mock_get_household_by_id):
+                                       mock_add_person_to_household, mock_remove_person_from_household, mock_get_households_by_ids):
     householdUtils = HouseholdUtils()
     householdDAO = HouseholdDAO()
     people_service = PeopleService(household_utils=householdUtils, household_DAO=householdDAO)
@@ -436,19 +449,14 @@ def test_update_households_for_persons(mock_get_existing_household_ids, mock_get
     mock_get_household_ids_to_remove.return_value = [1]
     household_1 = models.Household(id=1, leader_id=1)
     household_3 = models.Household(id=3, leader_id=2)
-    def side_effect(household_id):
-        if(household_id == 1):
-            return household_1
-        elif(household_id == 3):
-            return household_3
-
-    mock_get_household_by_id.side_effect = side_effect
+    mock_get_households_by_ids.return_value = {1: household_1, 3: household_3}
 
     #Person is not relevant in this call because of the mocking.
     person_entity = models.Person(id=1)
     people_service.update_households_for_person([2, 3], person_entity)
 
-    mock_get_household_by_id.assert_has_calls([call(1), call(3)], any_order=True)
+    # the households to add and to remove are loaded together
+    mock_get_households_by_ids.assert_called_once_with([3, 1])
     mock_add_person_to_household.assert_called_once_with(household_3, person_entity)
     mock_remove_person_from_household.assert_called_once_with(household_1, person_entity)
 
@@ -456,21 +464,23 @@ def test_update_households_for_persons(mock_get_existing_household_ids, mock_get
 # The fact that this test is so complicated or at least long, is a sign that the method should be refactored. There is
 # no complex logic, but just a lot of things happening in the one method. The test mocks almost everything making it a little
 # less valuable.
+@mock.patch.object(ViewCacheService, 'invalidate_people')
 @mock.patch.object(PeopleFactory, 'create_person_from_person_entity')
 @mock.patch.object(PeopleDAO, 'create_person')
 @mock.patch.object(PeopleDAO, 'get_person_by_id')
 @mock.patch('src.app.people.services.peopleService.PeopleService.add_person_to_households')
 @mock.patch.object(DateUtils, 'get_current_datetime')
 @mock.patch.object(PeopleFactory, 'create_person_entity_from_create_person')
-@mock.patch.object(AddressDAO, 'get_address_by_id')
-@mock.patch.object(MediaDAO, 'get_media_item_by_id')
 @mock.patch('src.app.people.services.peopleService.PeopleService.validate_image_id')
 @mock.patch('src.app.people.services.peopleService.PeopleService.validate_addresses')
 @mock.patch('src.app.people.services.peopleService.PeopleService.validate_households')
-def test_create_person(mock_validate_households, mock_validate_addresses, mock_validate_image_id, mock_get_media_item_by_id,
-                       mock_get_address_by_id, mock_create_person_entity_from_create_person, mock_get_current_datetime,
-                       mock_add_person_to_households, mock_get_person_by_id, mock_create_person, mock_create_person_from_person_entity):
-    people_service = PeopleService(peopleDAO=PeopleDAO(), addressDAO=AddressDAO(), media_DAO=MediaDAO(), people_factory=PeopleFactory())
+def test_create_person(mock_validate_households, mock_validate_addresses, mock_validate_image_id,
+                       mock_create_person_entity_from_create_person, mock_get_current_datetime,
+                       mock_add_person_to_households, mock_get_person_by_id, mock_create_person, mock_create_person_from_person_entity,
+                       mock_invalidate_people):
+    db = mock.MagicMock(info={})
+    people_service = PeopleService(peopleDAO=PeopleDAO(), addressDAO=AddressDAO(), media_DAO=MediaDAO(), people_factory=PeopleFactory(),
+                                   view_cache_service=ViewCacheService(), unit_of_work=UnitOfWork(db))
 
 
     new_person = CreatePerson(first_name="John", last_name="Smith", email="john.smith@test.com", mobile_number="07212345678",
@@ -478,12 +488,11 @@ def test_create_person(mock_validate_households, mock_validate_addresses, mock_v
                               social_media_links=[SocialMediaLink(url="https://www.facebook.com/1", type="facebook"),
                                SocialMediaLink(url="https://www.instagram.com/1", type="instagram")],
                               marital_status=MaritalStatus.married, profile_image_id=1, addresses=[1,2], household_ids=[1, 2])
-    #no validation errors
-    mock_validate_households.return_value = None
-    mock_validate_addresses.return_value = None
-    mock_validate_image_id.return_value = None
+    #no validation errors, the validations return the entities they loaded
+    households = {1: models.Household(id=1), 2: models.Household(id=2)}
+    mock_validate_households.return_value = households
     image_to_link = media_models.MediaItem(id=1)
-    mock_get_media_item_by_id.return_value = image_to_link
+    mock_validate_image_id.return_value = image_to_link
     home_address = models.Address(
         id=1,
         type="home",
@@ -492,12 +501,8 @@ def test_create_person(mock_validate_households, mock_validate_addresses, mock_v
         id=2,
         type="business",
     )
-    def side_effect(address_id):
-        if(address_id == 1):
-            return home_address
-        elif(address_id == 2):
-            return business_address
-    mock_get_address_by_id.side_effect = side_effect
+    # in a different order than the ids of the request
+    mock_validate_addresses.return_value = {2: business_address, 1: home_address}
 
     people_address_home = models.PeopleAddress(person_id=1, address=home_address)
     people_address_business = models.PeopleAddress(person_id=1, address=business_address)
@@ -538,16 +543,16 @@ def test_create_person(mock_validate_households, mock_validate_addresses, mock_v
     mock_validate_households.assert_called_once()
     mock_validate_addresses.assert_called_once()
     mock_validate_image_id.assert_called_once()
-    mock_get_media_item_by_id.assert_called_once()
-    assert mock_get_address_by_id.call_count == 2
-    mock_create_person_entity_from_create_person.assert_called_once()
+    mock_create_person_entity_from_create_person.assert_called_once_with(new_person, [home_address, business_address])
     mock_get_current_datetime.assert_called_once()
     mock_add_person_to_households.assert_called_once()
     mock_create_person.assert_called_once()
+    db.commit.assert_called_once()
     mock_create_person.assert_called_with(create_entity, image_to_link)
     mock_create_person_from_person_entity.assert_called_once()
     mock_add_person_to_households.assert_called_once()
-    mock_add_person_to_households.assert_called_with(created_person, [1,2])
+    mock_add_person_to_households.assert_called_with(created_person, [1,2], households)
+    mock_invalidate_people.assert_called_once_with([1])
     mock_get_person_by_id.assert_called_once()
     mock_get_person_by_id.assert_called_with(1)
     mock_create_person_from_person_entity.assert_called_with(created_person, include_households=True, include_profile_image=True, user=None)
@@ -589,34 +594,34 @@ def test_create_person_invalid_image_id_provided(mock_validate_households, mock_
 
 
 #def validate_household_remove_person(self, new_household_ids, personToUpdate):
-@mock.patch.object(HouseholdDAO, 'get_household_by_id')
+@mock.patch.object(HouseholdDAO, 'get_households_by_ids')
 @mock.patch.object(HouseholdUtils, 'get_household_ids_to_remove')
 @mock.patch.object(HouseholdUtils, 'get_existing_household_ids')
-def test_validate_household_remove_person_valid(mock_get_existing_household_ids, mock_get_household_ids_to_remove, mock_get_household_by_id):
+def test_validate_household_remove_person_valid(mock_get_existing_household_ids, mock_get_household_ids_to_remove, mock_get_households_by_ids):
     people_service = PeopleService(household_DAO=HouseholdDAO(), household_utils=HouseholdUtils())
 
     mock_get_existing_household_ids.return_value = [1,2,3,4]
     mock_get_household_ids_to_remove.return_value = [3]
-    mock_get_household_by_id.return_value = models.Household(id=3, leader=models.Person(id=2), address_id=1)
+    mock_get_households_by_ids.return_value = {3: models.Household(id=3, leader_id=2, address_id=1)}
 
     people_service.validate_household_remove_person([1,2,3], models.Person(id=1))
 
     #no exception means test passed
     mock_get_existing_household_ids.assert_called_once()
     mock_get_household_ids_to_remove.assert_called_once()
-    mock_get_household_by_id.assert_called_once()
+    mock_get_households_by_ids.assert_called_once_with([3])
 
 
 #def validate_household_remove_person(self, new_household_ids, personToUpdate):
-@mock.patch.object(HouseholdDAO, 'get_household_by_id')
+@mock.patch.object(HouseholdDAO, 'get_households_by_ids')
 @mock.patch.object(HouseholdUtils, 'get_household_ids_to_remove')
 @mock.patch.object(HouseholdUtils, 'get_existing_household_ids')
-def test_validate_household_remove_person(mock_get_existing_household_ids, mock_get_household_ids_to_remove, mock_get_household_by_id):
+def test_validate_household_remove_person(mock_get_existing_household_ids, mock_get_household_ids_to_remove, mock_get_households_by_ids):
     people_service = PeopleService(household_DAO=HouseholdDAO(), household_utils=HouseholdUtils())
 
     mock_get_existing_household_ids.return_value = [1,2,3,4]
     mock_get_household_ids_to_remove.return_value = [3]
-    mock_get_household_by_id.return_value = models.Household(id=3, leader=models.Person(id=1), address_id=1)
+    mock_get_households_by_ids.return_value = {3: models.Household(id=3, leader_id=1, address_id=1)}
 
     with(pytest.raises(UnableToRemoveLeaderFromHouseholdException)):
         people_service.validate_household_remove_person([1,2,3], models.Person(id=1))
@@ -624,36 +629,40 @@ def test_validate_household_remove_person(mock_get_existing_household_ids, mock_
     #no exception means test passed
     mock_get_existing_household_ids.assert_called_once()
     mock_get_household_ids_to_remove.assert_called_once()
-    mock_get_household_by_id.assert_called_once()
+    mock_get_households_by_ids.assert_called_once_with([3])
 
-@mock.patch.object(HouseholdDAO, 'get_household_by_id')
-def test_validate_households(mock_get_household_by_id):
+@mock.patch.object(HouseholdDAO, 'get_households_by_ids')
+def test_validate_households(mock_get_households_by_ids):
     people_service = PeopleService(household_DAO=HouseholdDAO(), household_utils=HouseholdUtils())
 
-    mock_get_household_by_id.return_value = models.Household(id=1, leader=models.Person(id=1), address_id=1)
+    household = models.Household(id=1, leader=models.Person(id=1), address_id=1)
+    mock_get_households_by_ids.return_value = {1: household}
 
-    people_service.validate_households([1])
+    assert people_service.validate_households([1]) == {1: household}
 
-    #no exception means test passed
-    mock_get_household_by_id.assert_called_once()
+    mock_get_households_by_ids.assert_called_once()
 
 
-@mock.patch.object(HouseholdDAO, 'get_household_by_id')
-def test_validate_households(mock_get_household_by_id):
+@mock.patch.object(HouseholdDAO, 'get_households_by_ids')
+def test_validate_households(mock_get_households_by_ids):
     people_service = PeopleService(household_DAO=HouseholdDAO(), household_utils=HouseholdUtils())
 
-    mock_get_household_by_id.return_value = None
-    with(pytest.raises(NoHouseholdExceptionForPersonCreation)):
-        people_service.validate_households([1])
+    mock_get_households_by_ids.return_value = {1: models.Household(id=1)}
+    with(pytest.raises(NoHouseholdExceptionForPersonCreation)) as e:
+        people_service.validate_households([1, 2])
 
-    mock_get_household_by_id.assert_called_once()
+    assert str(e.value) == "No household with that Id: 2"
+    mock_get_households_by_ids.assert_called_once()
 
+@mock.patch.object(ViewCacheService, 'invalidate_people')
 @mock.patch.object(MediaFactory, 'create_image_from_image_entity')
 @mock.patch.object(PeopleDAO, 'add_person_image')
 @mock.patch.object(MediaService, 'upload_image')
 @mock.patch.object(PeopleDAO, 'get_person_by_id')
-def test_upload_profile_image(mock_get_person_by_id, mock_upload_image, mock_add_person_image, mock_create_image_from_image_entity):
-    people_service = PeopleService(peopleDAO=PeopleDAO(), media_DAO=MediaDAO(), media_service=MediaService(), media_factory=MediaFactory())
+def test_upload_profile_image(mock_get_person_by_id, mock_upload_image, mock_add_person_image, mock_create_image_from_image_entity,
+                              mock_invalidate_people):
+    people_service = PeopleService(peopleDAO=PeopleDAO(), media_DAO=MediaDAO(), media_service=MediaService(), media_factory=MediaFactory(),
+                                   view_cache_service=ViewCacheService())
     person = models.Person(id=1, first_name="John", last_name="Smith")
     mock_get_person_by_id.return_value = person
     file = UploadFile(filename="test.jpg", content_type="image/jpeg")
@@ -665,6 +674,7 @@ def test_upload_profile_image(mock_get_person_by_id, mock_upload_image, mock_add
 
     mock_add_person_image.assert_called_once()
     mock_add_person_image.assert_called_with(person, mock_upload_image.return_value)
+    mock_invalidate_people.assert_called_once_with([1])
     mock_create_image_from_image_entity.assert_called_once()
     mock_create_image_from_image_entity.assert_called_with(mock_upload_image.return_value)
 
@@ -704,47 +714,32 @@ def test_get_profile_images_by_person_id(mock_get_person_by_id, mock_create_prof
 
 
 @mock.patch.object(HouseholdDAO, 'add_person_to_household')
-@mock.patch.object(HouseholdDAO, 'get_household_by_id')
-def test_add_person_to_households(mock_get_household_by_id, mock_add_person_to_household):
+@mock.patch.object(HouseholdDAO, 'get_households_by_ids')
+def test_add_person_to_households(mock_get_households_by_ids, mock_add_person_to_household):
     people_service = PeopleService(household_DAO=HouseholdDAO())
     person = models.Person(id=1, first_name="John", last_name="Smith")
 
     household_1 = models.Household(id=1, leader=models.Person(id=1), address_id=1)
     household_2 = models.Household(id=2, leader=models.Person(id=2), address_id=2)
-    def side_effect(household_id):
-        if household_id == 1:
-            return household_1
-        elif household_id == 2:
-            return household_2
-
-    mock_get_household_by_id.side_effect = side_effect
+    mock_get_households_by_ids.return_value = {1: household_1, 2: household_2}
     people_service.add_person_to_households(person, [1,2])
 
-    mock_get_household_by_id.call_count == 2
-    mock_get_household_by_id.assert_has_calls([call(1), call(2)], any_order=True)
+    mock_get_households_by_ids.assert_called_once_with([1, 2])
     mock_add_person_to_household.call_count == 2
     mock_add_person_to_household.assert_has_calls([call(household_1, person), call(household_2, person)], any_order=True)
 
 @mock.patch.object(HouseholdDAO, 'remove_person_from_household')
-@mock.patch.object(HouseholdDAO, 'get_household_by_id')
-def test_remove_person_from_households(mock_get_household_by_id, mock_remove_person_from_household):
+@mock.patch.object(HouseholdDAO, 'get_households_by_ids')
+def test_remove_person_from_households(mock_get_households_by_ids, mock_remove_person_from_household):
     people_service = PeopleService(household_DAO=HouseholdDAO())
     person = models.Person(id=1, first_name="John", last_name="Smith")
 
     household_1 = models.Household(id=1, leader=models.Person(id=1), address_id=1)
     household_2 = models.Household(id=2, leader=models.Person(id=2), address_id=2)
-
-    def side_effect(household_id):
-        if household_id == 1:
-            return household_1
-        elif household_id == 2:
-            return household_2
-
-    mock_get_household_by_id.side_effect = side_effect
+    mock_get_households_by_ids.return_value = {1: household_1, 2: household_2}
     people_service.remove_person_from_households(person, [1, 2])
 
-    mock_get_household_by_id.call_count == 2
-    mock_get_household_by_id.assert_has_calls([call(1), call(2)], any_order=True)
+    mock_get_households_by_ids.assert_called_once_with([1, 2])
     mock_remove_person_from_household.call_count == 2
     mock_remove_person_from_household.assert_has_calls([call(household_1, person), call(household_2, person)],
                                                        any_order=True)
@@ -784,3 +779,95 @@ def test_find_people_by_email_or_first_name_and_last_name_with_blank_strings(moc
                                                             call(people_list[1],include_households=False, include_profile_image=True)], any_order=True)
 
 
+
+
+def create_spreadsheet(rows) -> UploadFile:
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    file = io.BytesIO()
+    workbook.save(file)
+    file.seek(0)
+    return UploadFile(filename="people.xlsx", file=file)
+
+
+@mock.patch.object(ViewCacheService, 'invalidate_households')
+@mock.patch.object(PeopleDAO, 'create_people')
+@mock.patch.object(AddressDAO, 'find_addresses_by_keys')
+@mock.patch.object(HouseholdDAO, 'get_existing_household_ids')
+@mock.patch.object(PeopleDAO, 'find_existing_name_keys')
+@mock.patch.object(PeopleDAO, 'find_existing_emails')
+def test_add_people_from_spreadsheet(mock_find_existing_emails, mock_find_existing_name_keys,
+                                     mock_get_existing_household_ids, mock_find_addresses_by_keys, mock_create_people,
+                                     mock_invalidate_households):
+    people_service = PeopleService(peopleDAO=PeopleDAO(), addressDAO=AddressDAO(), household_DAO=HouseholdDAO(),
+                                   people_factory=PeopleFactory(address_factory=AddressFactory()),
+                                   address_factory=AddressFactory(), view_cache_service=ViewCacheService())
+    mock_find_existing_emails.return_value = {"existing@test.com"}
+    mock_find_existing_name_keys.return_value = {("jane", "smith", datetime.date(1980, 1, 1))}
+    mock_get_existing_household_ids.return_value = {1}
+    mock_find_addresses_by_keys.return_value = {}
+    mock_create_people.side_effect = lambda people, household_ids: list(range(10, 10 + len(people)))
+
+    file = create_spreadsheet([
+        ["First Name", "Last Name", "Email", "Mobile Number", "Date of Birth", "Household_ID", "Street Number", "Street",
+         "Suburb", "City", "Province", "Country"],
+        ["John", "Smith", "john@test.com", 721234567, datetime.datetime(1980, 1, 1), 1, 1, "Main Road", "Rondebosch",
+         "Cape Town", "Western Cape", "South Africa"],
+        ["Existing", "Person", "EXISTING@test.com", "0721234567"],
+        ["Jane", "Smith", None, "0721234567", datetime.datetime(1980, 1, 1)],
+        ["Bad", "Email", "not an email", "0721234567"],
+        ["No", "Household", None, "0721234567", None, 2],
+        [None, None],
+        ["Mary", "Smith", "mary@test.com", "0721234567", None, None, "1", " Main Road ", "Rondebosch", "Cape Town",
+         "Western Cape", "South Africa"],
+        ["Mary", "Smith", "MARY@test.com", "0721234567"],
+    ])
+    report = people_service.add_people_from_spreadsheet(file, batch_size=3)
+
+    assert (report.created, report.duplicates, report.invalid) == (2, 3, 2)
+    assert [(row.row, row.status, row.person_id) for row in report.rows] == [
+        (2, ImportRowStatus.created, 10),
+        (3, ImportRowStatus.duplicate, None),
+        (4, ImportRowStatus.duplicate, None),
+        (5, ImportRowStatus.invalid, None),
+        (6, ImportRowStatus.invalid, None),
+        (8, ImportRowStatus.created, 10),
+        (9, ImportRowStatus.duplicate, None),
+    ]
+    # one insert per batch that has new people
+    assert mock_create_people.call_count == 2
+    john, = mock_create_people.call_args_list[0].args[0]
+    mary, = mock_create_people.call_args_list[1].args[0]
+    assert john.mobile_number == "721234567"
+    assert john.date_of_birth == datetime.date(1980, 1, 1)
+    assert mock_create_people.call_args_list[0].args[1] == [1]
+    assert john.addresses[0].address.street == "Main Road"
+    assert mary.addresses[0].address.street == "Main Road"
+    mock_invalidate_households.assert_has_calls([call({1}), call(set())])
+
+
+def test_add_people_from_spreadsheet_without_required_column():
+    people_service = PeopleService(peopleDAO=PeopleDAO(), view_cache_service=ViewCacheService())
+    file = create_spreadsheet([["First Name", "Email"], ["John", "john@test.com"]])
+    with pytest.raises(InvalidPeopleSpreadsheetException):
+        people_service.add_people_from_spreadsheet(file)
+
+
+def test_create_login_for_person_in_a_savepoint():
+    db = mock.MagicMock(info={})
+    user_service = mock.Mock()
+    people_service = PeopleService(peopleDAO=PeopleDAO(), people_factory=PeopleFactory(), user_service=user_service,
+                                   unit_of_work=UnitOfWork(db))
+    person = models.Person(id=1, first_name="John", email="john@example.com")
+
+    # a person whose email already has a login is created without one
+    user_service.create_user_from_person.side_effect = ExistingUserExistsException("User already exists")
+    assert people_service.create_login_for_person(person) is None
+    db.begin_nested.assert_called_once()
+    assert db.begin_nested.return_value.__exit__.call_args[0][0] is ExistingUserExistsException
+
+    # anything else fails the creation of the person
+    user_service.create_user_from_person.side_effect = ValueError("unexpected")
+    with pytest.raises(ValueError):
+        people_service.create_login_for_person(person)
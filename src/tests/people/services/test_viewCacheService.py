@@ -0,0 +1,116 @@
+from unittest import mock
+
+import pytest
+
+from src.app.people.daos.addressDAO import AddressDAO
+from src.app.people.daos.householdDAO import HouseholdDAO
+from src.app.people.daos.peopleDAO import PeopleDAO
+from src.app.people.models.people import BasicViewPerson
+from src.app.people.services.viewCacheService import ViewCacheService
+from src.app.utils import viewCache
+from src.app.utils.viewCache import ViewCache, LRUViewCacheBackend, SharedViewCacheBackend, LocalSharedStore, \
+    PERSON, HOUSEHOLD
+
+
+def create_view_cache_service(cache):
+    return ViewCacheService(peopleDAO=PeopleDAO(), household_DAO=HouseholdDAO(), address_DAO=AddressDAO(), cache=cache)
+
+
+@mock.patch.object(PeopleDAO, 'get_person_version')
+def test_get_person_json_builds_once_per_version(mock_get_person_version):
+    view_cache_service = create_view_cache_service(ViewCache(LRUViewCacheBackend(10)))
+    build_view = mock.Mock(return_value=BasicViewPerson(id=1, first_name="John"))
+    mock_get_person_version.return_value = 1
+
+    first = view_cache_service.get_person_json(1, build_view)
+    second = view_cache_service.get_person_json(1, build_view)
+    mock_get_person_version.return_value = 2
+    third = view_cache_service.get_person_json(1, build_view)
+
+    assert first == second == third
+    assert first.startswith(b'{"id":1,"first_name":"John"')
+    assert build_view.call_count == 2
+
+
+@mock.patch.object(PeopleDAO, 'get_person_version')
+def test_get_person_json_no_person(mock_get_person_version):
+    view_cache_service = create_view_cache_service(ViewCache(LRUViewCacheBackend(10)))
+    build_view = mock.Mock()
+    mock_get_person_version.return_value = None
+
+    assert view_cache_service.get_person_json(1, build_view) is None
+    build_view.assert_not_called()
+
+
+@mock.patch.object(HouseholdDAO, 'get_household_version')
+def test_get_household_json_shared_backend(mock_get_household_version):
+    view_cache_service = create_view_cache_service(ViewCache(SharedViewCacheBackend(LocalSharedStore(), 60)))
+    build_view = mock.Mock(return_value=BasicViewPerson(id=1))
+    mock_get_household_version.return_value = 3
+
+    view_cache_service.get_household_json(1, build_view)
+    view_cache_service.get_household_json(1, build_view)
+
+    assert build_view.call_count == 1
+
+
+def test_start_view_cache_fails_when_the_shared_store_cannot_be_reached():
+    redis = mock.Mock()
+    redis.Redis.from_url.return_value.ping.side_effect = ConnectionError("Connection refused")
+    with mock.patch.object(viewCache.settings, 'flocki_view_cache_backend', 'shared'), \
+            mock.patch.object(viewCache.settings, 'flocki_view_cache_url', 'redis://cache:6379/0'), \
+            mock.patch.dict('sys.modules', {'redis': redis}), mock.patch.object(viewCache, 'view_cache', ViewCache()):
+        with pytest.raises(ConnectionError):
+            viewCache.start_view_cache()
+        assert viewCache.view_cache.backend is None
+
+    with mock.patch.object(viewCache, 'view_cache', ViewCache()):
+        viewCache.start_view_cache()
+        assert isinstance(viewCache.view_cache.backend, LRUViewCacheBackend)
+
+
+@mock.patch.object(HouseholdDAO, 'increment_versions')
+@mock.patch.object(PeopleDAO, 'increment_versions')
+@mock.patch.object(HouseholdDAO, 'get_people_ids_in_households')
+@mock.patch.object(HouseholdDAO, 'get_household_ids_for_people')
+def test_invalidate_people(mock_get_household_ids_for_people, mock_get_people_ids_in_households,
+                           mock_people_increment_versions, mock_household_increment_versions):
+    cache = ViewCache(LRUViewCacheBackend(10))
+    for id in [1, 2, 3, 4]:
+        cache.put(PERSON, id, 1, b'{}')
+    for id in [10, 11, 12]:
+        cache.put(HOUSEHOLD, id, 1, b'{}')
+    view_cache_service = create_view_cache_service(cache)
+    # person 1 moved from household 12 to households 10 and 11, which have people 2 and 3 as members
+    mock_get_household_ids_for_people.return_value = {10, 11}
+    mock_get_people_ids_in_households.return_value = {1, 2, 3}
+
+    view_cache_service.invalidate_people([1], [12])
+
+    mock_get_household_ids_for_people.assert_called_once_with({1})
+    mock_get_people_ids_in_households.assert_called_once_with({10, 11, 12})
+    mock_people_increment_versions.assert_called_once_with({1, 2, 3})
+    mock_household_increment_versions.assert_called_once_with({10, 11, 12})
+    assert [cache.get(PERSON, id, 1) for id in [1, 2, 3, 4]] == [None, None, None, b'{}']
+    assert [cache.get(HOUSEHOLD, id, 1) for id in [10, 11, 12]] == [None, None, None]
+
+
+@mock.patch.object(HouseholdDAO, 'increment_versions')
+@mock.patch.object(PeopleDAO, 'increment_versions')
+@mock.patch.object(HouseholdDAO, 'get_people_ids_in_households')
+@mock.patch.object(AddressDAO, 'get_household_ids_with_address')
+@mock.patch.object(AddressDAO, 'get_people_ids_with_address')
+def test_invalidate_address(mock_get_people_ids_with_address, mock_get_household_ids_with_address,
+                            mock_get_people_ids_in_households, mock_people_increment_versions,
+                            mock_household_increment_versions):
+    view_cache_service = create_view_cache_service(ViewCache(LRUViewCacheBackend(10)))
+    mock_get_people_ids_with_address.return_value = {1}
+    mock_get_household_ids_with_address.return_value = {10}
+    mock_get_people_ids_in_households.return_value = {2, 3}
+
+    view_cache_service.invalidate_address(5)
+
+    mock_get_people_ids_with_address.assert_called_once_with(5)
+    mock_get_household_ids_with_address.assert_called_once_with(5)
+    mock_people_increment_versions.assert_called_once_with({1, 2, 3})
+    mock_household_increment_versions.assert_called_once_with({10})